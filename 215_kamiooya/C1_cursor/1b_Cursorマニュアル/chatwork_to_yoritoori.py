@@ -40,6 +40,7 @@ from yoritoori_utils import (
     parse_received_date_folder,
     resolve_incoming_attach_date_dir,
 )
+from yoritoori_md_writer import write_blocks
 
 JST = ZoneInfo("Asia/Tokyo")
 
@@ -479,14 +480,8 @@ def append_to_yoritoori(
 {attach}
 ---
 """
-    content = md_path.read_text(encoding="utf-8")
-    marker = "## やり取り（時系列）"
-    if marker in content:
-        pos = content.find(marker) + len(marker)
-        content = content[:pos].rstrip() + "\n\n" + block.strip() + "\n\n" + content[pos:].lstrip()
-    else:
-        content += block
-    md_path.write_text(content, encoding="utf-8")
+    # Gmail / LINE の取り込みと同じファイルロック・一時ファイル置き換えで書く
+    write_blocks(md_path, [block])
     mirror_yoritoori_md_to_gitrepos(md_path)
     return True
 
@@ -518,14 +513,8 @@ def append_sent_to_yoritoori(
 {attach}
 ---
 """
-    content = md_path.read_text(encoding="utf-8")
-    marker = "## やり取り（時系列）"
-    if marker in content:
-        pos = content.find(marker) + len(marker)
-        content = content[:pos].rstrip() + "\n\n" + block.strip() + "\n\n" + content[pos:].lstrip()
-    else:
-        content += block
-    md_path.write_text(content, encoding="utf-8")
+    # Gmail / LINE の取り込みと同じファイルロック・一時ファイル置き換えで書く
+    write_blocks(md_path, [block])
     mirror_yoritoori_md_to_gitrepos(md_path)
     return True
 
@@ -199,6 +199,61 @@ def build_service_for_token(token_path_for_account: Path):
     return service, email_addr
 
 
+_JARVIS_SCRIPTS = Path(__file__).resolve().parents[3] / "scripts"
+
+
+def fetch_messages_as(service, ids, fmt="full"):
+    """ids の順で取得（消えたメールは抜ける）。Jarvis の Gmail 保管庫（scripts/jarvis_gmail_store.py）が
+    あれば保存済みは API に出ず、残りは batch でまとめて取る。無い環境では1件ずつ GET。"""
+    ids = list(ids)
+    if not ids:
+        return []
+    try:
+        if _JARVIS_SCRIPTS.is_dir() and str(_JARVIS_SCRIPTS) not in sys.path:
+            sys.path.append(str(_JARVIS_SCRIPTS))
+        from jarvis_gmail_store import fetch_messages
+    except ImportError:
+        return [service.users().messages().get(userId="me", id=i, format=fmt).execute() for i in ids]
+    return fetch_messages(service, ids, fmt)
+
+
+def fetch_full_messages(service, ids):
+    return fetch_messages_as(service, ids, "full")
+
+
+def list_message_ids(service, query, limit=None):
+    """q に一致する id を nextPageToken でたどって取る（1ページ500件。limit で打ち切り）。"""
+    ids = []
+    page = None
+    while True:
+        kwargs = {"userId": "me", "q": query, "maxResults": 500}
+        if page:
+            kwargs["pageToken"] = page
+        result = service.users().messages().list(**kwargs).execute()
+        ids.extend(m["id"] for m in result.get("messages", []))
+        page = result.get("nextPageToken")
+        if not page or (limit and len(ids) >= limit):
+            break
+    return ids[:limit] if limit else ids
+
+
+def header_dict(msg):
+    """小文字ヘッダ名 → 値（同名は先勝ち）。metadata / full どちらでも。"""
+    out = {}
+    for h in msg.get("payload", {}).get("headers", []):
+        out.setdefault(h["name"].lower(), h["value"])
+    return out
+
+
+def mail_date_str(from_date):
+    if from_date:
+        try:
+            return format_date(email_utils.parsedate_to_datetime(from_date))
+        except (TypeError, ValueError):
+            pass
+    return format_date(datetime.now())
+
+
 from yoritoori_utils import (
     YORITOORI_FILENAME,
     insert_after_timeline_heading,
@@ -206,6 +261,11 @@ from yoritoori_utils import (
     resolve_incoming_attach_date_dir,
     resolve_incoming_attach_dir,
 )
+from yoritoori_index import file_entries
+from yoritoori_md_writer import MarkdownAppender
+
+# 1回の実行で追記するブロックをファイルごとに溜め、main の最後にまとめて書く
+MD_WRITER = MarkdownAppender(insert_after_timeline_heading, after_write=mirror_yoritoori_md_to_gitrepos)
 
 
 def extract_email(from_header):
@@ -528,61 +588,28 @@ def save_attachments(service, message_id, payload, folder_path, date_str):
     return saved
 
 
-def parse_yoritoori_existing():
-    """各やり取り.md から既存エントリの (partner_name, subject, date_yyyymmdd) を抽出。"""
+def _existing_keys(channel_prefix):
+    """各やり取り.md の見出しインデックスから (partner_name, subject, date_yyyymmdd) を集める。
+    変わっていないファイルは読まない（yoritoori_index.py）。"""
     existing = set()
     for folder in base_path.iterdir():
         if not folder.is_dir():
             continue
-        md_path = folder / YORITOORI_FILENAME
-        if not md_path.exists():
-            continue
-        content = md_path.read_text(encoding="utf-8")
-        blocks = re.split(r"\n---\s*\n", content)
-        for block in blocks:
-            m = re.search(
-                r"### (\d{4}/\d{2}/\d{2})(?:\s+(\d{1,2}:\d{2}))?｜([^｜]+)｜相手から返信",
-                block,
-            )
-            if not m:
+        for e in file_entries(folder / YORITOORI_FILENAME):
+            if not e["channel"].startswith(channel_prefix):
                 continue
-            date_part = m.group(1)
-            partner_name = (m.group(3) or "").strip()
-            subject = ""
-            sm = re.search(r"\*\*件名\*\*:\s*(.+)", block)
-            if sm:
-                subject = sm.group(1).strip()
-            key = (partner_name, subject, date_part.replace("/", "-"))
-            existing.add(key)
+            existing.add((e["partner"], e["subject"] or "", e["received_at"][:10].replace("/", "-")))
     return existing
 
 
+def parse_yoritoori_existing():
+    """各やり取り.md から既存エントリの (partner_name, subject, date_yyyymmdd) を抽出。"""
+    return _existing_keys("相手から返信")
+
+
 def parse_yoritoori_existing_sent():
     """各やり取り.md から既存の「自分から送信」エントリの (partner_name, subject, date_yyyymmdd) を抽出。重複判定用。"""
-    existing = set()
-    for folder in base_path.iterdir():
-        if not folder.is_dir():
-            continue
-        md_path = folder / YORITOORI_FILENAME
-        if not md_path.exists():
-            continue
-        content = md_path.read_text(encoding="utf-8")
-        blocks = re.split(r"\n---\s*\n", content)
-        for block in blocks:
-            m = re.search(
-                r"### (\d{4}/\d{2}/\d{2})(?:\s+(\d{1,2}:\d{2}))?｜([^｜]+)｜自分から送信",
-                block,
-            )
-            if not m:
-                continue
-            date_part = m.group(1).replace("/", "-")
-            partner_name = (m.group(3) or "").strip()
-            subject = ""
-            sm = re.search(r"\*\*件名\*\*:\s*(.+)", block)
-            if sm:
-                subject = sm.group(1).strip()
-            existing.add((partner_name, subject, date_part))
-    return existing
+    return _existing_keys("自分から送信")
 
 
 def append_sent_to_yoritoori(folder_path, partner_name, date_str, subject, body, attachment_names=None):
@@ -611,13 +638,13 @@ def append_sent_to_yoritoori(folder_path, partner_name, date_str, subject, body,
 
 ---
 """
-    content = md_path.read_text(encoding="utf-8")
-    md_path.write_text(insert_after_timeline_heading(content, block), encoding="utf-8")
-    mirror_yoritoori_md_to_gitrepos(md_path)
+    MD_WRITER.add(md_path, block)
     return True
 
 
-def append_to_yoritoori(folder_path, partner_name, date_str, body, attachment_names=None, subject=""):
+def append_to_yoritoori(folder_path, partner_name, date_str, body, attachment_names=None, subject="", on_written=None):
+    """やり取り.md に「相手から返信」ブロックを追記（MD_WRITER に溜め、flush で書く）。
+    on_written は実際に書けた後に呼ぶ（既読化など）。"""
     if attachment_names is None:
         attachment_names = []
 
@@ -637,7 +664,6 @@ def append_to_yoritoori(folder_path, partner_name, date_str, body, attachment_na
     if attachment_names:
         attach_block = "\n**添付ファイル**: " + ", ".join(attachment_names) + "（添付フォルダに保存）\n"
 
-    content = md_path.read_text(encoding="utf-8")
     block = f"""
 
 ### {date_str}｜{partner_name}｜相手から返信｜{summary}
@@ -646,14 +672,20 @@ def append_to_yoritoori(folder_path, partner_name, date_str, body, attachment_na
 
 ---
 """
-    md_path.write_text(insert_after_timeline_heading(content, block), encoding="utf-8")
-    mirror_yoritoori_md_to_gitrepos(md_path)
+    MD_WRITER.add(md_path, block, on_written=on_written)
     return True
 
 
-def process_message(service, msg, resolver, mark_read=True):
-    """1件のメールを処理し、やり取りに追記。追記したら True。"""
-    full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
+def process_message(service, msg, resolver, mark_read=True, full=None):
+    """1件のメールを処理し、やり取りに追記。追記したら True。
+
+    full（format=full の取得済み payload）を渡せば取り直さない。本文・添付の保存にもそのまま使う。
+    """
+    if full is None:
+        fetched = fetch_full_messages(service, [msg["id"]])
+        if not fetched:
+            return False
+        full = fetched[0]
     headers = full.get("payload", {}).get("headers", [])
 
     from_val = next((h["value"] for h in headers if h["name"].lower() == "from"), None)
@@ -688,7 +720,18 @@ def process_message(service, msg, resolver, mark_read=True):
     except Exception as e:
         print(f"添付の保存中にエラー: {e}", file=sys.stderr)
 
-    ok = append_to_yoritoori(partner["folder"], partner["name"], date_str, body, attachment_names, subject)
+    def _mark_read():
+        service.users().messages().modify(
+            userId="me",
+            id=msg["id"],
+            body={"removeLabelIds": ["UNREAD"]},
+        ).execute()
+
+    # 既読化は追記が実際に書けてから（flush 時）
+    ok = append_to_yoritoori(
+        partner["folder"], partner["name"], date_str, body, attachment_names, subject,
+        on_written=_mark_read if mark_read else None,
+    )
     if ok:
         learned = resolver.maybe_learn(partner, email) if email else False
         log_msg = (
@@ -698,12 +741,6 @@ def process_message(service, msg, resolver, mark_read=True):
         if attachment_names:
             log_msg += f" [添付{len(attachment_names)}件]"
         print(log_msg)
-        if mark_read:
-            service.users().messages().modify(
-                userId="me",
-                id=msg["id"],
-                body={"removeLabelIds": ["UNREAD"]},
-            ).execute()
         return True
     return False
 
@@ -785,23 +822,26 @@ def main():
             sys.stdout.flush()
             _, existing_sent = _run_include_sent(service, resolver, existing_sent=existing_sent)
 
+        # このアカウント分の追記をファイルごとに1回で書く（既読化もここで）
+        if MD_WRITER.flush():
+            print("一部のやり取り.md に書けませんでした（未読のものは次回また取り込みます）。", file=sys.stderr)
+
     print("\n完了しました。")
     sys.stdout.flush()
 
 
 def _run_unread_only(service, resolver):
     """未読メールを処理し、やり取りに追記して既読にする。"""
-    result = service.users().messages().list(userId="me", q="is:unread", maxResults=50).execute()
-    messages = result.get("messages", [])
+    ids = list_message_ids(service, "is:unread", limit=50)
 
-    if not messages:
+    if not ids:
         print("未読メールはありません。")
         sys.stdout.flush()
         return 0
 
     appended = 0
-    for msg in messages:
-        if process_message(service, msg, resolver, mark_read=True):
+    for full in fetch_full_messages(service, ids):
+        if process_message(service, full, resolver, mark_read=True, full=full):
             appended += 1
 
     if appended > 0:
@@ -813,7 +853,10 @@ def _run_unread_only(service, resolver):
 
 
 def _run_include_read(service, resolver, existing=None):
-    """既読含む。やり取りの漏れを検出して追加。"""
+    """既読含む。やり取りの漏れを検出して追加。
+
+    一覧はヘッダだけ（format=metadata を batch）で既存キーと照合し、残ったものだけ本文を1回取る。
+    """
     if existing is None:
         existing = parse_yoritoori_existing()
 
@@ -825,44 +868,33 @@ def _run_include_read(service, resolver, existing=None):
 
     from_query = " OR ".join(parts)
     query = f"({from_query}) newer_than:30d"
-    result = service.users().messages().list(userId="me", q=query, maxResults=100).execute()
-    messages = result.get("messages", [])
+    ids = list_message_ids(service, query)
 
-    if not messages:
+    if not ids:
         print("直近30日にパートナーからのメールはありませんでした。")
         sys.stdout.flush()
         return 0, existing
 
-    appended = 0
-    for msg in messages:
-        full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-        headers = full.get("payload", {}).get("headers", [])
-        from_val = next((h["value"] for h in headers if h["name"].lower() == "from"), None)
-        to_val = next((h["value"] for h in headers if h["name"].lower() == "to"), "")
-        cc_val = next((h["value"] for h in headers if h["name"].lower() == "cc"), "")
-        from_date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "")
-
-        email = extract_email(from_val)
-        partner, _kind = resolver.resolve(email, to_header=to_val or "", cc_header=cc_val or "")
+    todo = []
+    for meta in fetch_messages_as(service, ids, "metadata"):
+        hdr = header_dict(meta)
+        email = extract_email(hdr.get("from"))
+        partner, _kind = resolver.resolve(email, to_header=hdr.get("to") or "", cc_header=hdr.get("cc") or "")
         if not partner:
             continue
-
-        if from_date:
-            try:
-                dt = email_utils.parsedate_to_datetime(from_date)
-                date_str = format_date(dt)
-            except (TypeError, ValueError):
-                date_str = format_date(datetime.now())
-        else:
-            date_str = format_date(datetime.now())
-
-        date_key = date_str[:10].replace("/", "-")
-        key = (partner["name"], subject.strip(), date_key)
+        date_key = mail_date_str(hdr.get("date"))[:10].replace("/", "-")
+        key = (partner["name"], (hdr.get("subject") or "").strip(), date_key)
         if key in existing:
             continue
+        todo.append((meta["id"], key))
 
-        if process_message(service, msg, resolver, mark_read=False):
+    appended = 0
+    keys = dict(todo)
+    for full in fetch_full_messages(service, [mid for mid, _ in todo]):
+        key = keys[full["id"]]
+        if key in existing:  # 同じ件名・日付の重複メール
+            continue
+        if process_message(service, full, resolver, mark_read=False, full=full):
             appended += 1
             existing.add(key)
 
@@ -874,6 +906,21 @@ def _run_include_read(service, resolver, existing=None):
     return appended, existing
 
 
+def _sent_partner(resolver, to_val):
+    to_emails = extract_emails_from_header(to_val)
+    for e in to_emails:
+        p, _kind = resolver.resolve(e)
+        if p:
+            return p
+        # ドメインのみ一致も resolve で拾える（From 扱いだがアドレス文字列は同じ）
+    if to_val:
+        # To 表示名ヒント（LEAF 等）
+        p, kind = resolver.resolve("", to_header=to_val or "", cc_header="")
+        if p and kind == "to_hint":
+            return p
+    return None
+
+
 def _run_include_sent(service, resolver, existing_sent=None):
     """送信トレイ（SENT）からパートナーあてのメールを取得し、やり取りに「自分から送信」として追記。"""
     if existing_sent is None:
@@ -885,57 +932,36 @@ def _run_include_sent(service, resolver, existing_sent=None):
         return 0, existing_sent
     to_query = " OR ".join(parts)
     query = f"in:sent ({to_query}) newer_than:30d"
-    result = service.users().messages().list(userId="me", q=query, maxResults=100).execute()
-    messages = result.get("messages", [])
+    ids = list_message_ids(service, query)
 
-    if not messages:
+    if not ids:
         print("直近30日にパートナーあての送信メールはありませんでした。")
         sys.stdout.flush()
         return 0, existing_sent
 
-    appended = 0
-    for msg in messages:
-        full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-        headers = full.get("payload", {}).get("headers", [])
-        to_val = next((h["value"] for h in headers if h["name"].lower() == "to"), None)
-        from_date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "")
-
-        to_emails = extract_emails_from_header(to_val)
-        partner = None
-        for e in to_emails:
-            p, _kind = resolver.resolve(e)
-            if p:
-                partner = p
-                break
-            # ドメインのみ一致も resolve で拾える（From 扱いだがアドレス文字列は同じ）
-        if not partner and to_val:
-            # To 表示名ヒント（LEAF 等）
-            p, kind = resolver.resolve("", to_header=to_val or "", cc_header="")
-            if p and kind == "to_hint":
-                partner = p
+    todo = []
+    for meta in fetch_messages_as(service, ids, "metadata"):
+        hdr = header_dict(meta)
+        partner = _sent_partner(resolver, hdr.get("to"))
         if not partner:
             continue
+        subject = (hdr.get("subject") or "").strip()
+        date_str = mail_date_str(hdr.get("date"))
+        key = (partner["name"], subject, date_str[:10].replace("/", "-"))
+        if key in existing_sent:
+            continue
+        todo.append((meta["id"], (partner, subject, date_str, key)))
 
+    appended = 0
+    info = dict(todo)
+    for full in fetch_full_messages(service, [mid for mid, _ in todo]):
+        partner, subject, date_str, key = info[full["id"]]
+        if key in existing_sent:
+            continue
         payload = full.get("payload", {})
         body = parse_email_body(payload)
         attachment_names = collect_attachment_filenames(payload)
-
-        if from_date:
-            try:
-                dt = email_utils.parsedate_to_datetime(from_date)
-                date_str = format_date(dt)
-            except (TypeError, ValueError):
-                date_str = format_date(datetime.now())
-        else:
-            date_str = format_date(datetime.now())
-
-        date_key = date_str[:10].replace("/", "-")
-        key = (partner["name"], subject.strip(), date_key)
-        if key in existing_sent:
-            continue
-
-        if append_sent_to_yoritoori(partner["folder"], partner["name"], date_str, subject.strip(), body, attachment_names):
+        if append_sent_to_yoritoori(partner["folder"], partner["name"], date_str, subject, body, attachment_names):
             appended += 1
             existing_sent.add(key)
             print(f"追記（送信）: {partner['name']} - {subject[:50]}...")
@@ -976,16 +1002,14 @@ def _run_add_at(service, resolver, add_at_str):
     after_date = (target_dt - timedelta(days=1)).strftime("%Y/%m/%d")
     before_date = (target_dt + timedelta(days=2)).strftime("%Y/%m/%d")
     query = f"({from_query}) after:{after_date} before:{before_date}"
-    result = service.users().messages().list(userId="me", q=query, maxResults=50).execute()
-    messages = result.get("messages", [])
+    ids = list_message_ids(service, query)
     existing = parse_yoritoori_existing()
-    appended = 0
 
-    for msg in messages:
-        full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-        headers = full.get("payload", {}).get("headers", [])
-        from_date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "")
+    todo = []
+    for meta in fetch_messages_as(service, ids, "metadata"):
+        hdr = header_dict(meta)
+        from_date = hdr.get("date")
+        subject = hdr.get("subject") or ""
         if from_date:
             try:
                 dt = email_utils.parsedate_to_datetime(from_date)
@@ -1000,14 +1024,20 @@ def _run_add_at(service, resolver, add_at_str):
         if not (start_dt <= dt <= end_dt):
             continue
 
-        date_str = format_date(dt)
-        date_key = date_str[:10].replace("/", "-")
+        date_key = format_date(dt)[:10].replace("/", "-")
         if (subject.strip(), date_key) in existing:
             continue
+        todo.append((meta["id"], (subject.strip(), date_key)))
 
-        if process_message(service, msg, resolver, mark_read=False):
+    appended = 0
+    keys = dict(todo)
+    for full in fetch_full_messages(service, [mid for mid, _ in todo]):
+        key = keys[full["id"]]
+        if key in existing:
+            continue
+        if process_message(service, full, resolver, mark_read=False, full=full):
             appended += 1
-            existing.add((subject.strip(), date_key))
+            existing.add(key)
 
     if appended > 0:
         print(f"\n{appended} 件のメールをやり取りに追記しました。")
@@ -1031,37 +1061,29 @@ def _run_import_from(service, resolver, from_email, days):
         sys.exit(1)
 
     query = f"from:{from_email} newer_than:{int(days)}d"
-    result = service.users().messages().list(userId="me", q=query, maxResults=500).execute()
-    messages = result.get("messages", [])
-    if not messages:
+    ids = list_message_ids(service, query)
+    if not ids:
         print(f"直近{days}日に {from_email} からのメールはありませんでした。")
         sys.stdout.flush()
         return 0
 
     existing = parse_yoritoori_existing()
-    appended = 0
-
-    for msg in messages:
-        full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-        headers = full.get("payload", {}).get("headers", [])
-        from_date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "")
-
-        if from_date:
-            try:
-                dt = email_utils.parsedate_to_datetime(from_date)
-                date_str = format_date(dt)
-            except (TypeError, ValueError):
-                date_str = format_date(datetime.now())
-        else:
-            date_str = format_date(datetime.now())
-
-        date_key = date_str[:10].replace("/", "-")
-        key = (partner["name"], subject.strip(), date_key)
+    todo = []
+    for meta in fetch_messages_as(service, ids, "metadata"):
+        hdr = header_dict(meta)
+        date_key = mail_date_str(hdr.get("date"))[:10].replace("/", "-")
+        key = (partner["name"], (hdr.get("subject") or "").strip(), date_key)
         if key in existing:
             continue
+        todo.append((meta["id"], key))
 
-        if process_message(service, msg, resolver, mark_read=False):
+    appended = 0
+    keys = dict(todo)
+    for full in fetch_full_messages(service, [mid for mid, _ in todo]):
+        key = keys[full["id"]]
+        if key in existing:
+            continue
+        if process_message(service, full, resolver, mark_read=False, full=full):
             appended += 1
             existing.add(key)
 
@@ -1094,64 +1116,45 @@ def _run_import_from_to_partner(service, partners, partner_name_or_folder, from_
         sys.exit(1)
 
     query = f"from:{from_email} newer_than:{int(days)}d"
-    result = service.users().messages().list(userId="me", q=query, maxResults=500).execute()
-    messages = result.get("messages", [])
-    if not messages:
+    ids = list_message_ids(service, query)
+    if not ids:
         print(f"直近{days}日に {from_email} からのメールはありませんでした。")
         sys.stdout.flush()
         return 0
 
     # 指定パートナーのフォルダだけを対象に既存判定（他パートナーと混ざらないように）
-    md_path = base_path / partner["folder"] / YORITOORI_FILENAME
-    if md_path.exists():
-        content = md_path.read_text(encoding="utf-8")
-    else:
-        content = ""
-
-    existing = set()
-    blocks = re.split(r"\n---\s*\n", content)
-    for block in blocks:
-        m = re.search(r"### (\d{4}/\d{2}/\d{2}).*｜[^｜]+｜相手から返信", block)
-        if not m:
+    existing = {
+        (e["subject"] or "", e["received_at"][:10].replace("/", "-"))
+        for e in file_entries(base_path / partner["folder"] / YORITOORI_FILENAME)
+        if e["channel"].startswith("相手から返信")
+    }
+
+    todo = []
+    for meta in fetch_messages_as(service, ids, "metadata"):
+        hdr = header_dict(meta)
+        subject = (hdr.get("subject") or "").strip()
+        date_str = mail_date_str(hdr.get("date"))
+        key = (subject, date_str[:10].replace("/", "-"))
+        if key in existing:
             continue
-        date_part = m.group(1).replace("/", "-")
-        subject = ""
-        sm = re.search(r"\*\*件名\*\*:\s*(.+)", block)
-        if sm:
-            subject = sm.group(1).strip()
-        existing.add((subject, date_part))
+        todo.append((meta["id"], (subject, date_str, key)))
 
     appended = 0
-    for msg in messages:
-        full = service.users().messages().get(userId="me", id=msg["id"], format="full").execute()
-        headers = full.get("payload", {}).get("headers", [])
-        from_date = next((h["value"] for h in headers if h["name"].lower() == "date"), None)
-        subject = next((h["value"] for h in headers if h["name"].lower() == "subject"), "")
-
-        if from_date:
-            try:
-                dt = email_utils.parsedate_to_datetime(from_date)
-                date_str = format_date(dt)
-            except (TypeError, ValueError):
-                date_str = format_date(datetime.now())
-        else:
-            date_str = format_date(datetime.now())
-
-        date_key = date_str[:10].replace("/", "-")
-        key = (subject.strip(), date_key)
+    info = dict(todo)
+    for full in fetch_full_messages(service, [mid for mid, _ in todo]):
+        subject, date_str, key = info[full["id"]]
         if key in existing:
             continue
-
         payload = full.get("payload", {})
         body = parse_email_body(payload)
 
         attachment_names = []
         try:
-            attachment_names = save_attachments(service, msg["id"], payload, partner["folder"], date_str)
+            attachment_names = save_attachments(service, full["id"], payload, partner["folder"], date_str)
         except Exception as e:
             print(f"添付の保存中にエラー: {e}", file=sys.stderr)
 
-        if append_to_yoritoori(partner["folder"], partner["name"], date_str, body, attachment_names, subject.strip()):
+        if append_to_yoritoori(partner["folder"], partner["name"], date_str, body, attachment_names, subject):
             appended += 1
             existing.add(key)
             log_msg = f"追記: {partner['name']} (from:{from_email}) - {subject[:40]}..."
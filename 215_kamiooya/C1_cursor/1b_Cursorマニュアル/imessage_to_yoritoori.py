@@ -40,6 +40,7 @@ from yoritoori_utils import (  # noqa: E402
     parse_received_date_folder,
     resolve_incoming_attach_date_dir,
 )
+from yoritoori_md_writer import write_blocks  # noqa: E402
 
 BASE_DIR = default_yoritoori_base_dir()
 CONTACT_YAML = BASE_DIR / "000_共通" / "連絡先一覧.yaml"
@@ -256,7 +257,6 @@ def append_to_yoritoori(
 
     summary = make_summary(body)
     attach = _attach_block(attachment_names)
-    content = md_path.read_text(encoding="utf-8")
     block = f"""
 
 ### {date_str}｜{partner_name}｜相手から返信（{source}）｜{summary}
@@ -265,13 +265,8 @@ def append_to_yoritoori(
 {attach}
 ---
 """
-    marker = "## やり取り（時系列）"
-    if marker in content:
-        pos = content.find(marker) + len(marker)
-        content = content[:pos].rstrip() + "\n\n" + block.strip() + "\n\n" + content[pos:].lstrip()
-    else:
-        content += block
-    md_path.write_text(content, encoding="utf-8")
+    # Gmail / LINE の取り込みと同じファイルロック・一時ファイル置き換えで書く
+    write_blocks(md_path, [block])
     mirror_yoritoori_md_to_gitrepos(md_path)
     return True
 
@@ -9,6 +9,8 @@
 import re
 from pathlib import Path
 
+from yoritoori_blocks import iter_blocks
+
 BASE_DIR = Path(__file__).resolve().parent.parent.parent / "C2_ルーティン作業" / "26_パートナー社への相談"
 YORITOORI_FILENAME = "5.やり取り.md"
 
@@ -28,19 +30,8 @@ def parse_sort_key(first_line):
 
 
 def split_into_blocks(body):
-    """本文をブロック（### で始まる単位）に分割。"""
-    blocks = []
-    current = []
-    for line in body.split("\n"):
-        if re.match(r"^### ", line):
-            if current:
-                blocks.append("\n".join(current))
-            current = [line]
-        else:
-            current.append(line)
-    if current:
-        blocks.append("\n".join(current))
-    return blocks
+    """本文をブロック（### で始まる単位）に分割。最初の見出しより前の部分も1ブロック。"""
+    return [b.text for b in iter_blocks(body, with_prelude=True)]
 
 
 def sort_yoritoori_file(md_path):
@@ -0,0 +1,146 @@
+# やり取り.md のブロック読み（見出し行〜次の見出しの直前）。夜間トリアージ・見出しインデックス・
+# 並び替え・LINE のプレースホルダー修復が共通で使う。
+#
+# 1行ずつ読んで見出しごとに Block を返すジェネレータ（全文を文字列にしない）。offset / length は
+# ファイル（bytes を渡したときはバイト、str を渡したときは文字）の位置。
+# since で古いブロックを除ける。タイムラインは「おおむね」新しい順だが、取り込み元によって古い日付が
+# 上に入ったり末尾に足されたりしているので、古いのが続いたら打ち切る stop_after_older は並び替え済みと
+# 分かっているファイルにだけ使う（期間で絞るだけなら yoritoori_index.file_entries(since=...) が速い）。
+#
+#   from yoritoori_blocks import iter_blocks
+#   for b in iter_blocks(md_path, since=datetime.now() - timedelta(days=14)):
+#       b.fields[0], b.body, b.when ...
+
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+TIMELINE_MARKER = "## やり取り（時系列）"
+
+# ### 2026/02/11｜ / ### 2026/02/11 14:30｜（20XX 等のテンプレートは日付なし扱い）
+DATE_RE = re.compile(r"^(\d{4})/(\d{2})/(\d{2})(?:\s+(\d{1,2}):(\d{2}))?")
+
+
+@dataclass
+class Block:
+    offset: int
+    length: int
+    heading: str  # 見出し行（改行なし）。with_prelude の先頭部分は ""
+    body: str  # 見出しの次の行〜ブロック末尾（未加工）
+
+    @property
+    def text(self) -> str:
+        return f"{self.heading}\n{self.body}" if self.heading else self.body
+
+    @property
+    def fields(self) -> list:
+        """「### 」以降を ｜ で分けたもの（各欄 strip 済み）。"""
+        h = self.heading[4:] if self.heading.startswith("### ") else self.heading
+        return [p.strip() for p in h.split("｜")]
+
+    @property
+    def when(self):
+        """見出し先頭の日時（時刻なしは 0:00）。日付でなければ None。"""
+        m = DATE_RE.match(self.fields[0]) if self.heading else None
+        if not m:
+            return None
+        y, mo, d = int(m.group(1)), int(m.group(2)), int(m.group(3))
+        try:
+            return datetime(y, mo, d, int(m.group(4) or 0), int(m.group(5) or 0))
+        except ValueError:
+            return None
+
+
+def _is_heading(line):
+    return line.startswith("### ")
+
+
+def _lines(source):
+    """(行文字列, 位置の進み) を順に。改行は \\n のみで区切る（本文中の \\r 等は行の一部）。"""
+    if isinstance(source, str):
+        pos = 0
+        while pos < len(source):
+            nl = source.find("\n", pos)
+            end = len(source) if nl < 0 else nl + 1
+            yield source[pos:end], end - pos
+            pos = end
+        return
+    if isinstance(source, (bytes, bytearray)):
+        pos = 0
+        while pos < len(source):
+            nl = source.find(b"\n", pos)
+            end = len(source) if nl < 0 else nl + 1
+            yield source[pos:end].decode("utf-8", errors="replace"), end - pos
+            pos = end
+        return
+    with open(Path(source), "rb") as fh:
+        for raw in fh:
+            yield raw.decode("utf-8", errors="replace"), len(raw)
+
+
+def iter_blocks(
+    source, *, since=None, stop_after_older=None, is_heading=None, after_marker=None, with_prelude=False
+):
+    """source（パス / bytes / str）のブロックをファイル順に返す。
+
+    since: これより古い（日付付きの）ブロックは返さない。aware でも naive として比べる。
+    stop_after_older: since より古いブロックがこの件数続いたら読むのをやめる（並び替え済みのファイル用）。
+    is_heading: 見出し判定（既定は「### 」で始まる行）。
+    after_marker: この文字列を含む行より後だけ見る（無いファイルは全体）。
+    with_prelude: 最初の見出しより前の部分も heading="" の Block として返す。
+    """
+    is_heading = is_heading or _is_heading
+    if since is not None and since.tzinfo is not None:
+        since = since.replace(tzinfo=None)
+    found = []
+    yield from _iter(source, since, stop_after_older, is_heading, after_marker, with_prelude, found)
+    if after_marker is not None and not found:
+        # マーカーが無いファイルは全体を対象にする
+        yield from _iter(source, since, stop_after_older, is_heading, None, with_prelude, found)
+
+
+def _iter(source, since, stop_after_older, is_heading, after_marker, with_prelude, found):
+    """after_marker を見つけたら found に印を付ける（無ければ呼び出し側が全体で読み直す）。"""
+    skipping = after_marker is not None
+    start, heading, lines, length = 0, None, [], 0  # 組み立て中のブロック
+    older_run = 0
+    pos = 0
+    for line, n in _lines(source):
+        if skipping:
+            pos += n
+            if after_marker in line:
+                skipping = False
+                start = pos
+                found.append(pos)
+            continue
+        stripped = line.rstrip("\r\n")
+        if is_heading(stripped):
+            if heading is not None or (with_prelude and lines):
+                b = Block(start, length, heading or "", "".join(lines))
+                keep, older_run = _check_since(b, since, older_run)
+                if keep:
+                    yield b
+                elif stop_after_older and older_run >= stop_after_older:
+                    return
+            start, heading, lines, length = pos, stripped, [], n
+        elif heading is not None or with_prelude:
+            lines.append(line)
+            length += n
+        pos += n
+    if heading is not None or (with_prelude and lines):
+        b = Block(start, length, heading or "", "".join(lines))
+        if _check_since(b, since, older_run)[0]:
+            yield b
+
+
+def _check_since(b, since, older_run):
+    """(返すか, 古いブロックの連続数)。日付の無いブロックは連続数を変えない。"""
+    if since is None:
+        return True, 0
+    when = b.when
+    if when is None:
+        return True, older_run
+    if when < since:
+        return False, older_run + 1
+    return True, 0
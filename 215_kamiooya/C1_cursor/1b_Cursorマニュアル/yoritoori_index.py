@@ -0,0 +1,181 @@
+# やり取り.md の見出しインデックス（ローカル SQLite）
+#
+# 5.やり取り.md は OneDrive 上で数MBに育つので、既存判定・未返信判定のたびに全パートナー分を
+# 読み直さない。ファイルごとに (mtime, size) を覚えておき、変わったファイルだけ読み直して
+# 見出し単位の行（日時・相手・チャネル・件名・バイト位置・ハッシュ・本文）を差し替える。
+#
+#   from yoritoori_index import file_entries
+#   for e in file_entries(md_path):            # 変わっていなければファイルは開かない
+#       e["received_at"], e["partner"], e["channel"], e["subject"] ...
+#
+# インデックスはローカル（git-repos/.jarvis_state）に置く。OneDrive 上に置くと同期で壊れるため。
+
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+from pathlib import Path
+
+from yoritoori_blocks import iter_blocks
+
+REPO = Path(__file__).resolve().parents[3]
+INDEX_PATH = Path(os.environ.get("YORITOORI_INDEX_PATH") or REPO / ".jarvis_state" / "yoritoori_index.sqlite3")
+
+# ### 2026/02/11 14:30｜相手｜チャネル｜要約
+HEADING_RE = re.compile(
+    r"^###\s+(\d{4}/\d{2}/\d{2}(?:\s+\d{1,2}:\d{2})?)\s*｜\s*([^｜]+)\s*｜\s*([^｜]+)\s*｜?\s*(.*)$"
+)
+SUBJECT_RE = re.compile(r"^\*\*件名\*\*\s*[:：]\s*(.+)$", re.MULTILINE)
+
+SCHEMA = """
+create table if not exists files (
+  path text primary key,
+  mtime_ns integer not null,
+  size integer not null
+);
+create table if not exists entries (
+  path text not null,
+  seq integer not null,
+  offset integer not null,
+  length integer not null,
+  hash text not null,
+  received_at text not null,
+  partner text not null,
+  channel text not null,
+  summary text not null,
+  subject text,
+  heading text not null,
+  body text not null,
+  primary key (path, seq)
+);
+"""
+
+_COLS = ("offset", "length", "hash", "received_at", "partner", "channel", "summary", "subject", "heading")
+
+
+def parse_entries(data: bytes) -> list:
+    """ファイル内容（bytes）→ 見出しごとの dict（ファイル順）。本文は次の見出しの直前まで。"""
+    entries = []
+    for b in iter_blocks(data, is_heading=HEADING_RE.match):
+        m = HEADING_RE.match(b.heading)
+        body = b.body.strip()
+        sm = SUBJECT_RE.search(body)
+        entries.append(
+            {
+                "offset": b.offset,
+                "received_at": m.group(1),
+                "partner": m.group(2).strip(),
+                "channel": m.group(3).strip(),
+                "summary": m.group(4).strip(),
+                "heading": b.heading,
+                "length": b.length,
+                "hash": hashlib.sha1(data[b.offset : b.offset + b.length]).hexdigest()[:16],
+                "subject": sm.group(1).strip() if sm else None,
+                "body": body,
+            }
+        )
+    return entries
+
+
+def _key(md_path) -> str:
+    return str(Path(md_path).resolve())
+
+
+class YoritooriIndex:
+    def __init__(self, path: Path = INDEX_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(str(self.path), timeout=30)
+        self.con.execute("pragma journal_mode=wal")
+        self.con.execute("pragma synchronous=normal")
+        self.con.executescript(SCHEMA)
+
+    def refresh(self, md_path) -> bool:
+        """(mtime, size) が変わっていれば読み直す。読み直したら True。消えたファイルは行を消す。"""
+        key = _key(md_path)
+        row = self.con.execute("select mtime_ns, size from files where path = ?", (key,)).fetchone()
+        try:
+            st = os.stat(md_path)
+        except OSError:
+            if row:
+                with self.con:
+                    self.con.execute("delete from entries where path = ?", (key,))
+                    self.con.execute("delete from files where path = ?", (key,))
+            return False
+        if row and row[0] == st.st_mtime_ns and row[1] == st.st_size:
+            return False
+        # 読んだ内容と同じ版の stat を記録する（読み込み中に書き換わっても次回また読み直す）
+        with open(md_path, "rb") as f:
+            st = os.fstat(f.fileno())
+            data = f.read()
+        entries = parse_entries(data)
+        with self.con:
+            self.con.execute("delete from entries where path = ?", (key,))
+            self.con.executemany(
+                "insert into entries (path, seq, offset, length, hash, received_at, partner, channel,"
+                " summary, subject, heading, body) values (?,?,?,?,?,?,?,?,?,?,?,?)",
+                [(key, i) + tuple(e[c] for c in _COLS) + (e["body"],) for i, e in enumerate(entries)],
+            )
+            self.con.execute(
+                "insert or replace into files (path, mtime_ns, size) values (?,?,?)",
+                (key, st.st_mtime_ns, st.st_size),
+            )
+        return True
+
+    def entries(self, md_path, with_body: bool = False, since: str | None = None) -> list:
+        """見出し一覧（ファイル順）。必要なら先に refresh。since（YYYY/MM/DD）以降の日付だけに絞れる。"""
+        self.refresh(md_path)
+        cols = _COLS + (("body",) if with_body else ())
+        where, params = "path = ?", [_key(md_path)]
+        if since:
+            where += " and substr(received_at, 1, 10) >= ?"
+            params.append(since)
+        rows = self.con.execute(
+            f"select {', '.join(cols)} from entries where {where} order by seq", params
+        ).fetchall()
+        return [dict(zip(cols, r)) for r in rows]
+
+    def close(self):
+        self.con.close()
+
+
+_INDEX = None
+_INDEX_FAILED = False
+
+
+def shared_index():
+    """プロセス共通のインデックス。開けなければ None（呼び出し側は毎回パースに戻る）。"""
+    global _INDEX, _INDEX_FAILED
+    if _INDEX is None and not _INDEX_FAILED:
+        try:
+            _INDEX = YoritooriIndex()
+        except (OSError, sqlite3.Error) as e:
+            print(f"やり取りインデックスを開けません（直接読みます）: {e}", file=sys.stderr)
+            _INDEX_FAILED = True
+    return _INDEX
+
+
+def file_entries(md_path, with_body: bool = False, since=None) -> list:
+    """md_path の見出し一覧。インデックス経由（変わったファイルだけ読む）。ファイルが無ければ []。
+
+    since（date / datetime）を渡すとその日以降の見出しだけ（本文もその分しか読み出さない）。
+    """
+    day = since.strftime("%Y/%m/%d") if since is not None else None
+    idx = shared_index()
+    if idx is not None:
+        try:
+            return idx.entries(md_path, with_body=with_body, since=day)
+        except (OSError, sqlite3.Error) as e:
+            print(f"やり取りインデックス参照エラー（直接読みます）: {e}", file=sys.stderr)
+    try:
+        data = Path(md_path).read_bytes()
+    except OSError:
+        return []
+    out = parse_entries(data)
+    if day:
+        out = [e for e in out if e["received_at"][:10] >= day]
+    if not with_body:
+        for e in out:
+            e.pop("body", None)
+    return out
@@ -0,0 +1,144 @@
+# やり取り.md への追記（Gmail / LINE / Chatwork / iMessage 共通）
+#
+# 1件ごとに「全文読む → 見出し直後に挿入 → 全文書く」を OneDrive 上の数MBファイルに繰り返さない。
+# MarkdownAppender で1回の実行分をファイルごとに溜め、flush で1回だけ置き換える。
+# 書き込みは一時ファイル + os.replace（途中で落ちても元ファイルは壊れない）。
+# 読み込みがクラウドのプレースホルダ途中（stat のサイズと不一致）なら書かずにリトライ。
+# 同じファイルへの書き込みはプロセスをまたいでロック（~/.cache/yoritoori_md_locks）。
+#
+#   w = MarkdownAppender(insert_after_timeline_heading, after_write=mirror_yoritoori_md_to_gitrepos)
+#   w.add(md_path, block, on_written=lambda: ...)   # 書けた後にやること（既読化など）
+#   w.flush()
+
+import atexit
+import errno
+import hashlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+from yoritoori_utils import insert_after_timeline_heading
+
+LOCK_DIR = Path.home() / ".cache" / "yoritoori_md_locks"
+RETRY_ERRNOS = {errno.EPERM, errno.EACCES, errno.EBUSY, errno.EAGAIN}
+ATTEMPTS = 5
+
+
+@contextmanager
+def md_lock(md_path):
+    """md_path 単位の排他ロック（ローカルのロックファイルに flock）。"""
+    if fcntl is None:
+        yield
+        return
+    LOCK_DIR.mkdir(parents=True, exist_ok=True)
+    key = hashlib.sha1(str(Path(md_path).resolve()).encode("utf-8")).hexdigest()[:16]
+    with open(LOCK_DIR / f"{key}.lock", "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def combine_blocks(blocks):
+    """古い順の blocks → 1回で挿入できる塊（新しい順）。1件ずつ見出し直後に挿入したのと同じ並び。"""
+    return "\n\n" + "\n\n".join(b.strip() for b in reversed(blocks)) + "\n"
+
+
+def write_blocks(md_path, blocks, insert=insert_after_timeline_heading):
+    """blocks（古い順）を md_path に1回の置き換えで挿入。一時的な EPERM 等は短いリトライで吸収。"""
+    if not blocks:
+        return
+    path = Path(md_path)
+    combined = combine_blocks(blocks)
+    last_err = None
+    with md_lock(path):
+        for attempt in range(1, ATTEMPTS + 1):
+            tmp = None
+            try:
+                raw = path.read_bytes()
+                st_size = path.stat().st_size
+                # クラウドプレースホルダの部分読みを拒否（上書きで Truncate する事故防止）
+                if len(raw) != st_size:
+                    raise OSError(errno.EAGAIN, f"partial read {len(raw)}/{st_size}: {path}")
+                new_raw = insert(raw.decode("utf-8"), combined).encode("utf-8")
+                if len(new_raw) <= len(raw):
+                    raise RuntimeError(f"append would not grow file: {path}")
+                tmp = path.with_suffix(path.suffix + f".tmp.{os.getpid()}")
+                tmp.write_bytes(new_raw)
+                os.replace(tmp, path)
+                return
+            except OSError as exc:
+                last_err = exc
+                if tmp is not None:
+                    try:
+                        tmp.unlink(missing_ok=True)
+                    except OSError:
+                        pass
+                # CloudStorage / OneDrive の一時ロック（launchd から EPERM になりやすい）
+                if not isinstance(exc, PermissionError) and exc.errno not in RETRY_ERRNOS:
+                    raise
+                time.sleep(0.4 * attempt)
+    raise last_err
+
+
+class MarkdownAppender:
+    """1回の実行分の追記をファイルごとに溜めて、flush でまとめて書く。"""
+
+    def __init__(self, insert=insert_after_timeline_heading, after_write=None):
+        self.insert = insert
+        self.after_write = after_write  # ファイルごとに1回（ミラー等）
+        self._pending = {}  # path -> [(block, on_written)]
+        self._atexit = False
+
+    def add(self, md_path, block, on_written=None):
+        self._pending.setdefault(Path(md_path), []).append((block, on_written))
+        if not self._atexit:
+            # flush し忘れの保険（sys.exit 含む正常終了時）
+            atexit.register(self.flush)
+            self._atexit = True
+
+    def pending(self, md_path=None):
+        if md_path is None:
+            return sum(len(v) for v in self._pending.values())
+        return len(self._pending.get(Path(md_path), []))
+
+    def flush(self, md_path=None):
+        """溜めた分を書く。書けたファイルの on_written を順に呼ぶ。失敗したファイル → 例外の dict。
+
+        md_path を渡すとそのファイルの分だけ書く。
+        失敗したファイルの分は on_written を呼ばない（既読化しないので次回また拾える）。
+        """
+        errors = {}
+        done = []
+        if md_path is None:
+            pending, self._pending = self._pending, {}
+        else:
+            path = Path(md_path)
+            pending = {path: self._pending.pop(path)} if path in self._pending else {}
+        for path, items in pending.items():
+            try:
+                write_blocks(path, [b for b, _ in items], self.insert)
+            except (OSError, RuntimeError) as e:
+                print(f"やり取り追記に失敗: {path}: {e}", file=sys.stderr)
+                errors[path] = e
+                continue
+            done.append((path, items))
+        # 書き込みを全部終えてから後処理（途中の例外で他ファイルの追記を落とさない）
+        for path, items in done:
+            callbacks = [cb for _, cb in items if cb is not None]
+            if self.after_write is not None:
+                callbacks.append(lambda p=path: self.after_write(p))
+            for cb in callbacks:
+                try:
+                    cb()
+                except Exception as e:
+                    print(f"追記後の処理でエラー: {path}: {e}", file=sys.stderr)
+        return errors
@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""inbox/notta 配下の新規 xlsx/srt を一括 dry-run / 取込する受入れスクリプト。"""
+"""inbox/notta 配下の新規 xlsx/srt を一括 dry-run / 取込する受入れスクリプト。
+
+  - 取込済みのファイル（サイズ・更新時刻・sha1）は state/notta_inbox_manifest.json に残し、
+    次回は新規・変更のあったファイルだけ取り込む（--all で全件）。manifest は --apply で成功した分だけ更新。
+  - 複数ファイルは --jobs 本まで並列（ファイルごとに notta_to_knowledge.py を別プロセスで実行）。
+  - --watch 秒 で inbox を見張り続ける（書き込み途中を避けるため、更新から SETTLE_SEC 経ったファイルだけ）。
+"""
 
 from __future__ import annotations
 
 import argparse
+import hashlib
+import json
+import os
 import subprocess
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 SCRIPT_DIR = Path(__file__).resolve().parent
@@ -17,6 +28,56 @@ DEFAULT_INBOX = Path(
 )
 PY = "/Users/matsunomasaharu2/selenium_env/venv/bin/python"
 IMPORTER = SCRIPT_DIR / "notta_to_knowledge.py"
+MANIFEST_PATH = SCRIPT_DIR.parent / "state" / "notta_inbox_manifest.json"
+SETTLE_SEC = 10
+
+
+def load_manifest() -> dict[str, dict]:
+    try:
+        data = json.loads(MANIFEST_PATH.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    files = data.get("files") if isinstance(data, dict) else None
+    return {str(k): v for k, v in files.items() if isinstance(v, dict)} if isinstance(files, dict) else {}
+
+
+def save_manifest(files: dict[str, dict]) -> None:
+    MANIFEST_PATH.parent.mkdir(parents=True, exist_ok=True)
+    tmp = MANIFEST_PATH.with_suffix(MANIFEST_PATH.suffix + f".tmp.{os.getpid()}")
+    tmp.write_text(json.dumps({"files": files}, ensure_ascii=False, indent=1) + "\n", encoding="utf-8")
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def file_sig(path: Path, prev: dict | None) -> dict:
+    """サイズ・更新時刻が前回と同じなら sha1 は読み直さない。"""
+    st = path.stat()
+    if prev and prev.get("size") == st.st_size and prev.get("mtime") == st.st_mtime:
+        return prev
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return {"size": st.st_size, "mtime": st.st_mtime, "sha1": h.hexdigest()}
+
+
+def pending_files(inbox: Path, manifest: dict[str, dict], *, include_all: bool) -> list[tuple[Path, dict]]:
+    now = time.time()
+    out = []
+    for p in sorted(inbox.rglob("*")):
+        if p.suffix.lower() not in (".xlsx", ".srt") or not p.is_file() or p.name.startswith("~$"):
+            continue
+        if now - p.stat().st_mtime < SETTLE_SEC:
+            continue
+        prev = manifest.get(str(p))
+        sig = file_sig(p, prev)
+        if include_all or not prev or prev.get("sha1") != sig["sha1"]:
+            out.append((p, sig))
+    return out
+
+
+def run_one(cmd: list[str]) -> tuple[int, str]:
+    p = subprocess.run(cmd, capture_output=True, text=True)
+    return p.returncode, (p.stdout or "") + (p.stderr or "")
 
 
 def main() -> int:
@@ -34,6 +95,9 @@ def main() -> int:
         action="store_true",
         help="SUPABASE_* があるとき remote upsert する",
     )
+    ap.add_argument("--jobs", type=int, default=4, help="並列に取り込むファイル数（既定 4）")
+    ap.add_argument("--all", action="store_true", help="取込済み（manifest と同じ内容）のファイルも対象にする")
+    ap.add_argument("--watch", type=int, default=0, help="N 秒ごとに inbox を見て新規・変更分を取り込み続ける")
     args = ap.parse_args()
     inbox = Path(args.inbox).expanduser()
     if not inbox.is_dir():
@@ -51,8 +115,6 @@ def main() -> int:
     ):
         if not envp.is_file():
             continue
-        import os
-
         for line in envp.read_text(encoding="utf-8").splitlines():
             s = line.strip()
             if not s or s.startswith("#") or "=" not in s:
@@ -60,8 +122,6 @@ def main() -> int:
             k, v = s.split("=", 1)
             os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
 
-    import os
-
     has_sb = bool(
         (os.environ.get("SUPABASE_URL") or "").strip()
         and (os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
@@ -74,17 +134,25 @@ def main() -> int:
     elif has_sb and args.apply:
         skip_sb = False
 
-    files = sorted(
-        [p for p in inbox.rglob("*") if p.suffix.lower() in (".xlsx", ".srt") and p.is_file()]
-    )
-    if not files:
-        print(
-            f"取込対象なし: {inbox} "
-            "（サンプル or 実ファイルを日付フォルダへ保存してください）"
-        )
+    manifest = load_manifest()
+    while True:
+        rc = run_batch(inbox, manifest, args, skip_sb)
+        if not args.watch:
+            return rc
+        time.sleep(max(5, args.watch))
+
+
+def run_batch(inbox: Path, manifest: dict[str, dict], args: argparse.Namespace, skip_sb: bool) -> int:
+    todo = pending_files(inbox, manifest, include_all=args.all)
+    if not todo:
+        if not args.watch:
+            print(
+                f"取込対象なし: {inbox} "
+                "（サンプル or 実ファイルを日付フォルダへ保存してください。取込済みの再実行は --all）"
+            )
         return 0
-    rc = 0
-    for f in files:
+    cmds = []
+    for f, _ in todo:
         video_id = f.stem
         cmd = [
             PY,
@@ -100,10 +168,20 @@ def main() -> int:
             cmd.append("--dry-run")
         if skip_sb:
             cmd.append("--skip-supabase")
-        print("==>", " ".join(cmd))
-        p = subprocess.run(cmd)
-        if p.returncode != 0:
-            rc = p.returncode
+        cmds.append(cmd)
+    rc = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        for (f, sig), cmd, (code, out) in zip(todo, cmds, pool.map(run_one, cmds)):
+            print("==>", " ".join(cmd))
+            print(out, end="" if out.endswith("\n") else "\n")
+            if code != 0:
+                rc = code
+            elif args.apply:
+                manifest[str(f)] = {**sig, "imported_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+            elif args.watch:
+                manifest[str(f)] = sig  # dry-run の見張りは同じファイルを繰り返し出さない（保存はしない）
+    if args.apply:
+        save_manifest(manifest)
     return rc
 
 
@@ -4,12 +4,16 @@
 管理者形式の「全件CSV」と state（既知のコメントID集合）を比較し、
 未登録分だけの差分CSVを出力する。
 
-state ファイル: JSON
-  { "version": 1, "updated_at": "...", "comment_ids": ["24148", ...] }
+state ファイル: SQLite（westudy_comment_ids.sqlite3）
+  known_ids(comment_id primary key) / state_meta(key, value)
+  --state に旧形式の .json を渡した場合は隣の .sqlite3 を使う。
+  .sqlite3 がまだ無く旧 JSON（{"comment_ids": [...]}）があれば、初回だけ取り込む。
 
 ポリシー:
   - 差分行 = 全件CSVにあって state に無い コメントID
   - --update-state 指定時: state := state | 今回の全件のID（単調増加。削除はしない）
+
+全件CSVは1行ずつ読み、既知判定は known_ids の主キー索引で引く（全件をメモリに載せない）。
 """
 
 from __future__ import annotations
@@ -17,6 +21,7 @@ from __future__ import annotations
 import argparse
 import csv
 import json
+import sqlite3
 import sys
 from datetime import datetime, timezone
 from pathlib import Path
@@ -34,9 +39,14 @@ REQUIRED_FIELDNAMES = [
     "IP アドレス",
     "ユーザーエージェント",
 ]
+SEEN_BATCH = 5000
+
+
+def state_db_path(path: Path) -> Path:
+    return path.with_suffix(".sqlite3") if path.suffix == ".json" else path
 
 
-def load_state(path: Path) -> set[str]:
+def load_legacy_json(path: Path) -> set[str]:
     if not path.exists():
         return set()
     try:
@@ -45,44 +55,109 @@ def load_state(path: Path) -> set[str]:
         ids = data.get("comment_ids") or []
         return {str(x).strip() for x in ids if str(x).strip()}
     except Exception as e:
-        print(f"[WARN] state 読込失敗、空集合で続行: {e}", file=sys.stderr)
+        print(f"[WARN] 旧 state 読込失敗、空集合で続行: {e}", file=sys.stderr)
         return set()
 
 
-def save_state(path: Path, ids: set[str]) -> bool:
-    current = load_state(path)
-    if current == ids:
-        return False
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    payload = {
-        "version": 1,
-        "updated_at": datetime.now(timezone.utc).isoformat(),
-        "comment_ids": sorted(ids, key=lambda x: (len(x), x)),
-    }
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
-    return True
-
-
-def read_full_rows(full_csv: Path) -> list[dict]:
-    rows = []
-    with full_csv.open("r", encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        if reader.fieldnames:
-            for h in REQUIRED_FIELDNAMES:
-                if h not in reader.fieldnames:
-                    print(
-                        f"エラー: 全件CSVに列「{h}」がありません。convert_to_admin_csv.py の出力を渡してください。",
-                        file=sys.stderr,
-                    )
-                    sys.exit(2)
-        for row in reader:
-            cid = (row.get("コメントID") or "").strip()
-            if cid:
-                rows.append(row)
-    return rows
+def open_state(path: Path) -> sqlite3.Connection:
+    """known_ids を開く（無ければ作り、旧 JSON があれば取り込む）。"""
+    db_path = state_db_path(path)
+    fresh = not db_path.exists()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path))
+    conn.executescript(
+        """
+        create table if not exists known_ids (comment_id text primary key) without rowid;
+        create table if not exists state_meta (key text primary key, value text not null);
+        """
+    )
+    if fresh:
+        legacy = load_legacy_json(db_path.with_suffix(".json"))
+        if legacy:
+            conn.executemany("insert or ignore into known_ids values (?)", ((x,) for x in legacy))
+            _touch(conn)
+            print(f"state: 旧 JSON から {len(legacy)} ID を取り込みました → {db_path}")
+    conn.commit()
+    return conn
+
+
+def _touch(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        "insert or replace into state_meta (key, value) values ('updated_at', ?)",
+        (datetime.now(timezone.utc).isoformat(),),
+    )
+
+
+def count_known(conn: sqlite3.Connection) -> int:
+    return conn.execute("select count(*) from known_ids").fetchone()[0]
+
+
+def is_known(conn: sqlite3.Connection, cid: str) -> bool:
+    return conn.execute("select 1 from known_ids where comment_id = ?", (cid,)).fetchone() is not None
+
+
+def merge_seen(conn: sqlite3.Connection, *, replace: bool) -> bool:
+    """temp.seen（今回の全件ID）を known_ids に反映。replace なら seen に無い ID を消す。変化があれば True。"""
+    before = conn.total_changes
+    conn.execute("insert or ignore into known_ids select comment_id from temp.seen")
+    if replace:
+        conn.execute("delete from known_ids where comment_id not in (select comment_id from temp.seen)")
+    changed = conn.total_changes != before
+    if changed:
+        _touch(conn)
+    conn.commit()
+    return changed
+
+
+def check_header(fieldnames: list[str] | None) -> None:
+    if not fieldnames:
+        return
+    for h in REQUIRED_FIELDNAMES:
+        if h not in fieldnames:
+            print(
+                f"エラー: 全件CSVに列「{h}」がありません。convert_to_admin_csv.py の出力を渡してください。",
+                file=sys.stderr,
+            )
+            sys.exit(2)
+
+
+def stream_delta(
+    conn: sqlite3.Connection, full_csv: Path, delta_csv: Path, *, write_rows: bool
+) -> tuple[int, int]:
+    """全件CSVを1行ずつ読み、既知でない行を差分CSVへ書く。今回のIDは temp.seen に積む。
+
+    戻り値: (全件行数, 差分行数)
+    """
+    conn.execute("create temp table if not exists seen (comment_id text primary key) without rowid")
+    conn.execute("delete from temp.seen")
+    total = written = 0
+    batch: list[tuple[str]] = []
+    delta_csv.parent.mkdir(parents=True, exist_ok=True)
+    with full_csv.open("r", encoding="utf-8-sig", newline="") as fin:
+        reader = csv.DictReader(fin)
+        check_header(reader.fieldnames)
+        with delta_csv.open("w", encoding="utf-8", newline="") as fout:
+            w = csv.DictWriter(
+                fout,
+                fieldnames=ADMIN_FIELDNAMES,
+                quoting=csv.QUOTE_MINIMAL,
+                lineterminator="\n",
+            )
+            w.writeheader()
+            for row in reader:
+                cid = (row.get("コメントID") or "").strip()
+                if not cid:
+                    continue
+                total += 1
+                batch.append((cid,))
+                if len(batch) >= SEEN_BATCH:
+                    conn.executemany("insert or ignore into temp.seen values (?)", batch)
+                    batch.clear()
+                if write_rows and not is_known(conn, cid):
+                    w.writerow({k: row.get(k, "") for k in ADMIN_FIELDNAMES})
+                    written += 1
+    conn.executemany("insert or ignore into temp.seen values (?)", batch)
+    return total, written
 
 
 def main() -> int:
@@ -91,7 +166,7 @@ def main() -> int:
     ap.add_argument(
         "--state",
         required=True,
-        help="既知コメントIDの JSON（comment_ids）",
+        help="既知コメントIDの SQLite（旧 .json を渡すと隣の .sqlite3 を使う）",
     )
     ap.add_argument("--delta", required=True, help="差分CSVの出力先")
     ap.add_argument(
@@ -126,57 +201,39 @@ def main() -> int:
         print(f"全件CSVがありません: {full_path}", file=sys.stderr)
         return 2
 
-    rows = read_full_rows(full_path)
-    all_ids = {r["コメントID"].strip() for r in rows}
-    known = load_state(state_path)
+    conn = open_state(state_path)
+    try:
+        total, written = stream_delta(
+            conn, full_path, delta_path, write_rows=not args.init_state_only
+        )
 
-    if args.init_state_only:
-        final_ids = all_ids if args.replace_state else (all_ids | known)
-        changed = save_state(state_path, final_ids)
-        delta_path.parent.mkdir(parents=True, exist_ok=True)
-        with delta_path.open("w", encoding="utf-8", newline="") as f:
-            w = csv.DictWriter(
-                f,
-                fieldnames=ADMIN_FIELDNAMES,
-                lineterminator="\n",
+        if args.init_state_only:
+            changed = merge_seen(conn, replace=args.replace_state)
+            mode = "完全一致" if args.replace_state else "和集合マージ"
+            print(
+                f"OK: state 初期化 ({mode}) {state_db_path(state_path)} （{count_known(conn)} ID）差分は空: {delta_path}"
+                + (" | state 変更あり" if changed else " | state 変更なし")
             )
-            w.writeheader()
-        mode = "完全一致" if args.replace_state else "和集合マージ"
-        print(
-            f"OK: state 初期化 ({mode}) {state_path} （{len(final_ids)} ID）差分は空: {delta_path}"
-            + (" | state 変更あり" if changed else " | state 変更なし")
-        )
-        return 0
+            return 0
 
-    new_ids = all_ids - known
-    delta_rows = [r for r in rows if r["コメントID"].strip() in new_ids]
+        new_ids = conn.execute(
+            "select count(*) from temp.seen s where not exists "
+            "(select 1 from known_ids k where k.comment_id = s.comment_id)"
+        ).fetchone()[0]
+        state_changed = merge_seen(conn, replace=False) if args.update_state else False
 
-    delta_path.parent.mkdir(parents=True, exist_ok=True)
-    with delta_path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=ADMIN_FIELDNAMES,
-            quoting=csv.QUOTE_MINIMAL,
-            lineterminator="\n",
-        )
-        w.writeheader()
-        for r in delta_rows:
-            w.writerow({k: r.get(k, "") for k in ADMIN_FIELDNAMES})
-
-    state_changed = False
-    if args.update_state:
-        state_changed = save_state(state_path, known | all_ids)
-
-    print(
-        f"OK: 差分 {len(delta_rows)} 行 / 全件 {len(rows)} 行 / 新ID {len(new_ids)} "
-        f"→ {delta_path}"
-        + (
-            f" | state 更新済み ({len(known | all_ids)} ID)"
-            if (args.update_state and state_changed)
-            else (" | state 変更なし" if args.update_state else "")
+        print(
+            f"OK: 差分 {written} 行 / 全件 {total} 行 / 新ID {new_ids} "
+            f"→ {delta_path}"
+            + (
+                f" | state 更新済み ({count_known(conn)} ID)"
+                if (args.update_state and state_changed)
+                else (" | state 変更なし" if args.update_state else "")
+            )
         )
-    )
-    return 0
+        return 0
+    finally:
+        conn.close()
 
 
 if __name__ == "__main__":
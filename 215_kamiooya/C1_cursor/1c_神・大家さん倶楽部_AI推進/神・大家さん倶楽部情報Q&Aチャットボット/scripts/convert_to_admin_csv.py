@@ -11,6 +11,11 @@ WeStudy トピック別スクレイプCSV → WeStudy 管理者CSVエクスポ
 出力ヘッダ:
   コメントID,投稿日時,投稿者名,投稿者メール,コメント内容,親コメントID,IP アドレス,ユーザーエージェント,ソース
   （ソース: app.js の CSV 取込で source_type に対応。WeStudy 取り込み時は神大家コミュニティと誤判定されないよう既定で WeStudy）
+
+集約:
+  行はメモリに溜めず作業用 SQLite へ追記し、コメントID順に並べ直しながら同一IDを choose_better_admin_row で1行に寄せる。
+  出力はそのままストリームで書く（件数が増えてもメモリはほぼ一定）。
+  作業DBは既定で一時ファイル。--work-db で残すと中身を確認できる（毎回作り直す）。
 """
 
 from __future__ import annotations
@@ -20,9 +25,12 @@ import csv
 import glob
 import os
 import re
+import sqlite3
 import sys
+import tempfile
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Iterator
 
 ROOT = Path(__file__).resolve().parents[1]
 sys.path.insert(0, str(Path(__file__).resolve().parent))
@@ -45,6 +53,7 @@ ADMIN_FIELDNAMES = [
 ]
 
 SKIP_NAME_PARTS = ("merged", "manifest", "topics_manifest", "summary", "failures")
+FLUSH_ROWS = 20000  # この件数ごとに作業DBへ追記
 
 
 def should_skip_csv_path(path: str) -> bool:
@@ -241,12 +250,77 @@ def list_topic_csvs(input_dir: str) -> list[str]:
     return [f for f in files if not should_skip_csv_path(f)]
 
 
-def collect_admin_rows(input_dir: str, verbose: bool) -> tuple[list[dict], int]:
-    files = list_topic_csvs(input_dir)
-    if not files:
-        return [], 0
+_COLS = ", ".join(f'"{k}"' for k in ADMIN_FIELDNAMES)
+
+
+def _row_key(cid: str) -> tuple[int, int, str]:
+    # 数値IDは数値順（SQLite integer に収まる範囲）。それ以外は後ろに文字列順（旧 sort_key と同じ並び）
+    if cid.isdigit() and len(cid) <= 18:
+        return (0, int(cid), cid)
+    return (1, 0, cid)
+
 
-    by_id: dict[str, dict] = {}
+class AdminRowStore:
+    """コメントID → 管理者行（作業用 SQLite）。同一IDは choose_better_admin_row で1行に寄せる。
+
+    add() はメモリ上で FLUSH_ROWS 件ずつ寄せてから追記するだけ（既存行は引かない）。
+    iter_rows() でID順・追記順に並べ（SQLite の外部ソート）、同じIDが続く間を畳み込んで1行ずつ返す。
+    """
+
+    def __init__(self, path: Path):
+        self.conn = sqlite3.connect(str(path))
+        self.conn.execute("pragma journal_mode = off")
+        self.conn.execute("pragma synchronous = off")
+        self.conn.execute("drop table if exists admin_rows")
+        self.conn.execute(
+            f"create table admin_rows (seq integer primary key, grp integer not null, num integer not null, {_COLS})"
+        )
+        self._pending: dict[str, dict] = {}
+
+    def add(self, admin: dict) -> None:
+        cid = admin["コメントID"]
+        self._pending[cid] = choose_better_admin_row(self._pending.get(cid), admin)
+        if len(self._pending) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        marks = ", ".join("?" * (len(ADMIN_FIELDNAMES) + 2))
+        self.conn.executemany(
+            f"insert into admin_rows (grp, num, {_COLS}) values ({marks})",
+            (
+                (*_row_key(cid)[:2], *(row.get(k, "") for k in ADMIN_FIELDNAMES))
+                for cid, row in self._pending.items()
+            ),
+        )
+        self.conn.commit()
+        self._pending.clear()
+
+    def iter_rows(self) -> Iterator[dict]:
+        self.flush()
+        best: dict | None = None
+        for rec in self.conn.execute(
+            f'select {_COLS} from admin_rows order by grp, num, "コメントID", seq'
+        ):
+            row = dict(zip(ADMIN_FIELDNAMES, rec))
+            if best is not None and best["コメントID"] == row["コメントID"]:
+                # seq 順 = 読んだ順なので old → new で比べる（同等なら後勝ち）
+                best = choose_better_admin_row(best, row)
+                continue
+            if best is not None:
+                yield best
+            best = row
+        if best is not None:
+            yield best
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+def collect_admin_rows(input_dir: str, store: AdminRowStore, verbose: bool) -> int:
+    """トピック別CSVを1行ずつ読み、store へ upsert する。戻り値は読込行数。"""
+    files = list_topic_csvs(input_dir)
     rows_in = 0
     for fp in files:
         try:
@@ -255,26 +329,35 @@ def collect_admin_rows(input_dir: str, verbose: bool) -> tuple[list[dict], int]:
                 for row in reader:
                     rows_in += 1
                     admin = row_to_admin(row)
-                    if not admin:
-                        continue
-                    cid = admin["コメントID"]
-                    by_id[cid] = choose_better_admin_row(by_id.get(cid), admin)
+                    if admin:
+                        store.add(admin)
         except Exception as e:
             print(f"[WARN] skip {fp}: {e}", file=sys.stderr)
             continue
 
     if verbose:
-        print(f"[convert] files={len(files)} rows_read={rows_in} unique_ids={len(by_id)}")
+        print(f"[convert] files={len(files)} rows_read={rows_in}")
+    return rows_in
 
-    def sort_key(item: dict) -> tuple[str, int]:
-        cid = item["コメントID"]
-        try:
-            return ("", int(cid))
-        except ValueError:
-            return (cid, 0)
 
-    out = sorted(by_id.values(), key=sort_key)
-    return out, rows_in
+def write_admin_csv(rows: Iterator[dict], out_path: Path) -> int:
+    """一時ファイルに書いてから置き換える（途中で落ちても前回の出力を壊さない）。"""
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_suffix(out_path.suffix + f".tmp.{os.getpid()}")
+    n = 0
+    with tmp.open("w", encoding="utf-8", newline="") as f:
+        w = csv.DictWriter(
+            f,
+            fieldnames=ADMIN_FIELDNAMES,
+            quoting=csv.QUOTE_MINIMAL,
+            lineterminator="\n",
+        )
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+            n += 1
+    os.replace(tmp, out_path)
+    return n
 
 
 def main() -> int:
@@ -290,6 +373,11 @@ def main() -> int:
         required=True,
         help="出力CSVパス",
     )
+    ap.add_argument(
+        "--work-db",
+        default="",
+        help="集約用 SQLite の置き場所（既定は一時ファイル。指定時も毎回作り直す）",
+    )
     ap.add_argument("--verbose", "-v", action="store_true")
     args = ap.parse_args()
 
@@ -298,23 +386,18 @@ def main() -> int:
         print(f"入力ディレクトリがありません: {input_dir}", file=sys.stderr)
         return 2
 
-    rows, rows_in = collect_admin_rows(input_dir, args.verbose)
     out_path = Path(args.output).expanduser().resolve()
-    out_path.parent.mkdir(parents=True, exist_ok=True)
-
-    with out_path.open("w", encoding="utf-8", newline="") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=ADMIN_FIELDNAMES,
-            quoting=csv.QUOTE_MINIMAL,
-            lineterminator="\n",
-        )
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+    with tempfile.TemporaryDirectory(prefix="convert_admin_") as td:
+        work = Path(args.work_db).expanduser() if args.work_db else Path(td) / "admin_rows.sqlite3"
+        store = AdminRowStore(work)
+        try:
+            rows_in = collect_admin_rows(input_dir, store, args.verbose)
+            n = write_admin_csv(store.iter_rows(), out_path)
+        finally:
+            store.close()
 
     print(
-        f"OK: {out_path} ({len(rows)} 行, 読込 {rows_in} 行, ヘッダ={ADMIN_FIELDNAMES[0]}...)"
+        f"OK: {out_path} ({n} 行, 読込 {rows_in} 行, ヘッダ={ADMIN_FIELDNAMES[0]}...)"
     )
     return 0
 
@@ -8,10 +8,22 @@ Supabase comments / knowledge_chunks の embedding 欄を Gemini で埋める。
   SUPABASE_SERVICE_ROLE_KEY（推奨）
   GEMINI_API_KEY
 
+前提: apps/kamiooya-qa-web/supabase/migrations/20260723_embedding_bulk_rpc.sql
+  （embedding_hash 列と embedding_pending / embedding_copy_by_hash / embedding_set）
+
+流れ（テーブルごと）:
+  1. embedding_pending で未埋め込み・本文が変わった行を id 順に batch 件ずつ取る
+  2. 同じ本文（md5）の埋め込みが既にある行は embedding_copy_by_hash で写す（API を呼ばない）
+  3. 残りを Gemini へ。--concurrency 本まで同時に投げ、呼び出し間隔は --rpm で抑える
+  4. 返ってきたバッチから embedding_set で1回の RPC にまとめて書く
+  書き終わったバッチ（先頭から連続した分）の最後の id を state/embed_cursor_<table>.json に残し、
+  中断しても次回はそこから続ける。最後まで行ったらカーソルは消す（次回は先頭から差分だけ拾う）。
+
 使い方:
   python3 embed_to_supabase.py --table knowledge_chunks
-  python3 embed_to_supabase.py --table comments --batch-size 50
+  python3 embed_to_supabase.py --table comments --batch-size 100 --concurrency 6 --rpm 120
   python3 embed_to_supabase.py --table comments --limit 200 --dry-run
+  python3 embed_to_supabase.py --table comments --restart   # カーソルを無視して先頭から
 """
 
 from __future__ import annotations
@@ -20,12 +32,12 @@ import argparse
 import json
 import os
 import sys
+import threading
 import time
-import urllib.error
-import urllib.parse
-import urllib.request
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 try:
     from supabase import Client, create_client
@@ -37,37 +49,12 @@ except ImportError as e:  # pragma: no cover
     )
     raise SystemExit(2)
 
-# text-embedding-004 は現行キーでは不可。gemini-embedding-001 + 768次元で schema と揃える。
-GEMINI_EMBED_MODEL = "gemini-embedding-001"
-GEMINI_EMBED_DIM = 768
-GEMINI_EMBED_URL = (
-    "https://generativelanguage.googleapis.com/v1beta/models/"
-    f"{GEMINI_EMBED_MODEL}:batchEmbedContents"
-)
-TABLES = ("comments", "knowledge_chunks")
-
+from gemini_embed import batch_embed_texts, load_env, require_env  # noqa: E402
 
-def load_env() -> None:
-    roots = [
-        Path.home() / "git-repos" / ".env.jarvis_private",
-        Path(__file__).resolve().parent / ".env",
-    ]
-    for p in roots:
-        if not p.exists():
-            continue
-        for line in p.read_text(encoding="utf-8").splitlines():
-            line = line.strip()
-            if not line or line.startswith("#") or "=" not in line:
-                continue
-            k, v = line.split("=", 1)
-            os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
-
-
-def require_env(name: str) -> str:
-    value = (os.environ.get(name) or "").strip()
-    if not value:
-        raise RuntimeError(f"環境変数 {name} が未設定です")
-    return value
+TABLES = ("comments", "knowledge_chunks")
+STATE_DIR = Path(__file__).resolve().parent.parent / "state"
+DEFAULT_CONCURRENCY = 4
+DEFAULT_RPM = 60  # batchEmbedContents の呼び出し回数/分（1回 = 最大100件）
 
 
 def get_client() -> Client:
@@ -81,95 +68,191 @@ def get_client() -> Client:
     return create_client(url, key)
 
 
-def fetch_pending_rows(
-    client: Client, table: str, batch_size: int, cursor_id: int | None
-) -> list[dict[str, Any]]:
-    if table == "comments":
-        select_cols = "id,comment_id,content"
-    else:
-        select_cols = "id,chunk_key,content"
-    query = (
-        client.table(table)
-        .select(select_cols)
-        .is_("embedding", "null")
-        .order("id")
-        .limit(batch_size)
-    )
-    if cursor_id is not None:
-        query = query.gt("id", cursor_id)
-    result = query.execute()
-    return list(result.data or [])
-
-
-def batch_embed_texts(texts: list[str]) -> list[list[float]]:
-    api_key = require_env("GEMINI_API_KEY")
-    payload = {
-        "requests": [
-            {
-                "model": f"models/{GEMINI_EMBED_MODEL}",
-                "content": {"parts": [{"text": text}]},
-                "taskType": "RETRIEVAL_DOCUMENT",
-                "outputDimensionality": GEMINI_EMBED_DIM,
-            }
-            for text in texts
-        ]
-    }
-    req = urllib.request.Request(
-        GEMINI_EMBED_URL + "?key=" + urllib.parse.quote(api_key),
-        data=json.dumps(payload).encode("utf-8"),
-        headers={"Content-Type": "application/json"},
-        method="POST",
-    )
-    try:
-        with urllib.request.urlopen(req, timeout=120) as resp:
-            raw = resp.read().decode("utf-8")
-    except urllib.error.HTTPError as e:
-        detail = e.read().decode("utf-8", "replace")
-        raise RuntimeError(f"Gemini embedding failed: HTTP {e.code} {detail[:240]}") from e
-    json_data = json.loads(raw)
-    embeddings = json_data.get("embeddings") or []
-    values: list[list[float]] = []
-    for item in embeddings:
-        vector = ((item or {}).get("values")) or []
-        if not vector:
-            raise RuntimeError("Gemini embedding response is empty")
-        values.append(vector)
-    if len(values) != len(texts):
-        raise RuntimeError(
-            f"Gemini embedding count mismatch: expected={len(texts)} actual={len(values)}"
-        )
-    return values
+def with_retry(label: str, fn: Callable[[], Any], *, attempts: int = 5, on_error=None) -> Any:
+    for attempt in range(1, attempts + 1):
+        try:
+            return fn()
+        except Exception as e:  # network blips / 429 on long runs
+            if attempt == attempts:
+                raise
+            wait_s = min(30, 2 ** attempt)
+            print(
+                f"warn: {label} attempt={attempt}/{attempts} err={type(e).__name__}: {e}; sleep {wait_s}s",
+                flush=True,
+            )
+            time.sleep(wait_s)
+            if on_error is not None:
+                on_error()
 
 
-def update_embeddings(client: Client, table: str, rows: list[dict[str, Any]], dry_run: bool) -> int:
-    texts = [str((row.get("content") or "")).strip() for row in rows]
-    if dry_run:
-        print(
-            f"[dry-run] table={table} rows={len(rows)} sample_id={rows[0].get('id') if rows else '—'}"
+class Rpc:
+    """client.rpc(...).execute().data をリトライ付きで（失敗したら client を作り直す）。"""
+
+    def __init__(self, client: Client):
+        self.client = client
+
+    def __call__(self, name: str, params: dict[str, Any]) -> Any:
+        return with_retry(
+            f"rpc {name}",
+            lambda: self.client.rpc(name, params).execute().data,
+            on_error=self._reconnect,
         )
+
+    def _reconnect(self) -> None:
+        self.client = get_client()
+
+
+class RateLimiter:
+    """呼び出しの間隔を 60/rpm 秒以上あける（ワーカースレッド共有）。"""
+
+    def __init__(self, rpm: float):
+        self.interval = 60.0 / rpm if rpm > 0 else 0.0
+        self._lock = threading.Lock()
+        self._next = 0.0
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+
+def cursor_path(table: str) -> Path:
+    return STATE_DIR / f"embed_cursor_{table}.json"
+
+
+def load_cursor(table: str) -> int:
+    try:
+        data = json.loads(cursor_path(table).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
         return 0
-    embeddings = batch_embed_texts(texts)
-    updated = 0
-    for row, embedding in zip(rows, embeddings):
-        last_err: Exception | None = None
-        for attempt in range(1, 6):
-            try:
-                client.table(table).update({"embedding": embedding}).eq("id", row["id"]).execute()
-                updated += 1
-                last_err = None
-                break
-            except Exception as e:  # network blips on long runs
-                last_err = e
-                wait_s = min(30, 2 ** attempt)
-                print(
-                    f"warn: update id={row.get('id')} attempt={attempt}/5 err={type(e).__name__}: {e}; sleep {wait_s}s",
-                    flush=True,
+    return int(data.get("last_id") or 0) if isinstance(data, dict) else 0
+
+
+def save_cursor(table: str, last_id: int) -> None:
+    path = cursor_path(table)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + f".tmp.{os.getpid()}")
+    tmp.write_text(
+        json.dumps({"last_id": last_id, "saved_at": time.strftime("%Y-%m-%d %H:%M:%S")}) + "\n",
+        encoding="utf-8",
+    )
+    os.replace(tmp, path)
+
+
+def clear_cursor(table: str) -> None:
+    cursor_path(table).unlink(missing_ok=True)
+
+
+def _copied_ids(data: Any) -> set[int]:
+    # returns setof bigint は [1, 2] で返る（古い PostgREST は [{"embedding_copy_by_hash": 1}]）
+    out: set[int] = set()
+    for x in data or []:
+        if isinstance(x, dict):
+            x = next(iter(x.values()), None)
+        if x is not None:
+            out.add(int(x))
+    return out
+
+
+def embed_unique(texts_by_hash: dict[str, str], limiter: RateLimiter) -> dict[str, list[float]]:
+    """md5 → ベクトル（ワーカースレッドで実行）。"""
+    hashes = list(texts_by_hash)
+
+    def call() -> list[list[float]]:
+        limiter.wait()
+        return batch_embed_texts([texts_by_hash[h] for h in hashes])
+
+    return dict(zip(hashes, with_retry("embed", call)))
+
+
+class Batch:
+    def __init__(self, rows: list[dict[str, Any]]):
+        self.last_id = int(rows[-1]["id"])
+        self.rows = rows
+        self.todo: list[dict[str, Any]] = []
+        self.done = False
+
+
+def run_table(
+    rpc: Rpc,
+    table: str,
+    *,
+    batch_size: int,
+    limit: int,
+    dry_run: bool,
+    concurrency: int,
+    rpm: float,
+    restart: bool,
+) -> tuple[int, int]:
+    after_id = 0 if restart else load_cursor(table)
+    if after_id:
+        print(f"embedding {table}: resume after id={after_id} ({cursor_path(table).name})", flush=True)
+    limiter = RateLimiter(rpm)
+    pool = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="embed")
+    inflight: dict[Future, Batch] = {}
+    order: deque[Batch] = deque()  # 取得順（カーソルは先頭から連続して書けた分だけ進める）
+    updated = copied = scanned = api_rows = 0
+    exhausted = False
+    try:
+        while True:
+            while not exhausted and len(inflight) < concurrency and (not limit or scanned < limit):
+                size = min(batch_size, limit - scanned) if limit else batch_size
+                rows = rpc("embedding_pending", {"p_table": table, "p_after_id": after_id, "p_limit": size})
+                if not rows:
+                    exhausted = True
+                    break
+                scanned += len(rows)
+                batch = Batch(rows)
+                after_id = batch.last_id
+                if dry_run:
+                    print(f"[dry-run] table={table} pending>={len(rows)} sample_id={rows[0].get('id')}")
+                    exhausted = True
+                    break
+                got = _copied_ids(
+                    rpc("embedding_copy_by_hash", {"p_table": table, "p_ids": [int(r["id"]) for r in rows]})
                 )
-                time.sleep(wait_s)
-                client = get_client()
-        if last_err is not None:
-            raise last_err
-    return updated
+                copied += len(got)
+                # 空本文は Gemini が受け付けないので飛ばす（pending に残るがカーソルは進む）
+                batch.todo = [
+                    r for r in rows if int(r["id"]) not in got and str(r.get("content") or "").strip()
+                ]
+                order.append(batch)
+                texts = {r["content_md5"]: str(r["content"]).strip() for r in batch.todo}
+                if texts:
+                    api_rows += len(texts)
+                    inflight[pool.submit(embed_unique, texts, limiter)] = batch
+                else:
+                    batch.done = True
+            if inflight:
+                finished, _ = wait(list(inflight), return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    batch = inflight.pop(fut)
+                    vectors = fut.result()
+                    payload = [
+                        {"id": int(r["id"]), "hash": r["content_md5"], "embedding": vectors[r["content_md5"]]}
+                        for r in batch.todo
+                    ]
+                    updated += int(rpc("embedding_set", {"p_table": table, "p_rows": payload}) or 0)
+                    batch.done = True
+            while order and order[0].done:
+                save_cursor(table, order.popleft().last_id)
+            if not inflight and (exhausted or (limit and scanned >= limit)):
+                break
+            print(
+                f"embedding {table}: updated={updated} copied={copied} api_rows={api_rows} "
+                f"scanned={scanned} inflight={len(inflight)} last_id={after_id}",
+                flush=True,
+            )
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+    if exhausted and not dry_run:
+        clear_cursor(table)
+    return updated + copied, scanned
 
 
 def parse_args() -> argparse.Namespace:
@@ -181,72 +264,33 @@ def parse_args() -> argparse.Namespace:
         required=True,
         help="対象テーブル（複数指定可）",
     )
-    p.add_argument("--batch-size", type=int, default=50, help="1回の埋め込み件数（既定 50）")
+    p.add_argument("--batch-size", type=int, default=50, help="1回の埋め込み件数（既定 50、最大 100）")
     p.add_argument("--limit", type=int, default=0, help="総件数上限（0 は無制限）")
     p.add_argument("--dry-run", action="store_true", help="対象件数だけ確認して更新しない")
-    p.add_argument("--sleep-ms", type=int, default=250, help="バッチ間待機ミリ秒")
+    p.add_argument(
+        "--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="同時に投げる埋め込みバッチ数（既定 4）"
+    )
+    p.add_argument("--rpm", type=float, default=DEFAULT_RPM, help="Gemini 呼び出し/分の上限（0 は無制限）")
+    p.add_argument("--restart", action="store_true", help="前回のカーソルを無視して先頭から")
     return p.parse_args()
 
 
-def run_table(
-    client: Client, table: str, *, batch_size: int, limit: int, dry_run: bool, sleep_ms: int
-) -> tuple[int, int]:
-    updated = 0
-    scanned = 0
-    cursor_id: int | None = None
-    while True:
-        remaining = limit - updated if limit > 0 else batch_size
-        fetch_size = min(batch_size, remaining) if limit > 0 else batch_size
-        if fetch_size <= 0:
-            break
-        rows = None
-        for attempt in range(1, 6):
-            try:
-                rows = fetch_pending_rows(client, table, fetch_size, cursor_id)
-                break
-            except Exception as e:
-                wait_s = min(30, 2 ** attempt)
-                print(
-                    f"warn: fetch attempt={attempt}/5 err={type(e).__name__}: {e}; sleep {wait_s}s",
-                    flush=True,
-                )
-                time.sleep(wait_s)
-                client = get_client()
-        if rows is None:
-            raise RuntimeError("fetch_pending_rows failed after retries")
-        if not rows:
-            break
-        scanned += len(rows)
-        cursor_id = int(rows[-1]["id"])
-        done = update_embeddings(client, table, rows, dry_run)
-        # refresh client periodically to avoid long-lived HTTP/2 disconnects
-        if scanned % 500 == 0:
-            client = get_client()
-        updated += done
-        print(
-            f"embedding {table}: batch={len(rows)} updated={updated} scanned={scanned} last_id={cursor_id}",
-            flush=True,
-        )
-        if dry_run:
-            break
-        time.sleep(max(0, sleep_ms) / 1000)
-    return updated, scanned
-
-
 def main() -> int:
     load_env()
     args = parse_args()
-    client = get_client()
+    rpc = Rpc(get_client())
     overall_updated = 0
     overall_scanned = 0
     for table in args.table:
         updated, scanned = run_table(
-            client,
+            rpc,
             table,
             batch_size=max(1, min(args.batch_size, 100)),
             limit=max(0, args.limit),
             dry_run=args.dry_run,
-            sleep_ms=args.sleep_ms,
+            concurrency=max(1, args.concurrency),
+            rpm=max(0.0, args.rpm),
+            restart=args.restart,
         )
         overall_updated += updated
         overall_scanned += scanned
@@ -8,6 +8,7 @@
 from __future__ import annotations
 
 import re
+from functools import lru_cache
 from urllib.parse import unquote, urlparse
 
 # 完全一致（スクレイプ title）
@@ -123,6 +124,8 @@ def forum_path_slug(url: str) -> str:
     return parts[-1]
 
 
+# 板の数は高々数十。全件変換では同じ (title, url) が行数ぶん来るので覚えておく
+@lru_cache(maxsize=4096)
 def resolve_forum_category(topic_title: str = "", topic_url: str = "") -> str:
     title = (topic_title or "").strip()
     url = (topic_url or "").strip()
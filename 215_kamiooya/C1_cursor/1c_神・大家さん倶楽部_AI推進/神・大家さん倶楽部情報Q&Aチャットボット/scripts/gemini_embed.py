@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gemini embedding（batchEmbedContents）。embed_to_supabase / knowledge_local 共通。
+
+必須環境変数:
+  GEMINI_API_KEY
+
+文書は task_type=RETRIEVAL_DOCUMENT（既定）、検索語は RETRIEVAL_QUERY で埋め込む。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import urllib.error
+import urllib.parse
+import urllib.request
+from pathlib import Path
+
+# text-embedding-004 は現行キーでは不可。gemini-embedding-001 + 768次元で schema と揃える。
+GEMINI_EMBED_MODEL = "gemini-embedding-001"
+GEMINI_EMBED_DIM = 768
+GEMINI_EMBED_URL = (
+    "https://generativelanguage.googleapis.com/v1beta/models/"
+    f"{GEMINI_EMBED_MODEL}:batchEmbedContents"
+)
+
+
+def load_env() -> None:
+    roots = [
+        Path.home() / "git-repos" / ".env.jarvis_private",
+        Path(__file__).resolve().parent / ".env",
+    ]
+    for p in roots:
+        if not p.exists():
+            continue
+        for line in p.read_text(encoding="utf-8").splitlines():
+            line = line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            k, v = line.split("=", 1)
+            os.environ.setdefault(k.strip(), v.strip().strip('"').strip("'"))
+
+
+def require_env(name: str) -> str:
+    value = (os.environ.get(name) or "").strip()
+    if not value:
+        raise RuntimeError(f"環境変数 {name} が未設定です")
+    return value
+
+
+def batch_embed_texts(
+    texts: list[str], *, task_type: str = "RETRIEVAL_DOCUMENT", timeout: float = 120
+) -> list[list[float]]:
+    api_key = require_env("GEMINI_API_KEY")
+    payload = {
+        "requests": [
+            {
+                "model": f"models/{GEMINI_EMBED_MODEL}",
+                "content": {"parts": [{"text": text}]},
+                "taskType": task_type,
+                "outputDimensionality": GEMINI_EMBED_DIM,
+            }
+            for text in texts
+        ]
+    }
+    req = urllib.request.Request(
+        GEMINI_EMBED_URL + "?key=" + urllib.parse.quote(api_key),
+        data=json.dumps(payload).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            raw = resp.read().decode("utf-8")
+    except urllib.error.HTTPError as e:
+        detail = e.read().decode("utf-8", "replace")
+        raise RuntimeError(f"Gemini embedding failed: HTTP {e.code} {detail[:240]}") from e
+    json_data = json.loads(raw)
+    embeddings = json_data.get("embeddings") or []
+    values: list[list[float]] = []
+    for item in embeddings:
+        vector = ((item or {}).get("values")) or []
+        if not vector:
+            raise RuntimeError("Gemini embedding response is empty")
+        values.append(vector)
+    if len(values) != len(texts):
+        raise RuntimeError(
+            f"Gemini embedding count mismatch: expected={len(texts)} actual={len(values)}"
+        )
+    return values
+
+
+def embed_documents(texts: list[str]) -> list[list[float]]:
+    return batch_embed_texts(texts, task_type="RETRIEVAL_DOCUMENT")
+
+
+def embed_queries(texts: list[str]) -> list[list[float]]:
+    # 検索時は1件なので待ちすぎない（落ちたら呼び出し側がキーワード検索だけにする）
+    return batch_embed_texts(texts, task_type="RETRIEVAL_QUERY", timeout=20)
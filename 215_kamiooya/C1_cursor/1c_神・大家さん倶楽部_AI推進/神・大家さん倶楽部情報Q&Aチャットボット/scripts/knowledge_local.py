@@ -10,19 +10,39 @@
   - comments のブートストラップ／差分 upsert
   - knowledge_sources / knowledge_chunks の upsert
   - 横断検索（コメント＋動画チャンク）
+
+検索:
+  comments.content / knowledge_chunks.search_text を FTS5（comments_fts / knowledge_chunks_fts）で引く。
+  日本語は分かち書きせず、かな・漢字の連続を2文字ずつ（bigram）、英数字は単語で索引する（ja_grams）。
+  FTS 表は contentless で、本体表のトリガーが ja_grams() で同期する。ja_grams は connect() が
+  接続ごとに登録するので、comments / knowledge_chunks への書き込みは connect() した接続で行うこと
+  （読むだけなら素の sqlite3 でよい）。FTS5 の無い SQLite では従来の LIKE 検索になる。
+
+  search_hybrid() はこれにローカルのベクトル近傍（local_embeddings、numpy で総当たり）を RRF で混ぜる。
+  埋め込みは Supabase と同じ gemini-embedding-001 で、Supabase を経由せずに引ける
+  （ネットワーク・クォータが落ちていてもキーワード検索は使える）。
+
+    python3 knowledge_local.py --embed-missing            # 未埋め込みの行を Gemini で埋める
+    python3 knowledge_local.py --search "サブリース 解約"
 """
 
 from __future__ import annotations
 
 import hashlib
 import json
+import math
 import os
 import re
 import sqlite3
+import struct
+import sys
+import unicodedata
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from gemini_embed import GEMINI_EMBED_MODEL
+
 DEFAULT_DB = Path(
     "/Users/matsunomasaharu2/Library/CloudStorage/OneDrive-個人用/"
     "215_神・大家さん倶楽部/C1_cursor/1c_神・大家さん倶楽部_AI推進/"
@@ -80,11 +100,115 @@ create table if not exists knowledge_chunks (
   updated_at text not null
 );
 
-create index if not exists comments_content_idx on comments(content);
-create index if not exists knowledge_chunks_search_idx on knowledge_chunks(search_text);
 create index if not exists knowledge_chunks_source_idx on knowledge_chunks(source_id, start_sec);
+
+create table if not exists local_meta (
+  key text primary key,
+  value text
+);
+
 """
 
+# local_embeddings の主キー・トリガーを変えたら上げる（connect() で作り直す）
+VEC_VERSION = "2"
+
+VEC_TABLE_STATEMENTS = (
+    """
+    create table if not exists local_embeddings (
+      kind text not null,
+      ref_id integer not null,
+      model text not null,
+      dim integer not null,
+      content_hash text not null,
+      vec blob not null,
+      updated_at text not null,
+      primary key (kind, ref_id, model)
+    )
+    """,
+    "create index if not exists local_embeddings_model_hash_idx on local_embeddings(model, content_hash)",
+)
+
+# 本文が変わる・行が消えたら全 model の埋め込みを消し、vec_writes を上げる（索引キャッシュの署名）
+VEC_STATEMENTS = tuple(
+    f"""
+    create trigger {table}_vec_{suffix} after {event} on {table}
+    {when}begin
+      delete from local_embeddings where kind = '{kind}' and ref_id = old.id;
+      update local_meta set value = cast(value as integer) + 1 where key = 'vec_writes';
+    end
+    """
+    for kind, table in (("comment", "comments"), ("chunk", "knowledge_chunks"))
+    for suffix, event, when in (
+        ("ad", "delete", ""),
+        ("au", "update of content", "when old.content is not new.content "),
+    )
+)
+
+VEC_DROP_STATEMENTS = (
+    "drop trigger if exists comments_vec_ad",
+    "drop trigger if exists comments_vec_au",
+    "drop trigger if exists knowledge_chunks_vec_ad",
+    "drop trigger if exists knowledge_chunks_vec_au",
+)
+
+# ja_grams / トリガーを変えたら上げる（connect() で FTS 表を作り直す）
+FTS_VERSION = "1"
+
+FTS_STATEMENTS = (
+    "create virtual table comments_fts using fts5(grams, content='', tokenize='unicode61 remove_diacritics 0')",
+    "create virtual table knowledge_chunks_fts using fts5(grams, content='', tokenize='unicode61 remove_diacritics 0')",
+    """
+    create trigger comments_fts_ai after insert on comments begin
+      insert into comments_fts(rowid, grams) values (new.id, ja_grams(new.content));
+    end
+    """,
+    """
+    create trigger comments_fts_ad after delete on comments begin
+      insert into comments_fts(comments_fts, rowid, grams) values ('delete', old.id, ja_grams(old.content));
+    end
+    """,
+    """
+    create trigger comments_fts_au after update of content on comments
+    when old.content is not new.content begin
+      insert into comments_fts(comments_fts, rowid, grams) values ('delete', old.id, ja_grams(old.content));
+      insert into comments_fts(rowid, grams) values (new.id, ja_grams(new.content));
+    end
+    """,
+    """
+    create trigger knowledge_chunks_fts_ai after insert on knowledge_chunks begin
+      insert into knowledge_chunks_fts(rowid, grams) values (new.id, ja_grams(new.search_text));
+    end
+    """,
+    """
+    create trigger knowledge_chunks_fts_ad after delete on knowledge_chunks begin
+      insert into knowledge_chunks_fts(knowledge_chunks_fts, rowid, grams)
+      values ('delete', old.id, ja_grams(old.search_text));
+    end
+    """,
+    """
+    create trigger knowledge_chunks_fts_au after update of search_text on knowledge_chunks
+    when old.search_text is not new.search_text begin
+      insert into knowledge_chunks_fts(knowledge_chunks_fts, rowid, grams)
+      values ('delete', old.id, ja_grams(old.search_text));
+      insert into knowledge_chunks_fts(rowid, grams) values (new.id, ja_grams(new.search_text));
+    end
+    """,
+)
+
+FTS_DROP_STATEMENTS = (
+    # 旧版の B-tree（LIKE '%…%' には効かず書き込みだけ重い）
+    "drop index if exists comments_content_idx",
+    "drop index if exists knowledge_chunks_search_idx",
+    "drop trigger if exists comments_fts_ai",
+    "drop trigger if exists comments_fts_ad",
+    "drop trigger if exists comments_fts_au",
+    "drop trigger if exists knowledge_chunks_fts_ai",
+    "drop trigger if exists knowledge_chunks_fts_ad",
+    "drop trigger if exists knowledge_chunks_fts_au",
+    "drop table if exists comments_fts",
+    "drop table if exists knowledge_chunks_fts",
+)
+
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
@@ -102,8 +226,10 @@ def resolve_db_path(path: str | Path | None = None) -> Path:
 def connect(path: str | Path | None = None) -> sqlite3.Connection:
     db_path = resolve_db_path(path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path))
+    # accept_notta_inbox が複数ファイルを並列に取り込むので書き込み待ちを長めに
+    conn = sqlite3.connect(str(db_path), timeout=30)
     conn.row_factory = sqlite3.Row
+    conn.create_function("ja_grams", 1, ja_grams, deterministic=True)
     conn.execute("pragma foreign_keys = on")
     conn.executescript(SCHEMA_SQL)
     # existing DBs: add content_channel if missing
@@ -118,9 +244,92 @@ def connect(path: str | Path | None = None) -> sqlite3.Connection:
         if col not in comment_cols:
             conn.execute(f"alter table comments add column {col} text")
             conn.commit()
+    ensure_vec_schema(conn)
+    ensure_fts(conn)
     return conn
 
 
+def get_meta(conn: sqlite3.Connection, key: str) -> str | None:
+    row = conn.execute("select value from local_meta where key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def ensure_fts(conn: sqlite3.Connection) -> bool:
+    """FTS 表が無い／版が古ければ作り直して既存行を索引する。FTS5 が使えなければ False。
+
+    別プロセスが同時に開いても作り直しは1回（begin immediate で待ってから版を見直す）。
+    """
+    if get_meta(conn, "fts_version") == FTS_VERSION:
+        return True
+    try:
+        conn.execute("begin immediate")
+        if get_meta(conn, "fts_version") != FTS_VERSION:
+            for stmt in FTS_DROP_STATEMENTS + FTS_STATEMENTS:
+                conn.execute(stmt)
+            conn.execute("insert into comments_fts(rowid, grams) select id, ja_grams(content) from comments")
+            conn.execute(
+                "insert into knowledge_chunks_fts(rowid, grams) select id, ja_grams(search_text) from knowledge_chunks"
+            )
+            conn.execute(
+                "insert or replace into local_meta (key, value) values ('fts_version', ?)", (FTS_VERSION,)
+            )
+        conn.commit()
+    except sqlite3.OperationalError as e:
+        if conn.in_transaction:
+            conn.rollback()
+        if "fts5" not in str(e):
+            raise
+        return False
+    return True
+
+
+def ensure_vec_schema(conn: sqlite3.Connection) -> None:
+    """local_embeddings を (kind, ref_id, model) 主キーに移し、トリガーを作り直す（版が古いときだけ）。"""
+    if get_meta(conn, "vec_version") == VEC_VERSION:
+        return
+    conn.execute("begin immediate")
+    try:
+        if get_meta(conn, "vec_version") != VEC_VERSION:
+            for stmt in VEC_DROP_STATEMENTS:
+                conn.execute(stmt)
+            cols = sorted(conn.execute("pragma table_info(local_embeddings)"), key=lambda r: r[5])
+            pk = [r[1] for r in cols if r[5]]
+            if cols and pk != ["kind", "ref_id", "model"]:
+                # 旧版は (kind, ref_id) 主キー（model を問わず1行1ベクトル）。中身はそのまま写す
+                conn.execute("drop index if exists local_embeddings_model_hash_idx")
+                conn.execute("alter table local_embeddings rename to local_embeddings_old")
+                for stmt in VEC_TABLE_STATEMENTS:
+                    conn.execute(stmt)
+                conn.execute(
+                    "insert into local_embeddings (kind, ref_id, model, dim, content_hash, vec, updated_at)"
+                    " select kind, ref_id, model, dim, content_hash, vec, updated_at from local_embeddings_old"
+                )
+                conn.execute("drop table local_embeddings_old")
+            for stmt in VEC_TABLE_STATEMENTS:
+                conn.execute(stmt)
+            for stmt in VEC_STATEMENTS:
+                conn.execute(stmt)
+            conn.execute("insert or ignore into local_meta (key, value) values ('vec_writes', '0')")
+            conn.execute(
+                "insert or replace into local_meta (key, value) values ('vec_version', ?)", (VEC_VERSION,)
+            )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def has_fts(conn: sqlite3.Connection) -> bool:
+    return get_meta(conn, "fts_version") == FTS_VERSION
+
+
+def _fts_usable(conn: sqlite3.Connection, tokens: list[str]) -> bool:
+    """FTS で引けるか。かな・漢字1文字の語は bigram の後ろ側（所得税の「税」）に当たらないので LIKE に回す。"""
+    if any(len(t) == 1 and not _ASCII_RE.match(t) for t in tokens):
+        return False
+    return has_fts(conn)
+
+
 def content_hash(text: str) -> str:
     return hashlib.sha1((text or "").encode("utf-8")).hexdigest()[:16]
 
@@ -290,20 +499,135 @@ def upsert_chunks(
     return n
 
 
-_TOKEN_RE = re.compile(r"[0-9A-Za-zぁ-んァ-ン一-龥]{2,}")
+def _chunk_meta(end_sec: Any, speaker: Any) -> tuple[int | None, str | None]:
+    end = int(end_sec) if end_sec not in (None, "") else None
+    return end, (str(speaker or "").strip() or None)
+
+
+def chunk_diff(
+    existing: dict[str, tuple[Any, Any]], chunks: list[dict[str, Any]]
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]], list[str]]:
+    """取込済み（chunk_key → (end_sec, speaker)）と今回のチャンクの差分。
+
+    chunk_key は開始秒＋本文ハッシュなので、本文・開始が同じチャンクはそのまま残す。
+    戻り値は (追加, end_sec / speaker だけ変わった, 消す chunk_key)。
+    """
+    seen: set[str] = set()
+    added: list[dict[str, Any]] = []
+    changed: list[dict[str, Any]] = []
+    for c in chunks:
+        key = str(c.get("chunk_key") or "")
+        if not key or key in seen or not str(c.get("content") or "").strip():
+            continue
+        seen.add(key)
+        if key not in existing:
+            added.append(c)
+        elif _chunk_meta(*existing[key]) != _chunk_meta(c.get("end_sec"), c.get("speaker")):
+            changed.append(c)
+    removed = [k for k in existing if k not in seen]
+    return added, changed, removed
+
+
+def sync_source_chunks(
+    conn: sqlite3.Connection, source_id: int, chunks: list[dict[str, Any]]
+) -> dict[str, int]:
+    """source のチャンクを chunks に揃える（差分だけ書く）。残ったチャンクの行・埋め込みは触らない。
+
+    chunks には chunk_key が要る（notta_to_knowledge.prepare_chunks）。
+    """
+    existing = {
+        r[0]: (r[1], r[2])
+        for r in conn.execute(
+            "select chunk_key, end_sec, speaker from knowledge_chunks where source_id = ?", (source_id,)
+        )
+    }
+    added, changed, removed = chunk_diff(existing, chunks)
+    if removed:
+        conn.executemany("delete from knowledge_chunks where chunk_key = ?", [(k,) for k in removed])
+    upsert_chunks(conn, source_id, added + changed)
+    return {
+        "added": len(added),
+        "updated": len(changed),
+        "removed": len(removed),
+        "kept": len(existing) - len(removed) - len(changed),
+    }
+
+
+# 字種ごとの連続（NFKC・小文字化した後）。ひらがなは助詞・送りがなが多いので検索語からは外す
+_RUN_RE = re.compile(r"[0-9a-z]+|[\u4e00-\u9fff\u3400-\u4dbf々〆ヶ]+|[\u30a1-\u30faー]+|[\u3041-\u3096]+")
+_HIRA_RE = re.compile(r"^[\u3041-\u3096]+$")
+_ASCII_RE = re.compile(r"^[0-9a-z]+$")
+_STOP = {"です", "ます", "こと", "方法", "教えて", "ください", "どこ", "なに", "何", "について"}
+
+
+def _norm(text: str) -> str:
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def _grams(run: str) -> list[str]:
+    if _ASCII_RE.match(run) or len(run) < 2:
+        return [run]
+    return [run[i : i + 2] for i in range(len(run) - 1)]
+
+
+def ja_grams(text: str | None) -> str:
+    """FTS に入れる語列。英数字は単語、かな・漢字は連続ごとに2文字ずつ（1文字の連続はそのまま）。"""
+    out: list[str] = []
+    for line in re.split(r"[^\w々〆ヶー]+", _norm(text or "")):
+        for run in _RUN_RE.findall(line):
+            out.extend(_grams(run))
+    return " ".join(out)
 
 
 def tokenize(q: str) -> list[str]:
-    stop = {"です", "ます", "こと", "方法", "教えて", "ください", "どこ", "なに", "何", "について"}
-    toks = []
-    for t in _TOKEN_RE.findall(q or ""):
-        if t in stop:
+    """検索語（AND）。字種の切れ目で分け、ひらがなと1文字の語は他に語があれば捨てる。"""
+    runs: list[str] = []
+    for part in re.split(r"[^\w々〆ヶー]+", _norm(q)):
+        if part in _STOP:
             continue
+        runs.extend(_RUN_RE.findall(part))
+    strong = [t for t in runs if len(t) >= 2 and not _HIRA_RE.match(t) and t not in _STOP]
+    toks: list[str] = []
+    for t in strong or [t for t in runs if t not in _STOP]:
         if t not in toks:
             toks.append(t)
     return toks[:8]
 
 
+def fts_query(tokens: list[str]) -> str:
+    """tokenize の語 → FTS5 MATCH 式。かな・漢字は bigram の連続（フレーズ）、英数字は前方一致。
+
+    かな・漢字1文字の語はここに来ない（_fts_usable で LIKE に回す）。
+    """
+    parts = []
+    for t in tokens:
+        grams = _grams(t)
+        phrase = '"' + " ".join(g.replace('"', '""') for g in grams) + '"'
+        if _ASCII_RE.match(t):
+            phrase += " *"
+        parts.append(phrase)
+    return " AND ".join(parts)
+
+
+def make_snippet(text: str, tokens: list[str], width: int = 220) -> tuple[str, list[list[int]]]:
+    """最初に当たった語の少し前から width 文字。highlights は snippet 内の [開始, 終了) 位置。"""
+    text = text or ""
+    low = text.lower()
+    pos = [low.find(t) for t in tokens]
+    pos = [p for p in pos if p >= 0]
+    start = max(0, min(pos) - width // 4) if pos else 0
+    snippet = text[start : start + width]
+    slow = snippet.lower()
+    marks: list[list[int]] = []
+    for t in tokens:
+        i = slow.find(t)
+        while i >= 0 and t:
+            marks.append([i, i + len(t)])
+            i = slow.find(t, i + len(t))
+    marks.sort()
+    return snippet, marks
+
+
 def format_mmss(sec: int | None) -> str:
     if sec is None:
         return ""
@@ -315,16 +639,117 @@ def format_mmss(sec: int | None) -> str:
     return f"{m:02d}:{ss:02d}"
 
 
+def _comment_hit(r: sqlite3.Row, tokens: list[str], score: float) -> dict[str, Any]:
+    st = r["source_type"] or "WeStudy"
+    if st in ("WeStudy", "westudy", ""):
+        st = "WeStudyコミュニティ"
+    snippet, marks = make_snippet(r["content"], tokens)
+    return {
+        "kind": "comment",
+        "source_type": st,
+        "comment_id": r["comment_id"],
+        "posted_at": r["posted_at"],
+        "author_name": r["author_name"],
+        "content": r["content"],
+        "snippet": snippet,
+        "highlights": marks,
+        "score": score,
+    }
+
+
+def _chunk_hit(r: sqlite3.Row, tokens: list[str], score: float) -> dict[str, Any]:
+    start = int(r["start_sec"] or 0)
+    url = r["video_url"] or ""
+    if url and "t=" not in url:
+        # hash fragments (#LF) を保ったまま t= を付ける
+        hash_idx = url.find("#")
+        base = url[:hash_idx] if hash_idx >= 0 else url
+        hash_part = url[hash_idx:] if hash_idx >= 0 else ""
+        sep = "&" if "?" in base else "?"
+        url = f"{base}{sep}t={start}{hash_part}"
+    channel = (r["content_channel"] if "content_channel" in r.keys() else None) or "seminar_video"
+    label = "WeStudyセミナー動画" if channel == "seminar_video" else "WeStudyコミュニティ"
+    snippet, marks = make_snippet(r["content"], tokens)
+    return {
+        "kind": "video_chunk",
+        "source_type": label,
+        "chunk_key": r["chunk_key"],
+        "video_title": r["video_title"],
+        "video_id": r["src_video_id"] or r["source_key"],
+        "video_url": url or None,
+        "origin_path": r["origin_path"] if "origin_path" in r.keys() else None,
+        "start_sec": start,
+        "end_sec": r["end_sec"],
+        "start_label": format_mmss(start),
+        "speaker": r["speaker"],
+        "content": r["content"],
+        "snippet": snippet,
+        "highlights": marks,
+        "score": score,
+    }
+
+
+CHUNK_COLUMNS = """c.*, s.title as video_title, s.video_url, s.video_id as src_video_id,
+       s.source_key, s.content_channel, s.origin_path"""
+
+
 def search_all(conn: sqlite3.Connection, query: str, limit: int = 10) -> list[dict[str, Any]]:
-    tokens = tokenize(query)
-    if not tokens:
-        tokens = [(query or "").strip()[:12]] if (query or "").strip() else []
+    """コメント＋動画チャンクの横断検索（全語を含むもの）。各表 BM25 順に limit 件、動画チャンクを先に並べる。
+
+    score は BM25（大きいほど良い）。snippet は最初に当たった語の周辺、highlights はその中の語の位置。
+    """
+    tokens = _query_tokens(query)
     if not tokens:
         return []
+    if not _fts_usable(conn, tokens):
+        return _search_like(conn, tokens, limit)
+    comment_hits, chunk_hits = _search_fts(conn, tokens, limit)
+    hits = comment_hits + chunk_hits
+    hits.sort(key=lambda x: (x.get("kind") != "video_chunk", -float(x.get("score") or 0)))
+    return hits[:limit]
+
+
+def _query_tokens(query: str) -> list[str]:
+    tokens = tokenize(query)
+    if not tokens:
+        tokens = [_norm(query).strip()[:12]] if (query or "").strip() else []
+    return tokens
 
-    hits: list[dict[str, Any]] = []
 
-    # comments
+def _search_fts(
+    conn: sqlite3.Connection, tokens: list[str], limit: int
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """(コメント, 動画チャンク) をそれぞれ BM25 順に limit 件。"""
+    match = fts_query(tokens)
+    rows = conn.execute(
+        """
+        select c.*, f.rank as fts_rank
+        from (select rowid, rank from comments_fts where comments_fts match ? order by rank limit ?) f
+        join comments c on c.id = f.rowid
+        order by f.rank, c.posted_at desc
+        """,
+        (match, limit),
+    ).fetchall()
+    comment_hits = [_comment_hit(r, tokens, round(-float(r["fts_rank"]), 4)) for r in rows]
+    rows2 = conn.execute(
+        f"""
+        select {CHUNK_COLUMNS}, f.rank as fts_rank
+        from (
+          select rowid, rank from knowledge_chunks_fts where knowledge_chunks_fts match ? order by rank limit ?
+        ) f
+        join knowledge_chunks c on c.id = f.rowid
+        join knowledge_sources s on s.id = c.source_id
+        order by f.rank, c.start_sec
+        """,
+        (match, limit),
+    ).fetchall()
+    chunk_hits = [_chunk_hit(r, tokens, round(-float(r["fts_rank"]), 4)) for r in rows2]
+    return comment_hits, chunk_hits
+
+
+def _search_like(conn: sqlite3.Connection, tokens: list[str], limit: int) -> list[dict[str, Any]]:
+    """FTS5 が無い SQLite 用（全件走査）。score は含む語の数。"""
+    hits: list[dict[str, Any]] = []
     where = " and ".join(["content like ?" for _ in tokens])
     params = [f"%{t}%" for t in tokens]
     rows = conn.execute(
@@ -332,28 +757,12 @@ def search_all(conn: sqlite3.Connection, query: str, limit: int = 10) -> list[di
         (*params, limit),
     ).fetchall()
     for r in rows:
-        st = r["source_type"] or "WeStudy"
-        if st in ("WeStudy", "westudy", ""):
-            st = "WeStudyコミュニティ"
-        hits.append(
-            {
-                "kind": "comment",
-                "source_type": st,
-                "comment_id": r["comment_id"],
-                "posted_at": r["posted_at"],
-                "author_name": r["author_name"],
-                "content": r["content"],
-                "snippet": (r["content"] or "")[:220],
-                "score": sum(1 for t in tokens if t.lower() in (r["content"] or "").lower()),
-            }
-        )
-
-    # chunks + sources
+        text = (r["content"] or "").lower()
+        hits.append(_comment_hit(r, tokens, sum(1 for t in tokens if t in text)))
     where2 = " and ".join(["c.search_text like ?" for _ in tokens])
     rows2 = conn.execute(
         f"""
-        select c.*, s.title as video_title, s.video_url, s.video_id as src_video_id,
-               s.source_key, s.content_channel, s.origin_path
+        select {CHUNK_COLUMNS}
         from knowledge_chunks c
         join knowledge_sources s on s.id = c.source_id
         where {where2}
@@ -363,50 +772,342 @@ def search_all(conn: sqlite3.Connection, query: str, limit: int = 10) -> list[di
         (*params, limit),
     ).fetchall()
     for r in rows2:
-        start = int(r["start_sec"] or 0)
-        url = r["video_url"] or ""
-        if url and "t=" not in url:
-            # hash fragments (#LF) を保ったまま t= を付ける
-            hash_idx = url.find("#")
-            base = url[:hash_idx] if hash_idx >= 0 else url
-            hash_part = url[hash_idx:] if hash_idx >= 0 else ""
-            sep = "&" if "?" in base else "?"
-            url = f"{base}{sep}t={start}{hash_part}"
-        channel = (r["content_channel"] if "content_channel" in r.keys() else None) or "seminar_video"
-        label = "WeStudyセミナー動画" if channel == "seminar_video" else "WeStudyコミュニティ"
-        hits.append(
-            {
-                "kind": "video_chunk",
-                "source_type": label,
-                "chunk_key": r["chunk_key"],
-                "video_title": r["video_title"],
-                "video_id": r["src_video_id"] or r["source_key"],
-                "video_url": url or None,
-                "origin_path": r["origin_path"] if "origin_path" in r.keys() else None,
-                "start_sec": start,
-                "end_sec": r["end_sec"],
-                "start_label": format_mmss(start),
-                "speaker": r["speaker"],
-                "content": r["content"],
-                "snippet": (r["content"] or "")[:220],
-                "score": sum(1 for t in tokens if t.lower() in (r["search_text"] or "").lower())
-                + 1,
-            }
-        )
-
-    hits.sort(key=lambda x: (-int(x.get("score") or 0), x.get("kind") != "video_chunk"))
+        text = (r["search_text"] or "").lower()
+        hits.append(_chunk_hit(r, tokens, sum(1 for t in tokens if t in text) + 1))
+    hits.sort(key=lambda x: (-float(x.get("score") or 0), x.get("kind") != "video_chunk"))
     return hits[:limit]
 
 
+# --- ベクトル検索（local_embeddings） ---------------------------------------------------------
+#
+# 1行 = 1コメント / 1チャンクの埋め込み（L2 正規化した float16 の blob）。本文が変わる・行が消えると
+# トリガーで消えるので、embed_missing() で埋め直す。検索は model ごとに全件を float32 行列へ載せた
+# 総当たり（数万件×768次元なら数 ms）。行列は DB ファイル×model ごとに保持し、件数か
+# local_meta の vec_writes（put_embeddings と削除トリガーで増える）が変わったら読み直す。
+# numpy が無い環境ではベクトル検索だけ使えない（search_hybrid はキーワードのみ）。
+
+VEC_KINDS = ("comment", "chunk")
+VEC_TABLES = {"comment": "comments", "chunk": "knowledge_chunks"}
+RRF_K = 60
+STUB_MODEL = "stub-bigram-64"
+STUB_DIM = 64
+
+
+def stub_embed(texts: list[str], dim: int = STUB_DIM) -> list[list[float]]:
+    """テスト・オフライン確認用の決定的な埋め込み（ja_grams の各語を dim 次元へハッシュして数える）。"""
+    out: list[list[float]] = []
+    for text in texts:
+        v = [0.0] * dim
+        for g in ja_grams(text).split():
+            h = int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little")
+            v[h % dim] += 1.0
+        out.append(v)
+    return out
+
+
+def _pack_vec(vec: Any) -> tuple[bytes, int]:
+    vals = [float(x) for x in vec]
+    norm = math.sqrt(sum(x * x for x in vals)) or 1.0
+    return struct.pack(f"<{len(vals)}e", *(x / norm for x in vals)), len(vals)
+
+
+def put_embeddings(
+    conn: sqlite3.Connection, kind: str, items: list[tuple[int, str, Any]], *, model: str
+) -> int:
+    """items: (ref_id, content_hash, ベクトル)。L2 正規化して float16 で保存（同じ行・同じ model は置き換え）。"""
+    ts = now_iso()
+    rows = []
+    for ref_id, chash, vec in items:
+        blob, dim = _pack_vec(vec)
+        rows.append((kind, int(ref_id), model, dim, chash, blob, ts))
+    conn.executemany(
+        """
+        insert or replace into local_embeddings (kind, ref_id, model, dim, content_hash, vec, updated_at)
+        values (?,?,?,?,?,?,?)
+        """,
+        rows,
+    )
+    conn.execute("update local_meta set value = cast(value as integer) + 1 where key = 'vec_writes'")
+    conn.commit()
+    return len(rows)
+
+
+def pending_embeddings(
+    conn: sqlite3.Connection, kind: str, *, model: str, after_id: int = 0, limit: int = 100
+) -> list[tuple[int, str]]:
+    """(ref_id, 本文) のうち model の埋め込みが無いもの（id 順、after_id より後）。"""
+    table = VEC_TABLES[kind]
+    rows = conn.execute(
+        f"""
+        select t.id, t.content from {table} t
+        left join local_embeddings e on e.kind = ? and e.ref_id = t.id and e.model = ?
+        where e.ref_id is null and t.id > ?
+        order by t.id
+        limit ?
+        """,
+        (kind, model, after_id, limit),
+    ).fetchall()
+    return [(int(r[0]), r[1] or "") for r in rows]
+
+
+def embed_missing(
+    conn: sqlite3.Connection,
+    embed_fn,
+    *,
+    model: str,
+    kinds: tuple[str, ...] = VEC_KINDS,
+    batch_size: int = 50,
+    limit: int = 0,
+    log=None,
+) -> int:
+    """埋め込みの無い行を embed_fn（list[str] -> list[list[float]]）で埋める。保存した件数を返す。
+
+    同じ model・同じ本文（content_hash）の埋め込みが既にあれば API を呼ばずに写す。
+    """
+    done = 0
+    for kind in kinds:
+        after_id = 0
+        while not limit or done < limit:
+            size = min(batch_size, limit - done) if limit else batch_size
+            rows = pending_embeddings(conn, kind, model=model, after_id=after_id, limit=size)
+            if not rows:
+                break
+            after_id = rows[-1][0]
+            known: dict[str, Any] = {}
+            todo: dict[str, str] = {}  # content_hash -> 本文（API に送る分、重複なし）
+            for _, text in rows:
+                chash = content_hash(text)
+                if chash in known or chash in todo:
+                    continue
+                prev = conn.execute(
+                    "select vec from local_embeddings where model = ? and content_hash = ? limit 1",
+                    (model, chash),
+                ).fetchone()
+                if prev is not None:
+                    known[chash] = _unpack_vec(prev[0])
+                else:
+                    todo[chash] = text
+            if todo:
+                vecs = embed_fn(list(todo.values()))
+                if len(vecs) != len(todo):
+                    raise RuntimeError(f"embedding count mismatch: expected={len(todo)} actual={len(vecs)}")
+                known.update(zip(todo, vecs))
+            items = [(ref_id, content_hash(text), known[content_hash(text)]) for ref_id, text in rows]
+            done += put_embeddings(conn, kind, items, model=model)
+            if log:
+                log(f"embedding {kind}: batch={len(rows)} api={len(todo)} total={done} last_id={after_id}")
+    return done
+
+
+def _unpack_vec(blob: bytes) -> list[float]:
+    return list(struct.unpack(f"<{len(blob) // 2}e", blob))
+
+
+class VectorIndex:
+    """1 model 分の埋め込みを float32 行列に載せた総当たり索引（行は L2 正規化済み）。"""
+
+    def __init__(self, keys: list[tuple[str, int]], mat: Any):
+        self.keys = keys
+        self.mat = mat
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def search(self, qvec: Any, k: int = 10) -> list[tuple[str, int, float]]:
+        """(kind, ref_id, コサイン類似度) を類似度の高い順に k 件。"""
+        import numpy as np
+
+        q = np.asarray(qvec, dtype=np.float32)
+        if q.shape != (self.mat.shape[1],):
+            raise ValueError(f"query dim {q.shape} != index dim {self.mat.shape[1]}")
+        q /= float(np.linalg.norm(q)) or 1.0
+        sims = self.mat @ q
+        k = min(int(k), len(sims))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-sims, k - 1)[:k]
+        idx = idx[np.argsort(-sims[idx], kind="stable")]
+        return [(*self.keys[i], float(sims[i])) for i in idx]
+
+
+_VEC_CACHE: dict[tuple[str, str], tuple[tuple, VectorIndex]] = {}
+
+
+def load_vector_index(conn: sqlite3.Connection, *, model: str) -> VectorIndex | None:
+    """model の埋め込みの索引。numpy が無い・埋め込みが1件も無いときは None。"""
+    try:
+        import numpy as np
+    except ImportError:
+        return None
+    # 置き換え・再埋め込みでは件数も rowid も変わらないことがあるので、書き込み回数で見る
+    sig = (
+        conn.execute("select count(*) from local_embeddings where model = ?", (model,)).fetchone()[0],
+        get_meta(conn, "vec_writes"),
+    )
+    if not sig[0]:
+        return None
+    db_file = next((r[2] for r in conn.execute("pragma database_list") if r[1] == "main"), "")
+    key = (db_file or f"memory:{id(conn)}", model)
+    cached = _VEC_CACHE.get(key)
+    if cached and cached[0] == sig:
+        return cached[1]
+    # 次元違い（model 名の付け間違い等）は多い方だけ使う
+    dim = conn.execute(
+        "select dim from local_embeddings where model = ? group by dim order by count(*) desc limit 1",
+        (model,),
+    ).fetchone()[0]
+    rows = conn.execute(
+        "select kind, ref_id, vec from local_embeddings where model = ? and dim = ? order by rowid",
+        (model, dim),
+    ).fetchall()
+    mat = np.frombuffer(b"".join(r[2] for r in rows), dtype="<f2").reshape(len(rows), dim)
+    index = VectorIndex([(r[0], int(r[1])) for r in rows], mat.astype(np.float32))
+    _VEC_CACHE[key] = (sig, index)
+    return index
+
+
+def search_vector(
+    conn: sqlite3.Connection,
+    qvec: Any,
+    *,
+    model: str,
+    limit: int = 10,
+    tokens: list[str] | None = None,
+    index: VectorIndex | None = None,
+) -> list[dict[str, Any]]:
+    """クエリベクトルの近傍（コメント・動画チャンク混在）。score はコサイン類似度。"""
+    index = index or load_vector_index(conn, model=model)
+    if index is None:
+        return []
+    found = index.search(qvec, limit)
+    ids = {kind: [ref_id for k, ref_id, _ in found if k == kind] for kind in VEC_KINDS}
+    rows: dict[tuple[str, int], sqlite3.Row] = {}
+    if ids["comment"]:
+        marks = ",".join("?" * len(ids["comment"]))
+        for r in conn.execute(f"select * from comments where id in ({marks})", ids["comment"]):
+            rows[("comment", int(r["id"]))] = r
+    if ids["chunk"]:
+        marks = ",".join("?" * len(ids["chunk"]))
+        for r in conn.execute(
+            f"""
+            select {CHUNK_COLUMNS}
+            from knowledge_chunks c
+            join knowledge_sources s on s.id = c.source_id
+            where c.id in ({marks})
+            """,
+            ids["chunk"],
+        ):
+            rows[("chunk", int(r["id"]))] = r
+    hits: list[dict[str, Any]] = []
+    for kind, ref_id, sim in found:
+        r = rows.get((kind, ref_id))
+        if r is None:
+            continue
+        make = _comment_hit if kind == "comment" else _chunk_hit
+        hits.append(make(r, tokens or [], round(sim, 4)))
+    return hits
+
+
+def _hit_key(hit: dict[str, Any]) -> tuple[str, str]:
+    if hit.get("kind") == "video_chunk":
+        return "video_chunk", str(hit.get("chunk_key"))
+    return "comment", str(hit.get("comment_id"))
+
+
+def search_hybrid(
+    conn: sqlite3.Connection,
+    query: str,
+    limit: int = 10,
+    *,
+    embed_fn=None,
+    model: str = GEMINI_EMBED_MODEL,
+    pool: int = 0,
+) -> list[dict[str, Any]]:
+    """キーワード（FTS のコメント・動画チャンク）とベクトル近傍を RRF（1/(RRF_K+順位) の和）で混ぜる。
+
+    embed_fn: list[str] -> list[list[float]]（既定は Gemini の RETRIEVAL_QUERY）。ローカルに model の
+    埋め込みが無い・埋め込みが作れない（キー無し・通信断・クォータ）ときはキーワードだけで並べる。
+    score は RRF、ranks は {"comment" | "chunk" | "vector": 各一覧での順位}、similarity はベクトル側の類似度。
+    """
+    pool = pool or max(limit * 3, 30)
+    tokens = _query_tokens(query)
+    lists: list[tuple[str, list[dict[str, Any]]]] = []
+    if tokens:
+        if _fts_usable(conn, tokens):
+            comment_hits, chunk_hits = _search_fts(conn, tokens, pool)
+            lists += [("comment", comment_hits), ("chunk", chunk_hits)]
+        else:
+            lists.append(("keyword", _search_like(conn, tokens, pool)))
+    index = load_vector_index(conn, model=model) if (query or "").strip() else None
+    if index is not None:
+        if embed_fn is None:
+            from gemini_embed import embed_queries as embed_fn
+        try:
+            qvec = embed_fn([query])[0]
+            lists.append(("vector", search_vector(conn, qvec, model=model, limit=pool, tokens=tokens, index=index)))
+        except Exception as e:
+            print(f"warn: vector search skipped: {type(e).__name__}: {e}", file=sys.stderr)
+
+    fused: dict[tuple[str, str], dict[str, Any]] = {}
+    for name, hits in lists:
+        for rank, h in enumerate(hits, 1):
+            cur = fused.get(_hit_key(h))
+            if cur is None:
+                # 先に来たキーワード側の snippet / highlights を残す
+                cur = fused[_hit_key(h)] = {**h, "score": 0.0, "ranks": {}}
+            cur["ranks"][name] = rank
+            cur["score"] += 1.0 / (RRF_K + rank)
+            if name == "vector":
+                cur["similarity"] = h["score"]
+    out = sorted(fused.values(), key=lambda x: -x["score"])[:limit]
+    for h in out:
+        h["score"] = round(h["score"], 6)
+    return out
+
+
 def counts(conn: sqlite3.Connection) -> dict[str, int]:
     return {
         "comments": conn.execute("select count(*) from comments").fetchone()[0],
         "knowledge_sources": conn.execute("select count(*) from knowledge_sources").fetchone()[0],
         "knowledge_chunks": conn.execute("select count(*) from knowledge_chunks").fetchone()[0],
+        "local_embeddings": conn.execute("select count(*) from local_embeddings").fetchone()[0],
     }
 
 
+def main() -> int:
+    import argparse
+
+    ap = argparse.ArgumentParser(description="ローカル SQLite ミラーの件数・埋め込み・検索")
+    ap.add_argument("--db", default=None, help="SQLite パス（既定 KNOWLEDGE_LOCAL_DB / state/）")
+    ap.add_argument("--embed-missing", action="store_true", help="埋め込みの無い行を埋める")
+    ap.add_argument("--stub", action="store_true", help="Gemini の代わりに stub_embed を使う（確認用）")
+    ap.add_argument("--batch-size", type=int, default=50)
+    ap.add_argument("--limit", type=int, default=0, help="埋める件数の上限（0 は無制限）")
+    ap.add_argument("--search", default="", help="search_hybrid で検索して表示")
+    args = ap.parse_args()
+
+    conn = connect(args.db)
+    print("db:", resolve_db_path(args.db))
+    if args.stub:
+        model, doc_fn, query_fn = STUB_MODEL, stub_embed, stub_embed
+    else:
+        from gemini_embed import embed_documents, embed_queries, load_env
+
+        load_env()
+        model, doc_fn, query_fn = GEMINI_EMBED_MODEL, embed_documents, embed_queries
+    if args.embed_missing:
+        n = embed_missing(
+            conn, doc_fn, model=model, batch_size=max(1, min(args.batch_size, 100)),
+            limit=max(0, args.limit), log=print,
+        )
+        print(f"embedding done: model={model} saved={n}")
+    print("counts:", counts(conn))
+    if args.search:
+        for h in search_hybrid(conn, args.search, embed_fn=query_fn, model=model):
+            where = h.get("video_title") or h.get("comment_id")
+            print(f"{h['score']:.4f} {h['kind']:<11} {h['ranks']} {where} {h['snippet'][:60]!r}")
+    return 0
+
+
 if __name__ == "__main__":
-    c = connect()
-    print("db:", resolve_db_path())
-    print("counts:", counts(c))
+    raise SystemExit(main())
@@ -1,9 +1,18 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""Mirror Supabase/local knowledge (step3_1_lf etc.) into Raimo miniApp tables via admin API."""
+"""Mirror Supabase/local knowledge (step3_1_lf etc.) into Raimo miniApp tables via admin API.
+
+既定は差分ミラー: Raimo の既存チャンクを chunk_key で突き合わせ、消えた・変わったチャンクだけ
+delete-by-key で消して、足りないチャンクだけ入れる。delete-by-key が未デプロイ（404）のときと
+--full のときは従来どおり delete-by-source → 全件 insert。
+
+  python3 mirror_knowledge_to_raimo.py step3_1_lf
+  python3 mirror_knowledge_to_raimo.py step3_1_lf --full
+"""
 
 from __future__ import annotations
 
+import argparse
 import json
 import os
 import sqlite3
@@ -134,18 +143,74 @@ def replace_chunks(base: str, source_key: str, chunks: list[dict]) -> tuple[int,
     return ok, fail
 
 
+def _raimo_chunk_sig(ch: dict) -> tuple:
+    """Raimo 側で変わったかの比較用（数値が文字列で返ることがあるので文字列で比べる）。"""
+    return tuple(
+        str(ch.get(k) if ch.get(k) is not None else "")
+        for k in ("start_sec", "end_sec", "speaker", "content", "search_text")
+    )
+
+
+def sync_chunks(base: str, source_key: str, chunks: list[dict]) -> tuple[int, int, int] | None:
+    """差分だけ反映して (insert, delete, 失敗) を返す。delete-by-key が無い Raimo では None。"""
+    remote = [
+        c for c in (get_json(base, "/knowledge-chunks").get("chunks") or []) if c.get("source_key") == source_key
+    ]
+    want = {ch["chunk_key"]: ch for ch in chunks}
+    have: dict[str, list[dict]] = {}
+    for c in remote:
+        have.setdefault(str(c.get("chunk_key") or ""), []).append(c)
+    # 消す: 今回に無い key・内容が変わった key・重複して入っている key
+    drop = [
+        k
+        for k, rows in have.items()
+        if k not in want or len(rows) > 1 or _raimo_chunk_sig(rows[0]) != _raimo_chunk_sig(want[k])
+    ]
+    put = [ch for k, ch in want.items() if k not in have or k in drop]
+    print(f"chunks diff: remote={len(remote)} local={len(chunks)} delete={len(drop)} insert={len(put)}")
+    fail = 0
+    for i, k in enumerate(drop):
+        st, body = post_json(base, "/admin/knowledge-chunks/delete-by-key", {"chunk_key": k})
+        if st == 404 and i == 0:
+            return None
+        if not 200 <= st < 300:
+            fail += 1
+            if fail <= 3:
+                print("chunk delete fail", st, body[:180], k)
+    ok = 0
+    for ch in put:
+        st, body = post_json(base, "/admin/knowledge-chunks", ch)
+        if 200 <= st < 300:
+            ok += 1
+        else:
+            fail += 1
+            if fail <= 3:
+                print("chunk fail", st, body[:180], ch["chunk_key"])
+    return ok, len(drop), fail
+
+
 def main() -> int:
     load_env()
+    ap = argparse.ArgumentParser(description="ローカル knowledge → Raimo knowledge_* ミラー")
+    ap.add_argument("video_id", nargs="?", default="step3_1_lf")
+    ap.add_argument("--full", action="store_true", help="差分を見ずに delete-by-source → 全件 insert")
+    args = ap.parse_args()
     base = (os.environ.get("RAIMO_APP_URL") or "").rstrip("/")
     if not base:
         raise SystemExit("RAIMO_APP_URL missing")
-    video_id = sys.argv[1] if len(sys.argv) > 1 else "step3_1_lf"
-    source, chunks = load_from_sqlite(video_id)
-    print(f"mirror {video_id}: chunks={len(chunks)} title={source['title'][:40]}")
+    source, chunks = load_from_sqlite(args.video_id)
+    print(f"mirror {args.video_id}: chunks={len(chunks)} title={source['title'][:40]}")
 
     upsert_source(base, source)
-    ok, fail = replace_chunks(base, source["source_key"], chunks)
-    print(f"chunks ok={ok} fail={fail}")
+    res = None if args.full else sync_chunks(base, source["source_key"], chunks)
+    if res is None:
+        if not args.full:
+            print("delete-by-key not available; fallback to full replace")
+        ok, fail = replace_chunks(base, source["source_key"], chunks)
+        print(f"chunks ok={ok} fail={fail}")
+    else:
+        ok, deleted, fail = res
+        print(f"chunks inserted={ok} deleted={deleted} fail={fail}")
     return 0 if fail == 0 else 1
 
 
@@ -9,9 +9,14 @@ Notta / 動画文字起こし → knowledge_sources / knowledge_chunks
   - 本文のみ Excel（旧サンプル）… 時刻なしチャンク
 
 出力:
-  - ローカル SQLite（knowledge_local.py）へ upsert
+  - ローカル SQLite（knowledge_local.py）へ反映
   - --csv で管理者互換＋動画メタCSVも出力可
-  - SUPABASE_URL + SUPABASE_SERVICE_ROLE_KEY があれば Supabase へも upsert
+  - SUPABASE_URL + SUPABASE_SERVICE_ROLE_KEY があれば Supabase へも反映
+
+再取込は差分だけ:
+  chunk_key は「video_id・開始秒・本文ハッシュ」なので、直した箇所のチャンクだけ key が変わる。
+  取込済みの key と突き合わせて、増えたチャンクを入れ、消えたチャンクを消す（残ったチャンクは
+  行も埋め込みもそのまま。新しいチャンクだけ embed_to_supabase / knowledge_local の埋め込み対象になる）。
 
 使い方:
   python3 notta_to_knowledge.py --input path/to/file.xlsx --title "講義名" --dry-run
@@ -35,10 +40,11 @@ if str(SCRIPT_DIR) not in sys.path:
     sys.path.insert(0, str(SCRIPT_DIR))
 
 from knowledge_local import (  # noqa: E402
+    chunk_diff,
     connect,
     counts,
     make_chunk_key,
-    upsert_chunks,
+    sync_source_chunks,
     upsert_source,
 )
 
@@ -293,19 +299,20 @@ def load_meta(path: Path | None, video_id: str | None) -> dict[str, Any]:
     return data if isinstance(data, dict) and "title" in data else {}
 
 
-def supabase_upsert(source: dict, chunks: list[dict]) -> tuple[int, int]:
+def supabase_sync(source: dict, chunks: list[dict]) -> dict[str, int] | None:
+    """Supabase の source のチャンクを chunks に揃える（差分だけ upsert / delete）。送らなかったら None。"""
     url = (os.environ.get("SUPABASE_URL") or "").strip().rstrip("/")
     key = (
         (os.environ.get("SUPABASE_SERVICE_ROLE_KEY") or "").strip()
         or (os.environ.get("SUPABASE_ANON_KEY") or "").strip()
     )
     if not url or not key:
-        return 0, 0
+        return None
     try:
         from supabase import create_client
     except ImportError:
         print("[WARN] supabase package missing; skip remote upsert", file=sys.stderr)
-        return 0, 0
+        return None
     try:
         client = create_client(url, key)
         client.table("knowledge_sources").upsert(source, on_conflict="source_key").execute()
@@ -319,9 +326,27 @@ def supabase_upsert(source: dict, chunks: list[dict]) -> tuple[int, int]:
         )
         sid = res.data[0]["id"] if res.data else None
         if sid is None:
-            return 1, 0
+            return None
+        existing: dict[str, tuple] = {}
+        page = 1000
+        while True:
+            rows = (
+                client.table("knowledge_chunks")
+                .select("chunk_key,end_sec,speaker")
+                .eq("source_id", sid)
+                .order("id")
+                .range(len(existing), len(existing) + page - 1)
+                .execute()
+                .data
+                or []
+            )
+            for r in rows:
+                existing[r["chunk_key"]] = (r.get("end_sec"), r.get("speaker"))
+            if len(rows) < page:
+                break
+        added, changed, removed = chunk_diff(existing, chunks)
         payload = []
-        for c in chunks:
+        for c in added + changed:
             payload.append(
                 {
                     "source_id": sid,
@@ -338,10 +363,37 @@ def supabase_upsert(source: dict, chunks: list[dict]) -> tuple[int, int]:
             client.table("knowledge_chunks").upsert(
                 payload[i : i + 200], on_conflict="chunk_key"
             ).execute()
-        return 1, len(payload)
+        for i in range(0, len(removed), 100):
+            client.table("knowledge_chunks").delete().eq("source_id", sid).in_(
+                "chunk_key", removed[i : i + 100]
+            ).execute()
+        return {
+            "added": len(added),
+            "updated": len(changed),
+            "removed": len(removed),
+            "kept": len(existing) - len(removed) - len(changed),
+        }
     except Exception as e:
         print(f"[WARN] Supabase upsert failed: {e}", file=sys.stderr)
-        return 0, 0
+        return None
+
+
+def prepare_chunks(raw_chunks: list[dict[str, Any]], video_id: str) -> list[dict[str, Any]]:
+    """chunk_cues の結果に video_id / content_hash / chunk_key を付ける。"""
+    chunks = []
+    for ch in raw_chunks:
+        text = ch["content"]
+        start = int(ch["start_sec"])
+        h = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+        chunks.append(
+            {
+                **ch,
+                "video_id": video_id,
+                "content_hash": h,
+                "chunk_key": make_chunk_key(video_id, start, text),
+            }
+        )
+    return chunks
 
 
 def parse_input(path: Path) -> tuple[list[Cue], list[str]]:
@@ -353,6 +405,10 @@ def parse_input(path: Path) -> tuple[list[Cue], list[str]]:
     raise RuntimeError(f"未対応形式: {suf}")
 
 
+def _fmt_diff(diff: dict[str, int]) -> str:
+    return " ".join(f"{k}={v}" for k, v in diff.items())
+
+
 def main() -> int:
     ap = argparse.ArgumentParser(description="Notta/SRT → knowledge chunks")
     ap.add_argument("--input", "-i", required=True, help="xlsx or srt")
@@ -387,20 +443,7 @@ def main() -> int:
             if c.end_sec is not None:
                 c.end_sec = max(0, c.end_sec + offset)
 
-    raw_chunks = chunk_cues(cues)
-    chunks = []
-    for ch in raw_chunks:
-        text = ch["content"]
-        start = int(ch["start_sec"])
-        h = hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
-        chunks.append(
-            {
-                **ch,
-                "video_id": video_id,
-                "content_hash": h,
-                "chunk_key": make_chunk_key(video_id, start, text),
-            }
-        )
+    chunks = prepare_chunks(chunk_cues(cues), video_id)
 
     source_key = f"notta:{video_id}"
     print(
@@ -466,8 +509,8 @@ def main() -> int:
             },
             content_channel="seminar_video",
         )
-        n = upsert_chunks(conn, sid, chunks)
-        print(f"local upsert: source_id={sid} chunks={n} counts={counts(conn)}")
+        diff = sync_source_chunks(conn, sid, chunks)
+        print(f"local sync: source_id={sid} {_fmt_diff(diff)} counts={counts(conn)}")
 
     if not args.skip_supabase:
         src_row = {
@@ -487,8 +530,8 @@ def main() -> int:
             },
             "ingest_status": "ready",
         }
-        s_n, c_n = supabase_upsert(src_row, chunks)
-        print(f"supabase upsert: sources={s_n} chunks={c_n}")
+        diff = supabase_sync(src_row, chunks)
+        print(f"supabase sync: {_fmt_diff(diff) if diff is not None else 'skipped'}")
 
     return 0
 
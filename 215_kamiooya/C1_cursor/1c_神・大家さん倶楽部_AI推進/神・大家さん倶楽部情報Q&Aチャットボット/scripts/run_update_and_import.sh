@@ -102,7 +102,7 @@ if [[ ! -f "$UPLOAD_SUPABASE_SCRIPT" ]]; then
 fi
 
 BUILD_DELTA_SCRIPT="$SCRIPT_DIR/build_delta_csv.py"
-STATE_DELTA="${CHATBOT_STATE_ROOT:-$OUTPUT_ROOT/state}/westudy_comment_ids.json"
+STATE_DELTA="${CHATBOT_STATE_ROOT:-$OUTPUT_ROOT/state}/westudy_comment_ids.sqlite3"
 
 echo "==> step1: WeStudy更新パイプライン（フォーラム）"
 "$PIPELINE_SCRIPT" --defer-state-update "$@"
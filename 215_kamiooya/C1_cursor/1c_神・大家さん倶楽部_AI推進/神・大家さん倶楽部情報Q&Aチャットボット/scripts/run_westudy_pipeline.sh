@@ -24,7 +24,7 @@ exec > >(tee -a "$LOG_FILE") 2>&1
 RAW_ROOT="$OUTPUT_ROOT/exports/raw"
 STATE_ROOT="${CHATBOT_STATE_ROOT:-$OUTPUT_ROOT/state}"
 STATE_SCRAPE="$STATE_ROOT/westudy_scrape"
-STATE_DELTA="$STATE_ROOT/westudy_comment_ids.json"
+STATE_DELTA="$STATE_ROOT/westudy_comment_ids.sqlite3"
 mkdir -p "$RAW_ROOT" "$STATE_SCRAPE" "$STATE_ROOT"
 
 SCRAPER="${WESTUDY_SCRAPER:-$HOME/git-repos/ProgramCode/alfred_python/westudy_forum_all.py}"
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""convert_to_admin_csv の SQLite 集約と build_delta_csv の known_ids state（pytest なしでも実行可）"""
+
+from __future__ import annotations
+
+import csv
+import json
+import sqlite3
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SCRIPT_DIR))
+
+import convert_to_admin_csv as conv  # noqa: E402
+
+PY = sys.executable
+RAW_HEADER = ["topic_title", "topic_url", "comment_id", "author", "time_iso", "body"]
+
+
+def _write_raw(path: Path, rows: list[list[str]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(RAW_HEADER)
+        w.writerows(rows)
+
+
+def _read(path: Path) -> list[dict]:
+    with path.open("r", encoding="utf-8-sig", newline="") as f:
+        return list(csv.DictReader(f))
+
+
+def test_store_merges_duplicates_across_flushes():
+    with tempfile.TemporaryDirectory() as td:
+        raw = Path(td) / "raw"
+        _write_raw(
+            raw / "a.csv",
+            [
+                ["板", "u", "comment-10", "A", "", "長い本文です"],
+                ["板", "u", "2", "A", "2026-01-01T00:00:00Z", "短い"],
+                ["板", "u", "trigger-1", "A", "", "DOMゴミ"],
+            ],
+        )
+        _write_raw(
+            raw / "b.csv",
+            [
+                # 日時ありが優先（本文が短くても）
+                ["板", "u", "10", "B", "2026-02-01T00:00:00Z", "短"],
+                # 同等なら後勝ち
+                ["板", "u", "2", "C", "2026-01-01T00:00:00Z", "同じ"],
+                ["板", "u", "9", "A", "", "九"],
+            ],
+        )
+        old_flush = conv.FLUSH_ROWS
+        conv.FLUSH_ROWS = 1  # 1行ごとに追記して、畳み込みを DB 側で行わせる
+        try:
+            store = conv.AdminRowStore(Path(td) / "work.sqlite3")
+            rows_in = conv.collect_admin_rows(str(raw), store, False)
+            rows = list(store.iter_rows())
+            store.close()
+        finally:
+            conv.FLUSH_ROWS = old_flush
+        assert rows_in == 6
+        assert [r["コメントID"] for r in rows] == ["2", "9", "10"]
+        by_id = {r["コメントID"]: r for r in rows}
+        assert by_id["10"]["投稿者名"] == "B"
+        assert by_id["2"]["投稿者名"] == "C"
+
+
+def _run_delta(*args: str) -> subprocess.CompletedProcess:
+    proc = subprocess.run(
+        [PY, str(SCRIPT_DIR / "build_delta_csv.py"), *args],
+        cwd=str(SCRIPT_DIR),
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    assert proc.returncode == 0, proc.stderr or proc.stdout
+    return proc
+
+
+def _known(db: Path) -> set[str]:
+    conn = sqlite3.connect(str(db))
+    try:
+        return {r[0] for r in conn.execute("select comment_id from known_ids")}
+    finally:
+        conn.close()
+
+
+def test_delta_state_table_and_legacy_json():
+    with tempfile.TemporaryDirectory() as td:
+        td_path = Path(td)
+        full = td_path / "full.csv"
+        with full.open("w", encoding="utf-8", newline="") as f:
+            w = csv.DictWriter(f, fieldnames=conv.ADMIN_FIELDNAMES, lineterminator="\n")
+            w.writeheader()
+            for cid in ("1", "2", "3"):
+                w.writerow({"コメントID": cid, "コメント内容": f"本文{cid}"})
+        legacy = td_path / "ids.json"
+        legacy.write_text(json.dumps({"version": 1, "comment_ids": ["1", "99"]}), encoding="utf-8")
+        db = td_path / "ids.sqlite3"
+        delta = td_path / "delta.csv"
+
+        # 旧 .json を渡しても隣の .sqlite3 に取り込んで使う
+        _run_delta("--full", str(full), "--state", str(legacy), "--delta", str(delta))
+        assert [r["コメントID"] for r in _read(delta)] == ["2", "3"]
+        assert _known(db) == {"1", "99"}
+
+        _run_delta("--full", str(full), "--state", str(db), "--delta", str(delta), "--update-state")
+        assert _known(db) == {"1", "2", "3", "99"}
+        proc = _run_delta("--full", str(full), "--state", str(db), "--delta", str(delta), "--update-state")
+        assert _read(delta) == []
+        assert "state 変更なし" in proc.stdout
+
+        _run_delta(
+            "--full", str(full), "--state", str(db), "--delta", str(delta),
+            "--init-state-only", "--replace-state",
+        )
+        assert _known(db) == {"1", "2", "3"}
+
+
+def main() -> int:
+    tests = [
+        test_store_merges_duplicates_across_flushes,
+        test_delta_state_table_and_legacy_json,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"OK  {fn.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"NG  {fn.__name__}: {e}", file=sys.stderr)
+    print(f"done failed={failed}/{len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,308 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""knowledge_local の FTS・ベクトル・ハイブリッド検索の単体テスト（pytest なしでも実行可）"""
+
+from __future__ import annotations
+
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(SCRIPT_DIR))
+
+from knowledge_local import (  # noqa: E402
+    STUB_MODEL,
+    connect,
+    embed_missing,
+    has_fts,
+    ja_grams,
+    load_vector_index,
+    pending_embeddings,
+    search_all,
+    search_hybrid,
+    stub_embed,
+    tokenize,
+    upsert_chunks,
+    upsert_comments,
+    upsert_source,
+)
+
+
+def _comment(cid: str, content: str) -> dict:
+    return {"comment_id": cid, "content": content, "posted_at": "2026-01-01 00:00:00"}
+
+
+def _db(td: str):
+    return connect(Path(td) / "t.sqlite3")
+
+
+def test_tokenize_japanese():
+    assert tokenize("金利について教えてください") == ["金利"]
+    assert tokenize("ＳＢＩ証券の手数料") == ["sbi", "証券", "手数料"]
+    assert tokenize("ローンの審査は？") == ["ローン", "審査"]
+    assert ja_grams("不動産投資") == "不動 動産 産投 投資"
+
+
+def test_fts_two_char_and_substring():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        assert has_fts(conn)
+        upsert_comments(
+            conn,
+            [
+                _comment("c1", "不動産投資の金利が上がると融資審査が厳しくなる"),
+                _comment("c2", "金利の話だけ"),
+                _comment("c3", "関係ない投稿"),
+            ],
+        )
+        ids = {h["comment_id"] for h in search_all(conn, "金利 融資")}
+        assert ids == {"c1"}
+        ids = {h["comment_id"] for h in search_all(conn, "動産")}
+        assert ids == {"c1"}
+        ids = {h["comment_id"] for h in search_all(conn, "金利について教えてください")}
+        assert ids == {"c1", "c2"}
+
+
+def test_fts_single_kanji():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(
+            conn,
+            [
+                _comment("c1", "所得税の申告"),
+                _comment("c2", "固定資産税の計算"),
+                _comment("c3", "税理士に相談"),
+                _comment("c4", "関係ない投稿"),
+            ],
+        )
+        ids = {h["comment_id"] for h in search_all(conn, "税")}
+        assert ids == {"c1", "c2", "c3"}
+
+
+def test_bm25_and_snippet():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(
+            conn,
+            [
+                _comment("few", "前置き" * 40 + "金利の話"),
+                _comment("many", "金利 金利 金利 金利の比較"),
+            ],
+        )
+        hits = search_all(conn, "金利")
+        assert [h["comment_id"] for h in hits] == ["many", "few"]
+        few = hits[1]
+        assert "金利" in few["snippet"]
+        s, e = few["highlights"][0]
+        assert few["snippet"][s:e] == "金利"
+
+
+def test_triggers_follow_update_and_delete():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(conn, [_comment("c1", "サブリース契約の注意点")])
+        assert search_all(conn, "サブリース")
+        upsert_comments(conn, [_comment("c1", "管理会社の選び方")])
+        assert not search_all(conn, "サブリース")
+        assert search_all(conn, "管理会社")
+        conn.execute("delete from comments where comment_id = 'c1'")
+        conn.commit()
+        assert not search_all(conn, "管理会社")
+
+        sid = upsert_source(conn, source_key="notta:v1", title="講義", video_id="v1")
+        upsert_chunks(conn, sid, [{"content": "固定資産税の計算", "start_sec": 65, "video_id": "v1"}])
+        hits = search_all(conn, "固定資産税")
+        assert hits and hits[0]["kind"] == "video_chunk" and hits[0]["start_label"] == "01:05"
+        conn.execute("delete from knowledge_sources where id = ?", (sid,))
+        conn.commit()
+        assert not search_all(conn, "固定資産税")
+
+
+def test_migrates_legacy_db():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "old.sqlite3"
+        raw = sqlite3.connect(str(path))
+        raw.executescript(
+            """
+            create table comments (
+              id integer primary key autoincrement, source_type text, comment_id text not null unique,
+              posted_at text, author_name text, author_email text, content text not null,
+              parent_comment_id text, ip_address text, user_agent text,
+              created_at text not null, updated_at text not null
+            );
+            create index comments_content_idx on comments(content);
+            insert into comments (comment_id, content, created_at, updated_at)
+            values ('old1', '築古アパートの修繕費', 'x', 'x');
+            """
+        )
+        raw.commit()
+        raw.close()
+        conn = connect(path)
+        assert [h["comment_id"] for h in search_all(conn, "修繕費")] == ["old1"]
+        names = {r[0] for r in conn.execute("select name from sqlite_master where type = 'index'")}
+        assert "comments_content_idx" not in names
+
+
+def _counting_stub():
+    calls = []
+
+    def fn(texts):
+        calls.append(list(texts))
+        return stub_embed(texts)
+
+    return fn, calls
+
+
+def test_embed_missing_and_invalidation():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(
+            conn,
+            [_comment("c1", "サブリースの解約"), _comment("c2", "サブリースの解約"), _comment("c3", "空室対策")],
+        )
+        fn, calls = _counting_stub()
+        assert embed_missing(conn, fn, model=STUB_MODEL) == 3
+        # 同じ本文（c1 / c2）は1回だけ埋め込む
+        assert sum(len(c) for c in calls) == 2
+        assert embed_missing(conn, fn, model=STUB_MODEL) == 0
+        assert len(load_vector_index(conn, model=STUB_MODEL)) == 3
+
+        upsert_comments(conn, [_comment("c3", "空室対策の広告費")])
+        assert len(load_vector_index(conn, model=STUB_MODEL)) == 2
+        assert embed_missing(conn, fn, model=STUB_MODEL) == 1
+        conn.execute("delete from comments where comment_id = 'c1'")
+        conn.commit()
+        assert len(load_vector_index(conn, model=STUB_MODEL)) == 2
+
+
+def test_models_keep_separate_vectors():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(conn, [_comment("c1", "サブリースの解約"), _comment("c2", "空室対策")])
+        assert embed_missing(conn, stub_embed, model="real") == 2
+        # 別 model で埋めても real の埋め込みは残る
+        assert embed_missing(conn, stub_embed, model=STUB_MODEL) == 2
+        assert pending_embeddings(conn, "comment", model="real") == []
+        assert len(load_vector_index(conn, model="real")) == 2
+        assert len(load_vector_index(conn, model=STUB_MODEL)) == 2
+        # 本文が変われば全 model の埋め込みが消える
+        upsert_comments(conn, [_comment("c2", "空室対策の広告費")])
+        assert len(load_vector_index(conn, model="real")) == 1
+        assert len(load_vector_index(conn, model=STUB_MODEL)) == 1
+
+
+def test_vector_cache_follows_reembed():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(conn, [_comment("c1", "融資審査"), _comment("c2", "サブリース")])
+        embed_missing(conn, stub_embed, model=STUB_MODEL)
+        i1 = load_vector_index(conn, model=STUB_MODEL)
+        assert load_vector_index(conn, model=STUB_MODEL) is i1
+        # 最後に埋めた行を書き換えて埋め直す（件数・rowid は同じになりうる）
+        upsert_comments(conn, [_comment("c2", "固定資産税の減免")])
+        embed_missing(conn, stub_embed, model=STUB_MODEL)
+        i2 = load_vector_index(conn, model=STUB_MODEL)
+        assert i2 is not i1
+        expected = stub_embed(["固定資産税の減免"])[0]
+        top = i2.search(expected, k=1)[0]
+        assert top[0] == "comment" and top[2] > 0.99
+
+
+def test_migrates_legacy_embeddings_key():
+    with tempfile.TemporaryDirectory() as td:
+        path = Path(td) / "old.sqlite3"
+        conn = connect(path)
+        upsert_comments(conn, [_comment("c1", "サブリースの解約")])
+        embed_missing(conn, stub_embed, model="real")
+        conn.executescript(
+            """
+            drop trigger comments_vec_ad;
+            drop trigger comments_vec_au;
+            alter table local_embeddings rename to e_new;
+            create table local_embeddings (
+              kind text not null, ref_id integer not null, model text not null, dim integer not null,
+              content_hash text not null, vec blob not null, updated_at text not null,
+              primary key (kind, ref_id)
+            );
+            insert into local_embeddings select * from e_new;
+            drop table e_new;
+            delete from local_meta where key = 'vec_version';
+            """
+        )
+        conn.close()
+        conn = connect(path)
+        pk = [r[1] for r in sorted(conn.execute("pragma table_info(local_embeddings)"), key=lambda r: r[5]) if r[5]]
+        assert pk == ["kind", "ref_id", "model"]
+        assert len(load_vector_index(conn, model="real")) == 1
+        assert embed_missing(conn, stub_embed, model=STUB_MODEL) == 1
+        assert len(load_vector_index(conn, model="real")) == 1
+
+
+def test_search_hybrid_rrf():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(
+            conn,
+            [
+                _comment("both", "固定資産税の減免申請"),
+                _comment("vec", "固定資産税の計算方法"),
+                _comment("none", "空室対策の広告費"),
+            ],
+        )
+        embed_missing(conn, stub_embed, model=STUB_MODEL)
+        hits = search_hybrid(conn, "固定資産税 減免", embed_fn=stub_embed, model=STUB_MODEL)
+        assert [h["comment_id"] for h in hits][:2] == ["both", "vec"]
+        assert set(hits[0]["ranks"]) == {"comment", "vector"}
+        assert set(hits[1]["ranks"]) == {"vector"}
+        assert hits[0]["highlights"]
+        assert hits[0]["score"] > hits[1]["score"]
+
+
+def test_search_hybrid_falls_back_to_keywords():
+    with tempfile.TemporaryDirectory() as td:
+        conn = _db(td)
+        upsert_comments(conn, [_comment("c1", "融資審査の通し方"), _comment("c2", "融資の話")])
+        embed_missing(conn, stub_embed, model=STUB_MODEL)
+
+        def down(texts):
+            raise RuntimeError("quota")
+
+        hits = search_hybrid(conn, "融資審査", embed_fn=down, model=STUB_MODEL)
+        assert [h["comment_id"] for h in hits] == ["c1"]
+        assert hits[0]["ranks"] == {"comment": 1}
+        # 別 model の埋め込みが無ければ embed_fn は呼ばれない
+        hits = search_hybrid(conn, "融資審査", embed_fn=down, model="other")
+        assert [h["comment_id"] for h in hits] == ["c1"]
+
+
+def main() -> int:
+    tests = [
+        test_tokenize_japanese,
+        test_fts_two_char_and_substring,
+        test_fts_single_kanji,
+        test_bm25_and_snippet,
+        test_triggers_follow_update_and_delete,
+        test_migrates_legacy_db,
+        test_embed_missing_and_invalidation,
+        test_models_keep_separate_vectors,
+        test_vector_cache_follows_reembed,
+        test_migrates_legacy_embeddings_key,
+        test_search_hybrid_rrf,
+        test_search_hybrid_falls_back_to_keywords,
+    ]
+    failed = 0
+    for fn in tests:
+        try:
+            fn()
+            print(f"OK  {fn.__name__}")
+        except Exception as e:
+            failed += 1
+            print(f"NG  {fn.__name__}: {e}", file=sys.stderr)
+    print(f"done failed={failed}/{len(tests)}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -13,7 +13,7 @@ ROOT = SCRIPT_DIR.parent
 sys.path.insert(0, str(SCRIPT_DIR))
 
 from knowledge_local import connect, counts, make_chunk_key, search_all  # noqa: E402
-from notta_to_knowledge import chunk_cues, parse_srt, parse_xlsx  # noqa: E402
+from notta_to_knowledge import Cue, chunk_cues, parse_srt, parse_xlsx, prepare_chunks  # noqa: E402
 
 
 FIX = ROOT / "fixtures" / "notta"
@@ -86,6 +86,32 @@ def test_local_upsert_and_search():
         assert any(h.get("start_label") for h in hits if h.get("kind") == "video_chunk")
 
 
+def test_reimport_touches_only_edited_chunks():
+    from knowledge_local import STUB_MODEL, embed_missing, stub_embed, sync_source_chunks, upsert_source
+
+    # 2時間・5秒おきの発話
+    cues = [Cue(i * 5, i * 5 + 5, "講師", f"{i}番目の話題では融資と金利の関係を説明します") for i in range(1440)]
+    with tempfile.TemporaryDirectory() as td:
+        conn = connect(Path(td) / "t.sqlite3")
+        sid = upsert_source(conn, source_key="notta:long", title="長い講義", video_id="long")
+        first = prepare_chunks(chunk_cues(cues), "long")
+        assert sync_source_chunks(conn, sid, first)["added"] == len(first) > 100
+        embed_missing(conn, stub_embed, model=STUB_MODEL)
+
+        again = sync_source_chunks(conn, sid, first)
+        assert again == {"added": 0, "updated": 0, "removed": 0, "kept": len(first)}
+
+        cues[700] = Cue(3500, 3505, "講師", "700番目の話題は言い直して固定資産税の話にします")
+        edited = prepare_chunks(chunk_cues(cues), "long")
+        diff = sync_source_chunks(conn, sid, edited)
+        assert 1 <= diff["added"] <= 3 and 1 <= diff["removed"] <= 3
+        assert diff["kept"] >= len(first) - 3
+        assert counts(conn)["knowledge_chunks"] == len(edited)
+        # 残ったチャンクの埋め込みはそのまま、新しいチャンクの分だけ埋め直す
+        assert counts(conn)["local_embeddings"] == len(edited) - diff["added"]
+        assert embed_missing(conn, stub_embed, model=STUB_MODEL) == diff["added"]
+
+
 def main() -> int:
     tests = [
         test_parse_srt,
@@ -94,6 +120,7 @@ def main() -> int:
         test_chunk_and_idempotent_keys,
         test_srt_xlsx_time_align,
         test_local_upsert_and_search,
+        test_reimport_touches_only_edited_chunks,
     ]
     failed = 0
     for fn in tests:
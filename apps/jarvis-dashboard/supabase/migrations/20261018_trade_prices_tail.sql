@@ -0,0 +1,43 @@
+-- Trade Desk: 複数銘柄の直近 N 本を1往復で返す（jarvis_trade_signal の日次実行用）。
+-- 行を返すと PostgREST の max rows（既定1000）で切れるので、{symbol: [足…]} の jsonb 1個で返す。
+-- jarvis-dashboard のみ。
+
+create or replace function public.trade_prices_tail(
+  p_symbols text[],
+  p_limit integer default 120
+)
+returns jsonb
+language sql
+stable
+security invoker
+set search_path = public
+as $$
+  select coalesce(jsonb_object_agg(s.symbol, b.bars), '{}'::jsonb)
+  from (select distinct unnest(p_symbols) as symbol) s
+  cross join lateral (
+    select coalesce(
+      jsonb_agg(
+        jsonb_build_object(
+          'trade_date', x.trade_date,
+          'open', x.open,
+          'high', x.high,
+          'low', x.low,
+          'close', x.close,
+          'volume', x.volume
+        )
+        order by x.trade_date
+      ),
+      '[]'::jsonb
+    ) as bars
+    from (
+      select p.trade_date, p.open, p.high, p.low, p.close, p.volume
+      from public.trade_prices p
+      where p.symbol = s.symbol
+      order by p.trade_date desc
+      limit greatest(coalesce(p_limit, 120), 1)
+    ) x
+  ) b;
+$$;
+
+comment on function public.trade_prices_tail(text[], integer) is
+  'Trade Desk: 銘柄ごとの直近 p_limit 本（日付昇順）を {symbol: [...]} で返す';
@@ -0,0 +1,103 @@
+-- embed_to_supabase.py のバルク書き込み用
+--   embedding_hash: 埋め込んだときの md5(content)。本文が変わったら再埋め込みの対象になる。
+--   embedding_pending: 未埋め込み／本文が変わった行（id 順のカーソル）
+--   embedding_copy_by_hash: 同じ本文の埋め込みが既にある行は API を呼ばずに写す
+--   embedding_set: 1バッチ分をまとめて書く（行ごとの UPDATE をやめる）
+
+alter table public.comments add column if not exists embedding_hash text;
+alter table public.knowledge_chunks add column if not exists embedding_hash text;
+
+-- 既存の埋め込み（Phase 11 で全件済み）は今の本文から作ったものとみなす
+update public.comments set embedding_hash = md5(content)
+  where embedding is not null and embedding_hash is null;
+update public.knowledge_chunks set embedding_hash = md5(content)
+  where embedding is not null and embedding_hash is null;
+
+create index if not exists comments_embedding_hash_idx on public.comments (embedding_hash);
+create index if not exists knowledge_chunks_embedding_hash_idx on public.knowledge_chunks (embedding_hash);
+
+create or replace function public.embedding_pending(
+  p_table text,
+  p_after_id bigint default 0,
+  p_limit int default 100
+)
+returns table (id bigint, content text, content_md5 text)
+language plpgsql
+stable
+set search_path = public, extensions
+as $$
+begin
+  if p_table not in ('comments', 'knowledge_chunks') then
+    raise exception 'embedding_pending: unknown table %', p_table;
+  end if;
+  return query execute format(
+    'select t.id, t.content, md5(t.content) from public.%I t
+     where t.id > $1 and (t.embedding is null or t.embedding_hash is distinct from md5(t.content))
+     order by t.id limit $2',
+    p_table
+  ) using p_after_id, p_limit;
+end;
+$$;
+
+create or replace function public.embedding_copy_by_hash(
+  p_table text,
+  p_ids bigint[]
+)
+returns setof bigint
+language plpgsql
+set search_path = public, extensions
+as $$
+begin
+  if p_table not in ('comments', 'knowledge_chunks') then
+    raise exception 'embedding_copy_by_hash: unknown table %', p_table;
+  end if;
+  return query execute format(
+    'update public.%1$I t
+     set embedding = src.embedding, embedding_hash = src.embedding_hash
+     from (
+       select distinct on (s.embedding_hash) s.embedding_hash, s.embedding
+       from public.%1$I s
+       where s.embedding is not null
+         and s.embedding_hash in (select md5(x.content) from public.%1$I x where x.id = any($1))
+     ) src
+     where t.id = any($1) and md5(t.content) = src.embedding_hash
+     returning t.id',
+    p_table
+  ) using p_ids;
+end;
+$$;
+
+-- p_rows: [{"id": 1, "hash": "<md5(content)>", "embedding": [...]}]
+-- 取得後に本文が書き換わった行（hash 不一致）は書かない（次回の pending に残る）
+create or replace function public.embedding_set(
+  p_table text,
+  p_rows jsonb
+)
+returns int
+language plpgsql
+set search_path = public, extensions
+as $$
+declare
+  n int;
+begin
+  if p_table not in ('comments', 'knowledge_chunks') then
+    raise exception 'embedding_set: unknown table %', p_table;
+  end if;
+  execute format(
+    'update public.%I t
+     set embedding = (r->>''embedding'')::extensions.vector, embedding_hash = r->>''hash''
+     from jsonb_array_elements($1) r
+     where t.id = (r->>''id'')::bigint and md5(t.content) = r->>''hash''',
+    p_table
+  ) using p_rows;
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+revoke all on function public.embedding_pending(text, bigint, int) from public, anon, authenticated;
+revoke all on function public.embedding_copy_by_hash(text, bigint[]) from public, anon, authenticated;
+revoke all on function public.embedding_set(text, jsonb) from public, anon, authenticated;
+grant execute on function public.embedding_pending(text, bigint, int) to service_role;
+grant execute on function public.embedding_copy_by_hash(text, bigint[]) to service_role;
+grant execute on function public.embedding_set(text, jsonb) to service_role;
@@ -31,6 +31,7 @@ import re
 import time
 import subprocess
 import sys
+import threading
 from contextlib import contextmanager
 from hashlib import md5
 from pathlib import Path
@@ -246,6 +247,7 @@ def _open_qr_image_if_possible(img_path: str) -> None:
 _process_client_cache: dict[str, Any] = {}
 _qr_logins_this_process = 0
 _last_chrline_call_at: float = 0.0
+_throttle_lock = threading.Lock()
 _midrun_recoveries_this_process = 0
 
 
@@ -298,16 +300,23 @@ def chrline_call_interval_ms() -> int:
 
 
 def chrline_throttle() -> None:
-    """前回 Square/Talk API 呼び出しから最小間隔だけ待つ（バッチ401・セッション切断対策）。"""
+    """前回 Square/Talk API 呼び出しから最小間隔だけ待つ（バッチ401・セッション切断対策）。
+
+    スレッドから同時に呼ばれても呼び出し枠を1つずつ予約するので、間隔はプロセス全体で守られる。
+    """
     global _last_chrline_call_at
     interval_ms = chrline_call_interval_ms()
     if interval_ms <= 0:
         return
-    now = time.monotonic()
-    elapsed_ms = (now - _last_chrline_call_at) * 1000.0
-    if _last_chrline_call_at > 0 and elapsed_ms < interval_ms:
-        time.sleep((interval_ms - elapsed_ms) / 1000.0)
-    _last_chrline_call_at = time.monotonic()
+    with _throttle_lock:
+        now = time.monotonic()
+        slot = now
+        if _last_chrline_call_at > 0:
+            slot = max(now, _last_chrline_call_at + interval_ms / 1000.0)
+        _last_chrline_call_at = slot
+    wait = slot - time.monotonic()
+    if wait > 0:
+        time.sleep(wait)
 
 
 def _max_midrun_recoveries_per_process() -> int:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+LINE 取り込みの重複排除キー（LINE_UNOFFICIAL_AUTH_DIR/.chrline_dedup.sqlite3、取り込みスクリプト共通）。
+
+- 以前はスクリプトごとの JSON（{"keys": [...]}）を毎回全部読み、sorted(keys)[-N:] で切って全部書き直していた。
+  辞書順で切るので、最近のキーが消えて古いキーが残り、消えた分を再取り込みすることがあった。
+- ここでは (ns, key) を主キーにして seen_at を持たせ、保存期間（KEEP_DAYS）と件数上限
+  （MAX_KEYS_PER_NS、新しい順）で間引く。書くのは新しく足したキーだけ。
+- message_id も持つので、リアルタイム監視とバッチ取り込みが互いに書いた分を messageId で判定できる。
+
+  store = DedupStore(dedup_db_path(save_root), "open_chat", legacy_json=save_root / DEDUP_FILENAME)
+  if key in store: ...
+  store.add(key, message_id=msg_id)   # save() まではメモリ上だけ（dry-run では save しない）
+  store.save()
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+DB_FILENAME = ".chrline_dedup.sqlite3"
+KEEP_DAYS = 180
+MAX_KEYS_PER_NS = 50000
+PRUNE_EVERY_SECONDS = 3600.0
+
+SCHEMA = """
+create table if not exists seen (
+  ns text not null,
+  key text not null,
+  message_id text,
+  seen_at real not null,
+  primary key (ns, key)
+);
+create index if not exists seen_ns_seen_at on seen (ns, seen_at);
+create index if not exists seen_message_id on seen (message_id);
+"""
+
+
+def dedup_db_path(save_root: Path) -> Path:
+    return save_root / DB_FILENAME
+
+
+def message_id_from_key(key: str) -> str:
+    """バッチ側キー（stream|id:MSG|ts:... / id:MSG|ts:...）の messageId。無ければ空。"""
+    for part in str(key).split("|"):
+        if part.startswith("id:") and len(part) > 3:
+            return part[3:].strip()
+    return ""
+
+
+def _load_legacy_keys(path: Path) -> list[str]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return []
+    keys = data.get("keys") if isinstance(data, dict) else None
+    if not isinstance(keys, list):
+        return []
+    return [str(x) for x in keys if x]
+
+
+class DedupStore:
+    """ns ごとのキー集合（in / add / discard）。add は溜めておき save() でまとめて書く。
+
+    message_ids_from: seen_message_id() で見る ns（既定は自分の ns だけ）。
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ns: str,
+        *,
+        legacy_json: Path | None = None,
+        message_ids_from: tuple[str, ...] | None = None,
+    ):
+        self.path = Path(path)
+        self.ns = ns
+        self.message_ids_from = tuple(message_ids_from or (ns,))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # リアルタイム監視はイベントスレッドと heartbeat から触るので接続は共有＋ロック
+        self._lock = threading.Lock()
+        self.con = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self.con.execute("pragma journal_mode=wal")
+        self.con.execute("pragma synchronous=normal")
+        self.con.executescript(SCHEMA)
+        self._added: dict[str, str] = {}  # key -> message_id（未保存）
+        self._added_message_ids: set[str] = set()
+        self._last_prune = 0.0
+        if legacy_json is not None:
+            self._import_legacy(Path(legacy_json))
+
+    def _import_legacy(self, path: Path) -> None:
+        """旧 JSON からの移行（この ns がまだ空のときだけ）。元ファイルは消さない。"""
+        if not path.is_file():
+            return
+        if self.con.execute("select 1 from seen where ns = ? limit 1", (self.ns,)).fetchone():
+            return
+        keys = _load_legacy_keys(path)
+        if not keys:
+            return
+        try:
+            seen_at = path.stat().st_mtime
+        except OSError:
+            seen_at = time.time()
+        with self.con:
+            self.con.executemany(
+                "insert or ignore into seen (ns, key, message_id, seen_at) values (?,?,?,?)",
+                [(self.ns, k, message_id_from_key(k) or None, seen_at) for k in keys],
+            )
+
+    def __contains__(self, key: str) -> bool:
+        if key in self._added:
+            return True
+        with self._lock:
+            row = self.con.execute("select 1 from seen where ns = ? and key = ?", (self.ns, key)).fetchone()
+        return row is not None
+
+    def seen_message_id(self, message_id: str) -> bool:
+        """message_ids_from のどれかで既に取り込んだ messageId か。"""
+        message_id = (message_id or "").strip()
+        if not message_id:
+            return False
+        if message_id in self._added_message_ids:
+            return True
+        marks = ",".join("?" * len(self.message_ids_from))
+        with self._lock:
+            row = self.con.execute(
+                f"select 1 from seen where message_id = ? and ns in ({marks}) limit 1",
+                (message_id, *self.message_ids_from),
+            ).fetchone()
+        return row is not None
+
+    def add(self, key: str, *, message_id: str | None = None) -> None:
+        mid = (message_id if message_id is not None else message_id_from_key(key)).strip()
+        with self._lock:
+            self._added[key] = mid
+            if mid:
+                self._added_message_ids.add(mid)
+
+    def discard(self, key: str) -> None:
+        """未保存の add を取り消す（書き込み失敗時）。保存済みのキーは消さない。"""
+        with self._lock:
+            mid = self._added.pop(key, "")
+            if mid and mid not in self._added.values():
+                self._added_message_ids.discard(mid)
+
+    def pending(self) -> int:
+        return len(self._added)
+
+    def save(self) -> None:
+        """溜めた add を書く。たまに古いキーを間引く。"""
+        now = time.time()
+        with self._lock, self.con:
+            added, self._added = self._added, {}
+            self._added_message_ids = set()
+            if added:
+                self.con.executemany(
+                    "insert or replace into seen (ns, key, message_id, seen_at) values (?,?,?,?)",
+                    [(self.ns, k, mid or None, now) for k, mid in added.items()],
+                )
+            if now - self._last_prune >= PRUNE_EVERY_SECONDS:
+                self._prune(now)
+                self._last_prune = now
+
+    def _prune(self, now: float) -> None:
+        self.con.execute(
+            "delete from seen where ns = ? and seen_at < ?",
+            (self.ns, now - KEEP_DAYS * 86400),
+        )
+        self.con.execute(
+            "delete from seen where ns = ? and key not in"
+            " (select key from seen where ns = ? order by seen_at desc limit ?)",
+            (self.ns, self.ns, MAX_KEYS_PER_NS),
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self.con.close()
@@ -5,12 +5,14 @@ from __future__ import annotations
 import re
 from dataclasses import dataclass
 
-from chrline_md_utils import format_line_heading, wrap_details
+from chrline_md_utils import TIMELINE_MARKER, format_line_heading, wrap_details
+from yoritoori_blocks import iter_blocks  # chrline_md_utils が 1b_Cursorマニュアル を sys.path に足す
 
 PLACEHOLDER_PREFIX = "[本文なし"
 RE_HEADING = re.compile(
     r"^### (?P<date>[12]\d{3}/\d{2}/\d{2})｜(?P<org>[^｜]+)｜(?P<tag>[^｜]+)｜(?P<summary>.*)$"
 )
+RE_BLOCK_START = re.compile(r"^### [12]\d{3}/\d{2}/\d{2}｜")
 RE_DK_COMMENT = re.compile(r"<!--\s*chrline-dk:([^>]+)\s*-->")
 
 
@@ -54,25 +56,9 @@ def parse_heading(heading_line: str) -> tuple[str, str, str, str] | None:
 
 def iter_yoritoori_blocks(content: str) -> list[YoritooriBlock]:
     """`### YYYY/MM/DD` 始まりのブロックを時系列マーカー以降から列挙。"""
-    marker = "## やり取り（時系列）"
-    start_idx = content.find(marker)
-    if start_idx < 0:
-        search_in = content
-        base = 0
-    else:
-        search_in = content[start_idx:]
-        base = start_idx
-
-    pattern = re.compile(r"(?m)^### [12]\d{3}/\d{2}/\d{2}｜")
-    matches = list(pattern.finditer(search_in))
-    if not matches:
-        return []
-
     blocks: list[YoritooriBlock] = []
-    for i, m in enumerate(matches):
-        block_start = base + m.start()
-        block_end = base + matches[i + 1].start() if i + 1 < len(matches) else len(content)
-        raw = content[block_start:block_end].rstrip()
+    for b in iter_blocks(content, is_heading=RE_BLOCK_START.match, after_marker=TIMELINE_MARKER):
+        raw = b.text.rstrip()
         lines = raw.split("\n")
         heading = lines[0] if lines else ""
         parsed = parse_heading(heading)
@@ -91,8 +77,8 @@ def iter_yoritoori_blocks(content: str) -> list[YoritooriBlock]:
         ph = is_placeholder_text(summary) or is_placeholder_text(body)
         blocks.append(
             YoritooriBlock(
-                start=block_start,
-                end=block_end,
+                start=b.offset,
+                end=b.offset + b.length,
                 heading=heading,
                 body=body,
                 raw=raw,
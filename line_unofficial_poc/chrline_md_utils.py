@@ -2,6 +2,14 @@
 from __future__ import annotations
 
 import re
+import sys
+from pathlib import Path
+
+# やり取り.md への書き込み（ロック・一時ファイル置き換え）は 1b_Cursorマニュアル/yoritoori_md_writer.py を共用
+_YORITOORI_MANUAL = Path(__file__).resolve().parents[1] / "215_kamiooya" / "C1_cursor" / "1b_Cursorマニュアル"
+if str(_YORITOORI_MANUAL) not in sys.path:
+    sys.path.append(str(_YORITOORI_MANUAL))
+from yoritoori_md_writer import MarkdownAppender, write_blocks  # noqa: E402,F401
 
 TIMELINE_MARKER = "## やり取り（時系列）"
 
@@ -17,6 +17,7 @@ from __future__ import annotations
 import argparse
 import json
 import os
+import queue
 import signal
 import subprocess
 import sys
@@ -35,20 +36,26 @@ from chrline_client_utils import (
     save_root_from_env,
 )
 from chrline_list_open_chats_poc import iter_joined_chats
-from chrline_md_utils import insert_block_after_timeline_header, make_summary, wrap_details
+from chrline_md_utils import insert_block_after_timeline_header, make_summary, wrap_details, write_blocks
+from chrline_dedup_store import DedupStore, dedup_db_path
 from chrline_open_chat_to_md import (
-    DEDUP_FILENAME as BATCH_DEDUP_FILENAME,
+    DEDUP_NS as BATCH_DEDUP_NS,
+    RT_DEDUP_NS,
+    _open_dedup as _open_batch_dedup,
     _build_open_chat_heading,
     _heading_stream_kind,
 )
-from chrline_square_sender_names import SquareSenderNameResolver
+from chrline_square_sender_names import SquareSenderNameResolver, sender_name_cache_path
 
-RT_DEDUP_FILENAME = ".chrline_open_chat_realtime_dedup.json"
+RT_DEDUP_FILENAME = ".chrline_open_chat_realtime_dedup.json"  # 旧形式（DedupStore への移行元）
 WATCH_STATUS_FILENAME = ".chrline_open_chat_watch_status.json"
-WRITE_SPOOL_FILENAME = ".chrline_open_chat_write_spool.jsonl"
+WRITE_SPOOL_FILENAME = ".chrline_open_chat_write_spool.jsonl"  # MD 書き込み前の先行ログ
 DEDUP_FLUSH_EVERY = 25
 DEDUP_FLUSH_SECONDS = 60.0
 HEARTBEAT_SECONDS = 30.0
+WRITE_COALESCE_SECONDS = 2.0
+WRITE_BATCH_MAX = 200
+WRITE_RETRY_SECONDS = 30.0
 MAC_LINE_CHECK_SECONDS = 5.0
 
 
@@ -144,23 +151,15 @@ def _load_routes(path: Path, cl) -> dict[str, RtRoute]:
     return out
 
 
-def _load_dedup(path: Path) -> set[str]:
-    if not path.is_file():
-        return set()
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        keys = data.get("keys")
-        if isinstance(keys, list):
-            return {str(x) for x in keys if x}
-    except (json.JSONDecodeError, OSError):
-        pass
-    return set()
-
-
-def _save_dedup(path: Path, keys: set[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    trimmed = sorted(keys)[-8000:]
-    path.write_text(json.dumps({"keys": trimmed}, ensure_ascii=False, indent=2), encoding="utf-8")
+def _open_dedup(save_root: Path) -> DedupStore:
+    """リアルタイム側のキー（chat|messageId）。バッチ取り込み済みの messageId も重複扱い。"""
+    _open_batch_dedup(save_root).close()  # バッチ側の旧 JSON をまだ移していなければここで移す
+    return DedupStore(
+        dedup_db_path(save_root),
+        RT_DEDUP_NS,
+        legacy_json=save_root / RT_DEDUP_FILENAME,
+        message_ids_from=(RT_DEDUP_NS, BATCH_DEDUP_NS),
+    )
 
 
 def _mac_line_is_running() -> bool:
@@ -196,20 +195,6 @@ def _write_watch_status(path: Path, **updates: Any) -> None:
     os.replace(tmp, path)
 
 
-def _message_ids_from_batch_dedup(path: Path) -> set[str]:
-    """バッチ側 dedup キー（stream|id:MSG|ts:...）から messageId 集合を抽出。"""
-    out: set[str] = set()
-    for key in _load_dedup(path):
-        # ...|id:123456|ts:...
-        parts = str(key).split("|")
-        for p in parts:
-            if p.startswith("id:") and len(p) > 3:
-                mid = p[3:].strip()
-                if mid:
-                    out.add(mid)
-    return out
-
-
 def _get(obj: Any, *keys: Any) -> Any:
     if obj is None:
         return None
@@ -318,9 +303,8 @@ def _msg_text(msg: Any) -> str:
     return f"[非テキスト contentType={ct}]"
 
 
-def _append(route: RtRoute, heading: str, body: str) -> None:
-    """OneDrive 上の MD へ追記。同期ロック等の一時的な EPERM は短いリトライで吸収する。"""
-    block = f"""
+def _block(heading: str, body: str) -> str:
+    return f"""
 
 {heading}
 
@@ -328,66 +312,31 @@ def _append(route: RtRoute, heading: str, body: str) -> None:
 
 ---
 """
-    path = route.output_md
-    last_err: Exception | None = None
-    for attempt in range(1, 6):
-        tmp: Path | None = None
-        try:
-            raw = path.read_bytes()
-            st_size = path.stat().st_size
-            # クラウドプレースホルダの部分読みを拒否（上書きで Truncate する事故防止）
-            if len(raw) != st_size:
-                raise OSError(35, f"partial read {len(raw)}/{st_size}: {path}")
-            content = raw.decode("utf-8")
-            new_content = insert_block_after_timeline_header(content, block)
-            new_raw = new_content.encode("utf-8")
-            if len(new_raw) <= len(raw):
-                raise RuntimeError(f"append would not grow file: {path}")
-            tmp = path.with_suffix(path.suffix + f".tmp.{os.getpid()}")
-            tmp.write_bytes(new_raw)
-            os.replace(tmp, path)
-            return
-        except PermissionError as exc:
-            last_err = exc
-            if tmp is not None:
-                try:
-                    tmp.unlink(missing_ok=True)
-                except OSError:
-                    pass
-            # CloudStorage / OneDrive の一時ロック（launchd から EPERM になりやすい）
-            time.sleep(0.4 * attempt)
-        except OSError as exc:
-            last_err = exc
-            if tmp is not None:
-                try:
-                    tmp.unlink(missing_ok=True)
-                except OSError:
-                    pass
-            if getattr(exc, "errno", None) not in {1, 13, 16, 35}:  # EPERM/EACCES/EBUSY/EAGAIN
-                raise
-            time.sleep(0.4 * attempt)
-    assert last_err is not None
-    raise last_err
 
 
-def _spool_enqueue(spool_path: Path, item: dict[str, Any]) -> None:
-    spool_path.parent.mkdir(parents=True, exist_ok=True)
-    with spool_path.open("a", encoding="utf-8") as fh:
-        fh.write(json.dumps(item, ensure_ascii=False) + "\n")
+_SPOOL_LOCK = threading.Lock()
+_STOP = object()
 
 
-def _flush_write_spool(spool_path: Path) -> tuple[int, int]:
-    """ローカル退避した追記を OneDrive へ再試行。戻り値: (ok, remain)。"""
-    if not spool_path.is_file():
-        return 0, 0
-    try:
-        lines = spool_path.read_text(encoding="utf-8").splitlines()
-    except OSError:
-        return 0, 0
-    if not lines:
-        return 0, 0
-    remain: list[str] = []
-    ok = 0
+def _spool_enqueue(spool_path: Path, item: dict[str, Any]) -> None:
+    """MD へ書く前にローカルの先行ログへ1行追記（落ちても次回起動時に書き直せる）。"""
+    line = json.dumps(item, ensure_ascii=False) + "\n"
+    with _SPOOL_LOCK:
+        spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with spool_path.open("a", encoding="utf-8") as fh:
+            fh.write(line)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+
+def _spool_load(spool_path: Path) -> list[dict[str, Any]]:
+    """未コミットの退避分（前回の異常終了・書き込み失敗の残り）。"""
+    with _SPOOL_LOCK:
+        try:
+            lines = spool_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+    out: list[dict[str, Any]] = []
     for line in lines:
         line = line.strip()
         if not line:
@@ -396,31 +345,176 @@ def _flush_write_spool(spool_path: Path) -> tuple[int, int]:
             item = json.loads(line)
         except json.JSONDecodeError:
             continue
-        output_md = Path(str(item.get("output_md") or "")).expanduser()
-        heading = str(item.get("heading") or "")
-        body = str(item.get("body") or "")
-        if not output_md.is_file() or not heading or not body:
-            continue
-        route = RtRoute(
-            rid=str(item.get("route_id") or "spool"),
-            chat_mid=str(item.get("chat_mid") or "m" + "0" * 32),
-            output_md=output_md,
-            org_label=str(item.get("org_label") or ""),
-            heading_tag="",
-        )
+        if isinstance(item, dict) and item.get("output_md") and item.get("heading") and item.get("body"):
+            out.append(item)
+    return out
+
+
+def _spool_commit(spool_path: Path, done_keys: set[str]) -> int:
+    """MD に書けた分を先行ログから消す（全部書けたらファイルごと消す）。戻り値: 残り件数。"""
+    with _SPOOL_LOCK:
         try:
-            _append(route, heading, body)
-            ok += 1
+            lines = spool_path.read_text(encoding="utf-8").splitlines()
         except OSError:
-            remain.append(json.dumps(item, ensure_ascii=False))
-    if remain:
-        spool_path.write_text("\n".join(remain) + "\n", encoding="utf-8")
-    else:
-        try:
+            return 0
+        remain: list[str] = []
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                key = str(json.loads(line).get("dedup_key") or "")
+            except (json.JSONDecodeError, AttributeError):
+                continue
+            if key not in done_keys:
+                remain.append(line)
+        if remain:
+            tmp = spool_path.with_suffix(spool_path.suffix + ".tmp")
+            tmp.write_text("\n".join(remain) + "\n", encoding="utf-8")
+            os.replace(tmp, spool_path)
+        else:
             spool_path.unlink(missing_ok=True)
+        return len(remain)
+
+
+def _spool_already_written(items: list[dict[str, Any]]) -> set[str]:
+    """先行ログの分で MD に既に入っているもの（書けた直後・コミット前に落ちた分）の dedup_key。
+
+    本文先頭の「[messageId] …」行が MD にあれば書けている。
+    """
+    by_md: dict[Path, list[dict[str, Any]]] = {}
+    for it in items:
+        if it.get("message_id"):
+            by_md.setdefault(Path(str(it["output_md"])).expanduser(), []).append(it)
+    done: set[str] = set()
+    for output_md, group in by_md.items():
+        try:
+            text = output_md.read_text(encoding="utf-8")
         except OSError:
-            pass
-    return ok, len(remain)
+            continue
+        for it in group:
+            if f"[messageId] {it['message_id']}\n" in text:
+                done.add(str(it.get("dedup_key") or ""))
+    return done
+
+
+class _CoalescingWriter:
+    """受信側は put するだけ。書き込みスレッドが output_md ごとにまとめて1回で挿入する。
+
+    WRITE_COALESCE_SECONDS 待つか WRITE_BATCH_MAX 件溜まったら書く。書けなかった MD は
+    それだけ WRITE_RETRY_SECONDS 後に再試行（その間も先行ログに残る。他の MD は待たせない）。
+    """
+
+    def __init__(self, spool_path: Path, *, on_written=None, on_error=None):
+        self.spool_path = spool_path
+        self.on_written = on_written  # (output_md, items)
+        self.on_error = on_error  # (output_md, items, exc)
+        self.queue: queue.Queue = queue.Queue()
+        self.failed = 0  # 書けずに先行ログに残っている件数
+        self._thread = threading.Thread(target=self._run, name="line-watch-writer", daemon=True)
+
+    def start(self, recovered: list[dict[str, Any]] = ()) -> None:
+        """recovered: 前回の先行ログの残り。MD に入っているもの（コミット前に落ちた分）は書き直さない。"""
+        done = _spool_already_written(list(recovered))
+        if done:
+            print(f"# write spool: 書き込み済み {len(done)} 件をスキップ", file=sys.stderr)
+            try:
+                _spool_commit(self.spool_path, done)
+            except OSError as exc:
+                print(f"# write spool commit error: {type(exc).__name__}: {exc}", file=sys.stderr)
+        for item in recovered:
+            if str(item.get("dedup_key") or "") not in done:
+                self.queue.put(item)
+        self._thread.start()
+
+    def put(self, item: dict[str, Any]) -> None:
+        _spool_enqueue(self.spool_path, item)
+        self.queue.put(item)
+
+    def stop(self, timeout: float = 30.0) -> None:
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        pending: dict[Path, list[dict[str, Any]]] = {}
+        first_at: dict[Path, float] = {}  # output_md → 最初に溜まった時刻
+        retry_at: dict[Path, float] = {}  # 書けなかった output_md → 再試行してよい時刻
+        stopping = False
+        while True:
+            now = time.time()
+            if pending:
+                wait = max(
+                    0.05,
+                    min(max(first_at[p] + WRITE_COALESCE_SECONDS, retry_at.get(p, 0.0)) for p in pending) - now,
+                )
+            else:
+                wait = None
+            try:
+                item = self.queue.get(timeout=wait)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                stopping = True
+            elif item is not None:
+                output_md = Path(str(item["output_md"])).expanduser()
+                first_at.setdefault(output_md, time.time())
+                pending.setdefault(output_md, []).append(item)
+                # 連続で届いている間は取り切ってからまとめる
+                if self.queue.qsize() and sum(len(v) for v in pending.values()) < WRITE_BATCH_MAX:
+                    continue
+            n = sum(len(v) for v in pending.values())
+            now = time.time()
+            due = {
+                p: items
+                for p, items in pending.items()
+                if stopping
+                or (
+                    now >= retry_at.get(p, 0.0)
+                    and (n >= WRITE_BATCH_MAX or now >= first_at[p] + WRITE_COALESCE_SECONDS)
+                )
+            }
+            if due:
+                left = self._commit(due)
+                for p in due:
+                    if p in left:
+                        pending[p] = left[p]
+                        retry_at[p] = time.time() + WRITE_RETRY_SECONDS
+                    else:
+                        del pending[p]
+                        first_at.pop(p, None)
+                        retry_at.pop(p, None)
+                self.failed = sum(len(pending[p]) for p in retry_at)
+            if stopping:
+                return
+
+    def _commit(self, pending: dict[Path, list[dict[str, Any]]]) -> dict[Path, list[dict[str, Any]]]:
+        """MD ごとに1回で書く。書けなかった MD の分を返す。"""
+        left: dict[Path, list[dict[str, Any]]] = {}
+        done_keys: set[str] = set()
+        for output_md, items in pending.items():
+            if not output_md.is_file():
+                print(f"# write skip (MD なし) {output_md}: {len(items)} 件", file=sys.stderr)
+                done_keys.update(str(it.get("dedup_key") or "") for it in items)
+                continue
+            try:
+                write_blocks(
+                    output_md,
+                    [_block(str(it["heading"]), str(it["body"])) for it in items],
+                    insert_block_after_timeline_header,
+                )
+            except (OSError, RuntimeError) as exc:
+                left[output_md] = items
+                if self.on_error is not None:
+                    self.on_error(output_md, items, exc)
+                continue
+            done_keys.update(str(it.get("dedup_key") or "") for it in items)
+            if self.on_written is not None:
+                self.on_written(output_md, items)
+        try:
+            _spool_commit(self.spool_path, done_keys)
+        except OSError as exc:
+            print(f"# write spool commit error: {type(exc).__name__}: {exc}", file=sys.stderr)
+        return left
 
 
 def _extract_thread_notification(event: Any) -> tuple[str, str, Any] | None:
@@ -455,13 +549,11 @@ def main() -> int:
         sys.stdout.reconfigure(encoding="utf-8")
 
     save_root = save_root_from_env()
-    rt_dedup_path = save_root / RT_DEDUP_FILENAME
-    batch_dedup_path = save_root / BATCH_DEDUP_FILENAME
     watch_status_path = save_root / WATCH_STATUS_FILENAME
     write_spool_path = save_root / WRITE_SPOOL_FILENAME
-    dedup = _load_dedup(rt_dedup_path)
-    batch_msg_ids = _message_ids_from_batch_dedup(batch_dedup_path)
+    dedup = _open_dedup(save_root)
     flush_state = {"count": 0, "last": time.time()}
+    sender_resolver: SquareSenderNameResolver | None = None
     status_lock = threading.Lock()
     stop_event = threading.Event()
 
@@ -472,7 +564,9 @@ def main() -> int:
     def _maybe_flush(*, force: bool = False) -> None:
         now = time.time()
         if force or flush_state["count"] >= DEDUP_FLUSH_EVERY or (now - flush_state["last"]) >= DEDUP_FLUSH_SECONDS:
-            _save_dedup(rt_dedup_path, dedup)
+            dedup.save()
+            if sender_resolver is not None:
+                sender_resolver.save()
             flush_state["count"] = 0
             flush_state["last"] = now
 
@@ -547,7 +641,10 @@ def main() -> int:
         # 起動時の getMySquareMid 連打は履歴制限と同系統でセッションを傷めるため省略。
         # 方向判定は「受信」寄りになるが、追記自体は問題ない。
         my_square_mid: dict[str, str] = {}
-        sender_resolver = SquareSenderNameResolver(cl, my_square_mids=my_square_mid)
+        sender_resolver = SquareSenderNameResolver(
+            cl, my_square_mids=my_square_mid, cache_path=sender_name_cache_path(save_root)
+        )
+        sender_resolver.prefetch_known()
 
         print(f"# realtime watch start chats={len(routes)}", file=sys.stderr)
         for c, r in routes.items():
@@ -555,6 +652,41 @@ def main() -> int:
 
         tracer = HooksTracer(cl, prefixes=[""])
 
+        def _on_written(output_md: Path, items: list[dict[str, Any]]) -> None:
+            last = items[-1]
+            _status(
+                state="running",
+                last_append_at=datetime.now().astimezone().isoformat(timespec="seconds"),
+                last_append_route=str(last.get("route_id") or ""),
+                last_append_kind=str(last.get("kind") or ""),
+                last_write_error="",
+                write_spool_pending=False,
+            )
+            if args.verbose:
+                print(f"# append {output_md.parent.name}: {len(items)} 件を1回で書き込み", file=sys.stderr)
+
+        def _on_write_error(output_md: Path, items: list[dict[str, Any]], exc: Exception) -> None:
+            _status(
+                state="running",
+                last_write_error=f"{type(exc).__name__}: {exc}",
+                last_write_error_at=datetime.now().astimezone().isoformat(timespec="seconds"),
+                last_write_error_route=str(items[-1].get("route_id") or ""),
+                write_spool_pending=True,
+            )
+            print(
+                f"# append spooled {output_md}: {len(items)} 件 err={type(exc).__name__}: {exc}",
+                file=sys.stderr,
+            )
+
+        writer = _CoalescingWriter(write_spool_path, on_written=_on_written, on_error=_on_write_error)
+        recovered = _spool_load(write_spool_path)
+        if recovered:
+            print(f"# write spool 再開: {len(recovered)} 件", file=sys.stderr)
+            for it in recovered:
+                if it.get("dedup_key"):
+                    dedup.add(str(it["dedup_key"]), message_id=str(it.get("message_id") or ""))
+        writer.start(recovered)
+
         def _shutdown(_sig, _frm):
             stop_event.set()
             _maybe_flush(force=True)
@@ -583,7 +715,7 @@ def main() -> int:
                 return
 
             key = f"{route.chat_mid}|{message_id}"
-            if key in dedup or message_id in batch_msg_ids:
+            if key in dedup or dedup.seen_message_id(message_id):
                 return
 
             created_ms = _to_ms(_get(msg, "createdTime", 5))
@@ -613,59 +745,31 @@ def main() -> int:
             if related:
                 body += f"[relatedMessageId] {related}\n"
             body += f"\n{text}"
-            try:
-                _append(route, heading, body)
-            except OSError as exc:
-                # イベントは再送されないため、ローカルへ退避して heartbeat で再試行する
-                _spool_enqueue(
-                    write_spool_path,
-                    {
-                        "output_md": str(route.output_md),
-                        "heading": heading,
-                        "body": body,
-                        "route_id": route.rid,
-                        "chat_mid": route.chat_mid,
-                        "org_label": route.org_label,
-                        "dedup_key": key,
-                        "message_id": message_id,
-                        "spooled_at": datetime.now().astimezone().isoformat(timespec="seconds"),
-                    },
-                )
-                dedup.add(key)
-                batch_msg_ids.add(message_id)
-                flush_state["count"] += 1
-                _maybe_flush()
-                _status(
-                    state="running",
-                    last_write_error=f"{type(exc).__name__}: {exc}",
-                    last_write_error_at=datetime.now().astimezone().isoformat(timespec="seconds"),
-                    last_write_error_route=route.rid,
-                    write_spool_pending=True,
-                )
-                print(
-                    f"# append spooled {route.rid} kind={kind} msg={message_id} "
-                    f"err={type(exc).__name__}: {exc}",
-                    file=sys.stderr,
-                )
-                return
-            dedup.add(key)
-            batch_msg_ids.add(message_id)
+            # イベントは再送されないので、先行ログに書いてから書き込みスレッドへ渡す
+            writer.put(
+                {
+                    "output_md": str(route.output_md),
+                    "heading": heading,
+                    "body": body,
+                    "route_id": route.rid,
+                    "chat_mid": route.chat_mid,
+                    "org_label": route.org_label,
+                    "kind": kind,
+                    "dedup_key": key,
+                    "message_id": message_id,
+                    "spooled_at": datetime.now().astimezone().isoformat(timespec="seconds"),
+                }
+            )
+            dedup.add(key, message_id=message_id)
             msgid_to_route[message_id] = route
             flush_state["count"] += 1
             _maybe_flush()
-            _status(
-                state="running",
-                last_append_at=datetime.now().astimezone().isoformat(timespec="seconds"),
-                last_append_route=route.rid,
-                last_append_kind=kind,
-                last_write_error="",
-            )
             if len(msgid_to_route) > 5000:
                 for k in list(msgid_to_route.keys())[:1000]:
                     msgid_to_route.pop(k, None)
             if args.verbose:
                 print(
-                    f"# append {route.rid} kind={kind} msg={message_id} "
+                    f"# queue {route.rid} kind={kind} msg={message_id} "
                     f"thread={bool(thread_mid)} related={bool(related)} "
                     f"src={route_source} ev={event_code}",
                     file=sys.stderr,
@@ -820,21 +924,10 @@ def main() -> int:
                 # プロセス生存の確認用。PUSH障害は tracer.run が例外終了してlaunchdが再起動する。
                 now = time.time()
                 if now - last_heartbeat >= HEARTBEAT_SECONDS:
-                    spool_ok, spool_remain = _flush_write_spool(write_spool_path)
-                    if spool_ok or spool_remain:
-                        print(
-                            f"# write spool flush ok={spool_ok} remain={spool_remain}",
-                            file=sys.stderr,
-                        )
                     _status(
                         state="running",
                         heartbeat_at=datetime.now().astimezone().isoformat(timespec="seconds"),
-                        write_spool_pending=bool(spool_remain),
-                        **(
-                            {"last_write_error": "", "last_spool_flush_ok": spool_ok}
-                            if spool_ok
-                            else {}
-                        ),
+                        write_spool_pending=bool(writer.failed),
                     )
                     last_heartbeat = now
 
@@ -845,6 +938,7 @@ def main() -> int:
             tracer.run(2, initServices=[3])
         finally:
             stop_event.set()
+            writer.stop()
             _maybe_flush(force=True)
         return 0
     finally:
@@ -5,7 +5,8 @@ LINE オープンチャット（Square）差分を Markdown に追記する。
 - ルート設定: YAML（--routes-yaml / LINE_OPEN_CHAT_ROUTES_YAML）
 - 対応: メインタイムライン + 参加中スレッド
 - 状態: LINE_UNOFFICIAL_AUTH_DIR/.chrline_open_chat_state.json
-- 重複排除: LINE_UNOFFICIAL_AUTH_DIR/.chrline_open_chat_dedup.json
+- 重複排除: LINE_UNOFFICIAL_AUTH_DIR/.chrline_dedup.sqlite3（ns=open_chat。リアルタイム監視の messageId も見る。
+  旧 .chrline_open_chat_dedup.json は初回に取り込む）
 - スレッド MID 補助: --discover-thread-mids でメインタイムラインのイベントから threadMid 候補を集計し、
   --auto-append-thread-mids で open_chat_routes.yaml の thread_mids に追記（--dry-run 時は YAML も未変更）
 - 再ログイン: 保存トークン失効時に QR を出すのは --allow-qr-login のときだけ（取り込み確認で意図したときに付与）
@@ -18,9 +19,11 @@ import json
 import os
 import re
 import sys
+import threading
 import time
 from collections import Counter, defaultdict
-from dataclasses import dataclass
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Any
@@ -33,13 +36,19 @@ from chrline_client_utils import (
     recover_session_midrun,
     save_root_from_env,
 )
+from chrline_dedup_store import DedupStore, dedup_db_path
 from chrline_dump_messages_poc import _format_line_msg_when, _msg_plain_text, _msg_sender_mid, _msg_time
 from chrline_list_open_chats_poc import iter_joined_chats, iter_threads
-from chrline_md_utils import insert_block_after_timeline_header, make_summary, wrap_details
-from chrline_square_sender_names import SquareSenderNameResolver, build_my_square_mid_map
+from chrline_md_utils import MarkdownAppender, insert_block_after_timeline_header, make_summary, wrap_details
+from chrline_square_sender_names import SquareSenderNameResolver, build_my_square_mid_map, sender_name_cache_path
 
 STATE_FILENAME = ".chrline_open_chat_state.json"
-DEDUP_FILENAME = ".chrline_open_chat_dedup.json"
+DEDUP_FILENAME = ".chrline_open_chat_dedup.json"  # 旧形式（DedupStore への移行元）
+DEDUP_NS = "open_chat"
+RT_DEDUP_NS = "open_chat_rt"
+# 1回の実行分の追記を MD ごとに溜める（Gmail/Chatwork/iMessage と同じロックで書く）
+MD_WRITER = MarkdownAppender(insert_block_after_timeline_header)
+
 # バッチ同期の route 別統計（ダッシュボード健全性用。日次30日）
 HEALTH_STATS_PATH = (
     Path(__file__).resolve().parents[1] / ".jarvis_state" / "openchat_thread_health.json"
@@ -164,23 +173,13 @@ def _save_state(path: Path, state: dict[str, Any]) -> None:
     path.write_text(json.dumps(state, ensure_ascii=False, indent=2), encoding="utf-8")
 
 
-def _load_dedup(path: Path) -> set[str]:
-    if not path.is_file():
-        return set()
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        keys = data.get("keys")
-        if isinstance(keys, list):
-            return {str(x) for x in keys if x}
-    except (json.JSONDecodeError, OSError):
-        pass
-    return set()
-
-
-def _save_dedup(path: Path, keys: set[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    trimmed = sorted(keys)[-5000:]
-    path.write_text(json.dumps({"keys": trimmed}, ensure_ascii=False, indent=2), encoding="utf-8")
+def _open_dedup(save_root: Path) -> DedupStore:
+    return DedupStore(
+        dedup_db_path(save_root),
+        DEDUP_NS,
+        legacy_json=save_root / DEDUP_FILENAME,
+        message_ids_from=(DEDUP_NS, RT_DEDUP_NS),
+    )
 
 
 def _get(cl, obj: Any, key: str, fid: int | None = None) -> Any:
@@ -766,6 +765,121 @@ def _fetch_square_chat_events(
     )
 
 
+class _ClientHolder:
+    """fetch ワーカーで共有する client。セッション切断の復旧は世代ごとに1回だけ行い、他のワーカーはそれを使う。
+
+    CHRLINE の client はスレッドセーフでないので、API 呼び出しはワーカーもメインスレッドも api を持って行う。
+    """
+
+    def __init__(self, cl, save_root: Path, *, allow_qr_login: bool) -> None:
+        self.cl = cl
+        self.gen = 0
+        self._failed_gen = -1
+        self._save_root = save_root
+        self._allow_qr_login = allow_qr_login
+        self._lock = threading.Lock()
+        self.api = threading.Lock()
+
+    def current(self) -> tuple[Any, int]:
+        with self._lock:
+            return self.cl, self.gen
+
+    def recover(self, gen: int) -> bool:
+        """gen の client で切断を見たワーカーが呼ぶ。使える client があれば True。"""
+        with self._lock:
+            if gen != self.gen:
+                return True  # 別ワーカーが復旧済み
+            if gen == self._failed_gen:
+                return False
+            cl2 = recover_session_midrun(self._save_root, self.cl, allow_qr_login=self._allow_qr_login)
+            if cl2 is None:
+                self._failed_gen = gen
+                return False
+            self.cl = cl2
+            self.gen += 1
+            return True
+
+
+@dataclass
+class _StreamJob:
+    st: Stream
+    sdata: dict[str, Any]
+    sync_token: str
+    cont_token: str
+    page_limit: int
+    join_failed: bool
+    thread_display_title: str
+
+
+@dataclass
+class _StreamFetch:
+    sync_token: str
+    cont_token: str
+    pages: list[Any] = field(default_factory=list)
+    error: BaseException | None = None
+    retried_after_401: bool = False
+
+
+def _fetch_stream_pages(holder: _ClientHolder, job: _StreamJob, limit: int) -> _StreamFetch:
+    """1ストリーム分のページを continuation が尽きるか page_limit まで取る（fetch ワーカー側）。
+
+    セッション切断の復旧・401 時の sync/continuation リセットはストリーム単位。
+    失敗したら、それまでに取れたページと例外を返す（書き込み側が health を更新する）。
+    """
+    st = job.st
+    out = _StreamFetch(sync_token=job.sync_token, cont_token=job.cont_token)
+    for _ in range(job.page_limit):
+        fetch_sync = out.sync_token
+        fetch_cont = out.cont_token
+        out.retried_after_401 = False
+        res = None
+        while True:
+            cl, gen = holder.current()
+            try:
+                with holder.api:
+                    res = _fetch_square_chat_events(
+                        cl,
+                        square_chat_mid=st.square_chat_mid,
+                        sync_token=fetch_sync,
+                        cont_token=fetch_cont,
+                        limit=limit,
+                        thread_mid=st.thread_mid or None,
+                    )
+                break
+            except Exception as e:
+                if _is_session_logged_out_error(e):
+                    if holder.recover(gen):
+                        continue
+                    out.error = e
+                    print(
+                        f"# stream セッション切断（復旧不可）: {st.stream_key} {type(e).__name__}: {e}",
+                        file=sys.stderr,
+                    )
+                    break
+                if not out.retried_after_401 and _is_fetch_permission_error(e):
+                    print(
+                        f"# stream 401 → sync/continuation リセットして再試行: {st.stream_key}",
+                        file=sys.stderr,
+                    )
+                    fetch_sync = ""
+                    fetch_cont = ""
+                    out.sync_token = ""
+                    out.cont_token = ""
+                    out.retried_after_401 = True
+                    continue
+                out.error = e
+                print(f"# stream エラー: {st.stream_key} {type(e).__name__}: {e}", file=sys.stderr)
+                break
+        if res is None:
+            break
+        out.pages.append(res)
+        out.sync_token, out.cont_token = _extract_tokens(cl, res, out.sync_token, out.cont_token)
+        if not out.cont_token:
+            # 同一 sync 内の続きがないのでこのストリームは完了
+            break
+    return out
+
+
 def _is_thread_deleted_error(exc: BaseException) -> bool:
     code = getattr(exc, "code", None)
     if code == 404:
@@ -1274,6 +1388,7 @@ def _prefetch_sender_names_for_events(cl, resolver: SquareSenderNameResolver, ev
 
 
 def _append_markdown(path: Path, heading: str, body: str) -> None:
+    """MD_WRITER に溜める（実行の最後に MD ごとに1回で書く）。"""
     block = f"""
 
 {heading}
@@ -1282,8 +1397,7 @@ def _append_markdown(path: Path, heading: str, body: str) -> None:
 
 ---
 """
-    content = path.read_text(encoding="utf-8")
-    path.write_text(insert_block_after_timeline_header(content, block), encoding="utf-8")
+    MD_WRITER.add(path, block)
 
 
 def build_arg_parser() -> argparse.ArgumentParser:
@@ -1321,6 +1435,12 @@ def build_arg_parser() -> argparse.ArgumentParser:
         action="store_true",
         help="閉鎖済み（closed）スレッドも差分対象に含める（通常は省略。初回再スキャン用）",
     )
+    parser.add_argument(
+        "--fetch-workers",
+        type=int,
+        default=4,
+        help="ストリームを並列に取得するスレッド数（API 間隔は LINE_CHRLINE_CALL_INTERVAL_MS で全体共通。1 で逐次）",
+    )
     parser.add_argument(
         "--max-thread-pages-per-stream",
         type=int,
@@ -1508,7 +1628,6 @@ def _run_body(args: argparse.Namespace, *, client=None) -> int:
 
     save_root = save_root_from_env()
     state_path = save_root / STATE_FILENAME
-    dedup_path = save_root / DEDUP_FILENAME
     state = _load_state(state_path)
     streams_state = state.setdefault("streams", {})
     reopened = _reopen_false_closed_threads(streams_state)
@@ -1528,8 +1647,8 @@ def _run_body(args: argparse.Namespace, *, client=None) -> int:
                 f"# false-join_denied スレッド再開: {reopened_join_denied} 件（YAML登録・fetch再試行）",
                 file=sys.stderr,
             )
-    seen_dedup = _load_dedup(dedup_path)
-    new_dedup: set[str] = set()
+    seen_dedup = _open_dedup(save_root)
+    dedup_by_md: defaultdict[Path, list[str]] = defaultdict(list)
     discover_counts: defaultdict[str, Counter[str]] = defaultdict(Counter)
 
     cl = client if client is not None else build_logged_in_client(
@@ -1638,156 +1757,239 @@ def _run_body(args: argparse.Namespace, *, client=None) -> int:
 
     chat_mids_for_self = {st.square_chat_mid for st in all_streams if st.square_chat_mid}
     my_square_mids = build_my_square_mid_map(cl, chat_mids_for_self)
-    sender_resolver = SquareSenderNameResolver(cl, my_square_mids=my_square_mids)
+    sender_resolver = SquareSenderNameResolver(
+        cl, my_square_mids=my_square_mids, cache_path=sender_name_cache_path(save_root)
+    )
+    # 前回までに見た送信者で期限切れのものを先にまとめて更新（以降はイベントごとに新顔だけ API）
+    refreshed = sender_resolver.prefetch_known()
+    if args.verbose and refreshed:
+        print(f"# sender names: 期限切れ {refreshed} 件を一括更新", file=sys.stderr)
 
     appended = 0
     thread_stats = ThreadSyncStats()
     route_thread_stats: dict[str, ThreadSyncStats] = defaultdict(ThreadSyncStats)
     route_main_appended: dict[str, int] = defaultdict(int)
     session_thread_titles: dict[str, str] = {}
-    for st in all_streams:
-        sdata = streams_state.get(st.stream_key, {})
-        rid = st.route.rid
-
-        if st.thread_mid:
-            thread_stats.total += 1
-            route_thread_stats[rid].total += 1
-            registered = st.thread_mid in set(st.route.thread_mids or [])
-            if not args.init:
-                if _is_thread_closed(sdata):
-                    thread_stats.skipped += 1
-                    route_thread_stats[rid].skipped += 1
-                    if args.verbose:
-                        health = _stream_health(sdata)
-                        print(
-                            f"# stream skip (closed:{health.get('closed_reason', '?')}): {st.stream_key}",
-                            file=sys.stderr,
-                        )
-                    continue
-                if not registered:
-                    skip_reason = _health_skip_reason(sdata)
-                    if skip_reason:
+    md_errors: dict[Path, BaseException] = {}
+    holder = _ClientHolder(cl, save_root, allow_qr_login=bool(args.allow_qr_login))
+    jobs: list[tuple[_StreamJob, Future[_StreamFetch]]] = []
+    pool = ThreadPoolExecutor(max_workers=max(1, args.fetch_workers), thread_name_prefix="openchat-fetch")
+    pending_state: list[tuple[str, Path, dict[str, Any], bool]] = []
+
+    def _checkpoint(md_path: Path | None = None) -> None:
+        """溜めた MD を書き（md_path 指定時はそのファイルだけ）、dedup → 書けたストリームの state の順に保存。"""
+        failed = MD_WRITER.flush(md_path)
+        for path, exc in failed.items():
+            for dk in dedup_by_md.get(path, ()):
+                seen_dedup.discard(dk)
+            md_errors[path] = exc
+        for path in [md_path] if md_path is not None else list(dedup_by_md):
+            dedup_by_md.pop(path, None)
+        # dedup を先に書く（state だけ進んで dedup が残らないと次回の重複判定が抜ける）
+        seen_dedup.save()
+        rest = []
+        for item in pending_state:
+            stream_key, path, entry, wrote = item
+            if md_path is not None and path != md_path:
+                rest.append(item)
+                continue
+            if wrote and path in failed:
+                # 書けなかったので token は進めない（次回このストリームを取り直す）
+                print(f"# MD 書き込み失敗: {stream_key} → state 据え置き", file=sys.stderr)
+                continue
+            streams_state[stream_key] = entry
+        if len(rest) < len(pending_state):
+            pending_state[:] = rest
+            _save_state(state_path, state)
+
+    try:
+        # 1) 前処理（join・タイトル解決・token 決定）は順に。決まったストリームから fetch を並列で投げる
+        for st in all_streams:
+            sdata = streams_state.get(st.stream_key, {})
+            rid = st.route.rid
+
+            if st.thread_mid:
+                thread_stats.total += 1
+                route_thread_stats[rid].total += 1
+                registered = st.thread_mid in set(st.route.thread_mids or [])
+                if not args.init:
+                    if _is_thread_closed(sdata):
                         thread_stats.skipped += 1
                         route_thread_stats[rid].skipped += 1
                         if args.verbose:
-                            print(f"# stream skip ({skip_reason}): {st.stream_key}", file=sys.stderr)
+                            health = _stream_health(sdata)
+                            print(
+                                f"# stream skip (closed:{health.get('closed_reason', '?')}): {st.stream_key}",
+                                file=sys.stderr,
+                            )
                         continue
+                    if not registered:
+                        skip_reason = _health_skip_reason(sdata)
+                        if skip_reason:
+                            thread_stats.skipped += 1
+                            route_thread_stats[rid].skipped += 1
+                            if args.verbose:
+                                print(f"# stream skip ({skip_reason}): {st.stream_key}", file=sys.stderr)
+                            continue
 
-        join_failed = False
-        if st.thread_mid and need_join:
-            joined = joined_by_chat.setdefault(st.square_chat_mid, set())
-            if st.thread_mid not in joined:
-                join_status = _ensure_thread_joined(
-                    cl,
-                    st.square_chat_mid,
-                    st.thread_mid,
-                    joined_cache=joined,
-                    join_threads=bool(args.join_threads),
-                    join_confirm_file=args.join_threads_confirm_file,
-                    join_auto_yes=bool(args.join_threads_yes),
-                )
-                if join_status == "deleted":
-                    # relatedMessageId 由来でも本体スレが削除済みのことがある（物件紹介の締切等）
-                    if not skip_md_state:
-                        h = _health_on_error(
-                            sdata,
-                            RuntimeError("joinSquareThread:404:此討論串已被刪除。"),
+            join_failed = False
+            if st.thread_mid and need_join:
+                joined = joined_by_chat.setdefault(st.square_chat_mid, set())
+                if st.thread_mid not in joined:
+                    with holder.api:
+                        join_status = _ensure_thread_joined(
+                            holder.cl,
+                            st.square_chat_mid,
+                            st.thread_mid,
+                            joined_cache=joined,
+                            join_threads=bool(args.join_threads),
+                            join_confirm_file=args.join_threads_confirm_file,
+                            join_auto_yes=bool(args.join_threads_yes),
                         )
-                        streams_state[st.stream_key] = {
-                            "sync_token": str(sdata.get("sync_token") or ""),
-                            "continuation_token": str(sdata.get("continuation_token") or ""),
-                            "health": h,
-                        }
-                        thread_stats.deleted += 1
-                        route_thread_stats[rid].deleted += 1
-                    if args.verbose:
-                        print(f"# stream skip (deleted via join): {st.stream_key}", file=sys.stderr)
-                    continue
-                if join_status in {"failed", "skipped"}:
-                    join_failed = True
-                    if args.verbose:
-                        print(f"# join 失敗・fetch を試行: {st.stream_key}", file=sys.stderr)
-
-        thread_display_title = ""
-        if st.thread_mid:
-            thread_display_title = _resolve_thread_display_title(
-                cl, st, session_thread_titles, route_id_to_new_titles
-            )
+                    if join_status == "deleted":
+                        # relatedMessageId 由来でも本体スレが削除済みのことがある（物件紹介の締切等）
+                        if not skip_md_state:
+                            h = _health_on_error(
+                                sdata,
+                                RuntimeError("joinSquareThread:404:此討論串已被刪除。"),
+                            )
+                            streams_state[st.stream_key] = {
+                                "sync_token": str(sdata.get("sync_token") or ""),
+                                "continuation_token": str(sdata.get("continuation_token") or ""),
+                                "health": h,
+                            }
+                            thread_stats.deleted += 1
+                            route_thread_stats[rid].deleted += 1
+                        if args.verbose:
+                            print(f"# stream skip (deleted via join): {st.stream_key}", file=sys.stderr)
+                        continue
+                    if join_status in {"failed", "skipped"}:
+                        join_failed = True
+                        if args.verbose:
+                            print(f"# join 失敗・fetch を試行: {st.stream_key}", file=sys.stderr)
 
-        if args.init:
-            sync_token = ""
-            cont_token = ""
-        else:
-            sync_token = str(sdata.get("sync_token") or "")
-            cont_token = "" if args.reset_continuation else str(sdata.get("continuation_token") or "")
-            if st.thread_mid and st.stream_key in healed_thread_keys and args.thread_catchup_pages > 0:
-                cont_token = ""
-            if args.init and st.thread_mid:
+            thread_display_title = ""
+            if st.thread_mid:
+                with holder.api:
+                    thread_display_title = _resolve_thread_display_title(
+                        holder.cl, st, session_thread_titles, route_id_to_new_titles
+                    )
+
+            if args.init:
                 sync_token = ""
                 cont_token = ""
-        if args.verbose:
-            print(f"# stream={st.stream_key} sync={bool(sync_token)} cont={bool(cont_token)}", file=sys.stderr)
-
-        if st.thread_mid and not args.init:
-            if st.stream_key in healed_thread_keys and args.thread_catchup_pages > 0:
-                page_limit = max(1, args.thread_catchup_pages)
             else:
-                page_limit = max(1, args.max_thread_pages_per_stream)
-        else:
-            page_limit = max(1, args.max_pages_per_stream)
-        stream_appended_start = appended
-        stream_had_error = False
-        last_exc: BaseException | None = None
-
-        for _ in range(page_limit):
-            fetch_sync = sync_token
-            fetch_cont = cont_token
-            retried_after_401 = False
-            while True:
-                try:
-                    res = _fetch_square_chat_events(
-                        cl,
-                        square_chat_mid=st.square_chat_mid,
-                        sync_token=fetch_sync,
-                        cont_token=fetch_cont,
-                        limit=args.limit,
-                        thread_mid=st.thread_mid or None,
-                    )
-                    break
-                except Exception as e:
-                    if _is_session_logged_out_error(e):
-                        cl2 = recover_session_midrun(
-                            save_root,
-                            cl,
-                            allow_qr_login=bool(args.allow_qr_login),
-                        )
-                        if cl2 is not None:
-                            cl = cl2
+                sync_token = str(sdata.get("sync_token") or "")
+                cont_token = "" if args.reset_continuation else str(sdata.get("continuation_token") or "")
+                if st.thread_mid and st.stream_key in healed_thread_keys and args.thread_catchup_pages > 0:
+                    cont_token = ""
+                if args.init and st.thread_mid:
+                    sync_token = ""
+                    cont_token = ""
+            if args.verbose:
+                print(f"# stream={st.stream_key} sync={bool(sync_token)} cont={bool(cont_token)}", file=sys.stderr)
+
+            if st.thread_mid and not args.init:
+                if st.stream_key in healed_thread_keys and args.thread_catchup_pages > 0:
+                    page_limit = max(1, args.thread_catchup_pages)
+                else:
+                    page_limit = max(1, args.max_thread_pages_per_stream)
+            else:
+                page_limit = max(1, args.max_pages_per_stream)
+            job = _StreamJob(
+                st=st,
+                sdata=sdata,
+                sync_token=sync_token,
+                cont_token=cont_token,
+                page_limit=page_limit,
+                join_failed=join_failed,
+                thread_display_title=thread_display_title,
+            )
+            jobs.append((job, pool.submit(_fetch_stream_pages, holder, job, args.limit)))
+
+        # 2) 取れた順ではなくストリーム順に MD へ溜める。output_md ごとに、そこへ書く最後のストリームを
+        #    処理し終えたら1回で書いて state を保存する（途中で落ちても書けた MD の分の token は残る）
+        last_job_for_md = {job.st.route.output_md: i for i, (job, _) in enumerate(jobs)}
+        for i, (job, fut) in enumerate(jobs):
+            fetched = fut.result()
+            cl = holder.cl
+            st, sdata, rid = job.st, job.sdata, job.st.route.rid
+            join_failed = job.join_failed
+            thread_display_title = job.thread_display_title
+            stream_appended_start = appended
+            last_exc = fetched.error
+            retried_after_401 = fetched.retried_after_401
+            new_entry: dict[str, Any] | None = None
+
+            # 送信者名・スレッド解決も API を呼ぶ（fetch ワーカーと client を取り合わない）
+            with holder.api:
+                for res in fetched.pages:
+                    events = _extract_events(cl, res)
+                    _prefetch_sender_names_for_events(cl, sender_resolver, events)
+                    for ev in events:
+                        if args.discover_thread_mids and not st.thread_mid:
+                            for tmid in _extract_thread_mids_from_event(ev, st.square_chat_mid):
+                                discover_counts[st.route.rid][tmid] += 1
+
+                        msg = _best_message_from_event(cl, ev)
+                        if args.discover_thread_mids and not st.thread_mid and msg is not None:
+                            related_for_discover = _related_message_id(cl, msg, ev)
+                            if related_for_discover:
+                                tmid = _resolve_thread_mid_via_api(cl, st.square_chat_mid, related_for_discover)
+                                if tmid:
+                                    discover_counts[st.route.rid][tmid] += 1
+
+                        if msg is None:
+                            continue
+                        body = _message_text(cl, msg)
+                        if body == "[本文なし]" and not args.include_empty:
                             continue
-                        last_exc = e
-                        print(
-                            f"# stream セッション切断（復旧不可）: {st.stream_key} {type(e).__name__}: {e}",
-                            file=sys.stderr,
+                        ts = _msg_time(cl, msg)
+                        if not ts:
+                            ts = _event_time(cl, ev)
+                        when = _format_line_msg_when(ts)
+                        date_part = when.split()[0] if when and " " in when else when or "?"
+                        sender = str(_msg_sender_mid(cl, msg) or "")
+                        my_sm = my_square_mids.get(st.square_chat_mid, "")
+                        direction = (
+                            "送信"
+                            if sender
+                            and (sender == my_sm or sender == str(getattr(cl, "mid", "")))
+                            else "受信"
                         )
-                        res = None
-                        break
-                    if not retried_after_401 and _is_fetch_permission_error(e):
-                        print(
-                            f"# stream 401 → sync/continuation リセットして再試行: {st.stream_key}",
-                            file=sys.stderr,
+                        sender_label = sender_resolver.label(sender, chat_mid=st.square_chat_mid)
+                        msg_id = _message_id(cl, msg, "")
+                        related_id = _related_message_id(cl, msg, ev)
+                        dk = _dedup_key(st.stream_key, msg_id, ts, body)
+                        if dk in seen_dedup or seen_dedup.seen_message_id(msg_id):
+                            continue
+
+                        kind = _heading_stream_kind(thread_mid=st.thread_mid or "", related_id=related_id)
+                        heading = _build_open_chat_heading(
+                            date_part=date_part,
+                            kind=kind,
+                            org_label=st.route.org_label,
+                            direction=direction,
+                            sender_label=sender_label,
+                            summary=make_summary(body),
+                            thread_display_title=thread_display_title if kind == "【スレッド】" else "",
                         )
-                        fetch_sync = ""
-                        fetch_cont = ""
-                        sync_token = ""
-                        cont_token = ""
-                        retried_after_401 = True
-                        continue
-                    last_exc = e
-                    print(f"# stream エラー: {st.stream_key} {type(e).__name__}: {e}", file=sys.stderr)
-                    res = None
-                    break
-            if res is None:
-                stream_had_error = True
+                        body_for_write = body
+                        if related_id:
+                            body_for_write = f"[relatedMessageId] {related_id}\n\n{body}"
+                        if skip_md_state:
+                            if args.dry_run or args.discover_only:
+                                pass  # discover-only は件数のみ（下で discover_counts）
+                        else:
+                            _append_markdown(st.route.output_md, heading, body_for_write)
+                            dedup_by_md[st.route.output_md].append(dk)
+                        if not skip_md_state:
+                            seen_dedup.add(dk, message_id=msg_id)
+                            appended += 1
+
+            sync_token, cont_token = fetched.sync_token, fetched.cont_token
+            stream_had_error = last_exc is not None
+            if stream_had_error:
                 if not skip_md_state and st.thread_mid:
                     if join_failed and _is_fetch_permission_error(last_exc or Exception()):
                         h = _health_on_closed(sdata, last_exc or RuntimeError("fetch denied"), reason="join_denied")
@@ -1810,102 +2012,45 @@ def _run_body(args: argparse.Namespace, *, client=None) -> int:
                         and bool(prev_sync or prev_cont)
                         and not retried_after_401
                     )
-                    streams_state[st.stream_key] = {
+                    new_entry = {
                         "sync_token": prev_sync if preserve_tokens else "",
                         "continuation_token": prev_cont if preserve_tokens else "",
                         "health": h,
                     }
-                break
 
-            events = _extract_events(cl, res)
-            before_appended = appended
-            _prefetch_sender_names_for_events(cl, sender_resolver, events)
-            for ev in events:
-                if args.discover_thread_mids and not st.thread_mid:
-                    for tmid in _extract_thread_mids_from_event(ev, st.square_chat_mid):
-                        discover_counts[st.route.rid][tmid] += 1
-
-                msg = _best_message_from_event(cl, ev)
-                if args.discover_thread_mids and not st.thread_mid and msg is not None:
-                    related_for_discover = _related_message_id(cl, msg, ev)
-                    if related_for_discover:
-                        tmid = _resolve_thread_mid_via_api(cl, st.square_chat_mid, related_for_discover)
-                        if tmid:
-                            discover_counts[st.route.rid][tmid] += 1
-
-                if msg is None:
-                    continue
-                body = _message_text(cl, msg)
-                if body == "[本文なし]" and not args.include_empty:
-                    continue
-                ts = _msg_time(cl, msg)
-                if not ts:
-                    ts = _event_time(cl, ev)
-                when = _format_line_msg_when(ts)
-                date_part = when.split()[0] if when and " " in when else when or "?"
-                sender = str(_msg_sender_mid(cl, msg) or "")
-                my_sm = my_square_mids.get(st.square_chat_mid, "")
-                direction = (
-                    "送信"
-                    if sender
-                    and (sender == my_sm or sender == str(getattr(cl, "mid", "")))
-                    else "受信"
-                )
-                sender_label = sender_resolver.label(sender, chat_mid=st.square_chat_mid)
-                msg_id = _message_id(cl, msg, "")
-                related_id = _related_message_id(cl, msg, ev)
-                dk = _dedup_key(st.stream_key, msg_id, ts, body)
-                if dk in seen_dedup:
-                    continue
-
-                kind = _heading_stream_kind(thread_mid=st.thread_mid or "", related_id=related_id)
-                heading = _build_open_chat_heading(
-                    date_part=date_part,
-                    kind=kind,
-                    org_label=st.route.org_label,
-                    direction=direction,
-                    sender_label=sender_label,
-                    summary=make_summary(body),
-                    thread_display_title=thread_display_title if kind == "【スレッド】" else "",
-                )
-                body_for_write = body
-                if related_id:
-                    body_for_write = f"[relatedMessageId] {related_id}\n\n{body}"
-                if skip_md_state:
-                    if args.dry_run or args.discover_only:
-                        pass  # discover-only は件数のみ（下で discover_counts）
+            if not skip_md_state and not stream_had_error:
+                entry: dict[str, Any] = {
+                    "sync_token": sync_token or "",
+                    "continuation_token": cont_token or "",
+                }
+                delta = appended - stream_appended_start
+                if st.thread_mid:
+                    entry["health"] = _health_on_success(sdata)
+                    thread_stats.ok += 1
+                    thread_stats.appended += delta
+                    route_thread_stats[rid].ok += 1
+                    route_thread_stats[rid].appended += delta
                 else:
-                    _append_markdown(st.route.output_md, heading, body_for_write)
-                if not skip_md_state:
-                    seen_dedup.add(dk)
-                    new_dedup.add(dk)
-                    appended += 1
-
-            sync_token, cont_token = _extract_tokens(cl, res, sync_token, cont_token)
-            has_next = bool(cont_token)
-            no_new_data = len(events) == 0 or appended == before_appended
-            if not has_next and no_new_data:
-                break
-            if not has_next and len(events) > 0:
-                # 同一 sync 内の続きがないのでこのストリームは完了
-                cont_token = ""
-                break
-
-        if not skip_md_state and not stream_had_error:
-            entry: dict[str, Any] = {
-                "sync_token": sync_token or "",
-                "continuation_token": cont_token or "",
-            }
-            delta = appended - stream_appended_start
-            if st.thread_mid:
-                entry["health"] = _health_on_success(sdata)
-                thread_stats.ok += 1
-                thread_stats.appended += delta
-                route_thread_stats[rid].ok += 1
-                route_thread_stats[rid].appended += delta
-            else:
-                route_main_appended[rid] += delta
-            streams_state[st.stream_key] = entry
+                    route_main_appended[rid] += delta
+                new_entry = entry
+
+            if not skip_md_state and new_entry is not None:
+                # MD は溜めただけ。output_md を書けたら state を進める
+                wrote = appended > stream_appended_start
+                pending_state.append((st.stream_key, st.route.output_md, new_entry, wrote))
+            if not skip_md_state and last_job_for_md[st.route.output_md] == i:
+                _checkpoint(st.route.output_md)
+    finally:
+        pool.shutdown(cancel_futures=True)
+        if not skip_md_state and (pending_state or MD_WRITER.pending()):
+            # 途中で落ちたときの残り（済んだストリームの分は書いて state を進める）
+            _checkpoint()
+    cl = holder.cl
+    sender_resolver.save()
+    if args.verbose:
+        print(f"# sender names: API 呼び出し {sender_resolver.api_calls} 回", file=sys.stderr)
+    if md_errors:
+        print(f"# MD 書き込み失敗 {len(md_errors)} 件（該当ストリームは次回取り直し）", file=sys.stderr)
 
     # include_threads なのに thread ストリーム0件の route も統計に載せる
     for route in routes:
@@ -1978,8 +2123,8 @@ def _run_body(args: argparse.Namespace, *, client=None) -> int:
     if args.discover_only:
         print("# discover-only 完了（MD/state/dedup は未更新）", file=sys.stderr)
 
-    if new_dedup and not skip_md_state:
-        _save_dedup(dedup_path, seen_dedup)
+    if not skip_md_state:
+        seen_dedup.save()
     if not skip_md_state:
         _save_state(state_path, state)
 
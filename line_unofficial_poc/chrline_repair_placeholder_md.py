@@ -14,6 +14,7 @@ from datetime import datetime
 from pathlib import Path
 
 from chrline_client_utils import build_logged_in_client, save_root_from_env
+from chrline_dedup_store import DedupStore
 from chrline_md_block_utils import (
     YoritooriBlock,
     build_yoritoori_block,
@@ -28,16 +29,14 @@ from chrline_sync_delta_poc import (
     _msg_time,
 )
 from chrline_sync_to_yoritoori import (
-    DEDUP_FILENAME,
     _default_kamiooya_kanji_yoritoori_path,
     _default_leaf_yoritoori_path,
     _default_tcell_yoritoori_path,
     _is_textual_body,
-    _load_dedup,
     _load_retry_queue,
     _message_dedup_key,
+    _open_dedup,
     _resolve_group_mid_by_title,
-    _save_dedup,
 )
 
 
@@ -144,7 +143,7 @@ def repair_md_file(
     fetch_depth: int,
     dry_run: bool,
     receive_only: bool,
-    seen_keys: set[str],
+    seen_keys: DedupStore,
     verbose: bool,
 ) -> dict:
     text = md_path.read_text(encoding="utf-8")
@@ -267,8 +266,7 @@ def main() -> int:
         print("修復対象の chatMid を解決できませんでした。", file=sys.stderr)
         return 1
 
-    dedup_path = save_root / DEDUP_FILENAME
-    seen_keys = _load_dedup(dedup_path)
+    seen_keys = _open_dedup(save_root)
     queue = _load_retry_queue(save_root / ".chrline_sync_retry_queue.json")
     _ = queue  # 将来 dk 突合用
 
@@ -300,8 +298,8 @@ def main() -> int:
             f"{md_path.parent.name}: placeholder={rep['placeholder']} repaired={rep['repaired']} failed={rep['failed']}"
         )
 
-    if not args.dry_run and seen_keys:
-        _save_dedup(dedup_path, seen_keys)
+    if not args.dry_run:
+        seen_keys.save()
 
     summary = {
         "generated_at": datetime.now().isoformat(timespec="seconds"),
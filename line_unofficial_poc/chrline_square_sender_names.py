@@ -1,11 +1,39 @@
-"""Square オープンチャット: 送信者 MID → 表示名の解決。"""
+"""Square オープンチャット: 送信者 MID → 表示名の解決。
+
+表示名は LINE_UNOFFICIAL_AUTH_DIR/.chrline_square_sender_names.json に実行をまたいで保存する。
+取れた名前は NAME_TTL、取れなかった MID は FAILED_TTL の間 API を呼ばない。
+期限切れでも名前は残し、再取得に失敗したら前回の名前を使う。
+"""
 from __future__ import annotations
 
+import json
+import os
+import time
+from pathlib import Path
 from typing import Any
 
 BATCH_SIZE = 50
 SELF_LABEL = "自分"
 UNKNOWN_LABEL = "不明"
+CACHE_FILENAME = ".chrline_square_sender_names.json"
+NAME_TTL = 7 * 86400
+FAILED_TTL = 86400
+PREFETCH_SEEN_WITHIN = 30 * 86400  # 起動時にまとめて更新するのは直近この期間に見た MID だけ
+
+
+def sender_name_cache_path(save_root: Path) -> Path:
+    return save_root / CACHE_FILENAME
+
+
+def _load_cache(path: Path) -> dict[str, dict[str, Any]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    members = data.get("members") if isinstance(data, dict) else None
+    if not isinstance(members, dict):
+        return {}
+    return {str(k): v for k, v in members.items() if isinstance(v, dict)}
 
 
 def _sanitize_heading_part(text: str) -> str:
@@ -71,18 +99,90 @@ def _iter_square_members(cl, resp: Any) -> list[Any]:
 
 
 class SquareSenderNameResolver:
-    """getSquareMembers で表示名を解決（セッション内キャッシュ）。"""
+    """getSquareMembers で表示名を解決。cache_path を渡すと実行をまたいでキャッシュ（save() で書く）。"""
 
-    def __init__(self, cl, *, my_square_mids: dict[str, str] | None = None):
+    def __init__(self, cl, *, my_square_mids: dict[str, str] | None = None, cache_path: Path | None = None):
         self.cl = cl
         self.my_square_mids = dict(my_square_mids or {})
         self._my_square_mid_set = {v for v in self.my_square_mids.values() if v}
         self._cache: dict[str, str] = {}
         self._pending: set[str] = set()
         self._failed: set[str] = set()
+        self.cache_path = cache_path
+        self._disk: dict[str, dict[str, Any]] = {}
+        self._stale: dict[str, str] = {}  # 期限切れの前回名（再取得失敗時に使う）
+        self._dirty = False
+        self.api_calls = 0
+        if cache_path is not None:
+            self._load_disk()
         for smid in self._my_square_mid_set:
             self._cache[smid] = SELF_LABEL
 
+    def _load_disk(self) -> None:
+        now = time.time()
+        self._disk = _load_cache(self.cache_path)
+        for mid, ent in self._disk.items():
+            fetched_at = float(ent.get("fetched_at") or 0)
+            name = str(ent.get("name") or "")
+            if ent.get("ok") and now - fetched_at < NAME_TTL:
+                self._cache[mid] = name
+            elif not ent.get("ok") and now - fetched_at < FAILED_TTL:
+                self._failed.add(mid)
+                self._cache[mid] = name or _short_mid(mid)
+            elif name:
+                self._stale[mid] = name
+
+    def _remember(self, mid: str, name: str, *, ok: bool) -> None:
+        now = time.time()
+        if ok:
+            self._cache[mid] = name
+            self._stale.pop(mid, None)
+        else:
+            self._failed.add(mid)
+            self._cache[mid] = self._stale.pop(mid, "") or _short_mid(mid)
+        if self.cache_path is not None:
+            # 失敗時も前回名は残す（FAILED_TTL の間は再取得しない）
+            prev_name = str((self._disk.get(mid) or {}).get("name") or "")
+            self._disk[mid] = {"name": name if ok else prev_name, "ok": ok, "fetched_at": now, "seen_at": now}
+            self._dirty = True
+
+    def _touch(self, mid: str) -> None:
+        ent = self._disk.get(mid)
+        if ent is None:
+            return
+        now = time.time()
+        if now - float(ent.get("seen_at") or 0) > 3600:
+            ent["seen_at"] = now
+            self._dirty = True
+
+    def prefetch_known(self) -> int:
+        """保存済みで期限切れ、かつ最近見た MID をまとめて再取得（起動時用）。件数を返す。"""
+        now = time.time()
+        mids = [
+            mid
+            for mid in self._stale
+            if now - float((self._disk.get(mid) or {}).get("seen_at") or 0) < PREFETCH_SEEN_WITHIN
+        ]
+        self.queue_many(mids)
+        self.flush()
+        return len(mids)
+
+    def save(self) -> None:
+        """キャッシュを書く（他プロセスの更新は fetched_at の新しい方を残してマージ）。"""
+        if self.cache_path is None or not self._dirty:
+            return
+        merged = _load_cache(self.cache_path)
+        for mid, ent in self._disk.items():
+            cur = merged.get(mid)
+            if cur is None or float(ent.get("fetched_at") or 0) >= float(cur.get("fetched_at") or 0):
+                merged[mid] = ent
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(self.cache_path.suffix + f".tmp.{os.getpid()}")
+        tmp.write_text(json.dumps({"members": merged}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.cache_path)
+        self._disk = merged
+        self._dirty = False
+
     def register_my_square_mid(self, chat_mid: str, square_member_mid: str) -> None:
         chat_mid = (chat_mid or "").strip()
         square_member_mid = (square_member_mid or "").strip()
@@ -123,6 +223,7 @@ class SquareSenderNameResolver:
         if not mids:
             return
         try:
+            self.api_calls += 1
             resp = self.cl.getSquareMembers(mids)
         except Exception:
             for mid in mids:
@@ -138,7 +239,7 @@ class SquareSenderNameResolver:
                 self._cache[smid] = SELF_LABEL
                 continue
             name = _member_display_name(self.cl, member)
-            self._cache[smid] = name or _short_mid(smid)
+            self._remember(smid, name or _short_mid(smid), ok=True)
         for mid in mids:
             if mid not in found:
                 self._fetch_single(mid)
@@ -150,10 +251,10 @@ class SquareSenderNameResolver:
             self._cache[mid] = SELF_LABEL
             return
         try:
+            self.api_calls += 1
             resp = self.cl.getSquareMember(mid)
         except Exception:
-            self._failed.add(mid)
-            self._cache[mid] = _short_mid(mid)
+            self._remember(mid, "", ok=False)
             return
         member = self.cl.checkAndGetValue(resp, "squareMember", 1)
         if member is None and isinstance(resp, dict):
@@ -161,7 +262,7 @@ class SquareSenderNameResolver:
         if member is None:
             member = resp
         name = _member_display_name(self.cl, member)
-        self._cache[mid] = name or _short_mid(mid)
+        self._remember(mid, name or _short_mid(mid), ok=True)
 
     def label(self, sender_mid: str, *, chat_mid: str = "") -> str:
         s = (sender_mid or "").strip()
@@ -170,6 +271,7 @@ class SquareSenderNameResolver:
         if self.is_self(s, chat_mid=chat_mid):
             return SELF_LABEL
         if s in self._cache:
+            self._touch(s)
             return self._cache[s]
         self.queue_many([s])
         self.flush()
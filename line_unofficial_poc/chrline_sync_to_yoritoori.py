@@ -20,7 +20,8 @@ CHRLINE sync の差分と getRecentMessagesV2 補完から、指定した 1:1 
 
 状態・重複:
   - sync リビジョンは chrline_sync_delta_poc と同じ .chrline_sync_delta_state.json
-  - 追記済みは LINE_UNOFFICIAL_AUTH_DIR の .chrline_sync_yoritoori_dedup.json（message id + 時刻）
+  - 追記済みは LINE_UNOFFICIAL_AUTH_DIR の .chrline_dedup.sqlite3（ns=sync_yoritoori、message id + 時刻）
+    旧 .chrline_sync_yoritoori_dedup.json は初回に取り込む
   - グループは sync の Operation に乗らない／E2EE で本文がプレースホルダになり sync から落ちることがあるため、
     各ターゲットに対し getRecentMessagesV2 による直近補完（--direct-backfill-count、既定 120）を毎回実施する。
 """
@@ -39,6 +40,7 @@ from pathlib import Path
 from CHRLINE.services.thrift.ttypes import OpType
 
 from chrline_client_utils import build_logged_in_client, save_root_from_env
+from chrline_dedup_store import DedupStore, dedup_db_path
 from chrline_md_block_utils import build_yoritoori_block, upsert_resolved_block
 from chrline_media_to_stock import attach_md_block, try_save_line_media
 from chrline_md_utils import (
@@ -147,7 +149,8 @@ _LEAF_GROUP_PEER_LABEL_DEFAULT = "Grandole志賀本通 I 管理"
 _KAMIOOYA_KANJI_GROUP_TITLE_DEFAULT = "東海飲み会幹事やりとり"
 _KAMIOOYA_KANJI_ORG_LABEL_DEFAULT = "東海飲み会幹事やりとり"
 
-DEDUP_FILENAME = ".chrline_sync_yoritoori_dedup.json"
+DEDUP_FILENAME = ".chrline_sync_yoritoori_dedup.json"  # 旧形式（DedupStore への移行元）
+DEDUP_NS = "sync_yoritoori"
 DECODE_STATS_FILENAME = ".chrline_sync_decode_stats.jsonl"
 RETRY_QUEUE_FILENAME = ".chrline_sync_retry_queue.json"
 LOCK_FILENAME = ".chrline_sync_to_yoritoori.lock"
@@ -212,30 +215,8 @@ def insert_block_after_timeline_header(content: str, block: str) -> str:
     return content[:pos].rstrip() + "\n\n" + block.strip() + "\n\n" + content[pos:].lstrip()
 
 
-def _dedup_path(save_root: Path) -> Path:
-    return save_root / DEDUP_FILENAME
-
-
-def _load_dedup(path: Path) -> set[str]:
-    if not path.is_file():
-        return set()
-    try:
-        data = json.loads(path.read_text(encoding="utf-8"))
-        keys = data.get("keys")
-        if isinstance(keys, list):
-            return {str(x) for x in keys if x}
-    except (json.JSONDecodeError, OSError):
-        pass
-    return set()
-
-
-def _save_dedup(path: Path, keys: set[str]) -> None:
-    path.parent.mkdir(parents=True, exist_ok=True)
-    trimmed = sorted(keys)[-3000:]
-    path.write_text(
-        json.dumps({"keys": trimmed}, ensure_ascii=False, indent=2),
-        encoding="utf-8",
-    )
+def _open_dedup(save_root: Path) -> DedupStore:
+    return DedupStore(dedup_db_path(save_root), DEDUP_NS, legacy_json=save_root / DEDUP_FILENAME)
 
 
 @dataclass(frozen=True)
@@ -600,7 +581,7 @@ def _append_direct_backfill_from_recent(
     target: _YoritooriTarget,
     receive_only: bool,
     count: int,
-    seen_keys: set[str],
+    seen_keys: DedupStore,
     new_keys: set[str],
     skip_e2ee_key_register: bool,
     dry_run: bool,
@@ -739,7 +720,7 @@ def _process_retry_queue(
     *,
     queue_items: dict[str, dict],
     route_target_map: dict[tuple[str, str], tuple[_YoritooriRoute, _YoritooriTarget]],
-    seen_keys: set[str],
+    seen_keys: DedupStore,
     new_keys: set[str],
     dry_run: bool,
     skip_e2ee_key_register: bool,
@@ -1266,13 +1247,12 @@ def run(args: argparse.Namespace, *, client=None) -> int:
 
     receive_only = not args.include_send
 
-    dedup_file = _dedup_path(save_root)
     stats_file = (
         Path(args.decode_stats_file).expanduser().resolve()
         if args.decode_stats_file.strip()
         else _decode_stats_path(save_root)
     )
-    seen_keys = _load_dedup(dedup_file)
+    seen_keys = _open_dedup(save_root)
     new_keys: set[str] = set()
     decode_stats: dict[str, dict] = {}
 
@@ -1642,7 +1622,7 @@ def run(args: argparse.Namespace, *, client=None) -> int:
             appended += wrote_pending
 
         if new_keys and not args.dry_run:
-            _save_dedup(dedup_file, seen_keys)
+            seen_keys.save()
 
         if not args.dry_run and (ops or max_seen > (saved_rev_i or 0)):
             _save_state(
@@ -522,6 +522,8 @@ def build_alerts(
 
 
 def scan_gmail(svc, newer_days: int = 60) -> list[dict[str, Any]]:
+    from jarvis_gmail_store import fetch_messages
+
     queries = [
         # 金額が入るのはメール表示設定ON時のみ。OFFでもカード特定・通知日は取れる
         f'from:statement@vpass.ne.jp subject:お支払い金額のお知らせ newer_than:{newer_days}d',
@@ -542,17 +544,10 @@ def scan_gmail(svc, newer_days: int = 60) -> list[dict[str, Any]]:
             .list(userId="me", q=query, maxResults=25)
             .execute()
         )
-        for m in r.get("messages") or []:
-            mid = m["id"]
-            if mid in seen:
-                continue
-            seen.add(mid)
-            full = (
-                svc.users()
-                .messages()
-                .get(userId="me", id=mid, format="full")
-                .execute()
-            )
+        ids = [m["id"] for m in r.get("messages") or [] if m["id"] not in seen]
+        seen.update(ids)
+        for full in fetch_messages(svc, ids):
+            mid = full["id"]
             hdrs = headers_map(full)
             subj = hdrs.get("Subject") or ""
             if "ご利用のお知らせ" in subj or "すぐチャン" in subj:
@@ -510,60 +510,102 @@ def collect_action_summaries(
     }
 
 
-def push_supabase(result: dict[str, Any]) -> int:
+CARDS_LOCKED_STATUS = ("archived", "promoted")
+IN_CHUNK = 80
+UPSERT_MAX_ROWS = 500
+
+
+def card_row(c: dict[str, Any]) -> dict[str, Any]:
+    """cards JSON の1件 → cards 行（remote マージ前）。"""
+    row = {
+        "id": c["id"],
+        "lane": c["lane"],
+        "kind": c.get("kind") or "note",
+        "title": c["title"],
+        "summary": c.get("summary"),
+        "status": c.get("status") or "active",
+        "source_path": c.get("source_path"),
+        "cursor_prompt": c.get("cursor_prompt"),
+        "payload": c.get("payload") or {},
+        "sort_key": c.get("sort_key"),
+        "updated_at": c.get("updated_at") or now_iso(),
+    }
+    if c.get("archived_at"):
+        row["archived_at"] = c["archived_at"]
+    return row
+
+
+def push_supabase(
+    result: dict[str, Any], *, scope: str = "cards", resend_all: bool = False
+) -> int:
+    """前回 push から変わったカードだけ upsert。消えたカードは active のままなら archived にする。
+
+    scope: push 台帳の区分（通常カードと処置要約・レーン絞り込みは別集合なので分ける）。
+    """
     from supabase import create_client
 
+    from jarvis_push_manifest import PushManifest
+
     url = (os.environ.get("JARVIS_SUPABASE_URL") or "").strip()
     key = (os.environ.get("JARVIS_SUPABASE_SERVICE_ROLE_KEY") or "").strip()
     if not url or not key:
         raise SystemExit("JARVIS_SUPABASE_* 未設定")
     sb = create_client(url, key)
-    # Web で archived / promoted 済みの id は active に戻さない
+    manifest = PushManifest(resend_all=resend_all)
+    local_by_id = {r["id"]: r for r in (card_row(c) for c in result.get("cards") or [])}
+    changed, removed = manifest.diff(scope, local_by_id)
+    # Web で archived / promoted 済みの id は active に戻さない（変わった id だけ引く）
     remote_locked: dict[str, Any] = {}
     try:
-        r = (
-            sb.table("cards")
-            .select("id,status,archived_at,payload")
-            .in_("status", ["archived", "promoted"])
-            .execute()
-        )
-        remote_locked = {x["id"]: x for x in (r.data or [])}
+        for i in range(0, len(changed), IN_CHUNK):
+            r = (
+                sb.table("cards")
+                .select("id,status,archived_at,payload")
+                .in_("id", changed[i : i + IN_CHUNK])
+                .in_("status", list(CARDS_LOCKED_STATUS))
+                .execute()
+            )
+            for x in r.data or []:
+                remote_locked[x["id"]] = x
     except Exception as e:
         print(f"# cards status merge skipped: {e}", file=sys.stderr)
 
     rows = []
-    for c in result.get("cards") or []:
-        st = c.get("status") or "active"
-        arch_at = c.get("archived_at")
-        payload = c.get("payload") or {}
-        if c["id"] in remote_locked:
-            locked = remote_locked[c["id"]]
-            st = locked.get("status") or st
-            arch_at = locked.get("archived_at") or arch_at
+    for iid in changed:
+        row = dict(local_by_id[iid])
+        if iid in remote_locked:
+            locked = remote_locked[iid]
+            row["status"] = locked.get("status") or row["status"]
+            arch_at = locked.get("archived_at") or row.get("archived_at")
+            if arch_at:
+                row["archived_at"] = arch_at
             # Notion URL 等を落とさない
             if isinstance(locked.get("payload"), dict):
-                payload = {**payload, **locked["payload"]}
-        row = {
-            "id": c["id"],
-            "lane": c["lane"],
-            "kind": c.get("kind") or "note",
-            "title": c["title"],
-            "summary": c.get("summary"),
-            "status": st,
-            "source_path": c.get("source_path"),
-            "cursor_prompt": c.get("cursor_prompt"),
-            "payload": payload,
-            "sort_key": c.get("sort_key"),
-            "updated_at": c.get("updated_at") or now_iso(),
-        }
-        if arch_at:
-            row["archived_at"] = arch_at
+                row["payload"] = {**row["payload"], **locked["payload"]}
         rows.append(row)
     n = 0
-    for i in range(0, len(rows), 40):
-        chunk = rows[i : i + 40]
+    for i in range(0, len(rows), UPSERT_MAX_ROWS):
+        chunk = rows[i : i + UPSERT_MAX_ROWS]
         sb.table("cards").upsert(chunk, on_conflict="id").execute()
         n += len(chunk)
+    # 消えたカードは削除せず archived に（card_comments が on delete cascade で消えるため）
+    archived = 0
+    for i in range(0, len(removed), IN_CHUNK):
+        r = (
+            sb.table("cards")
+            .update({"status": "archived", "archived_at": now_iso(), "updated_at": now_iso()})
+            .in_("id", removed[i : i + IN_CHUNK])
+            .eq("status", "active")
+            .execute()
+        )
+        archived += len(r.data or [])
+    manifest.mark(scope, {i: local_by_id[i] for i in changed})
+    manifest.forget(scope, removed)
+    manifest.save()
+    print(
+        f"# cards[{scope}] upserted {n} (unchanged {len(local_by_id) - n}) archived {archived}/{len(removed)}",
+        file=sys.stderr,
+    )
     sb.table("sync_meta").upsert(
         {"key": "cards_pushed_at", "value": now_iso(), "updated_at": now_iso()},
         on_conflict="key",
@@ -596,6 +638,7 @@ def main(argv: list[str] | None = None) -> int:
         help="Gemini 処置要約（kind=action_summary）を生成。max_auto_cards とは独立",
     )
     ap.add_argument("--lane", default="", help="--action-summary 時のレーン絞り込み")
+    ap.add_argument("--resend-all", action="store_true", help="push 台帳を無視して全カードを送る")
     ap.add_argument(
         "--action-summary-max",
         type=int,
@@ -629,7 +672,11 @@ def main(argv: list[str] | None = None) -> int:
             if k != "total":
                 print(f"  {k}: {v}")
     if args.push:
-        n = push_supabase(result)
+        if args.action_summary:
+            scope = f"cards:action_summary:{args.lane.strip() or '*'}"
+        else:
+            scope = "cards"
+        n = push_supabase(result, scope=scope, resend_all=args.resend_all)
         print(f"# pushed {n}", file=sys.stderr)
     if args.json:
         print(json.dumps(result, ensure_ascii=False, indent=2))
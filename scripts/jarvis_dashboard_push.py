@@ -6,6 +6,9 @@ Jarvis: ローカル queue / situation_watch を jarvis-dashboard（Supabase）
   python scripts/jarvis_dashboard_push.py
   python scripts/jarvis_dashboard_push.py --triage-only
   python scripts/jarvis_dashboard_push.py --watch-only
+  python scripts/jarvis_dashboard_push.py --resend-all   # 台帳を無視して全行送り直し
+
+変わった行だけ送る（.jarvis_state/dashboard_push_manifest.json、jarvis_push_manifest 参照）。
 
 要: JARVIS_SUPABASE_URL + JARVIS_SUPABASE_SERVICE_ROLE_KEY
 """
@@ -78,100 +81,135 @@ def refresh_watch() -> None:
     subprocess.run([exe, str(WATCH_SCRIPT)], cwd=str(REPO), check=False, timeout=60)
 
 
-def push_triage(sb) -> int:
+# Web で閉じた行（sent/skipped/snoozed/done）を Mac push で pending に戻さない。
+TRIAGE_PROTECTED = {"sent", "skipped", "snoozed", "done"}
+# Web で保存した draft_text / payload メタも潰さない。
+TRIAGE_KEEP_PAYLOAD = (
+    "sent_at",
+    "gmail_sent_id",
+    "gmail_sent_thread_id",
+    "yoritoori_appended",
+    "yoritoori_appended_at",
+    "web_draft_saved_at",
+)
+# queue.json から消えた id（差し替わった activity 等）は Web で触っていなければ remote からも消す
+TRIAGE_DELETABLE_STATUS = ["pending", "info"]
+IN_CHUNK = 80  # .in_() は GET の URL に載るので id 数を抑える
+UPSERT_MAX_ROWS = 500  # 通常は1回の upsert。初回・--resend-all で多いときだけ分ける
+
+
+def open_manifest(*, resend_all: bool = False):
+    scripts_dir = str(Path(__file__).resolve().parent)
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    from jarvis_push_manifest import PushManifest
+
+    return PushManifest(resend_all=resend_all)
+
+
+def upsert_rows(sb, table: str, rows: list[dict[str, Any]]) -> int:
+    for i in range(0, len(rows), UPSERT_MAX_ROWS):
+        sb.table(table).upsert(rows[i : i + UPSERT_MAX_ROWS], on_conflict="id").execute()
+    return len(rows)
+
+
+def triage_local_row(it: dict[str, Any]) -> dict[str, Any]:
+    """queue.json の1件 → triage_items 行（remote マージ前）。"""
+    payload = {
+        k: it.get(k)
+        for k in (
+            "reason",
+            "draft_gemini",
+            "draft_cursor",
+            "message_id_header",
+            "engine",
+        )
+        if it.get(k) is not None
+    }
+    return {
+        "id": str(it.get("id") or "").strip(),
+        "lane": it.get("lane") or "partner",
+        "kind": it.get("kind") or "mail",
+        "status": it.get("status") or "pending",
+        "partner": it.get("partner") or None,
+        "folder": it.get("folder") or None,
+        "subject": it.get("subject") or None,
+        "received_at": it.get("received_at") or None,
+        "summary": it.get("summary") or None,
+        "draft_text": it.get("draft_text") or None,
+        "original_body": (str(it.get("original_body") or ""))[:8000] or None,
+        "priority": it.get("priority") or None,
+        "channel": it.get("channel") or None,
+        "account": it.get("account") or None,
+        "gmail_thread_id": it.get("gmail_thread_id") or None,
+        "gmail_message_id": it.get("gmail_message_id") or None,
+        "from_email": it.get("from_email") or None,
+        "seq": it.get("seq"),
+        "payload": payload,
+        "updated_at": it.get("updated_at") or now_iso(),
+    }
+
+
+def merge_triage_remote(row: dict[str, Any], remote: dict[str, Any]) -> dict[str, Any]:
+    out = dict(row)
+    remote_st = str(remote.get("status") or "")
+    if out["status"] == "pending" and remote_st in TRIAGE_PROTECTED:
+        out["status"] = remote_st
+    payload = dict(row["payload"])
+    remote_payload = remote.get("payload") if isinstance(remote.get("payload"), dict) else {}
+    for k in TRIAGE_KEEP_PAYLOAD:
+        if remote_payload.get(k) is not None:
+            payload[k] = remote_payload[k]
+    out["payload"] = payload
+    if remote_payload.get("web_draft_saved_at") and remote.get("draft_text"):
+        out["draft_text"] = remote.get("draft_text")
+    return out
+
+
+def push_triage(sb, manifest=None) -> int:
+    """前回 push から変わった行だけ remote とマージして upsert（manifest=None なら全行）。"""
     if not QUEUE_PATH.is_file():
         print("# triage: queue.json なし", file=sys.stderr)
         return 0
     data = json.loads(QUEUE_PATH.read_text(encoding="utf-8"))
     items = data.get("items") or []
-    # Web で閉じた行（sent/skipped/snoozed/done）を Mac push で pending に戻さない。
-    # Web で保存した draft_text / payload メタも潰さない。
-    PROTECTED = {"sent", "skipped", "snoozed", "done"}
-    KEEP_PAYLOAD = (
-        "sent_at",
-        "gmail_sent_id",
-        "gmail_sent_thread_id",
-        "yoritoori_appended",
-        "yoritoori_appended_at",
-        "web_draft_saved_at",
-    )
+    local_rows = dedupe_rows_by_id([triage_local_row(it) for it in items], label="triage")
+    local_by_id = {r["id"]: r for r in local_rows}
+    if manifest is not None:
+        changed, removed = manifest.diff("triage_items", local_by_id)
+    else:
+        changed, removed = list(local_by_id), []
     remote_by_id: dict[str, dict[str, Any]] = {}
-    ids = [str(it.get("id") or "").strip() for it in items if str(it.get("id") or "").strip()]
     try:
-        for i in range(0, len(ids), 80):
-            chunk_ids = ids[i : i + 80]
+        for i in range(0, len(changed), IN_CHUNK):
             r = (
                 sb.table("triage_items")
                 .select("id,status,draft_text,payload,updated_at")
-                .in_("id", chunk_ids)
+                .in_("id", changed[i : i + IN_CHUNK])
                 .execute()
             )
             for x in r.data or []:
                 remote_by_id[str(x["id"])] = x
     except Exception as e:
         print(f"# triage protected merge skipped: {e}", file=sys.stderr)
-    rows: list[dict[str, Any]] = []
-    for it in items:
-        iid = str(it.get("id") or "").strip()
-        if not iid:
-            continue
-        st = it.get("status") or "pending"
-        remote = remote_by_id.get(iid) or {}
-        remote_st = str(remote.get("status") or "")
-        if st == "pending" and remote_st in PROTECTED:
-            st = remote_st
-        payload = {
-            k: it.get(k)
-            for k in (
-                "reason",
-                "draft_gemini",
-                "draft_cursor",
-                "message_id_header",
-                "engine",
-            )
-            if it.get(k) is not None
-        }
-        remote_payload = remote.get("payload") if isinstance(remote.get("payload"), dict) else {}
-        for k in KEEP_PAYLOAD:
-            if remote_payload.get(k) is not None:
-                payload[k] = remote_payload[k]
-        draft_text = it.get("draft_text") or None
-        if remote_payload.get("web_draft_saved_at") and remote.get("draft_text"):
-            draft_text = remote.get("draft_text")
-        rows.append(
-            {
-                "id": iid,
-                "lane": it.get("lane") or "partner",
-                "kind": it.get("kind") or "mail",
-                "status": st,
-                "partner": it.get("partner") or None,
-                "folder": it.get("folder") or None,
-                "subject": it.get("subject") or None,
-                "received_at": it.get("received_at") or None,
-                "summary": it.get("summary") or None,
-                "draft_text": draft_text,
-                "original_body": (str(it.get("original_body") or ""))[:8000] or None,
-                "priority": it.get("priority") or None,
-                "channel": it.get("channel") or None,
-                "account": it.get("account") or None,
-                "gmail_thread_id": it.get("gmail_thread_id") or None,
-                "gmail_message_id": it.get("gmail_message_id") or None,
-                "from_email": it.get("from_email") or None,
-                "seq": it.get("seq"),
-                "payload": payload,
-                "updated_at": it.get("updated_at") or now_iso(),
-            }
+    rows = [merge_triage_remote(local_by_id[i], remote_by_id.get(i) or {}) for i in changed]
+    n = upsert_rows(sb, "triage_items", rows) if rows else 0
+    deleted = 0
+    for i in range(0, len(removed), IN_CHUNK):
+        r = (
+            sb.table("triage_items")
+            .delete()
+            .in_("id", removed[i : i + IN_CHUNK])
+            .in_("status", TRIAGE_DELETABLE_STATUS)
+            .execute()
         )
-    rows = dedupe_rows_by_id(rows, label="triage")
-    if not rows:
+        deleted += len(r.data or [])
+    if manifest is not None:
+        manifest.mark("triage_items", {i: local_by_id[i] for i in changed})
+        manifest.forget("triage_items", removed)
+    if not local_rows:
         print("# triage: 0 rows", file=sys.stderr)
         return 0
-    # chunk upsert
-    n = 0
-    for i in range(0, len(rows), 50):
-        chunk = rows[i : i + 50]
-        sb.table("triage_items").upsert(chunk, on_conflict="id").execute()
-        n += len(chunk)
     sb.table("sync_meta").upsert(
         {"key": "triage_pushed_at", "value": now_iso(), "updated_at": now_iso()},
         on_conflict="key",
@@ -183,11 +221,15 @@ def push_triage(sb) -> int:
         ],
         on_conflict="key",
     ).execute()
-    print(f"# triage upserted {n}", file=sys.stderr)
+    print(
+        f"# triage upserted {n} (unchanged {len(local_rows) - n}) deleted {deleted}/{len(removed)}",
+        file=sys.stderr,
+    )
     return n
 
 
-def push_watch(sb) -> int:
+def push_watch(sb, manifest=None) -> int:
+    """remote は全件1回で読む（Web の ack をローカル state へ戻すため）。upsert は変わった行だけ。"""
     refresh_watch()
     if not WATCH_PATH.is_file():
         print("# watch: situation_watch.json なし", file=sys.stderr)
@@ -510,7 +552,19 @@ def push_watch(sb) -> int:
     rows = dedupe_rows_by_id(rows, label="watch")
     if not rows:
         return 0
-    sb.table("watch_status").upsert(rows, on_conflict="id").execute()
+    by_id = {r["id"]: r for r in rows}
+    if manifest is not None:
+        # remote マージ後の行で比べる（Web の ack を取り込んだ結果が変われば送る）。
+        # 消えた id は GHA も同じ id を書くので remote には残し、台帳から外すだけ
+        changed, removed = manifest.diff("watch_status", by_id)
+        if removed:
+            print(f"# watch: {len(removed)} ids はローカルに無い（remote は残す）", file=sys.stderr)
+            manifest.forget("watch_status", removed)
+    else:
+        changed = list(by_id)
+    n = upsert_rows(sb, "watch_status", [by_id[i] for i in changed]) if changed else 0
+    if manifest is not None:
+        manifest.mark("watch_status", {i: by_id[i] for i in changed})
     sb.table("sync_meta").upsert(
         [
             {"key": "watch_pushed_at", "value": now_iso(), "updated_at": now_iso()},
@@ -518,8 +572,8 @@ def push_watch(sb) -> int:
         ],
         on_conflict="key",
     ).execute()
-    print(f"# watch upserted {len(rows)}", file=sys.stderr)
-    return len(rows)
+    print(f"# watch upserted {n} (unchanged {len(rows) - n})", file=sys.stderr)
+    return n
 
 
 def push_other_mail_digest(sb=None) -> int:
@@ -600,7 +654,7 @@ def push_openchat_thread_health() -> int:
     return 0
 
 
-def push_lanes_finance_subscriptions() -> tuple[int, int, int, int]:
+def push_lanes_finance_subscriptions(*, resend_all: bool = False) -> tuple[int, int, int, int]:
     """サブプロセスで lanes / finance / subscriptions / occupancy を集約＋push。失敗しても 0。"""
     import subprocess
 
@@ -625,6 +679,7 @@ def push_lanes_finance_subscriptions() -> tuple[int, int, int, int]:
                 str(REPO / "scripts" / "jarvis_dashboard_lanes.py"),
                 "--action-summary",
                 "--push",
+                *(["--resend-all"] if resend_all else []),
             ],
             cwd=str(REPO),
             capture_output=True,
@@ -701,21 +756,31 @@ def main(argv: list[str] | None = None) -> int:
     ap.add_argument("--triage-only", action="store_true")
     ap.add_argument("--watch-only", action="store_true")
     ap.add_argument("--full", action="store_true", help="lanes/finance/subscriptions も含めて push")
+    ap.add_argument(
+        "--resend-all",
+        action="store_true",
+        help="push 台帳を無視して全行を送り直す（remote を作り直したとき等）",
+    )
     args = ap.parse_args(argv)
 
     sb = client()
+    manifest = open_manifest(resend_all=args.resend_all)
     t = w = digest = oc_digest = oc_health = 0
     if not args.watch_only:
-        t = push_triage(sb)
+        t = push_triage(sb, manifest)
+        manifest.save()
         digest = push_other_mail_digest(sb)
         oc_digest = push_openchat_digest()
     if not args.triage_only:
-        w = push_watch(sb)
+        w = push_watch(sb, manifest)
+        manifest.save()
         # watch 後に健全性で openchat_threads を上書き（構造化 payload）
         oc_health = push_openchat_thread_health()
     cards = finance = subscriptions = occupancy = 0
     if args.full or (not args.triage_only and not args.watch_only):
-        cards, finance, subscriptions, occupancy = push_lanes_finance_subscriptions()
+        cards, finance, subscriptions, occupancy = push_lanes_finance_subscriptions(
+            resend_all=args.resend_all
+        )
     print(
         json.dumps(
             {
@@ -15,7 +15,6 @@ Jarvis: 電力・太陽光キャッシュフロー収集
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import os
 import re
@@ -28,6 +27,9 @@ from zoneinfo import ZoneInfo
 
 import yaml
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 JST = ZoneInfo("Asia/Tokyo")
 REPO = Path(__file__).resolve().parents[1]
 CFG_PATH = REPO / "config" / "energy_cf.yaml"
@@ -75,23 +77,9 @@ def zaim_paths(cfg: dict[str, Any]) -> list[Path]:
     return out
 
 
-def read_zaim(path: Path) -> list[dict[str, str]]:
-    for enc in ("utf-8-sig", "cp932", "utf-8"):
-        try:
-            text = path.read_text(encoding=enc)
-            break
-        except UnicodeDecodeError:
-            text = ""
-    else:
-        return []
-    return list(csv.DictReader(text.splitlines()))
-
-
-def yen_field(row: dict[str, str], field: str) -> float:
-    try:
-        return float(str(row.get(field) or "0").replace(",", "") or 0)
-    except ValueError:
-        return 0.0
+def read_zaim(path: Path) -> list[dict[str, Any]]:
+    """共有キャッシュ経由（文字コードの判定もキャッシュ側。_date / _income / _expense 付き）。"""
+    return open_ledger(path).rows()
 
 
 def empty_month() -> dict[str, Any]:
@@ -160,13 +148,9 @@ def collect_from_zaim(cfg: dict[str, Any]) -> dict[str, dict[str, Any]]:
 
     for path in zaim_paths(cfg):
         for row in read_zaim(path):
-            d = (row.get("日付") or "").strip()
-            if len(d) < 10:
-                continue
-            try:
-                dt = datetime.strptime(d[:10], "%Y-%m-%d").date()
-            except ValueError:
+            if not row["_date"]:
                 continue
+            dt = date.fromisoformat(row["_date"])
             cat = row.get("カテゴリ") or ""
             item = "".join(
                 [
@@ -175,8 +159,8 @@ def collect_from_zaim(cfg: dict[str, Any]) -> dict[str, dict[str, Any]]:
                     row.get("お店") or "",
                 ]
             )
-            income = yen_field(row, "収入")
-            expense = yen_field(row, "支出")
+            income = row["_income"]
+            expense = row["_expense"]
             method = (row.get("方法") or "").strip()
 
             # buy エネワン or 切替前の自宅中部電力（賃貸δ除外）
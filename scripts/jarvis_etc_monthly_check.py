@@ -123,9 +123,10 @@ def gmail_etc_search(days: int = 45) -> list[dict]:
         '(subject:"ETCマイレージ" OR subject:"ＥＴＣマイレージ" OR subject:"還元" OR from:smile-etc.jp)'
     )
     res = service.users().messages().list(userId="me", q=q, maxResults=10).execute()
+    from jarvis_gmail_store import fetch_messages
+
     hits = []
-    for mid in res.get("messages", [])[:10]:
-        msg = service.users().messages().get(userId="me", id=mid["id"], format="metadata").execute()
+    for msg in fetch_messages(service, [m["id"] for m in res.get("messages", [])[:10]], "metadata"):
         headers = {h["name"].lower(): h["value"] for h in msg.get("payload", {}).get("headers", [])}
         hits.append(
             {
@@ -10,7 +10,6 @@ Jarvis: Zaim CSV → 法人/個人別の月次財務メトリクス（ローカ
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import os
 import sys
@@ -22,6 +21,9 @@ from zoneinfo import ZoneInfo
 
 import yaml
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 JST = ZoneInfo("Asia/Tokyo")
 REPO = Path(__file__).resolve().parents[1]
 MAP_PATH = REPO / "config" / "finance_entity_map.yaml"
@@ -84,55 +86,35 @@ def classify_row(row: dict[str, str], cfg: dict[str, Any]) -> tuple[str, str]:
     return entity, kind
 
 
-def yen(row: dict[str, str], field: str) -> float:
-    try:
-        return float(str(row.get(field) or "0").replace(",", "") or 0)
-    except ValueError:
-        return 0.0
-
-
 def aggregate(csv_path: Path, cfg: dict[str, Any], year: int, month: int | None) -> dict[str, Any]:
     buckets: dict[tuple[str, str, str], float] = defaultdict(float)
     # key: (ym, entity, metric)
     skipped = 0
     used = 0
-    with csv_path.open(encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            d = (row.get("日付") or "").strip()
-            if len(d) < 7:
-                continue
-            try:
-                dt = datetime.strptime(d[:10], "%Y-%m-%d").date()
-            except ValueError:
-                continue
-            if dt.year != year:
-                continue
-            if month is not None and dt.month != month:
-                continue
-            ym = f"{dt.year:04d}-{dt.month:02d}"
-            entity, kind = classify_row(row, cfg)
-            if entity == "skip":
-                skipped += 1
-                continue
-            method = (row.get("方法") or "").strip()
-            income = yen(row, "収入")
-            expense = yen(row, "支出")
-            used += 1
-            if method == "income" or income > 0:
-                buckets[(ym, entity, "income_total")] += income
-                if kind == "rent_income":
-                    buckets[(ym, entity, "rent_income")] += income
-                else:
-                    buckets[(ym, entity, kind)] += income
-            if method == "payment" or expense > 0:
-                buckets[(ym, entity, "expense_total")] += expense
-                if kind == "repair":
-                    buckets[(ym, entity, "repair_expense")] += expense
-                elif kind.startswith("rental") or kind == "rental_expense":
-                    buckets[(ym, entity, "rental_expense")] += expense
-                else:
-                    buckets[(ym, entity, "other_expense")] += expense
+    for row in open_ledger(csv_path).rows(year=year, month=month):
+        ym = row["_date"][:7]
+        entity, kind = classify_row(row, cfg)
+        if entity == "skip":
+            skipped += 1
+            continue
+        method = (row.get("方法") or "").strip()
+        income = row["_income"]
+        expense = row["_expense"]
+        used += 1
+        if method == "income" or income > 0:
+            buckets[(ym, entity, "income_total")] += income
+            if kind == "rent_income":
+                buckets[(ym, entity, "rent_income")] += income
+            else:
+                buckets[(ym, entity, kind)] += income
+        if method == "payment" or expense > 0:
+            buckets[(ym, entity, "expense_total")] += expense
+            if kind == "repair":
+                buckets[(ym, entity, "repair_expense")] += expense
+            elif kind.startswith("rental") or kind == "rental_expense":
+                buckets[(ym, entity, "rental_expense")] += expense
+            else:
+                buckets[(ym, entity, "other_expense")] += expense
 
     # cashflow = income - expense per entity/month
     months = sorted({k[0] for k in buckets})
@@ -0,0 +1,517 @@
+#!/usr/bin/env python3
+"""Gmail メッセージのローカル保管庫（SQLite）。夜間チェーンで同じメールを何度も GET しない。
+
+  本文・ヘッダ・添付一覧は一度取れば変わらないので (アカウント, message id) で持ち続ける。
+  変わるのはラベル（UNREAD / SENT 等）だけなので、history.list の差分同期で追う。
+  保存に無い分は batch HTTP（最大50件/リクエスト）でまとめて取る。
+  スレッドは threads.list が返す historyId が保存時と同じなら保存分から組み立てる。
+
+  検索（q=）は Gmail の意味論なので従来どおり list で id だけ取り、中身をここから引く:
+
+    store = GmailStore()
+    ids = [m["id"] for m in svc.users().messages().list(userId="me", q=q).execute().get("messages") or []]
+    for full in store.get_messages(svc, ids):   # 取りこぼしだけ batch で取得
+        ...
+
+  cd ~/git-repos
+  ~/selenium_env/venv/bin/python scripts/jarvis_gmail_store.py --sync token_livingsupport.json token_estate.json
+  ~/selenium_env/venv/bin/python scripts/jarvis_gmail_store.py --status
+"""
+from __future__ import annotations
+
+import argparse
+import base64
+import html
+import json
+import re
+import sqlite3
+import sys
+import time
+import zlib
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Iterable
+from zoneinfo import ZoneInfo
+
+JST = ZoneInfo("Asia/Tokyo")
+REPO = Path(__file__).resolve().parents[1]
+MANUAL = REPO / "215_kamiooya" / "C1_cursor" / "1b_Cursorマニュアル"
+STORE_PATH = REPO / ".jarvis_state" / "gmail_store.sqlite3"
+BATCH_SIZE = 50  # Gmail 推奨上限（100まで可だが 429 が出やすい）
+BATCH_INTERVAL = 1.0  # messages.get 50件 = 250 units ≒ 1秒あたりの per-user 上限
+SYNC_MAX_AGE = timedelta(minutes=10)  # これより新しい同期があれば history.list も呼ばない
+PREFETCH_LIMIT = 500  # 差分同期で先取りする新着の上限（超えた分は使うときに取る）
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+SCHEMA = """
+create table if not exists accounts (
+  account text primary key,
+  history_id text,
+  synced_at text
+);
+create table if not exists messages (
+  account text not null,
+  id text not null,
+  thread_id text,
+  fmt text not null,
+  internal_date integer,
+  labels text,
+  subject text,
+  from_addr text,
+  date_hdr text,
+  body_text text,
+  attachments text,
+  raw blob not null,
+  stale integer not null default 0,
+  fetched_at text,
+  primary key (account, id)
+);
+create index if not exists messages_thread on messages (account, thread_id);
+create index if not exists messages_date on messages (account, internal_date);
+create table if not exists threads (
+  account text not null,
+  id text not null,
+  history_id text,
+  message_ids text,
+  primary key (account, id)
+);
+"""
+
+
+def now_iso() -> str:
+    return datetime.now(JST).isoformat(timespec="seconds")
+
+
+# --- 解析（保存時に1回だけ） ---
+
+
+def header_map(payload: dict[str, Any]) -> dict[str, str]:
+    """小文字ヘッダ名 → 値（同名は先勝ち）。"""
+    out: dict[str, str] = {}
+    for h in payload.get("headers") or []:
+        name = (h.get("name") or "").lower()
+        if name and name not in out:
+            out[name] = h.get("value") or ""
+    return out
+
+
+def _b64(data: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4)).decode("utf-8", errors="replace")
+    except (ValueError, TypeError):
+        return ""
+
+
+def body_text(payload: dict[str, Any]) -> str:
+    """text/plain 優先。無ければ text/html をタグ除去。"""
+    plain: list[str] = []
+    htmls: list[str] = []
+
+    def walk(part: dict[str, Any]) -> None:
+        mime = (part.get("mimeType") or "").lower()
+        data = (part.get("body") or {}).get("data")
+        if data and not part.get("filename"):
+            if mime == "text/plain":
+                plain.append(_b64(data))
+            elif mime == "text/html":
+                htmls.append(_b64(data))
+        for sub in part.get("parts") or []:
+            walk(sub)
+
+    walk(payload)
+    if plain:
+        return "\n".join(plain).strip()
+    if htmls:
+        text = re.sub(r"(?is)<(script|style).*?</\1>", "", "\n".join(htmls))
+        text = re.sub(r"(?i)<br\s*/?>|</p>", "\n", text)
+        return html.unescape(re.sub(r"<[^>]+>", "", text)).strip()
+    return ""
+
+
+def attachment_manifest(payload: dict[str, Any]) -> list[dict[str, Any]]:
+    out: list[dict[str, Any]] = []
+
+    def walk(part: dict[str, Any]) -> None:
+        body = part.get("body") or {}
+        if part.get("filename") and body.get("attachmentId"):
+            out.append(
+                {
+                    "filename": part["filename"],
+                    "mimeType": part.get("mimeType") or "",
+                    "attachmentId": body["attachmentId"],
+                    "size": int(body.get("size") or 0),
+                }
+            )
+        for sub in part.get("parts") or []:
+            walk(sub)
+
+    walk(payload)
+    return out
+
+
+def _http_status(err: Exception) -> int | None:
+    resp = getattr(err, "resp", None)
+    try:
+        return int(getattr(resp, "status", None) or 0) or None
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable(err: Exception) -> bool:
+    st = _http_status(err)
+    if st in RETRY_STATUS:
+        return True
+    return st == 403 and "ratelimitexceeded" in str(err).lower()
+
+
+class GmailStore:
+    """(アカウント, id) → Gmail API の message リソースそのもの（＋解析済み列）。"""
+
+    def __init__(self, path: Path = STORE_PATH, *, sync_max_age: timedelta = SYNC_MAX_AGE) -> None:
+        self.path = path
+        self.sync_max_age = sync_max_age
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.con = sqlite3.connect(str(path), timeout=30)
+        self.con.execute("pragma journal_mode=wal")
+        self.con.execute("pragma synchronous=normal")
+        self.con.executescript(SCHEMA)
+        self._accounts: dict[int, tuple[Any, str, str]] = {}
+        self._last_batch = 0.0
+        self.api_calls = 0
+        self.hits = 0
+
+    def close(self) -> None:
+        self.con.close()
+
+    # --- アカウント ---
+
+    def account(self, svc: Any) -> str:
+        """サービスのメールアドレス（getProfile は1サービス1回）。"""
+        hit = self._accounts.get(id(svc))
+        if hit is None or hit[0] is not svc:
+            prof = svc.users().getProfile(userId="me").execute()
+            self.api_calls += 1
+            hit = (svc, str(prof.get("emailAddress") or "").lower(), str(prof.get("historyId") or ""))
+            self._accounts[id(svc)] = hit
+        return hit[1]
+
+    # --- 読み ---
+
+    def _rows(self, account: str, ids: list[str], fmt: str) -> dict[str, dict[str, Any]]:
+        out: dict[str, dict[str, Any]] = {}
+        for i in range(0, len(ids), 500):
+            chunk = ids[i : i + 500]
+            q = ",".join("?" * len(chunk))
+            for mid, rfmt, labels, raw in self.con.execute(
+                f"select id, fmt, labels, raw from messages where account=? and stale=0 and id in ({q})",
+                (account, *chunk),
+            ):
+                if fmt == "full" and rfmt != "full":
+                    continue
+                msg = json.loads(zlib.decompress(raw))
+                msg["labelIds"] = json.loads(labels or "[]")
+                out[mid] = msg
+        return out
+
+    def _put(self, account: str, msg: dict[str, Any], fmt: str) -> None:
+        payload = msg.get("payload") or {}
+        hm = header_map(payload)
+        self.con.execute(
+            "insert or replace into messages (account, id, thread_id, fmt, internal_date, labels, subject,"
+            " from_addr, date_hdr, body_text, attachments, raw, stale, fetched_at)"
+            " values (?,?,?,?,?,?,?,?,?,?,?,?,0,?)",
+            (
+                account,
+                msg["id"],
+                msg.get("threadId"),
+                fmt,
+                int(msg.get("internalDate") or 0),
+                json.dumps(msg.get("labelIds") or []),
+                hm.get("subject") or "",
+                hm.get("from") or "",
+                hm.get("date") or "",
+                body_text(payload) if fmt == "full" else None,
+                json.dumps(attachment_manifest(payload), ensure_ascii=False) if fmt == "full" else None,
+                zlib.compress(json.dumps(msg, ensure_ascii=False).encode("utf-8")),
+                now_iso(),
+            ),
+        )
+
+    def _batch(self, svc: Any, keys: list[str], make: Callable[[str], Any]) -> dict[str, dict[str, Any]]:
+        """keys を BATCH_SIZE ずつ batch HTTP で。429/5xx はその分だけ間を空けて取り直す。404 は無かったことに。"""
+        got: dict[str, dict[str, Any]] = {}
+        todo = list(keys)
+        for attempt in range(6):
+            if not todo:
+                break
+            retry: list[str] = []
+            for i in range(0, len(todo), BATCH_SIZE):
+                chunk = todo[i : i + BATCH_SIZE]
+                wait = self._last_batch + BATCH_INTERVAL - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+
+                def cb(rid: str, resp: Any, err: Exception | None) -> None:
+                    if err is None:
+                        got[rid] = resp
+                    elif _retryable(err):
+                        retry.append(rid)
+                    elif _http_status(err) != 404:
+                        print(f"# gmail get {rid}: {err}", file=sys.stderr)
+
+                batch = svc.new_batch_http_request(callback=cb)
+                for k in chunk:
+                    batch.add(make(k), request_id=k)
+                try:
+                    batch.execute()
+                except Exception as e:  # バッチ全体の失敗（接続など）は丸ごと取り直し
+                    if not _retryable(e) and _http_status(e) is not None:
+                        raise
+                    retry.extend(k for k in chunk if k not in got)
+                self.api_calls += 1
+                self._last_batch = time.monotonic()
+            todo = list(dict.fromkeys(retry))
+            if todo:
+                time.sleep(min(32, 2**attempt))
+        if todo:
+            print(f"# gmail batch 取り直し上限: {len(todo)}件", file=sys.stderr)
+        return got
+
+    def get_messages(
+        self, svc: Any, ids: Iterable[str], fmt: str = "full", *, sync: bool = True
+    ) -> list[dict[str, Any]]:
+        """ids の順で返す（消えたメールは抜ける）。fmt は full / metadata（full 保存で metadata も賄う）。"""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return []
+        account = self.account(svc)
+        if sync:
+            self.sync(svc)
+        have = self._rows(account, ids, fmt)
+        self.hits += len(have)
+        miss = [m for m in ids if m not in have]
+        if miss:
+            users = svc.users()
+            got = self._batch(svc, miss, lambda mid: users.messages().get(userId="me", id=mid, format=fmt))
+            with self.con:
+                for msg in got.values():
+                    self._put(account, msg, fmt)
+            have.update(got)
+        return [have[m] for m in ids if m in have]
+
+    def get_message(self, svc: Any, mid: str, fmt: str = "full") -> dict[str, Any]:
+        """1件。取れなければ従来どおり API の例外を出す。"""
+        got = self.get_messages(svc, [mid], fmt)
+        if got:
+            return got[0]
+        return svc.users().messages().get(userId="me", id=mid, format=fmt).execute()
+
+    def get_threads(self, svc: Any, listed: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+        """threads.list の結果（id, historyId）→ format=full 相当のスレッド。historyId が同じなら保存分。"""
+        listed = [t for t in listed if t.get("id")]
+        if not listed:
+            return []
+        account = self.account(svc)
+        out: dict[str, dict[str, Any]] = {}
+        miss: list[str] = []
+        for t in listed:
+            row = self.con.execute(
+                "select history_id, message_ids from threads where account=? and id=?", (account, t["id"])
+            ).fetchone()
+            if row and t.get("historyId") and row[0] == str(t["historyId"]):
+                mids = json.loads(row[1] or "[]")
+                msgs = self._rows(account, mids, "full")
+                if len(msgs) == len(mids):
+                    self.hits += 1
+                    out[t["id"]] = {"id": t["id"], "historyId": row[0], "messages": [msgs[m] for m in mids]}
+                    continue
+            miss.append(t["id"])
+        if miss:
+            users = svc.users()
+            got = self._batch(svc, miss, lambda tid: users.threads().get(userId="me", id=tid, format="full"))
+            with self.con:
+                for tid, th in got.items():
+                    msgs = th.get("messages") or []
+                    for m in msgs:
+                        self._put(account, m, "full")
+                    self.con.execute(
+                        "insert or replace into threads (account, id, history_id, message_ids) values (?,?,?,?)",
+                        (account, tid, str(th.get("historyId") or ""), json.dumps([m["id"] for m in msgs])),
+                    )
+            out.update(got)
+        return [out[t["id"]] for t in listed if t["id"] in out]
+
+    def query(
+        self, account: str, *, since: datetime | None = None, subject: str = "", limit: int = 100
+    ) -> list[dict[str, Any]]:
+        """保存済みの解析列だけで引く（API に出ない）。"""
+        sql = "select id, thread_id, internal_date, labels, subject, from_addr, date_hdr, body_text, attachments from messages where account=?"
+        args: list[Any] = [account]
+        if since is not None:
+            sql += " and internal_date >= ?"
+            args.append(int(since.timestamp() * 1000))
+        if subject:
+            sql += " and subject like ?"
+            args.append(f"%{subject}%")
+        sql += " order by internal_date desc limit ?"
+        args.append(limit)
+        keys = ("id", "thread_id", "internal_date", "labels", "subject", "from", "date", "body", "attachments")
+        out = []
+        for row in self.con.execute(sql, args):
+            d = dict(zip(keys, row))
+            d["labels"] = json.loads(d["labels"] or "[]")
+            d["attachments"] = json.loads(d["attachments"] or "[]")
+            out.append(d)
+        return out
+
+    # --- 差分同期 ---
+
+    def sync(self, svc: Any, *, force: bool = False, prefetch: int = PREFETCH_LIMIT) -> dict[str, int]:
+        """history.list で前回以降のラベル変更・削除を反映し、新着を先取りする。
+
+        初回は historyId を覚えるだけ（過去分は使うときに取る）。履歴が古すぎて 404 のときは
+        保存分のラベルを「要再取得」にして historyId を取り直す。
+        """
+        account = self.account(svc)
+        stats = {"added": 0, "labels": 0, "deleted": 0, "prefetched": 0}
+        row = self.con.execute("select history_id, synced_at from accounts where account=?", (account,)).fetchone()
+        if row and row[1] and not force:
+            if datetime.now(JST) - datetime.fromisoformat(row[1]) < self.sync_max_age:
+                return stats
+        profile_hid = self._accounts[id(svc)][2]
+        if not row or not row[0]:
+            self._save_account(account, profile_hid)
+            return stats
+
+        added: list[str] = []
+        hid = row[0]
+        page: str | None = None
+        try:
+            while True:
+                kw: dict[str, Any] = {"userId": "me", "startHistoryId": row[0], "maxResults": 500}
+                if page:
+                    kw["pageToken"] = page
+                resp = svc.users().history().list(**kw).execute()
+                self.api_calls += 1
+                with self.con:
+                    for h in resp.get("history") or []:
+                        for ev in h.get("messagesAdded") or []:
+                            added.append(ev["message"]["id"])
+                            stats["added"] += 1
+                        for key in ("labelsAdded", "labelsRemoved"):
+                            for ev in h.get(key) or []:
+                                m = ev.get("message") or {}
+                                self.con.execute(
+                                    "update messages set labels=? where account=? and id=?",
+                                    (json.dumps(m.get("labelIds") or []), account, m.get("id")),
+                                )
+                                stats["labels"] += 1
+                        for ev in h.get("messagesDeleted") or []:
+                            self.con.execute(
+                                "delete from messages where account=? and id=?", (account, ev["message"]["id"])
+                            )
+                            stats["deleted"] += 1
+                hid = str(resp.get("historyId") or hid)
+                page = resp.get("nextPageToken")
+                if not page:
+                    break
+        except Exception as e:
+            if _http_status(e) != 404:
+                raise
+            with self.con:
+                self.con.execute("update messages set stale=1 where account=?", (account,))
+            self._save_account(account, profile_hid)
+            print(f"# gmail history 期限切れ（{account}）→ 保存分は使うときに取り直し", file=sys.stderr)
+            return stats
+        if added and prefetch > 0:
+            want = list(dict.fromkeys(added))[-prefetch:]
+            stats["prefetched"] = len(self.get_messages(svc, want, sync=False))
+        self._save_account(account, hid)
+        return stats
+
+    def _save_account(self, account: str, history_id: str) -> None:
+        with self.con:
+            self.con.execute(
+                "insert or replace into accounts (account, history_id, synced_at) values (?,?,?)",
+                (account, history_id, now_iso()),
+            )
+
+    def status(self) -> list[dict[str, Any]]:
+        out = []
+        for account, hid, synced in self.con.execute("select account, history_id, synced_at from accounts order by account"):
+            n, stale = self.con.execute(
+                "select count(*), coalesce(sum(stale), 0) from messages where account=?", (account,)
+            ).fetchone()
+            out.append({"account": account, "history_id": hid, "synced_at": synced, "messages": n, "stale": stale})
+        return out
+
+
+_STORE: GmailStore | None = None
+
+
+def shared_store() -> GmailStore | None:
+    """プロセス共通の保管庫。開けなければ None（呼び出し側は従来の GET に戻す）。"""
+    global _STORE
+    if _STORE is None:
+        try:
+            _STORE = GmailStore()
+        except (OSError, sqlite3.Error) as e:
+            print(f"# gmail store を開けません: {e}", file=sys.stderr)
+            return None
+    return _STORE
+
+
+def fetch_messages(svc: Any, ids: Iterable[str], fmt: str = "full") -> list[dict[str, Any]]:
+    """保管庫経由で ids を取る（ids の順）。保管庫が使えなければ1件ずつ GET。"""
+    store = shared_store()
+    if store is not None:
+        return store.get_messages(svc, ids, fmt)
+    return [svc.users().messages().get(userId="me", id=mid, format=fmt).execute() for mid in dict.fromkeys(ids)]
+
+
+def fetch_threads(svc: Any, listed: Iterable[dict[str, Any]]) -> list[dict[str, Any]]:
+    """threads.list の結果 → format=full のスレッド（保管庫経由）。"""
+    store = shared_store()
+    if store is not None:
+        return store.get_threads(svc, listed)
+    return [svc.users().threads().get(userId="me", id=t["id"], format="full").execute() for t in listed if t.get("id")]
+
+
+def service_for_token(token: Path) -> Any:
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from googleapiclient.discovery import build
+
+    creds = Credentials.from_authorized_user_file(str(token))
+    if creds.expired and creds.refresh_token:
+        creds.refresh(Request())
+    return build("gmail", "v1", credentials=creds, cache_discovery=False)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Gmail ローカル保管庫（差分同期・状態）")
+    ap.add_argument("--sync", nargs="*", metavar="TOKEN", help="token JSON（名前なら 1b_Cursorマニュアル 配下）")
+    ap.add_argument("--force", action="store_true", help="直近に同期済みでも history.list を呼ぶ")
+    ap.add_argument("--status", action="store_true")
+    args = ap.parse_args()
+
+    store = GmailStore()
+    rc = 0
+    for name in args.sync or []:
+        token = Path(name) if "/" in name else MANUAL / name
+        try:
+            svc = service_for_token(token)
+            stats = store.sync(svc, force=args.force)
+        except Exception as e:
+            print(f"# FAIL {token.name}: {e}", file=sys.stderr)
+            rc = 1
+            continue
+        print(f"# {token.name} {store.account(svc)} {json.dumps(stats)}", flush=True)
+    if args.status or args.sync is None:
+        for r in store.status():
+            print(f"{r['account']}\tmessages={r['messages']}\tstale={r['stale']}\thistory={r['history_id']}\tsynced={r['synced_at']}")
+    return rc
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -44,6 +44,9 @@ BUDGET_SHEET = "シングルインカム年収手取"
 BUDGET_TABLE = "表1.月別予算設定"
 CANONICAL_KEY = "260621"
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 sys.path.insert(0, str(ZAIM_SYNC))
 from column_utils import month_cols_for_year  # noqa: E402
 from numbers_budget_extract import (  # noqa: E402
@@ -219,38 +222,29 @@ def ingest_zaim_raw(sb: Any, year: int, path: Path, *, dry_run: bool, push_metri
     st = path.stat()
     checksum = file_checksum(path)
     rows_out: list[dict] = []
-    with path.open(encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, start=1):
-            entity, kind = classify_txn(row, cfg)
-            d_raw = (row.get("日付") or "").strip()
-            txn_date = None
-            if len(d_raw) >= 10:
-                try:
-                    txn_date = datetime.strptime(d_raw[:10], "%Y-%m-%d").date().isoformat()
-                except ValueError:
-                    txn_date = None
-            rows_out.append(
-                {
-                    "fiscal_year": year,
-                    "row_index": idx,
-                    "txn_date": txn_date,
-                    "method": (row.get("方法") or "").strip() or None,
-                    "category": (row.get("カテゴリ") or "").strip() or None,
-                    "subcategory": (row.get("カテゴリの内訳") or "").strip() or None,
-                    "description": (row.get("品目") or "").strip() or None,
-                    "memo": (row.get("メモ") or "").strip() or None,
-                    "from_account": (row.get("支払元") or "").strip() or None,
-                    "to_account": (row.get("入金先") or "").strip() or None,
-                    "income_jpy": yen_num(row.get("収入")),
-                    "expense_jpy": yen_num(row.get("支出")),
-                    "balance_jpy": yen_num(row.get("残高")) if row.get("残高") not in (None, "") else None,
-                    "currency": (row.get("通貨") or "").strip() or None,
-                    "aggregation": (row.get("集計の設定") or "").strip() or None,
-                    "entity": entity,
-                    "kind": kind,
-                }
-            )
+    for row in open_ledger(path).rows():
+        entity, kind = classify_txn(row, cfg)
+        rows_out.append(
+            {
+                "fiscal_year": year,
+                "row_index": row["_row"],
+                "txn_date": row["_date"],
+                "method": (row.get("方法") or "").strip() or None,
+                "category": (row.get("カテゴリ") or "").strip() or None,
+                "subcategory": (row.get("カテゴリの内訳") or "").strip() or None,
+                "description": (row.get("品目") or "").strip() or None,
+                "memo": (row.get("メモ") or "").strip() or None,
+                "from_account": (row.get("支払元") or "").strip() or None,
+                "to_account": (row.get("入金先") or "").strip() or None,
+                "income_jpy": row["_income"],
+                "expense_jpy": row["_expense"],
+                "balance_jpy": yen_num(row.get("残高")) if row.get("残高") not in (None, "") else None,
+                "currency": (row.get("通貨") or "").strip() or None,
+                "aggregation": (row.get("集計の設定") or "").strip() or None,
+                "entity": entity,
+                "kind": kind,
+            }
+        )
 
     meta = {
         "source_key": source_key,
@@ -491,7 +485,7 @@ def run_finance(*, dry_run: bool, push_metrics: bool) -> dict:
         raw = TAX_DIR / f"{year}年度" / f"Zaim.{year}年度.csv"
         if raw.is_file():
             if dry_run:
-                results.append({"year": year, "raw_rows": sum(1 for _ in raw.open(encoding="utf-8-sig")) - 1})
+                results.append({"year": year, "raw_rows": len(open_ledger(raw))})
             else:
                 results.append(ingest_zaim_raw(sb, year, raw, dry_run=False, push_metrics=push_metrics))
                 print(f"# finance raw {year}: {results[-1].get('inserted', results[-1].get('rows'))} rows", flush=True)
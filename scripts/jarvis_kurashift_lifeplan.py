@@ -33,6 +33,9 @@ TAX_DIR = Path(
 ).expanduser()
 PY = Path("/Users/matsunomasaharu2/selenium_env/venv/bin/python")
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 
 def now_iso() -> str:
     return datetime.now(timezone.utc).astimezone().isoformat(timespec="seconds")
@@ -162,20 +165,18 @@ def load_summary_csv(path: Path) -> list[dict[str, Any]]:
 def load_raw_zaim_abg(path: Path, year: int) -> dict[str, int]:
     """明細CSVのカテゴリ先頭 α/β/γ から支出合計（年フィルタ）。"""
     totals = {"alpha": 0, "beta": 0, "gamma": 0, "delta_re": 0, "other": 0}
-    with path.open(encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        for r in reader:
-            dt = (r.get("日付") or "")[:4]
-            if dt and dt.isdigit() and int(dt) != year:
-                continue
-            cat = (r.get("カテゴリ") or "").strip()
-            exp = parse_yen(r.get("支出") or "0")
-            if exp <= 0:
-                continue
-            b = classify_abg(cat)
-            if b == "income":
-                continue
-            totals[b if b in totals else "other"] += exp
+    for r in open_ledger(path).rows():
+        dt = (r.get("日付") or "")[:4]
+        if dt and dt.isdigit() and int(dt) != year:
+            continue
+        cat = (r.get("カテゴリ") or "").strip()
+        exp = int(round(r["_expense"]))
+        if exp <= 0:
+            continue
+        b = classify_abg(cat)
+        if b == "income":
+            continue
+        totals[b if b in totals else "other"] += exp
     return totals
 
 
@@ -34,6 +34,7 @@ from typing import Any
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
+from jarvis_gmail_store import fetch_messages
 
 REPO = Path(__file__).resolve().parents[1]
 MANUAL = REPO / "215_kamiooya" / "C1_cursor" / "1b_Cursorマニュアル"
@@ -537,13 +538,7 @@ def fetch_account(
     keepers: list[dict[str, Any]] = []
     auto_pass: list[dict[str, Any]] = []
     partner_hits = 0
-    for m in resp.get("messages") or []:
-        full = (
-            svc.users()
-            .messages()
-            .get(userId="me", id=m["id"], format="full")
-            .execute()
-        )
+    for full in fetch_messages(svc, [m["id"] for m in resp.get("messages") or []]):
         hm = header_map(full.get("payload", {}).get("headers") or [])
         pmeta = _partner_meta(hm, partner_emails, partner_domains, partner_names)
         if pmeta.get("is_partner"):
@@ -556,7 +551,7 @@ def fetch_account(
         if out:
             auto_pass.append(
                 _deal_row_from_message(
-                    gmail_id=m["id"],
+                    gmail_id=full["id"],
                     source=source,
                     subject=subject,
                     text=text,
@@ -571,7 +566,7 @@ def fetch_account(
             continue
         keepers.append(
             _deal_row_from_message(
-                gmail_id=m["id"],
+                gmail_id=full["id"],
                 source=source,
                 subject=subject,
                 text=text,
@@ -608,13 +603,7 @@ def fetch_grok_mails(
         .execute()
     )
     keepers: list[dict[str, Any]] = []
-    for m in resp.get("messages") or []:
-        full = (
-            svc.users()
-            .messages()
-            .get(userId="me", id=m["id"], format="full")
-            .execute()
-        )
+    for full in fetch_messages(svc, [m["id"] for m in resp.get("messages") or []]):
         hm = header_map(full.get("payload", {}).get("headers") or [])
         subject = hm.get("subject") or "(無題)"
         if GROK_SUBJECT_PREFIX not in subject:
@@ -638,7 +627,7 @@ def fetch_grok_mails(
                 else "info"
             )
         row = _deal_row_from_message(
-            gmail_id=m["id"],
+            gmail_id=full["id"],
             source="mail_grok",
             subject=subject,
             text=text,
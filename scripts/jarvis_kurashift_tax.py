@@ -458,14 +458,10 @@ def ingest_mail(year: int, dry_run: bool, limit: int, scope: str = "personal") -
     case_id = ensure_tax_case(sb, year, scope) if sb else None
     saved: list[dict[str, Any]] = []
 
-    for m in messages:
-        mid = m["id"]
-        full = (
-            service.users()
-            .messages()
-            .get(userId="me", id=mid, format="full")
-            .execute()
-        )
+    from jarvis_gmail_store import fetch_messages
+
+    for full in fetch_messages(service, [m["id"] for m in messages]):
+        mid = full["id"]
         headers = header_map((full.get("payload") or {}).get("headers") or [])
         subject = headers.get("subject") or ""
         date_hdr = headers.get("date") or ""
@@ -12,7 +12,6 @@ Zaim 実績と config/mobile_plan_watch.yaml を突き合わせ、
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import os
 import re
@@ -30,6 +29,9 @@ except ImportError:
     print("PyYAML required", file=sys.stderr)
     raise SystemExit(1)
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 ROOT = Path(__file__).resolve().parents[1]
 CFG_PATH = ROOT / "config" / "mobile_plan_watch.yaml"
 STATE_PATH = ROOT / ".jarvis_state" / "mobile_plan.json"
@@ -80,13 +82,6 @@ def nf(s: str) -> str:
     return re.sub(r"\s+", "", s).lower()
 
 
-def parse_yen(r: dict[str, str]) -> float:
-    try:
-        return float(r.get("支出") or 0) or 0.0
-    except ValueError:
-        return 0.0
-
-
 def resolve_csv(cfg: dict[str, Any], year: int) -> Path:
     z = cfg.get("zaim") or {}
     base = Path(z.get("csv_base_dir") or "").expanduser()
@@ -118,9 +113,8 @@ def load_mobile_rows(cfg: dict[str, Any], today: date) -> list[dict[str, Any]]:
         path = resolve_csv(cfg, y)
         if not path.is_file():
             continue
-        rows = list(csv.DictReader(path.open(encoding="utf-8-sig")))
-        for r in rows:
-            yen = parse_yen(r)
+        for r in open_ledger(path).rows():
+            yen = r["_expense"]
             if yen <= 0:
                 continue
             blob = shop_blob(r)
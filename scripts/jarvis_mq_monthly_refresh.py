@@ -118,6 +118,7 @@ def ingest_finance_years(years: list[int], *, dry_run: bool) -> list[dict]:
     sys.path.insert(0, str(REPO / "scripts"))
     # 遅延 import（同じリポ）
     import jarvis_kurashift_history_ingest as hi  # type: ignore
+    from jarvis_zaim_ledger import open_ledger  # type: ignore
 
     sb = None if dry_run else hi.sb_client()
     results = []
@@ -128,9 +129,9 @@ def ingest_finance_years(years: list[int], *, dry_run: bool) -> list[dict]:
             print(f"# finance skip {year}: CSVなし {raw}", flush=True)
             continue
         if dry_run:
-            n = sum(1 for _ in raw.open(encoding="utf-8-sig")) - 1
+            n = len(open_ledger(raw))
             results.append({"year": year, "ok": True, "dry_run": True, "rows": n})
-            print(f"# finance dry-run {year}: rows≈{n}", flush=True)
+            print(f"# finance dry-run {year}: rows={n}", flush=True)
             continue
         out = hi.ingest_zaim_raw(sb, year, raw, dry_run=False, push_metrics=False)
         results.append({"year": year, "ok": True, **out})
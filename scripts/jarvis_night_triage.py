@@ -28,7 +28,7 @@ import sys
 import time
 import urllib.error
 import urllib.request
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any
 from zoneinfo import ZoneInfo
@@ -48,9 +48,9 @@ ONEDRIVE_PARTNER = (
     / "C2_ルーティン作業/26_パートナー社への相談"
 )
 
-HEADING_RE = re.compile(
-    r"^###\s+(\d{4}/\d{2}/\d{2}(?:\s+\d{2}:\d{2})?)\s*｜\s*([^｜]+)\s*｜\s*([^｜]+)\s*｜\s*(.*)$"
-)
+sys.path.insert(0, str(MANUAL_DIR))
+from yoritoori_index import file_entries  # noqa: E402  見出しインデックス（変わった md だけ読む）
+
 SUBJECT_RE = re.compile(r"^\*\*件名\*\*\s*[:：]\s*(.+)$", re.MULTILINE)
 RE_PREFIX_RE = re.compile(r"^((re|fw|fwd|返信|転送)\s*[:：]\s*)+", re.I)
 
@@ -83,6 +83,7 @@ SKIP_FOLDERS = {
 OPENCHAT_ROOT_NAME = "815_神大家オプチャ"
 PLACEHOLDER_BODY_RE = re.compile(r"(\[本文なし|E2EE|復号でき|プレースホルダ)", re.I)
 ACTIVITY_LOOKBACK_DEFAULT = 7
+CONTEXT_SLACK_DAYS = 30  # 未返信判定の文脈（直近4通）用に lookback より前も読む
 ACTIVITY_PER_PARTNER = 3
 ACTIVITY_PARTNER_MAX = 30
 ACTIVITY_OPENCHAT_MAX = 40
@@ -275,8 +276,6 @@ def find_recent_chat_activity(
     """パートナー MD から Chatwork/LINE/iMessage の直近受信を抽出。"""
     cutoff = None
     if lookback_days > 0:
-        from datetime import timedelta
-
         cutoff = datetime.now(JST) - timedelta(days=lookback_days)
     picked: list[dict[str, Any]] = []
     # 新しい順に走査し、フォルダごとに上限
@@ -337,20 +336,15 @@ def list_openchat_mds(base: Path) -> list[tuple[str, Path]]:
     return out
 
 
-def parse_openchat_md(md_path: Path, group_folder: str) -> list[dict[str, Any]]:
-    """815 オプチャの見出しをパース（欄数が可変）。"""
-    text = md_path.read_text(encoding="utf-8", errors="replace")
+def parse_openchat_md(
+    md_path: Path, group_folder: str, *, since: datetime | None = None
+) -> list[dict[str, Any]]:
+    """815 オプチャの見出しをパース（欄数が可変）。since があればその日以降の分だけ。"""
     entries: list[dict[str, Any]] = []
-    lines = text.splitlines()
-    i = 0
-    while i < len(lines):
-        line = lines[i]
-        if not line.startswith("### "):
-            i += 1
-            continue
-        parts = [p.strip() for p in line[4:].split("｜")]
+    for e in file_entries(md_path, with_body=True, since=since):
+        parts = [p.strip() for p in e["heading"].split("｜")]
+        parts[0] = e["received_at"]
         if len(parts) < 5:
-            i += 1
             continue
         received_at = parts[0]
         stream = parts[1] if len(parts) > 1 else ""
@@ -371,12 +365,7 @@ def parse_openchat_md(md_path: Path, group_folder: str) -> list[dict[str, Any]]:
                     sender = parts[j + 1] if j + 1 < len(parts) else ""
                     summary = "｜".join(parts[j + 2 :]) if j + 2 < len(parts) else ""
                     break
-        body_lines: list[str] = []
-        i += 1
-        while i < len(lines) and not lines[i].startswith("### "):
-            body_lines.append(lines[i])
-            i += 1
-        body = "\n".join(body_lines).strip()
+        body = e["body"]
         entries.append(
             {
                 "folder": group_folder,
@@ -399,8 +388,6 @@ def find_recent_openchat_activity(
 ) -> list[dict[str, Any]]:
     cutoff = None
     if lookback_days > 0:
-        from datetime import timedelta
-
         cutoff = datetime.now(JST) - timedelta(days=lookback_days)
     picked: list[dict[str, Any]] = []
     ordered = sorted(entries, key=lambda x: x.get("received_at") or "", reverse=True)
@@ -496,23 +483,14 @@ def entry_id(folder: str, received_at: str, subject: str) -> str:
     return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
 
 
-def parse_yoritoori(md_path: Path, partner_folder: str, partner_name: str) -> list[dict[str, Any]]:
-    text = md_path.read_text(encoding="utf-8", errors="replace")
-    lines = text.splitlines()
+def parse_yoritoori(
+    md_path: Path, partner_folder: str, partner_name: str, *, since: datetime | None = None
+) -> list[dict[str, Any]]:
+    """since があればその日以降の見出しだけ（インデックスから必要な本文だけ読む）。"""
     entries: list[dict[str, Any]] = []
-    i = 0
-    while i < len(lines):
-        m = HEADING_RE.match(lines[i])
-        if not m:
-            i += 1
-            continue
-        received_at, name, channel, summary = m.group(1), m.group(2).strip(), m.group(3).strip(), m.group(4).strip()
-        body_lines: list[str] = []
-        i += 1
-        while i < len(lines) and not HEADING_RE.match(lines[i]):
-            body_lines.append(lines[i])
-            i += 1
-        body = "\n".join(body_lines).strip()
+    for e in file_entries(md_path, with_body=True, since=since):
+        received_at, name, channel, summary = e["received_at"], e["partner"], e["channel"], e["summary"]
+        body = e["body"]
         sm = SUBJECT_RE.search(body)
         subject = (sm.group(1).strip() if sm else summary) or "(件名なし)"
         # 件名行以降の本文（引用込みだが上限で切る）
@@ -551,8 +529,6 @@ def find_unreplied(entries: list[dict[str, Any]], lookback_days: int) -> list[di
 
     cutoff = None
     if lookback_days > 0:
-        from datetime import timedelta
-
         cutoff = datetime.now(JST) - timedelta(days=lookback_days)
 
     candidates: list[dict[str, Any]] = []
@@ -605,6 +581,16 @@ def list_partner_mds(base: Path) -> list[tuple[str, Path]]:
     return out
 
 
+def run_gmail_sync(dry_run: bool, tokens: list[str]) -> int:
+    """Gmail 保管庫を各アカウント1回だけ差分同期（以降の取込・判定は保存分＋batch で読む）。"""
+    cmd = [str(PY), str(REPO / "scripts" / "jarvis_gmail_store.py"), "--sync", *tokens]
+    if dry_run:
+        print(f"# dry-run: would run {' '.join(cmd)}")
+        return 0
+    print(f"# gmail sync: {' '.join(tokens)}")
+    return subprocess.run(cmd, cwd=str(REPO)).returncode
+
+
 def run_gmail_fetch(dry_run: bool) -> int:
     script = MANUAL_DIR / "gmail_to_yoritoori.py"
     if not script.is_file():
@@ -1317,6 +1303,11 @@ def main() -> int:
     do_partner = args.lane in ("partner", "all")
     do_general = args.lane in ("general", "all")
 
+    if not args.skip_fetch:
+        tokens = list(cfg.get("gmail_sync_tokens") or ["token_livingsupport.json"])
+        if run_gmail_sync(args.dry_run, tokens) != 0:
+            print("# gmail sync failed（各スクリプトは保存分＋API で続行）", file=sys.stderr)
+
     if do_partner and not args.skip_fetch:
         rc = run_gmail_fetch(args.dry_run)
         if rc != 0:
@@ -1329,10 +1320,14 @@ def main() -> int:
     all_cands: list[dict[str, Any]] = []
     activities: list[dict[str, Any]] = []
     activity_lookback = int(cfg.get("activity_lookback_days") or ACTIVITY_LOOKBACK_DEFAULT)
+    # 判定に使う期間＋文脈（直近4通）用の余裕だけ読む。どちらかが 0（期限なし）なら全件
+    partner_since = None
+    if lookback > 0 and activity_lookback > 0:
+        partner_since = datetime.now(JST) - timedelta(days=max(lookback, activity_lookback) + CONTEXT_SLACK_DAYS)
     if do_partner:
         for folder, md in list_partner_mds(base):
             name = folder.split("_", 1)[-1] if "_" in folder else folder
-            entries = parse_yoritoori(md, folder, name)
+            entries = parse_yoritoori(md, folder, name, since=partner_since)
             cands = find_unreplied(entries, lookback)
             all_cands.extend(cands)
             activities.extend(find_recent_chat_activity(entries, activity_lookback))
@@ -1343,8 +1338,11 @@ def main() -> int:
         print(f"# partner chat activity: {len(activities)}")
 
         oc_acts: list[dict[str, Any]] = []
+        openchat_since = None
+        if activity_lookback > 0:
+            openchat_since = datetime.now(JST) - timedelta(days=activity_lookback + 1)
         for group, md in list_openchat_mds(base):
-            entries = parse_openchat_md(md, group)
+            entries = parse_openchat_md(md, group, since=openchat_since)
             oc_acts.extend(find_recent_openchat_activity(entries, activity_lookback))
         oc_acts.sort(key=lambda x: x.get("received_at") or "", reverse=True)
         oc_acts = oc_acts[:ACTIVITY_OPENCHAT_MAX]
@@ -425,12 +425,11 @@ def find_general_unreplied(
         if not page_token:
             break
 
+    from jarvis_gmail_store import fetch_threads
+
     candidates: list[dict[str, Any]] = []
-    for th in threads[:max_threads]:
-        tid = th.get("id")
-        if not tid:
-            continue
-        full = service.users().threads().get(userId="me", id=tid, format="full").execute()
+    for full in fetch_threads(service, threads[:max_threads]):
+        tid = full["id"]
         msgs = full.get("messages") or []
         if not msgs:
             continue
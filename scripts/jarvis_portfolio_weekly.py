@@ -20,6 +20,7 @@ from pathlib import Path
 from typing import Any
 
 from jarvis_trade_common import JST, REPO, sb_client, today_jst
+from jarvis_zaim_ledger import open_ledger, yearly_csvs
 
 STATE_PATH = REPO / ".jarvis_state" / "portfolio_weekly.json"
 FINANCE = REPO / "215_kamiooya" / "C1_cursor" / "finance"
@@ -251,7 +252,7 @@ def map_sony_item_to_account(it: dict[str, Any]) -> str:
 
 
 def estimate_sony_costs_from_zaim(sb) -> dict[str, dict[str, Any]]:
-    """Zaim投影からソニー各口座の払込累計（推計）を返す。
+    """Zaim（年度CSV、無ければ Supabase 投影）からソニー各口座の払込累計（推計）を返す。
 
     - 真治SOVANI: 2023-07以降の 32,725 のうち月4,000分
     - 千景: 28,725 全期間 ＋ 32,725 のうち 28,725分
@@ -269,17 +270,24 @@ def estimate_sony_costs_from_zaim(sb) -> dict[str, dict[str, Any]]:
         except ValueError:
             pass
 
-    try:
-        rows = (
-            sb.table("kurashift_finance_transactions")
-            .select("txn_date,expense_jpy,from_account,subcategory")
-            .ilike("subcategory", "%ソニー%")
-            .execute()
-            .data
-            or []
-        )
-    except Exception as exc:
-        return {**out, "_error": {"note": str(exc)[:200]}}
+    # 手元に年度CSVがあれば共有キャッシュから（Supabase 投影は GHA など CSV が無い環境用）
+    rows = [
+        {"expense_jpy": r["_expense"], "from_account": (r.get("支払元") or "").strip()}
+        for path in yearly_csvs()
+        for r in open_ledger(path).rows(contains={"カテゴリの内訳": "ソニー"})
+    ]
+    if not rows:
+        try:
+            rows = (
+                sb.table("kurashift_finance_transactions")
+                .select("txn_date,expense_jpy,from_account,subcategory")
+                .ilike("subcategory", "%ソニー%")
+                .execute()
+                .data
+                or []
+            )
+        except Exception as exc:
+            return {**out, "_error": {"note": str(exc)[:200]}}
 
     chikage = 0
     shinji_sovani = 0
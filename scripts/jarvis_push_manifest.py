@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""ダッシュボード push の「前回送った内容」台帳（.jarvis_state/dashboard_push_manifest.json）。
+
+  以前は毎回 queue.json / situation_watch / cards を全部読み、全 id の remote 状態を取り、
+  全行を upsert し直していた（変わっていない行も）。ここでは行ごとの内容ハッシュを持っておき、
+  新規・変更の行だけ送る。ローカルから消えた id は removed として呼び出し側が明示的に扱う。
+
+    m = PushManifest()
+    changed, removed = m.diff("triage_items", rows_by_id)   # rows はマージ前のローカル行
+    ...changed だけ remote を引いてマージ → upsert
+    m.mark("triage_items", {i: rows_by_id[i] for i in changed})
+    m.forget("triage_items", removed)
+    m.save()
+
+  - ハッシュには updated_at / checked_at（毎回変わる時刻）を入れない。
+  - 最後に送ってから RESEND_AFTER を過ぎた行は変わっていなくても送り直す
+    （GHA や Web が同じ id を書き換えた分・remote を作り直したときの取りこぼし対策）。
+  - scope はテーブル名を基本に、同じテーブルへ別の集合を送るもの（cards の通常 / 処置要約）を分ける。
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Iterable
+
+REPO = Path(__file__).resolve().parents[1]
+MANIFEST_PATH = REPO / ".jarvis_state" / "dashboard_push_manifest.json"
+RESEND_AFTER = 7 * 86400
+VOLATILE_KEYS = ("updated_at", "checked_at")
+
+
+def row_hash(row: dict[str, Any], *, ignore: Iterable[str] = VOLATILE_KEYS) -> str:
+    skip = set(ignore)
+    body = {k: v for k, v in row.items() if k not in skip}
+    raw = json.dumps(body, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _load_scopes(path: Path) -> dict[str, dict[str, dict[str, Any]]]:
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+    scopes = data.get("scopes") if isinstance(data, dict) else None
+    if not isinstance(scopes, dict):
+        return {}
+    return {
+        str(scope): {str(k): v for k, v in ents.items() if isinstance(v, dict)}
+        for scope, ents in scopes.items()
+        if isinstance(ents, dict)
+    }
+
+
+class PushManifest:
+    """scope → {id: {"h": 内容ハッシュ, "at": 送った時刻}}。save() まで書かない。"""
+
+    def __init__(self, path: Path = MANIFEST_PATH, *, resend_all: bool = False):
+        self.path = Path(path)
+        self.resend_all = resend_all
+        self._scopes = _load_scopes(self.path)
+        self._touched: set[str] = set()
+
+    def diff(
+        self, scope: str, rows_by_id: dict[str, dict[str, Any]]
+    ) -> tuple[list[str], list[str]]:
+        """(新規・変更・送り直しの id, 前回送ったがローカルに無い id)。changed は rows_by_id の順。"""
+        known = self._scopes.get(scope) or {}
+        now = time.time()
+        changed: list[str] = []
+        for iid, row in rows_by_id.items():
+            ent = known.get(iid)
+            if (
+                self.resend_all
+                or ent is None
+                or ent.get("h") != row_hash(row)
+                or now - float(ent.get("at") or 0) >= RESEND_AFTER
+            ):
+                changed.append(iid)
+        removed = [iid for iid in known if iid not in rows_by_id]
+        return changed, removed
+
+    def mark(self, scope: str, rows_by_id: dict[str, dict[str, Any]]) -> None:
+        """送れた行を記録（diff に渡したのと同じマージ前の行で）。"""
+        if not rows_by_id:
+            return
+        now = time.time()
+        ents = self._scopes.setdefault(scope, {})
+        for iid, row in rows_by_id.items():
+            ents[iid] = {"h": row_hash(row), "at": now}
+        self._touched.add(scope)
+
+    def forget(self, scope: str, ids: Iterable[str]) -> None:
+        ents = self._scopes.get(scope)
+        if not ents:
+            return
+        for iid in ids:
+            if ents.pop(iid, None) is not None:
+                self._touched.add(scope)
+
+    def save(self) -> None:
+        """触った scope だけ書き戻す（lanes はサブプロセスで同じファイルの別 scope を書く）。"""
+        if not self._touched:
+            return
+        merged = _load_scopes(self.path)
+        for scope in self._touched:
+            merged[scope] = self._scopes.get(scope) or {}
+        self._scopes = merged
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + f".tmp.{os.getpid()}")
+        tmp.write_text(
+            json.dumps({"version": 1, "scopes": self._scopes}, ensure_ascii=False) + "\n",
+            encoding="utf-8",
+        )
+        os.replace(tmp, self.path)
+        self._touched.clear()
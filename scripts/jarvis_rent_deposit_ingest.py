@@ -12,7 +12,6 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import re
 import sys
@@ -31,6 +30,9 @@ try:
 except ImportError:
     PdfReader = None  # type: ignore
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 JST = ZoneInfo("Asia/Tokyo")
 REPO = Path(__file__).resolve().parents[1]
 STATE_DIR = REPO / ".jarvis_state"
@@ -307,59 +309,50 @@ def zaim_bank_inflows(ym: str | None = None) -> list[dict[str, Any]]:
         return []
 
     out: list[dict[str, Any]] = []
-    with csv_path.open(encoding="utf-8-sig", newline="") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            method = (row.get("方法") or "").strip()
-            if method != "income":
-                continue
-            try:
-                income = int(float(str(row.get("収入") or "0").replace(",", "") or 0))
-            except ValueError:
-                income = 0
-            if income <= 0:
-                continue
-            date = (row.get("日付") or "").replace("/", "-")[:10]
-            if len(date) < 7:
-                continue
-            row_ym = date[:7]
-            if ym and row_ym != ym:
-                continue
-            dep = row.get("入金先") or ""
-            cat = row.get("カテゴリ") or ""
-            item = row.get("品目") or ""
-            bank_id = None
-            for bid, match in matches.items():
-                if match and match in dep:
-                    bank_id = bid
-                    break
-            if not bank_id:
-                # fallback common
-                if "PayPay" in dep:
-                    bank_id = "paypay"
-                elif "MUFG" in dep:
-                    bank_id = "mufg"
-                elif "滋賀" in dep:
-                    bank_id = "shiga"
-                elif "京都" in dep:
-                    bank_id = "kyoto"
-            if not bank_id:
-                continue
-            is_rent = "家賃" in cat or "家賃" in item
-            out.append(
-                {
-                    "source": "zaim_bank",
-                    "ym": row_ym,
-                    "bank_id": bank_id,
-                    "date": date,
-                    "amount_yen": income,
-                    "is_rent_category": is_rent,
-                    "category": cat,
-                    "item": item,
-                    "deposit_account": dep,
-                    "label": f"Zaim {bank_id} {income:,}",
-                }
-            )
+    period = {"year": int(ym[:4]), "month": int(ym[5:7])} if ym else {}
+    for row in open_ledger(csv_path).rows(method="income", **period):
+        income = int(row["_income"])
+        if income <= 0:
+            continue
+        date = row["_date"] or ""
+        if len(date) < 7:
+            continue
+        row_ym = date[:7]
+        dep = row.get("入金先") or ""
+        cat = row.get("カテゴリ") or ""
+        item = row.get("品目") or ""
+        bank_id = None
+        for bid, match in matches.items():
+            if match and match in dep:
+                bank_id = bid
+                break
+        if not bank_id:
+            # fallback common
+            if "PayPay" in dep:
+                bank_id = "paypay"
+            elif "MUFG" in dep:
+                bank_id = "mufg"
+            elif "滋賀" in dep:
+                bank_id = "shiga"
+            elif "京都" in dep:
+                bank_id = "kyoto"
+        if not bank_id:
+            continue
+        is_rent = "家賃" in cat or "家賃" in item
+        out.append(
+            {
+                "source": "zaim_bank",
+                "ym": row_ym,
+                "bank_id": bank_id,
+                "date": date,
+                "amount_yen": income,
+                "is_rent_category": is_rent,
+                "category": cat,
+                "item": item,
+                "deposit_account": dep,
+                "label": f"Zaim {bank_id} {income:,}",
+            }
+        )
     return out
 
 
@@ -15,7 +15,6 @@
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import sys
 from datetime import date, timedelta
@@ -25,6 +24,9 @@ from typing import Any
 
 import yaml
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 REPO = Path(__file__).resolve().parents[1]
 CONFIG_PATH = REPO / "config" / "salary_pay_calendar.yaml"
 DEFAULT_CSV = Path.home() / (
@@ -109,45 +111,37 @@ def bonus_pay_date_nominal(year: int, month: int, nominal_day: int = 1) -> date:
     return previous_business_day(date(year, month, day))
 
 
-def _parse_yen(raw: str) -> int:
-    try:
-        return int(float(raw or 0))
-    except ValueError:
-        return 0
-
-
 def load_salary_rows(csv_path: Path) -> list[dict[str, Any]]:
     if not csv_path.is_file():
         return []
     out: list[dict[str, Any]] = []
-    with csv_path.open(encoding="utf-8") as f:
-        for row in csv.DictReader(f):
-            d = row.get("日付") or ""
-            item = (
-                (row.get("品目") or "")
-                + (row.get("お店") or "")
-                + (row.get("メモ") or "")
-            )
-            if "ミツビシジユウコウ" not in item and "三菱重工" not in item:
-                # 給与行は会社名付きが多い。フォールバックで「給与」のみは固定振分にも付く
-                if "給与" not in item and "賞与" not in item:
-                    continue
-            inc = _parse_yen(row.get("収入") or "0")
-            if inc <= 0:
-                continue
-            kind = "bonus" if ("賞与" in item or "ボーナス" in item) else "salary"
-            if kind == "salary" and "給与" not in item and "賞与" not in item:
+    for row in open_ledger(csv_path).rows():
+        d = row.get("日付") or ""
+        item = (
+            (row.get("品目") or "")
+            + (row.get("お店") or "")
+            + (row.get("メモ") or "")
+        )
+        if "ミツビシジユウコウ" not in item and "三菱重工" not in item:
+            # 給与行は会社名付きが多い。フォールバックで「給与」のみは固定振分にも付く
+            if "給与" not in item and "賞与" not in item:
                 continue
-            out.append(
-                {
-                    "date": d,
-                    "month": d[:7],
-                    "amount_jpy": inc,
-                    "to": row.get("入金先") or "",
-                    "item": item.strip(),
-                    "kind": kind,
-                }
-            )
+        inc = int(row["_income"])
+        if inc <= 0:
+            continue
+        kind = "bonus" if ("賞与" in item or "ボーナス" in item) else "salary"
+        if kind == "salary" and "給与" not in item and "賞与" not in item:
+            continue
+        out.append(
+            {
+                "date": d,
+                "month": d[:7],
+                "amount_jpy": inc,
+                "to": row.get("入金先") or "",
+                "item": item.strip(),
+                "kind": kind,
+            }
+        )
     return out
 
 
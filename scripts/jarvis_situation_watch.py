@@ -8,14 +8,21 @@ Jarvis: 状況ウォッチ集約（Phase 0）
   python scripts/jarvis_situation_watch.py
   python scripts/jarvis_situation_watch.py --json   # stdout のみ
   python scripts/jarvis_situation_watch.py --write  # 既定で書き出しもする
+  python scripts/jarvis_situation_watch.py --no-cache  # 評価キャッシュを使わない
+
+評価器は並列に実行し、入力ファイル（EVAL_INPUTS）が前回と同じなら cache_ttl の間は前回の結果を使う
+（.jarvis_state/situation_watch_eval_cache.json）。所要時間は出力の eval に入る。
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
 import json
 import os
 import re
 import sys
+import threading
+import time
 from datetime import date, datetime, timedelta
 from pathlib import Path
 from typing import Any
@@ -29,6 +36,9 @@ STATE = REPO / ".jarvis_state"
 YAML_PATH = REPO / "config" / "situation_watch.yaml"
 OUT_PATH = STATE / "situation_watch.json"
 ARCHIVE_PATH = STATE / "situation_watch_archive.json"
+EVAL_CACHE_PATH = STATE / "situation_watch_eval_cache.json"
+DEFAULT_CACHE_TTL = 900  # 秒。入力が変わらなくても日数の境目などで結果が変わるので長くしすぎない
+DEFAULT_EVAL_TIMEOUT = 30.0
 WATCH_STATUS = (
     REPO / "line_unofficial_poc" / ".line_auth" / ".chrline_open_chat_watch_status.json"
 )
@@ -1219,15 +1229,20 @@ def count_today_thread_headings() -> int:
     base = OPENCHAT_MD_GLOB
     if not base.is_dir():
         return -1
+    manual = str(REPO / "215_kamiooya" / "C1_cursor" / "1b_Cursorマニュアル")
+    if manual not in sys.path:
+        sys.path.insert(0, manual)
+    from yoritoori_index import file_entries
+
     today_s = today().strftime("%Y/%m/%d")
-    pat = re.compile(rf"^### {re.escape(today_s)}.*【スレッド】", re.M)
     n = 0
+    # 見出しインデックス経由（変わっていない md は読まない）
     for md in base.glob("*/5.やり取り.md"):
-        try:
-            text = md.read_text(encoding="utf-8", errors="ignore")
-        except OSError:
-            continue
-        n += len(pat.findall(text))
+        n += sum(
+            1
+            for e in file_entries(md)
+            if e["received_at"].startswith(today_s) and "【スレッド】" in e["heading"]
+        )
     return n
 
 
@@ -1946,18 +1961,206 @@ EVALUATORS = {
 }
 
 
-def collect() -> dict[str, Any]:
+def _zaim_csv_paths() -> list[Path]:
+    """refresh_zaim_quality のサブプロセスが読む Zaim CSV（今年度・前年度）。"""
+    try:
+        cfg = yaml.safe_load((REPO / "config" / "zaim_quality_watch.yaml").read_text(encoding="utf-8")) or {}
+    except (OSError, yaml.YAMLError):
+        return []
+    base = Path(cfg.get("csv_base_dir") or "").expanduser()
+    y = today().year
+    return [base / f"{yy}年度" / f"Zaim.{yy}年度.csv" for yy in (y, y - 1)]
+
+
+def _openchat_md_paths() -> list[Path]:
+    base = OPENCHAT_MD_GLOB
+    if not base.is_dir():
+        return []
+    return [base, *base.glob("*/5.やり取り.md")]
+
+
+# 評価器ごとの入力ファイル（mtime・サイズが前回と同じなら前回のカードを使う）。
+# 載っていない評価器は毎回評価する。callable は評価のたびに一覧を作る。
+EVAL_INPUTS: dict[str, Any] = {
+    "etc_mileage": (STATE / "etc_monthly.json",),
+    "vpoint": (
+        STATE / "vpoint_cadence.json",
+        STATE / "vpoint_monthly.json",
+        STATE / "teiki_barai_chance.json",
+    ),
+    "rent_step": (STATE / "rent_step_monthly.json", REPO / "config" / "rent_step_up.yaml"),
+    "card_annual_fee": (STATE / "card_annual_fee.json",),
+    "card_debit_watch": (STATE / "card_debit_watch.json",),
+    "airwallet_banks": (STATE / "airwallet_banks_weekly.json",),
+    "line_export": (STATE / "line_export_reminder.json",),
+    "energy_cf": (STATE / "energy_cf.json",),
+    "westudy_weekly": (STATE / "westudy_weekly_watch.json",),
+    "glucon_report_due": (STATE / "glucon_report.json",),
+    "mobile_plan": (STATE / "mobile_plan.json",),
+    "openchat_threads": lambda: [WATCH_STATUS, *_openchat_md_paths()],
+    "square_probe": (STATE / "square_probe.json",),
+    "chrline_version": (STATE / "chrline_version.json",),
+    "car_loan": (STATE / "car_loan.json",),
+    "sbi_vpoint_up": (STATE / "sbi_vpoint_up_checklist.json",),
+    "night_triage": (STATE / "night_triage" / "queue.json",),
+    "zaim_quality": lambda: [
+        REPO / "config" / "zaim_quality_watch.yaml",
+        REPO / "config" / "zaim_bank_sync_watch.yaml",
+        REPO / "scripts" / "jarvis_zaim_quality_check.py",
+        REPO / "scripts" / "jarvis_zaim_bank_sync_check.py",
+        REPO / "scripts" / "jarvis_zaim_learn.py",
+        STATE / "zaim_quality_watch.json",
+        STATE / "zaim_bank_sync.json",
+        STATE / "zaim_csv_weekly.json",
+        STATE / "zaim_review_batch.json",
+        STATE / "zaim_watch_changelog.json",
+        STATE / "zaim_learn_last.json",
+        STATE / "zaim_learn_rules.json",
+        *_zaim_csv_paths(),
+    ],
+    "cursor_pro_plus_downgrade": (),
+    "cursor_usage_watch": (
+        STATE / "cursor_usage_watch.json",
+        REPO / "scripts" / "jarvis_cursor_usage_watch.py",
+    ),
+}
+
+
+def eval_cache_key(iid: str, meta: dict) -> str | None:
+    """入力ファイル・レジストリ項目・日付・このスクリプト自体から作るキー。入力未宣言なら None。"""
+    spec = EVAL_INPUTS.get(iid)
+    if spec is None:
+        return None
+    paths = spec() if callable(spec) else spec
+    stamp = []
+    for p in [Path(__file__).resolve(), *paths]:
+        try:
+            st = p.stat()
+            stamp.append([str(p), st.st_mtime_ns, st.st_size])
+        except OSError:
+            stamp.append([str(p), None, None])
+    raw = json.dumps([iid, meta, today().isoformat(), stamp], ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def load_eval_cache() -> dict[str, Any]:
+    data = load_json(EVAL_CACHE_PATH) or {}
+    items = data.get("items")
+    return items if isinstance(items, dict) else {}
+
+
+def save_eval_cache(items: dict[str, Any]) -> None:
+    STATE.mkdir(parents=True, exist_ok=True)
+    tmp = EVAL_CACHE_PATH.with_suffix(f".tmp.{os.getpid()}")
+    tmp.write_text(json.dumps({"items": items}, ensure_ascii=False) + "\n", encoding="utf-8")
+    os.replace(tmp, EVAL_CACHE_PATH)
+
+
+def error_card(meta: dict, summary: str) -> dict[str, Any]:
+    iid = meta.get("id") or ""
+    return card(
+        item_id=iid,
+        title=meta.get("title") or iid,
+        category=meta.get("category") or "",
+        level="warn",
+        summary=summary,
+        cursor_prompt=meta.get("cursor_prompt") or "",
+        source=meta.get("source") or "",
+    )
+
+
+def run_evaluators(
+    metas: list[dict], defaults: dict[str, Any], *, use_cache: bool = True
+) -> tuple[dict[str, dict[str, Any]], dict[str, dict[str, Any]]]:
+    """評価器を並列に実行（キャッシュが効くものは実行しない）。({id: カード}, {id: 計測})。
+
+    各項目の cache_ttl（秒、0 でキャッシュしない）/ timeout（秒）はレジストリで上書きできる。
+    タイムアウトした評価器は前回のカードがあればそれを使う（スレッドは daemon なので終了時に捨てる）。
+    キャッシュのキーは評価後に取り直す（rent_step / zaim_quality は評価中に自分の入力を書き直すため）。
+    """
+    cache = load_eval_cache() if use_cache else {}
+    now = time.time()
+    cards: dict[str, dict[str, Any]] = {}
+    timings: dict[str, dict[str, Any]] = {}
+    runs: dict[str, dict[str, Any]] = {}
+
+    def run(iid: str, meta: dict, box: dict[str, Any]) -> None:
+        t0 = time.perf_counter()
+        try:
+            box["card"] = EVALUATORS[iid](meta)
+        except Exception as e:
+            box["card"] = error_card(meta, f"評価エラー: {e}")
+            box["error"] = True
+        box["ms"] = round((time.perf_counter() - t0) * 1000)
+        if not box.get("error") and box["ttl"] > 0:
+            box["key"] = eval_cache_key(iid, meta)
+
+    for meta in metas:
+        iid = meta.get("id") or ""
+        ttl = float(meta.get("cache_ttl", defaults.get("cache_ttl", DEFAULT_CACHE_TTL)))
+        ent = cache.get(iid) if isinstance(cache.get(iid), dict) else None
+        if use_cache and ent and ttl > 0 and now - float(ent.get("at") or 0) < ttl:
+            t0 = time.perf_counter()
+            key = eval_cache_key(iid, meta)
+            if key is not None and key == ent.get("key") and isinstance(ent.get("card"), dict):
+                cards[iid] = ent["card"]
+                timings[iid] = {"ms": round((time.perf_counter() - t0) * 1000), "cached": True}
+                continue
+        box: dict[str, Any] = {
+            "meta": meta,
+            "ttl": ttl,
+            "timeout": float(meta.get("timeout", defaults.get("timeout", DEFAULT_EVAL_TIMEOUT))),
+        }
+        box["thread"] = threading.Thread(target=run, args=(iid, meta, box), daemon=True, name=f"watch-{iid}")
+        box["thread"].start()
+        runs[iid] = box
+
+    started = time.monotonic()
+    for iid, box in runs.items():
+        box["thread"].join(max(0.0, started + box["timeout"] - time.monotonic()))
+        if "card" not in box:
+            prev = (cache.get(iid) or {}).get("card") if isinstance(cache.get(iid), dict) else None
+            if isinstance(prev, dict):
+                cards[iid] = prev
+            else:
+                cards[iid] = error_card(box["meta"], f"評価タイムアウト（{box['timeout']:g}秒）")
+            timings[iid] = {"ms": round((time.monotonic() - started) * 1000), "cached": False, "timeout": True}
+            print(f"# situation watch: {iid} timeout", file=sys.stderr)
+            continue
+        cards[iid] = box["card"]
+        timings[iid] = {"ms": box["ms"], "cached": False}
+        if box.get("error"):
+            timings[iid]["error"] = True
+        if box.get("key"):
+            cache[iid] = {"key": box["key"], "at": now, "card": box["card"]}
+        else:
+            cache.pop(iid, None)
+    if runs and use_cache:
+        try:
+            save_eval_cache(cache)
+        except OSError as e:
+            print(f"# eval cache save skipped: {e}", file=sys.stderr)
+    return cards, timings
+
+
+def collect(*, use_cache: bool = True) -> dict[str, Any]:
+    t0 = time.perf_counter()
     reg = load_registry()
     archive = load_archive()
     archived_map = archive.get("archived") or {}
     popup_levels = set(reg.get("popup_levels") or ["attention", "warn"])
+    metas = [
+        meta
+        for meta in reg.get("items") or []
+        if meta.get("enabled", True) and EVALUATORS.get(meta.get("id") or "")
+    ]
+    cards, timings = run_evaluators(metas, reg.get("eval_defaults") or {}, use_cache=use_cache)
     items_out: list[dict[str, Any]] = []
     for meta in reg.get("items") or []:
         if not meta.get("enabled", True):
             continue
         iid = meta.get("id") or ""
-        fn = EVALUATORS.get(iid)
-        if not fn:
+        if iid not in cards:
             items_out.append(
                 card(
                     item_id=iid,
@@ -1970,18 +2173,7 @@ def collect() -> dict[str, Any]:
                 )
             )
             continue
-        try:
-            c = fn(meta)
-        except Exception as e:
-            c = card(
-                item_id=iid,
-                title=meta.get("title") or iid,
-                category=meta.get("category") or "",
-                level="warn",
-                summary=f"評価エラー: {e}",
-                cursor_prompt=meta.get("cursor_prompt") or "",
-                source=meta.get("source") or "",
-            )
+        c = dict(cards[iid])
         if meta.get("never_archive"):
             c["status"] = "active"
             c.pop("archived_at", None)
@@ -2018,6 +2210,9 @@ def collect() -> dict[str, Any]:
         },
         "popup_item_ids": [i["id"] for i in popup],
         "items": items_out,
+        # 評価器ごとの所要時間（cached=前回結果を使った）。カードの payload には入れない（push の差分判定が毎回変わるため）
+        "eval": timings,
+        "eval_ms": round((time.perf_counter() - t0) * 1000),
     }
 
 
@@ -2063,6 +2258,7 @@ def main(argv: list[str] | None = None) -> int:
     ap.add_argument("--no-write", action="store_true")
     ap.add_argument("--archive", metavar="ID", help="項目をアーカイブ")
     ap.add_argument("--unarchive", metavar="ID", help="アーカイブ解除")
+    ap.add_argument("--no-cache", action="store_true", help="評価キャッシュを使わず全評価器を実行")
     args = ap.parse_args(argv)
 
     if args.archive:
@@ -2072,14 +2268,16 @@ def main(argv: list[str] | None = None) -> int:
         unarchive_item(args.unarchive)
         print(f"# unarchived {args.unarchive}")
 
-    result = collect()
+    result = collect(use_cache=not args.no_cache)
     if not args.no_write:
         path = write_result(result)
         print(f"# wrote {path}", file=sys.stderr)
     c = result["counts"]
     print(
         f"# situation watch: active={c['active']} popup={c['popup']} "
-        f"attention={c['attention']} warn={c['warn']} ok={c['ok']}",
+        f"attention={c['attention']} warn={c['warn']} ok={c['ok']} "
+        f"eval={result['eval_ms']}ms cached={sum(1 for t in result['eval'].values() if t.get('cached'))}"
+        f"/{len(result['eval'])}",
         file=sys.stderr,
     )
     if args.json:
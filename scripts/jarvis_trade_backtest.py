@@ -7,6 +7,7 @@
   cd ~/git-repos && set -a && source .env.jarvis_private && set +a
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest.py
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest.py --range 10y --capital 100000
+  ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest.py --range max --engine dict   # 従来経路で突き合わせ
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest_tune.py --range max
 """
 from __future__ import annotations
@@ -18,7 +19,8 @@ import sys
 from datetime import date
 from typing import Any
 
-from jarvis_trade_common import fetch_yahoo_daily, load_watchlist, sleep_polite
+from jarvis_trade_bar_store import BarStore, range_start
+from jarvis_trade_common import load_watchlist
 from jarvis_trade_strategy import (
     INVERSE_SYMBOL,
     REGIME_SYMBOL,
@@ -37,18 +39,21 @@ OUT_JSON = STATE_DIR / "trade_backtest_last.json"
 HIST_TAIL = 90  # SMA60 + rising_mean 20 + 余裕
 
 
-def load_bars(range_: str, symbols: list[str]) -> dict[str, list[dict[str, Any]]]:
+def load_bars(range_: str, symbols: list[str], *, offline: bool = False) -> dict[str, list[dict[str, Any]]]:
+    """ローカル保管庫（jarvis_trade_bar_store）から読む。足りない分だけ Yahoo から並列に差分取得。"""
+    store = BarStore()
+    since = range_start(range_)
+    fetched: set[str] = set()
+    if not offline:
+        for sym, _, hit, err in store.refresh_many(symbols, range_):
+            if err is not None:
+                print(f"# FAIL {sym}: {err}（保存済みの足で続行）", file=sys.stderr)
+            elif hit:
+                fetched.add(sym)
     out: dict[str, list[dict[str, Any]]] = {}
-    for i, sym in enumerate(symbols):
-        try:
-            rows = fetch_yahoo_daily(sym, range_=range_)
-            out[sym] = rows
-            print(f"# {sym} bars={len(rows)}", flush=True)
-        except Exception as e:
-            print(f"# FAIL {sym}: {e}", file=sys.stderr)
-            out[sym] = []
-        if i + 1 < len(symbols):
-            sleep_polite()
+    for sym in symbols:
+        out[sym] = store.rows(sym, since=since)
+        print(f"# {sym} bars={len(out[sym])}{'' if sym in fetched else ' (cache)'}", flush=True)
     return out
 
 
@@ -79,20 +84,68 @@ def next_open(rows: list[dict[str, Any]], dates: list[str], day: str) -> tuple[s
     return str(r["trade_date"])[:10], float(px)
 
 
-def mark_equity(
-    positions: list[dict[str, Any]],
-    bars: dict[str, list],
-    date_ix: dict[str, list[str]],
-    day: str,
-    cash: float,
-) -> float:
+class DictBars:
+    """従来の per-bar dict 経路。判定のたびに直近 HIST_TAIL 本を切り出して指標を計算し直す。
+
+    run_sim はこの形（calendar / close_on / next_open / regime / rhythm_exit / scale_in / probe）
+    だけを使う。配列版は jarvis_trade_bar_arrays.ArrayBars。
+    """
+
+    def __init__(self, bars: dict[str, list[dict[str, Any]]], p: dict[str, Any]) -> None:
+        self.bars = bars
+        self.p = p
+        self.date_ix = {sym: _dates_of(rows) for sym, rows in bars.items()}
+        self.calendar = sorted(set(self.date_ix.get(REGIME_SYMBOL) or []))
+
+    def _hist(self, symbol: str, day: str) -> list[dict[str, Any]]:
+        return history_until_idx(self.bars.get(symbol, []), self.date_ix.get(symbol, []), day)
+
+    def close_on(self, symbol: str, day: str) -> float | None:
+        hist = self._hist(symbol, day)
+        return float(hist[-1]["close"]) if hist else None
+
+    def next_open(self, symbol: str, day: str) -> tuple[str, float] | None:
+        return next_open(self.bars.get(symbol, []), self.date_ix.get(symbol, []), day)
+
+    def regime(self, day: str) -> str:
+        return regime_from_rows(self._hist(REGIME_SYMBOL, day), self.p)
+
+    def rhythm_exit(self, pos: dict[str, Any], px: float, day: str, as_of: date):
+        return decide_rhythm_exit(pos, px, self._hist(pos["symbol"], day), as_of, self.p)
+
+    def scale_in(self, pos: dict[str, Any], px: float, day: str, as_of: date):
+        return decide_scale_in(pos, px, self._hist(pos["symbol"], day), as_of, self.p)
+
+    def probe(self, symbol: str, day: str) -> tuple[float, str] | None:
+        return score_probe(self._hist(symbol, day), self.p)
+
+
+def bar_view(bars: Any, p: dict[str, Any], engine: str = "auto") -> Any:
+    """run_sim 用の足ビューを選ぶ。array は NumPy が無ければ dict に落とす（auto のみ）。"""
+    if engine not in ("auto", "array", "dict"):
+        raise ValueError(f"unknown engine: {engine}")
+    if engine != "dict":
+        try:
+            from jarvis_trade_bar_arrays import ArrayBars, BarArrays
+        except ImportError:
+            if engine == "array":
+                raise
+        else:
+            arrays = bars if isinstance(bars, BarArrays) else BarArrays.from_rows(bars)
+            return ArrayBars(arrays, p, HIST_TAIL)
+    if not isinstance(bars, dict):
+        bars = bars.to_rows()
+    return DictBars(bars, p)
+
+
+def mark_equity(view: Any, positions: list[dict[str, Any]], day: str, cash: float) -> float:
     mkt = 0.0
     for pos in positions:
-        hist = history_until_idx(bars.get(pos["symbol"], []), date_ix.get(pos["symbol"], []), day)
-        if not hist:
+        px = view.close_on(pos["symbol"], day)
+        if px is None:
             mkt += float(pos["avg_price"]) * int(pos["qty"])
             continue
-        mkt += float(hist[-1]["close"]) * int(pos["qty"])
+        mkt += px * int(pos["qty"])
     return cash + mkt
 
 
@@ -119,23 +172,44 @@ def run_sim(
     force_lot: bool = False,
     skip_inverse: bool = False,
     allow_symbols: set[str] | None = None,
+    engine: str = "auto",
+    start: str | None = None,
+    end: str | None = None,
+    state: dict[str, Any] | None = None,
 ) -> dict[str, Any]:
-    """1セットのパラメータで全期間を回す。DB・実弾は触らない。"""
+    """1セットのパラメータで全期間を回す。DB・実弾は触らない。
+
+    engine: "array"（NumPy で指標を前計算）/ "dict"（従来の切り出し計算）/ "auto"（NumPy があれば array）。
+    bars は銘柄→日足 dict の一覧か、配列化済みの BarArrays。どちらでも約定・エクイティは同じ。
+    start/end（YYYY-MM-DD, 両端含む）で期間を切れる。state に前の期間の戻り値 "state"
+    （現金・建玉・未約定）を渡すと続きから回す（ウォークフォワードの OOS つなぎ用）。
+    capital はサイズ計算の基準なので、つなぐときも最初の元手を渡す。
+    """
     p = merge_params(p)
     if allow_symbols:
         equities = [it for it in equities if it["symbol"] in allow_symbols]
-    date_ix = {sym: _dates_of(rows) for sym, rows in bars.items()}
-    calendar = sorted(set(date_ix.get(REGIME_SYMBOL) or []))
+    view = bar_view(bars, p, engine)
+    calendar = view.calendar
     if len(calendar) < 80:
         raise RuntimeError(f"日経ETFの日足が足りません（{len(calendar)}本）")
-    start_i = 60
-    cash = float(capital)
-    positions: list[dict[str, Any]] = []
+    start_i = max(60, bisect.bisect_left(calendar, start) if start else 0)
+    end_i = bisect.bisect_right(calendar, end) if end else len(calendar)
+    if start_i >= end_i:
+        raise RuntimeError(f"期間に営業日がありません（{start}→{end}）")
+    days = calendar[start_i:end_i]
+    if state is None:
+        cash = float(capital)
+        positions: list[dict[str, Any]] = []
+        pending: list[dict[str, Any]] = []
+    else:
+        cash = float(state["cash"])
+        positions = state["positions"]
+        pending = state["pending"]
     trades: list[dict[str, Any]] = []
     equity_curve: list[tuple[str, float]] = []
-    peak = float(capital)
+    start_eq = cash if state is None else mark_equity(view, positions, calendar[start_i - 1], cash)
+    peak = start_eq
     max_dd = 0.0
-    pending: list[dict[str, Any]] = []
     skipped_lot = 0
 
     fracs = list(p["scale_fracs"])
@@ -159,7 +233,7 @@ def run_sim(
         nonlocal cash
         still: list[dict[str, Any]] = []
         for od in pending:
-            fill = next_open(bars.get(od["symbol"], []), date_ix.get(od["symbol"], []), od["signal_day"])
+            fill = view.next_open(od["symbol"], od["signal_day"])
             if not fill:
                 still.append(od)
                 continue
@@ -236,20 +310,18 @@ def run_sim(
         pending[:] = still
         positions[:] = [x for x in positions if x.get("status") != "closed"]
 
-    for day in calendar[start_i:]:
+    for day in days:
         fill_pending(day)
         as_of = date.fromisoformat(day)
-        regime_rows = history_until_idx(bars[REGIME_SYMBOL], date_ix[REGIME_SYMBOL], day)
-        regime = regime_from_rows(regime_rows, p)
+        regime = view.regime(day)
 
         for pos in list(positions):
             if pos.get("_pending_exit") or pos.get("_pending_add"):
                 continue
-            hist = history_until_idx(bars.get(pos["symbol"], []), date_ix.get(pos["symbol"], []), day)
-            if not hist:
+            px = view.close_on(pos["symbol"], day)
+            if px is None:
                 continue
-            px = float(hist[-1]["close"])
-            decided = decide_rhythm_exit(pos, px, hist, as_of, p)
+            decided = view.rhythm_exit(pos, px, day, as_of)
             if decided:
                 reason, sell_qty, kind = decided
                 pending.append(
@@ -265,7 +337,7 @@ def run_sim(
                 )
                 pos["_pending_exit"] = True
                 continue
-            add = decide_scale_in(pos, px, hist, as_of, p)
+            add = view.scale_in(pos, px, day, as_of)
             if add:
                 next_level, tag, signs = add
                 budget = capital * per * float(fracs[next_level - 1])
@@ -292,8 +364,7 @@ def run_sim(
             for it in equities:
                 if it["symbol"] in held:
                     continue
-                hist = history_until_idx(bars.get(it["symbol"], []), date_ix.get(it["symbol"], []), day)
-                scored = score_probe(hist, p)
+                scored = view.probe(it["symbol"], day)
                 if not scored:
                     continue
                 score, reason = scored
@@ -302,8 +373,7 @@ def run_sim(
             slots = max_pos - open_count
             probe_budget = capital * per * float(fracs[0])
             for score, it, reason in cands[:slots]:
-                hist = history_until_idx(bars[it["symbol"]], date_ix[it["symbol"]], day)
-                px = float(hist[-1]["close"])
+                px = view.close_on(it["symbol"], day)
                 qty = sized_qty(probe_budget, px)
                 if qty < 1:
                     continue
@@ -326,9 +396,8 @@ def run_sim(
             and INVERSE_SYMBOL not in held
             and open_count < max_pos
         ):
-            hist = history_until_idx(bars.get(INVERSE_SYMBOL, []), date_ix.get(INVERSE_SYMBOL, []), day)
-            if hist:
-                px = float(hist[-1]["close"])
+            px = view.close_on(INVERSE_SYMBOL, day)
+            if px is not None:
                 qty = sized_qty(capital * per * fracs[0], px)
                 if qty >= 1:
                     pending.append(
@@ -342,7 +411,7 @@ def run_sim(
                         }
                     )
 
-        eq = mark_equity(positions, bars, date_ix, day, cash)
+        eq = mark_equity(view, positions, day, cash)
         if eq > peak:
             peak = eq
         dd = (peak - eq) / peak if peak else 0.0
@@ -350,18 +419,20 @@ def run_sim(
             max_dd = dd
         equity_curve.append((day, eq))
 
-    last_day = calendar[-1]
-    fill_pending(last_day)
-    final_eq = mark_equity(positions, bars, date_ix, last_day, cash)
+    last_day = days[-1]
+    if end_i == len(calendar):
+        fill_pending(last_day)
+    final_eq = mark_equity(view, positions, last_day, cash)
     closed = [t for t in trades if t.get("status") == "filled" and t.get("side") in ("sell",)]
     pnls = [float(t.get("pnl") or 0) for t in closed]
     wins = [x for x in pnls if x > 0]
-    ret = (final_eq - capital) / capital if capital else 0.0
+    ret = (final_eq - start_eq) / start_eq if start_eq else 0.0
     return {
-        "from": calendar[start_i],
+        "from": days[0],
         "to": last_day,
-        "calendar_days": len(calendar) - start_i,
+        "calendar_days": len(days),
         "capital": capital,
+        "start_equity": start_eq,
         "final_equity": round(final_eq, 0),
         "return_pct": round(ret * 100, 2),
         "max_drawdown_pct": round(max_dd * 100, 2),
@@ -376,6 +447,7 @@ def run_sim(
         ],
         "trades": trades,
         "equity_curve": equity_curve,
+        "state": {"cash": cash, "positions": positions, "pending": pending},
     }
 
 
@@ -386,6 +458,13 @@ def main() -> int:
     ap.add_argument("--params-json", default="", help="DEFAULT_PARAMS を上書きする JSON")
     ap.add_argument("--force-lot", action="store_true", help="予算不足でも1株買う（旧挙動・非推奨）")
     ap.add_argument("--skip-inverse", action="store_true")
+    ap.add_argument(
+        "--engine",
+        choices=("auto", "array", "dict"),
+        default="auto",
+        help="array=NumPy 前計算（速い）/ dict=従来の切り出し計算。結果は同じ",
+    )
+    ap.add_argument("--offline", action="store_true", help="Yahoo に出ず保存済みの足だけで回す")
     ap.add_argument("--no-save", action="store_true")
     args = ap.parse_args()
 
@@ -398,7 +477,7 @@ def main() -> int:
         f"# backtest range={args.range} capital={args.capital:.0f} names={len(equities)} force_lot={args.force_lot}",
         flush=True,
     )
-    bars = load_bars(args.range, symbols)
+    bars = load_bars(args.range, symbols, offline=args.offline)
     if len(bars.get(REGIME_SYMBOL) or []) < 70:
         print("# 日経ETFの日足が足りません", file=sys.stderr)
         return 2
@@ -410,10 +489,11 @@ def main() -> int:
         args.capital,
         force_lot=args.force_lot,
         skip_inverse=args.skip_inverse,
+        engine=args.engine,
     )
     summary = {
         "range": args.range,
-        **{k: v for k, v in result.items() if k not in ("trades", "equity_curve")},
+        **{k: v for k, v in result.items() if k not in ("trades", "equity_curve", "state")},
         "fill_model": "next_open",
         "force_lot": args.force_lot,
         "note": "過去検証。先読み回避のため翌営業日始値。1株が枠を超える銘柄は見送り（--force-lot で旧挙動）。",
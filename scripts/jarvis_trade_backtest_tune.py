@@ -2,24 +2,42 @@
 """平均回帰の「理論は固定・バランスだけ変える」比較。
 
   大量グリッドは過学習するので、セオリーから外さない少数案だけ回す。
-  価格は1回だけ取り、同じ足で全案を比較する。
+  価格はローカル保管庫（jarvis_trade_bar_store）から1回だけ読み、同じ足で全案を比較する。
+
+  広く探すときは --sweep（グリッド／ランダム）。全コアで並列に回し、足は共有メモリで1回だけ渡す。
+  結果は JSONL に1案ずつ追記し、同じ条件（range・capital・データ期間・分割日）で済んだ案は再実行しない（中断しても続きから）。
+
+  --walk-forward は学習窓で案を選び直し、次の検証窓だけ回すのをずらしながら繰り返す。
+  検証窓は建玉・現金を持ち越してつなぎ、全体の OOS と「選び直さない固定案」を並べる。
 
   cd ~/git-repos && set -a && source .env.jarvis_private && set +a
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest_tune.py --range max
+  ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest_tune.py --range max --sweep config/trade_backtest_sweep.yaml
+  ~/selenium_env/venv/bin/python scripts/jarvis_trade_backtest_tune.py --range max --walk-forward
 """
 from __future__ import annotations
 
 import argparse
+import hashlib
+import itertools
 import json
+import os
+import random
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+import yaml
 
 from jarvis_trade_backtest import STATE_DIR, load_bars, run_sim, tradable_jp
 from jarvis_trade_common import load_watchlist
-from jarvis_trade_strategy import INVERSE_SYMBOL, REGIME_SYMBOL, merge_params
+from jarvis_trade_strategy import DEFAULT_PARAMS, INVERSE_SYMBOL, REGIME_SYMBOL, merge_params
 
 OUT_JSON = STATE_DIR / "trade_backtest_tune.json"
+SWEEP_JSONL = STATE_DIR / "trade_backtest_sweep.jsonl"
+WF_JSON = STATE_DIR / "trade_backtest_walkforward.json"
 HIGH_PRICE = {"8035.T", "6857.T", "6920.T"}  # 10万枠では1株が枠超えやすい
 ETF_ONLY = {"1545.T", "1546.T"}
 
@@ -105,47 +123,51 @@ def _dd(curve: list[tuple[str, float]]) -> float:
     return round(max_dd * 100, 2)
 
 
+def window_summary(c: list[tuple[str, float]], sells: list[dict[str, Any]], start_eq: float) -> dict[str, Any]:
+    if not c:
+        return {
+            "from": None,
+            "to": None,
+            "return_pct": None,
+            "max_drawdown_pct": None,
+            "win_rate_pct": None,
+            "round_trips": 0,
+            "fills": 0,
+            "final_equity": None,
+            "quality_bar": False,
+        }
+    end_eq = c[-1][1]
+    ret = (end_eq / start_eq - 1) * 100 if start_eq else 0.0
+    pnls = [float(t.get("pnl") or 0) for t in sells]
+    wins = [x for x in pnls if x > 0]
+    return {
+        "from": c[0][0],
+        "to": c[-1][0],
+        "return_pct": round(ret, 2),
+        "max_drawdown_pct": _dd(c),
+        "win_rate_pct": round(100 * len(wins) / len(pnls), 1) if pnls else None,
+        "round_trips": len(pnls),
+        "fills": len(sells),
+        "final_equity": round(end_eq, 0),
+        "quality_bar": _dd(c) < 20 and ret > 0,
+    }
+
+
+def _sells(res: dict[str, Any]) -> list[dict[str, Any]]:
+    return [t for t in res.get("trades") or [] if t.get("status") == "filled" and t.get("side") == "sell"]
+
+
 def split_window(res: dict[str, Any], mid: str) -> tuple[dict[str, Any], dict[str, Any]]:
     """同一ランのエクイティを前半/後半に分けて評価（指標のウォームアップを壊さない）。"""
     curve = list(res.get("equity_curve") or [])
     is_c = [(d, e) for d, e in curve if d <= mid]
     oos_c = [(d, e) for d, e in curve if d > mid]
-    trades = [t for t in res.get("trades") or [] if t.get("status") == "filled" and t.get("side") == "sell"]
-
-    def pack(c: list[tuple[str, float]], sells: list[dict[str, Any]], start_eq: float) -> dict[str, Any]:
-        if not c:
-            return {
-                "from": None,
-                "to": None,
-                "return_pct": None,
-                "max_drawdown_pct": None,
-                "win_rate_pct": None,
-                "round_trips": 0,
-                "fills": 0,
-                "final_equity": None,
-                "quality_bar": False,
-            }
-        end_eq = c[-1][1]
-        ret = (end_eq / start_eq - 1) * 100 if start_eq else 0.0
-        pnls = [float(t.get("pnl") or 0) for t in sells]
-        wins = [x for x in pnls if x > 0]
-        return {
-            "from": c[0][0],
-            "to": c[-1][0],
-            "return_pct": round(ret, 2),
-            "max_drawdown_pct": _dd(c),
-            "win_rate_pct": round(100 * len(wins) / len(pnls), 1) if pnls else None,
-            "round_trips": len(pnls),
-            "fills": len(sells),
-            "final_equity": round(end_eq, 0),
-            "quality_bar": _dd(c) < 20 and ret > 0,
-        }
-
+    trades = _sells(res)
     is_sells = [t for t in trades if str(t.get("fill_day") or "") <= mid]
     oos_sells = [t for t in trades if str(t.get("fill_day") or "") > mid]
     is_start = is_c[0][1] if is_c else float(res["capital"])
     oos_start = oos_c[0][1] if oos_c else (is_c[-1][1] if is_c else float(res["capital"]))
-    return pack(is_c, is_sells, is_start), pack(oos_c, oos_sells, oos_start)
+    return window_summary(is_c, is_sells, is_start), window_summary(oos_c, oos_sells, oos_start)
 
 
 def summarize_run(label: str, note: str, res: dict[str, Any]) -> dict[str, Any]:
@@ -167,12 +189,23 @@ def summarize_run(label: str, note: str, res: dict[str, Any]) -> dict[str, Any]:
     }
 
 
+def as_arrays(bars: dict[str, list]) -> Any:
+    """全案で同じ足を使うので、NumPy があれば1回だけ配列化しておく（指標も案をまたいで再利用）。"""
+    try:
+        from jarvis_trade_bar_arrays import BarArrays
+    except ImportError:
+        return bars
+    return BarArrays.from_rows(bars)
+
+
 def run_variant(
-    bars: dict[str, list],
+    bars: Any,
     equities: list[dict[str, Any]],
     v: dict[str, Any],
     capital: float,
+    **window: Any,
 ) -> dict[str, Any]:
+    """window は run_sim の start / end / state（ウォークフォワード用）。"""
     allow = set(v["allow"]) if v.get("allow") else None
     names = equities
     if v.get("deny"):
@@ -185,20 +218,340 @@ def run_variant(
         force_lot=bool(v.get("force_lot")),
         skip_inverse=bool(v.get("skip_inverse")),
         allow_symbols=allow,
+        **window,
+    )
+
+
+def load_sweep_spec(path: Path) -> dict[str, Any]:
+    spec = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
+    grid = spec.get("params") or {}
+    unknown = sorted(k for k in list(grid) + list(spec.get("base") or {}) if k not in DEFAULT_PARAMS)
+    if unknown:
+        raise SystemExit(f"未知のパラメータ: {', '.join(unknown)}（jarvis_trade_strategy.DEFAULT_PARAMS を参照）")
+    for k, vals in grid.items():
+        if not isinstance(vals, (list, dict)) or not vals:
+            raise SystemExit(f"params.{k} は候補リストか {{low, high}} で書いてください")
+        if isinstance(vals, dict) and spec.get("mode", "grid") == "grid":
+            raise SystemExit(f"params.{k}: {{low, high}} は mode: random のときだけ")
+    return spec
+
+
+def _pick(vals: Any, rnd: random.Random) -> Any:
+    if isinstance(vals, list):
+        return rnd.choice(vals)
+    lo, hi = vals["low"], vals["high"]
+    if isinstance(lo, int) and isinstance(hi, int):
+        return rnd.randint(lo, hi)
+    return round(rnd.uniform(float(lo), float(hi)), int(vals.get("round", 4)))
+
+
+def variant_id(v: dict[str, Any]) -> str:
+    key = {k: v.get(k) for k in ("params", "force_lot", "skip_inverse")}
+    return "sw_" + hashlib.sha1(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+
+def sweep_variants(spec: dict[str, Any]) -> list[dict[str, Any]]:
+    """spec（grid / random）から案を作る。params 以外は全案共通。"""
+    base = dict(spec.get("base") or {})
+    grid: dict[str, Any] = spec.get("params") or {}
+    keys = list(grid)
+    combos: list[dict[str, Any]] = []
+    if spec.get("mode", "grid") == "random":
+        rnd = random.Random(int(spec.get("seed") or 0))
+        for _ in range(int(spec.get("samples") or 50)):
+            combos.append({k: _pick(grid[k], rnd) for k in keys})
+    else:
+        for vals in itertools.product(*(grid[k] for k in keys)):
+            combos.append(dict(zip(keys, vals)))
+    out: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for combo in combos:
+        v = {
+            "params": {**base, **combo},
+            "force_lot": bool(spec.get("force_lot", False)),
+            "skip_inverse": bool(spec.get("skip_inverse", True)),
+        }
+        v["id"] = variant_id(v)
+        if v["id"] in seen:
+            continue
+        seen.add(v["id"])
+        v["note"] = " ".join(f"{k}={combo[k]}" for k in keys)
+        out.append(v)
+    return out
+
+
+def sweep_run_key(range_: str, capital: float, first: str, last: str, mid: str) -> dict[str, Any]:
+    """案の結果が比べられる条件（同じ --sweep-out でもここが違う行は別の実行として扱う）。"""
+    return {"range": range_, "capital": capital, "from": first, "to": last, "is_to": mid}
+
+
+def sweep_records(path: Path, run: dict[str, Any]) -> list[dict[str, Any]]:
+    """out の行のうち run が一致するもの（条件違いの行・run の無い旧形式の行は無視）。"""
+    if not path.is_file():
+        return []
+    recs: list[dict[str, Any]] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            rec = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # 途中で切れた最終行
+        if isinstance(rec, dict) and "id" in rec and rec.get("run") == run:
+            recs.append(rec)
+    return recs
+
+
+def done_ids(path: Path, run: dict[str, Any]) -> set[str]:
+    return {rec["id"] for rec in sweep_records(path, run)}
+
+
+_W: dict[str, Any] = {}
+
+
+def _sweep_init(meta: dict[str, Any], equities: list[dict[str, Any]], capital: float, mid: str) -> None:
+    from jarvis_trade_bar_arrays import BarArrays
+
+    arrays, shm = BarArrays.attach_shared(meta)
+    _W.update(arrays=arrays, shm=shm, equities=equities, capital=capital, mid=mid)
+
+
+def _sweep_run(v: dict[str, Any]) -> dict[str, Any]:
+    t0 = time.monotonic()
+    full = run_variant(_W["arrays"], _W["equities"], v, _W["capital"])
+    ins, oos = split_window(full, _W["mid"])
+    return {
+        "id": v["id"],
+        "note": v["note"],
+        "params": v["params"],
+        "force_lot": v["force_lot"],
+        "skip_inverse": v["skip_inverse"],
+        "is_to": _W["mid"],
+        "full": summarize_run(v["id"], v["note"], full),
+        "in_sample": ins,
+        "out_of_sample": oos,
+        "elapsed_sec": round(time.monotonic() - t0, 2),
+    }
+
+
+def run_sweep(
+    bars: dict[str, list],
+    equities: list[dict[str, Any]],
+    todo: list[dict[str, Any]],
+    capital: float,
+    mid: str,
+    out: Path,
+    workers: int,
+    run: dict[str, Any],
+) -> int:
+    """未実行の案をプロセスプールで回し、終わった順に out へ1行ずつ追記。失敗件数を返す。"""
+    try:
+        from jarvis_trade_bar_arrays import BarArrays
+    except ImportError:
+        raise SystemExit("--sweep は NumPy が必要です（pip install numpy）")
+    shm, meta = BarArrays.from_rows(bars).to_shared()
+    fail = 0
+    try:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with out.open("a", encoding="utf-8") as fh, ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_sweep_init,
+            initargs=(meta, equities, capital, mid),
+        ) as pool:
+            futs = {pool.submit(_sweep_run, v): v for v in todo}
+            for n, fut in enumerate(as_completed(futs), 1):
+                v = futs[fut]
+                try:
+                    rec = fut.result()
+                except Exception as e:
+                    print(f"# FAIL {v['id']} {v['note']}: {e}", file=sys.stderr)
+                    fail += 1
+                    continue
+                fh.write(json.dumps({**rec, "run": run}, ensure_ascii=False) + "\n")
+                fh.flush()
+                o = rec["out_of_sample"]
+                print(
+                    f"  [{n}/{len(todo)}] {v['note']}: full {rec['full']['return_pct']:+.1f}% "
+                    f"oos {o.get('return_pct')}% DD{o.get('max_drawdown_pct')}% ({rec['elapsed_sec']}s)",
+                    flush=True,
+                )
+    finally:
+        shm.close()
+        shm.unlink()
+    return fail
+
+
+def print_sweep_top(out: Path, ids: set[str], run: dict[str, Any], top: int) -> None:
+    recs = list({r["id"]: r for r in sweep_records(out, run) if r["id"] in ids}.values())
+    recs.sort(
+        key=lambda r: (r["out_of_sample"].get("return_pct") is not None, r["out_of_sample"].get("return_pct") or 0),
+        reverse=True,
     )
+    print(f"📎 Trade Desk スイープ（OOS リターン上位 {min(top, len(recs))}/{len(recs)}）")
+    for r in recs[:top]:
+        o = r["out_of_sample"]
+        bar = "✅" if o.get("quality_bar") else "—"
+        print(
+            f"  {r['note']}: 全{r['full']['return_pct']:+.1f}% DD{r['full']['max_drawdown_pct']:.1f}% "
+            f"| OOS {o.get('return_pct')}% DD{o.get('max_drawdown_pct')}% {bar}"
+        )
+    print(f"- 保存: {out}")
+
+
+def wf_windows(cal: list[str], train: int, test: int, warmup: int = 60) -> list[tuple[str, str, str, str]]:
+    """(学習 from, to, 検証 from, to)。検証窓の幅ずつずらす。最後の検証窓は端数でも入れる。"""
+    out: list[tuple[str, str, str, str]] = []
+    a = warmup
+    while a + train < len(cal):
+        b = a + train
+        c = min(b + test, len(cal))
+        out.append((cal[a], cal[b - 1], cal[b], cal[c - 1]))
+        a += test
+    return out
+
+
+def wf_rank(r: dict[str, Any]) -> tuple[bool, float]:
+    """学習窓での選び方: DD<20% を優先し、その中でリターン。"""
+    return (r["max_drawdown_pct"] < 20, r["return_pct"])
+
+
+def _wf_train(job: tuple[int, dict[str, Any], str, str]) -> tuple[int, str, dict[str, Any]]:
+    wi, v, start, end = job
+    res = run_variant(_W["arrays"], _W["equities"], v, _W["capital"], start=start, end=end)
+    return wi, v["id"], summarize_run(v["id"], v["note"], res)
+
+
+def wf_train_all(
+    bars: dict[str, list],
+    sim_bars: Any,
+    equities: list[dict[str, Any]],
+    jobs: list[tuple[int, dict[str, Any], str, str]],
+    capital: float,
+    workers: int,
+) -> Iterator[tuple[int, str, dict[str, Any]]]:
+    """学習窓×候補を全部回す。窓どうしは独立なので、検証の前にまとめて並列に流す。"""
+    shm = None
+    if workers > 1 and sim_bars is not bars:
+        from jarvis_trade_bar_arrays import BarArrays
+
+        shm, meta = BarArrays.from_rows(bars).to_shared()
+    try:
+        if shm is None:
+            _W.update(arrays=sim_bars, equities=equities, capital=capital)
+            for job in jobs:
+                try:
+                    yield _wf_train(job)
+                except Exception as e:
+                    print(f"# FAIL {job[1]['id']} {job[2]}→{job[3]}: {e}", file=sys.stderr)
+            return
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_sweep_init, initargs=(meta, equities, capital, "")
+        ) as pool:
+            futs = {pool.submit(_wf_train, job): job for job in jobs}
+            for fut in as_completed(futs):
+                job = futs[fut]
+                try:
+                    yield fut.result()
+                except Exception as e:
+                    print(f"# FAIL {job[1]['id']} {job[2]}→{job[3]}: {e}", file=sys.stderr)
+    finally:
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+
+def walk_forward(
+    bars: dict[str, list],
+    equities: list[dict[str, Any]],
+    cands: list[dict[str, Any]],
+    capital: float,
+    windows: list[tuple[str, str, str, str]],
+    workers: int,
+) -> dict[str, Any]:
+    """窓ごとに学習期間で候補を選び直し、次の検証期間だけ回す。検証は建玉・現金を持ち越してつなぐ。
+
+    指標は BarArrays に全期間1回だけ作り、窓・候補をまたいで使い回す（窓ごとに作り直さない）。
+    """
+    sim_bars = as_arrays(bars)
+    by_id = {v["id"]: v for v in cands}
+    order = {v["id"]: i for i, v in enumerate(cands)}
+    jobs = [(wi, v, w[0], w[1]) for wi, w in enumerate(windows) for v in cands]
+    train: dict[int, list[tuple[str, dict[str, Any]]]] = {wi: [] for wi in range(len(windows))}
+    for n, (wi, vid, r) in enumerate(wf_train_all(bars, sim_bars, equities, jobs, capital, workers), 1):
+        train[wi].append((vid, r))
+        if n % max(1, len(cands)) == 0:
+            print(f"  学習 {n}/{len(jobs)}", flush=True)
+
+    carry: dict[str, Any] | None = None
+    curve: list[tuple[str, float]] = []
+    sells: list[dict[str, Any]] = []
+    rows: list[dict[str, Any]] = []
+    for wi, (tr_from, tr_to, te_from, te_to) in enumerate(windows):
+        if not train[wi]:
+            raise RuntimeError(f"学習窓 {tr_from}→{tr_to} で回った候補がありません")
+        # 同点は候補の並び順（並列の終わった順に左右されない）
+        vid, tr = max(sorted(train[wi], key=lambda x: order[x[0]]), key=lambda x: wf_rank(x[1]))
+        res = run_variant(sim_bars, equities, by_id[vid], capital, start=te_from, end=te_to, state=carry)
+        carry = res["state"]
+        curve += res["equity_curve"]
+        sells += _sells(res)
+        te = window_summary(res["equity_curve"], _sells(res), res["start_equity"])
+        rows.append(
+            {
+                "train_from": tr_from,
+                "train_to": tr_to,
+                "test_from": te_from,
+                "test_to": te_to,
+                "chosen": vid,
+                "note": by_id[vid]["note"],
+                "train": {k: tr[k] for k in ("return_pct", "max_drawdown_pct", "win_rate_pct", "round_trips")},
+                "test": te,
+            }
+        )
+        print(
+            f"  [{wi + 1}/{len(windows)}] 学習 {tr_from}→{tr_to} {vid} {tr['return_pct']:+.1f}% "
+            f"| 検証 {te_from}→{te_to} {te['return_pct']:+.1f}% DD{te['max_drawdown_pct']:.1f}%",
+            flush=True,
+        )
+
+    oos_from, oos_to = windows[0][2], windows[-1][3]
+    fixed: list[dict[str, Any]] = []
+    for v in cands:  # 比較用: 選び直さず1案で同じ OOS 期間を通した場合
+        try:
+            res = run_variant(sim_bars, equities, v, capital, start=oos_from, end=oos_to)
+        except Exception as e:
+            print(f"# FAIL fixed {v['id']}: {e}", file=sys.stderr)
+            continue
+        fixed.append({"id": v["id"], "note": v["note"], **window_summary(res["equity_curve"], _sells(res), capital)})
+    fixed.sort(key=lambda r: r["return_pct"] if r["return_pct"] is not None else float("-inf"), reverse=True)
+    return {
+        "windows": rows,
+        "stitched_oos": window_summary(curve, sells, capital),
+        "fixed_oos": fixed,
+    }
 
 
 def main() -> int:
     ap = argparse.ArgumentParser(description="Trade Desk バックテスト比較（少数案）")
     ap.add_argument("--range", default="max", help="Yahoo range（max / 10y / 5y）")
     ap.add_argument("--capital", type=float, default=100000)
+    ap.add_argument("--sweep", default="", help="スイープ spec（YAML: mode grid/random, params, base）")
+    ap.add_argument("--sweep-out", default=str(SWEEP_JSONL), help="結果 JSONL（同じ条件で済んだ案はスキップ）")
+    ap.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--offline", action="store_true", help="Yahoo に出ず保存済みの足だけで回す")
+    ap.add_argument("--walk-forward", action="store_true", help="学習窓で選び直し→次の窓で検証をずらしながら繰り返す")
+    ap.add_argument("--train-days", type=int, default=504, help="学習窓（営業日。既定≒2年）")
+    ap.add_argument("--test-days", type=int, default=126, help="検証窓（営業日。既定≒半年）")
     args = ap.parse_args()
 
+    spec: dict[str, Any] | None = None
+    if args.sweep:
+        spec = load_sweep_spec(Path(args.sweep))
+
     instruments = load_watchlist()
     equities = [it for it in instruments if tradable_jp(it)]
     symbols = [REGIME_SYMBOL, INVERSE_SYMBOL, *[it["symbol"] for it in equities]]
     print(f"# tune range={args.range} capital={args.capital:.0f} names={len(equities)}", flush=True)
-    bars = load_bars(args.range, symbols)
+    bars = load_bars(args.range, symbols, offline=args.offline)
     nikkei = bars.get(REGIME_SYMBOL) or []
     if len(nikkei) < 70:
         print("# 日経ETFの日足が足りません", file=sys.stderr)
@@ -209,6 +562,55 @@ def main() -> int:
     mid = cal[int(len(cal) * 0.70)]
     print(f"# data {first} → {last}  mid(70%)={mid}", flush=True)
 
+    if args.walk_forward:
+        cands = sweep_variants(spec) if spec is not None else variants()
+        windows = wf_windows(cal, args.train_days, args.test_days)
+        if not windows:
+            print(f"# 足が学習窓 {args.train_days} 日に足りません（{len(cal)}本）", file=sys.stderr)
+            return 2
+        print(
+            f"# walk-forward 窓{len(windows)}（学習{args.train_days}/検証{args.test_days}営業日）"
+            f" 候補{len(cands)} workers={args.workers}",
+            flush=True,
+        )
+        wf = walk_forward(bars, equities, cands, args.capital, windows, max(1, args.workers))
+        payload = {
+            "range": args.range,
+            "capital": args.capital,
+            "train_days": args.train_days,
+            "test_days": args.test_days,
+            "candidates": [v["id"] for v in cands],
+            "note": "窓ごとに学習期間で選び直し（DD<20%優先→リターン）、次の検証期間だけ回して建玉ごとつないだ OOS。",
+            **wf,
+        }
+        STATE_DIR.mkdir(parents=True, exist_ok=True)
+        WF_JSON.write_text(json.dumps(payload, ensure_ascii=False, indent=2), encoding="utf-8")
+        st = wf["stitched_oos"]
+        bar = "✅" if st.get("quality_bar") else "—"
+        print("📎 Trade Desk ウォークフォワード")
+        print(f"- OOS {st['from']} → {st['to']}（{len(windows)}窓つなぎ）")
+        print(
+            f"- 選び直し: {st['return_pct']:+.1f}% DD{st['max_drawdown_pct']:.1f}% "
+            f"WR{st['win_rate_pct']}% 決済{st['round_trips']} {bar}"
+        )
+        for r in wf["fixed_oos"][:3]:
+            print(f"  固定 {r['id']}: {r['return_pct']:+.1f}% DD{r['max_drawdown_pct']:.1f}%  {r['note']}")
+        print(f"- 保存: {WF_JSON}")
+        return 0
+
+    if spec is not None:
+        out = Path(args.sweep_out)
+        planned = sweep_variants(spec)
+        run = sweep_run_key(args.range, args.capital, first, last, mid)
+        done = done_ids(out, run)
+        todo = [v for v in planned if v["id"] not in done]
+        print(f"# sweep {len(planned)}案（済 {len(planned) - len(todo)} / 残り {len(todo)}） workers={args.workers}", flush=True)
+        fail = run_sweep(bars, equities, todo, args.capital, mid, out, max(1, args.workers), run) if todo else 0
+        print_sweep_top(out, {v["id"] for v in planned}, run, args.top)
+        return 0 if fail == 0 else 1
+
+    sim_bars = as_arrays(bars)
+
     rows_all: list[dict[str, Any]] = []
     rows_is: list[dict[str, Any]] = []
     rows_oos: list[dict[str, Any]] = []
@@ -216,7 +618,7 @@ def main() -> int:
     for v in variants():
         print(f"# run {v['id']} …", flush=True)
         try:
-            full = run_variant(bars, equities, v, args.capital)
+            full = run_variant(sim_bars, equities, v, args.capital)
             ins, oos = split_window(full, mid)
         except Exception as e:
             print(f"# FAIL {v['id']}: {e}", file=sys.stderr)
@@ -0,0 +1,474 @@
+"""Trade Desk バックテストの配列エンジン（NumPy）。お金もDBも動かさない。
+
+  銘柄ごとの日足を1回だけ列（始値・高値・安値・終値）に並べ、SMA／RSI／沈み／反発サインを
+  全期間まとめて前計算する。run_sim は日ごとに列を引くだけになる。
+  判定の閾値・文言は jarvis_trade_strategy の *_from_stats を共有し、dict 版と同じ約定・エクイティを出す。
+  指標は dict 版と同じく「直近 tail 本」で見た値にそろえる（尾が短い序盤は未定義扱い）。
+  和は dict 版と同じく左から順に足す（同じ丸め）ので、閾値ぎわでも判定がずれない。
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from datetime import date
+from typing import Any
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from jarvis_trade_strategy import (
+    INVERSE_SYMBOL,
+    MEAN_N,
+    REBOUND_SIGNS,
+    REGIME_SYMBOL,
+    probe_from_stats,
+    rhythm_exit_from_stats,
+    scale_in_from_stats,
+)
+
+
+def _col(rows: list[dict[str, Any]], key: str) -> np.ndarray:
+    # None は NaN になる
+    return np.array([r.get(key) for r in rows], dtype=np.float64)
+
+
+@dataclass
+class SymbolBars:
+    """1銘柄の日足（列持ち）。欠損値は NaN。"""
+
+    symbol: str
+    dates: list[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def from_rows(cls, symbol: str, rows: list[dict[str, Any]]) -> "SymbolBars":
+        return cls(
+            symbol=symbol,
+            dates=[str(r["trade_date"])[:10] for r in rows],
+            open=_col(rows, "open"),
+            high=_col(rows, "high"),
+            low=_col(rows, "low"),
+            close=_col(rows, "close"),
+            volume=np.array([int(r.get("volume") or 0) for r in rows], dtype=np.int64),
+        )
+
+    def to_rows(self) -> list[dict[str, Any]]:
+        def num(a: np.ndarray, i: int) -> float | None:
+            return None if np.isnan(a[i]) else float(a[i])
+
+        return [
+            {
+                "symbol": self.symbol,
+                "trade_date": d,
+                "open": num(self.open, i),
+                "high": num(self.high, i),
+                "low": num(self.low, i),
+                "close": num(self.close, i),
+                "volume": int(self.volume[i]),
+            }
+            for i, d in enumerate(self.dates)
+        ]
+
+
+@dataclass
+class BarArrays:
+    """全銘柄の列持ち日足。指標はパラメータごとにここへキャッシュする（同じ足で何案も回す用）。"""
+
+    symbols: dict[str, SymbolBars]
+    _ind: dict[tuple[str, tuple], "SymbolIndicators"] = field(default_factory=dict, repr=False)
+    _last_ix: dict[str, np.ndarray] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_rows(cls, bars: dict[str, list[dict[str, Any]]]) -> "BarArrays":
+        return cls({sym: SymbolBars.from_rows(sym, rows) for sym, rows in bars.items()})
+
+    def to_rows(self) -> dict[str, list[dict[str, Any]]]:
+        return {sym: sb.to_rows() for sym, sb in self.symbols.items()}
+
+    def get(self, symbol: str) -> SymbolBars | None:
+        return self.symbols.get(symbol)
+
+    def to_shared(self) -> tuple[shared_memory.SharedMemory, dict[str, Any]]:
+        """全銘柄の列を1枚の共有メモリに詰める。返す meta をワーカーの attach_shared に渡す。
+
+        呼び出し側が close()/unlink() する。ワーカーへはタスクごとに足を pickle しない。
+        """
+        total = sum(len(sb.dates) for sb in self.symbols.values())
+        shm = shared_memory.SharedMemory(create=True, size=max(1, total * 8 * len(_SHARED_COLS)))
+        layout: list[tuple[str, int, int, list[str]]] = []
+        views = _shared_views(shm, total)
+        pos = 0
+        for sym, sb in self.symbols.items():
+            n = len(sb.dates)
+            for col in _SHARED_COLS:
+                views[col][pos : pos + n] = getattr(sb, col)
+            layout.append((sym, pos, n, sb.dates))
+            pos += n
+        return shm, {"name": shm.name, "total": total, "layout": layout}
+
+    @classmethod
+    def attach_shared(cls, meta: dict[str, Any]) -> tuple["BarArrays", shared_memory.SharedMemory]:
+        """to_shared の共有メモリを読み取り専用ビューとして開く（コピーしない）。"""
+        try:
+            shm = shared_memory.SharedMemory(name=meta["name"], track=False)
+        except TypeError:  # Python < 3.13: プールのワーカーは作成側の resource_tracker を共有するので登録は重複しない
+            shm = shared_memory.SharedMemory(name=meta["name"])
+        views = _shared_views(shm, int(meta["total"]))
+        for v in views.values():
+            v.flags.writeable = False
+        symbols: dict[str, SymbolBars] = {}
+        for sym, pos, n, dates in meta["layout"]:
+            symbols[sym] = SymbolBars(
+                symbol=sym,
+                dates=list(dates),
+                **{col: views[col][pos : pos + n] for col in _SHARED_COLS},
+            )
+        return cls(symbols), shm
+
+    def indicators(self, symbol: str, p: dict[str, Any], tail: int) -> "SymbolIndicators | None":
+        sb = self.symbols.get(symbol)
+        if sb is None:
+            return None
+        key = (symbol, (tail, *(repr(p.get(k)) for k in INDICATOR_PARAM_KEYS)))
+        ind = self._ind.get(key)
+        if ind is None:
+            ind = SymbolIndicators.build(sb, p, tail)
+            self._ind[key] = ind
+        return ind
+
+
+_SHARED_COLS = ("open", "high", "low", "close", "volume")
+
+
+def _shared_views(shm: shared_memory.SharedMemory, total: int) -> dict[str, np.ndarray]:
+    out: dict[str, np.ndarray] = {}
+    for i, col in enumerate(_SHARED_COLS):
+        dtype = np.int64 if col == "volume" else np.float64
+        out[col] = np.ndarray((total,), dtype=dtype, buffer=shm.buf, offset=i * total * 8)
+    return out
+
+
+INDICATOR_PARAM_KEYS = (
+    "sma_fast",
+    "sma_slow",
+    "rsi_period",
+    "rising_mean_lookback",
+    "rising_mean_min_ratio",
+    "drop_min_pct",
+    "drop_max_pct",
+    "rsi_buy_low",
+    "rsi_buy_high",
+    "rebound_min_signs",
+)
+
+
+def window_sum(x: np.ndarray, n: int) -> np.ndarray:
+    """out[k] = x[k-n+1] + … + x[k]（左から順に加算）。足りない位置は NaN。"""
+    out = np.full(len(x), np.nan)
+    if n <= 0 or len(x) < n:
+        return out
+    m = len(x) - n + 1
+    acc = x[0:m].copy()
+    for j in range(1, n):
+        acc = acc + x[j : j + m]
+    out[n - 1 :] = acc
+    return out
+
+
+def sma_col(c: np.ndarray, n: int) -> np.ndarray:
+    """jarvis_trade_common.sma を全位置で。"""
+    if n <= 0:
+        return np.full(len(c), np.nan)
+    return window_sum(c, n) / n
+
+
+def rsi_col(c: np.ndarray, n: int) -> np.ndarray:
+    """jarvis_trade_common.rsi（単純平均版）を全位置で。"""
+    out = np.full(len(c), np.nan)
+    if n <= 0 or len(c) < n + 1:
+        return out
+    d = np.empty(len(c))
+    d[0] = np.nan
+    d[1:] = c[1:] - c[:-1]
+    up = d >= 0
+    gains = window_sum(np.where(up, d, 0.0), n)
+    losses = window_sum(np.where(up, 0.0, -d), n)
+    gains[:n] = np.nan
+    losses[:n] = np.nan
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = (gains / n) / (losses / n)
+        out = np.where(losses == 0, 100.0, 100.0 - (100.0 / (1.0 + rs)))
+    out[:n] = np.nan
+    return out
+
+
+def _shift(a: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(len(a), np.nan)
+    if 0 < k < len(a):
+        out[k:] = a[:-k]
+    elif k == 0:
+        out[:] = a
+    return out
+
+
+def _rolling(fn: Any, a: np.ndarray, w: int) -> np.ndarray:
+    """out[k] = fn(a[k-w+1..k])。窓が足りない位置は NaN。"""
+    out = np.full(len(a), np.nan)
+    if w <= 0 or len(a) < w:
+        return out
+    out[w - 1 :] = fn.reduce(sliding_window_view(a, w), axis=1)
+    return out
+
+
+@dataclass
+class SymbolIndicators:
+    """1銘柄・1パラメータの指標列。位置 k は「k 本目までの尾（最大 tail 本）」で見た値。"""
+
+    bars: SymbolBars
+    tail: int
+    fast: np.ndarray
+    slow: np.ndarray
+    mean: np.ndarray
+    rsi: np.ndarray
+    drop_mean: np.ndarray
+    drop_high: np.ndarray
+    stretch: np.ndarray
+    sign_bits: np.ndarray
+    n_signs: np.ndarray
+    probe: np.ndarray
+    ups_cum: np.ndarray
+    # 建玉ごとの安値（opened → (起点, 位置, 最安値)）。日を進めるたびに差分だけ見る
+    _swing: dict[str, tuple[int, int, float]] = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def build(cls, sb: SymbolBars, p: dict[str, Any], tail: int) -> "SymbolIndicators":
+        c, o, lo = sb.close, sb.open, sb.low
+        n = len(c)
+        L = np.minimum(np.arange(n) + 1, tail)
+        fast_n = int(p["sma_fast"])
+        slow_n = int(p["sma_slow"])
+        mean_n = int(p.get("sma_slow") or MEAN_N)
+        rn = int(p["rsi_period"])
+        lb = int(p.get("rising_mean_lookback") or 20)
+        ratio = float(p.get("rising_mean_min_ratio") or 0.98)
+
+        fast_raw = sma_col(c, fast_n)
+        slow_raw = sma_col(c, slow_n)
+        mean_raw = slow_raw if mean_n == slow_n else sma_col(c, mean_n)
+        rsi_raw = rsi_col(c, rn)
+        fast = np.where(L >= fast_n, fast_raw, np.nan)
+        slow = np.where(L >= slow_n, slow_raw, np.nan)
+        mean = np.where(L >= mean_n, mean_raw, np.nan)
+        rsi = np.where(L >= rn + 1, rsi_raw, np.nan)
+
+        # stretch_stats: 直近20本（尾が短ければ尾全体）の高値
+        w = min(20, tail)
+        high20 = _rolling(np.maximum, c, w)
+        head = min(w - 1, n)
+        high20[:head] = np.maximum.accumulate(c[:head])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            drop_mean = (mean - c) / mean
+            drop_high = np.where(high20 != 0, (high20 - c) / high20, 0.0)
+        stretch = np.maximum(drop_mean, drop_high)
+        st_rsi = np.where(np.isnan(rsi), -1.0, rsi)
+
+        # rebound_signs（尾が6本未満なら 0）
+        prev_c = _shift(c, 1)
+        recent_low = _shift(_rolling(np.fmin, lo, 5), 1)
+        rsi_prev = np.where(L > rn + 2, _shift(rsi_raw, 1), np.nan)
+        bits = (
+            (c > prev_c).astype(np.int8)
+            | ((c > o).astype(np.int8) << 1)
+            | ((lo > recent_low).astype(np.int8) << 2)
+            | ((rsi > rsi_prev).astype(np.int8) << 3)
+        )
+        bits = np.where(L >= 6, bits, 0).astype(np.int8)
+        n_signs = (bits & 1) + ((bits >> 1) & 1) + ((bits >> 2) & 1) + ((bits >> 3) & 1)
+
+        # falling_knife / mean_is_rising
+        knife_prev = np.where((L > 25) & (L - 5 >= fast_n), _shift(fast_raw, 5), np.nan)
+        knife = fast < knife_prev * 0.97
+        rise_prev = np.where(L > mean_n + lb, _shift(mean_raw, lb), np.nan)
+        rising = (rise_prev > 0) & (mean >= rise_prev * ratio)
+
+        probe = (
+            ~np.isnan(mean)
+            & ~knife
+            & rising
+            & (float(p["drop_min_pct"]) <= stretch)
+            & (stretch <= float(p["drop_max_pct"]))
+            & (float(p["rsi_buy_low"]) <= st_rsi)
+            & (st_rsi <= float(p["rsi_buy_high"]))
+            & (n_signs >= int(p["rebound_min_signs"]))
+        )
+        ups_cum = np.cumsum(c > prev_c)
+        return cls(
+            bars=sb,
+            tail=tail,
+            fast=fast,
+            slow=slow,
+            mean=mean,
+            rsi=rsi,
+            drop_mean=drop_mean,
+            drop_high=drop_high,
+            stretch=stretch,
+            sign_bits=bits,
+            n_signs=n_signs,
+            probe=probe,
+            ups_cum=ups_cum,
+        )
+
+    def stats(self, k: int) -> dict[str, float] | None:
+        """stretch_stats と同じ形。"""
+        mean = self.mean[k]
+        if np.isnan(mean):
+            return None
+        r = self.rsi[k]
+        return {
+            "last": float(self.bars.close[k]),
+            "mean": float(mean),
+            "drop_mean": float(self.drop_mean[k]),
+            "drop_high": float(self.drop_high[k]),
+            "stretch": float(self.stretch[k]),
+            "rsi": -1.0 if np.isnan(r) else float(r),
+        }
+
+    def signs(self, k: int) -> list[str]:
+        b = int(self.sign_bits[k])
+        return [label for i, label in enumerate(REBOUND_SIGNS) if b >> i & 1]
+
+    def tail_start(self, k: int) -> int:
+        return max(0, k + 1 - self.tail)
+
+    def swing_low_since(self, k: int, opened: str) -> float | None:
+        start = max(self.tail_start(k), bisect.bisect_left(self.bars.dates, opened[:10]))
+        if start > k:
+            return None
+        hit = self._swing.get(opened)
+        if hit is not None and hit[0] == start and hit[1] <= k:
+            m = hit[2] if hit[1] == k else np.fmin(hit[2], np.fmin.reduce(self.bars.low[hit[1] + 1 : k + 1]))
+        else:
+            m = np.fmin.reduce(self.bars.low[start : k + 1])
+        self._swing[opened] = (start, k, m)
+        return None if np.isnan(m) else float(m)
+
+    def up_days_since(self, k: int, opened: str) -> int:
+        o = bisect.bisect_left(self.bars.dates, opened[:10])
+        a = max(o, self.tail_start(k) + 1)
+        if a > k:
+            return 0
+        return int(self.ups_cum[k] - self.ups_cum[a - 1])
+
+
+class ArrayBars:
+    """run_sim 用の配列ビュー（jarvis_trade_backtest.DictBars と同じ形）。
+
+    各銘柄の「その日までの最終足の位置」を REGIME_SYMBOL の営業日カレンダーにそろえて持つ。
+    """
+
+    def __init__(self, arrays: BarArrays, p: dict[str, Any], tail: int) -> None:
+        self.arrays = arrays
+        self.p = p
+        self.tail = tail
+        reg = arrays.get(REGIME_SYMBOL)
+        self.calendar = sorted(set(reg.dates)) if reg else []
+        self._day_ix = {d: i for i, d in enumerate(self.calendar)}
+        self._cal = np.array(self.calendar, dtype="U10")
+        self._last_ix = arrays._last_ix  # カレンダーは足で決まるので、案・期間をまたいで使い回す
+        self._inds: dict[str, SymbolIndicators] = {}
+
+    def _bar(self, symbol: str, day: str) -> int:
+        """day 時点の最終足の位置。足が無ければ -1。"""
+        sb = self.arrays.get(symbol)
+        if sb is None:
+            return -1
+        i = self._day_ix.get(day)
+        if i is None:
+            return bisect.bisect_right(sb.dates, day) - 1
+        ix = self._last_ix.get(symbol)
+        if ix is None:
+            ix = np.searchsorted(np.array(sb.dates, dtype="U10"), self._cal, side="right") - 1
+            self._last_ix[symbol] = ix
+        return int(ix[i])
+
+    def _ind(self, symbol: str) -> SymbolIndicators:
+        ind = self._inds.get(symbol)
+        if ind is None:
+            ind = self.arrays.indicators(symbol, self.p, self.tail)
+            assert ind is not None
+            self._inds[symbol] = ind
+        return ind
+
+    def close_on(self, symbol: str, day: str) -> float | None:
+        k = self._bar(symbol, day)
+        if k < 0:
+            return None
+        return float(self.arrays.symbols[symbol].close[k])
+
+    def next_open(self, symbol: str, day: str) -> tuple[str, float] | None:
+        sb = self.arrays.get(symbol)
+        if sb is None:
+            return None
+        i = bisect.bisect_right(sb.dates, day)
+        if i >= len(sb.dates):
+            return None
+        px = sb.open[i] if not np.isnan(sb.open[i]) else sb.close[i]
+        if np.isnan(px):
+            return None
+        return sb.dates[i], float(px)
+
+    def regime(self, day: str) -> str:
+        k = self._bar(REGIME_SYMBOL, day)
+        if k < 0:
+            return "unknown"
+        ind = self._ind(REGIME_SYMBOL)
+        fast, slow = ind.fast[k], ind.slow[k]
+        if np.isnan(fast) or np.isnan(slow):
+            return "unknown"
+        return "risk_on" if fast > slow else "risk_off"
+
+    def rhythm_exit(self, pos: dict[str, Any], px: float, day: str, as_of: date):
+        if pos.get("symbol") == INVERSE_SYMBOL:
+            return rhythm_exit_from_stats(pos, px, as_of, self.p, None, None, 0)
+        k = self._bar(pos["symbol"], day)
+        ind = self._ind(pos["symbol"])
+        opened = str(pos["opened_at"])
+        return rhythm_exit_from_stats(
+            pos,
+            px,
+            as_of,
+            self.p,
+            ind.stats(k),
+            ind.swing_low_since(k, opened),
+            int(ind.n_signs[k]),
+        )
+
+    def scale_in(self, pos: dict[str, Any], px: float, day: str, as_of: date):
+        k = self._bar(pos["symbol"], day)
+        ind = self._ind(pos["symbol"])
+        fast = ind.fast[k]
+        return scale_in_from_stats(
+            pos,
+            px,
+            self.p,
+            ind.signs(k),
+            ind.stats(k),
+            None if np.isnan(fast) else float(fast),
+            ind.up_days_since(k, str(pos["opened_at"])),
+        )
+
+    def probe(self, symbol: str, day: str) -> tuple[float, str] | None:
+        k = self._bar(symbol, day)
+        if k < 0:
+            return None
+        ind = self._ind(symbol)
+        if not ind.probe[k]:
+            return None
+        st = ind.stats(k)
+        assert st is not None
+        return probe_from_stats(st, ind.signs(k), self.p)
@@ -0,0 +1,342 @@
+"""Trade Desk 日足のローカル保管庫（1銘柄1ファイル・追記型・mmap 可）。
+
+  .jarvis_state/trade_bars/<symbol>.bars に固定長レコードで日付順に並べる。
+    <i4 日付(yyyymmdd) / 4B 詰め / <f8 始値・高値・安値・終値（欠損 NaN） / <i8 出来高  = 48B
+  numpy があれば np.memmap(path, dtype=RECORD_DTYPE) でそのまま列として読める。
+  更新は「最終保存日以降だけ Yahoo から取る」。最終日は場中の暫定値かもしれないので上書きする。
+  <symbol>.meta.json に最終確認時刻と取得済み範囲を持ち、max_age 内ならネットに出ない。
+  取得が失敗・一部欠けの回は確認済みにも取得済み範囲にもしない（次回また取りに行く）。
+
+  cd ~/git-repos
+  ~/selenium_env/venv/bin/python scripts/jarvis_trade_bar_store.py --status
+  ~/selenium_env/venv/bin/python scripts/jarvis_trade_bar_store.py --refresh --range max
+"""
+from __future__ import annotations
+
+import argparse
+import fcntl
+import json
+import math
+import os
+import re
+import struct
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Iterator
+
+from jarvis_trade_common import (
+    JST,
+    REPO,
+    YAHOO_WORKERS,
+    YahooFetchError,
+    fetch_yahoo_daily,
+    fetch_yahoo_since,
+    load_watchlist,
+    today_jst,
+    yahoo_client,
+)
+
+STORE_DIR = REPO / ".jarvis_state" / "trade_bars"
+RECORD = struct.Struct("<i4xddddq")
+MAX_AGE_HOURS = 6.0
+RANGE_DAYS = {
+    "1mo": 31,
+    "3mo": 92,
+    "6mo": 183,
+    "1y": 366,
+    "2y": 731,
+    "5y": 1827,
+    "10y": 3653,
+    "15y": 5479,
+    "20y": 7305,
+    "max": 7305,  # fetch_yahoo_daily の max は20年
+}
+
+try:
+    import numpy as np
+
+    RECORD_DTYPE = np.dtype(
+        {
+            "names": ["date", "open", "high", "low", "close", "volume"],
+            "formats": ["<i4", "<f8", "<f8", "<f8", "<f8", "<i8"],
+            "offsets": [0, 8, 16, 24, 32, 40],
+            "itemsize": RECORD.size,
+        }
+    )
+except ImportError:  # 日次シグナル（クラウド）は numpy なしでも読めればよい
+    np = None  # type: ignore[assignment]
+    RECORD_DTYPE = None
+
+
+def _safe_name(symbol: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]", "_", symbol)
+
+
+def _f(v: Any) -> float:
+    return math.nan if v is None else float(v)
+
+
+def _opt(v: float) -> float | None:
+    return None if math.isnan(v) else v
+
+
+def _ymd(d: str) -> int:
+    return int(d[:10].replace("-", ""))
+
+
+def _iso(n: int) -> str:
+    return f"{n // 10000:04d}-{n // 100 % 100:02d}-{n % 100:02d}"
+
+
+def _row(symbol: str, rec: tuple) -> dict[str, Any]:
+    d, o, h, l, c, v = rec
+    return {
+        "symbol": symbol,
+        "trade_date": _iso(d),
+        "open": _opt(o),
+        "high": _opt(h),
+        "low": _opt(l),
+        "close": c,
+        "volume": v,
+        "source": "yahoo",
+    }
+
+
+def range_start(range_: str, today: date | None = None) -> date:
+    return (today or today_jst()) - timedelta(days=RANGE_DAYS.get(range_, 366))
+
+
+class BarStore:
+    """銘柄ごとの日足ファイル。読み書きはこのクラスだけが行う。"""
+
+    def __init__(self, root: Path = STORE_DIR, *, max_age_hours: float = MAX_AGE_HOURS) -> None:
+        self.root = root
+        self.max_age = timedelta(hours=max_age_hours)
+
+    def path(self, symbol: str) -> Path:
+        return self.root / f"{_safe_name(symbol)}.bars"
+
+    def _meta_path(self, symbol: str) -> Path:
+        return self.root / f"{_safe_name(symbol)}.meta.json"
+
+    # --- 読み ---
+
+    def meta(self, symbol: str) -> dict[str, Any]:
+        try:
+            return json.loads(self._meta_path(symbol).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return {}
+
+    def rows(self, symbol: str, since: date | None = None) -> list[dict[str, Any]]:
+        """fetch_yahoo_daily と同じ形の行（日付昇順）。"""
+        p = self.path(symbol)
+        if not p.is_file():
+            return []
+        data = p.read_bytes()
+        n = len(data) // RECORD.size
+        lo = 0
+        if since is not None:
+            key = _ymd(since.isoformat())
+            hi = n
+            while lo < hi:  # 日付昇順なので二分探索
+                mid = (lo + hi) // 2
+                if RECORD.unpack_from(data, mid * RECORD.size)[0] < key:
+                    lo = mid + 1
+                else:
+                    hi = mid
+        return [_row(symbol, rec) for rec in RECORD.iter_unpack(data[lo * RECORD.size : n * RECORD.size])]
+
+    def tail(self, symbol: str, n: int) -> list[dict[str, Any]]:
+        p = self.path(symbol)
+        if not p.is_file() or n <= 0:
+            return []
+        size = p.stat().st_size // RECORD.size * RECORD.size
+        with p.open("rb") as fh:
+            fh.seek(max(0, size - n * RECORD.size))
+            data = fh.read(min(size, n * RECORD.size))
+        return [_row(symbol, rec) for rec in RECORD.iter_unpack(data)]
+
+    def mmap(self, symbol: str):
+        """列として読む（numpy 必須）。レコードは RECORD_DTYPE。"""
+        if np is None:
+            raise RuntimeError("BarStore.mmap には numpy が必要です")
+        p = self.path(symbol)
+        if not p.is_file() or p.stat().st_size < RECORD.size:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        n = p.stat().st_size // RECORD.size
+        return np.memmap(p, dtype=RECORD_DTYPE, mode="r", shape=(n,))
+
+    def last_date(self, symbol: str) -> str | None:
+        last = self.tail(symbol, 1)
+        return last[0]["trade_date"] if last else None
+
+    def is_fresh(self, symbol: str, range_: str | None = None, *, now: datetime | None = None) -> bool:
+        """max_age 内に確認済みで、range_ の起点まで取得済みならネット不要。"""
+        m = self.meta(symbol)
+        if not m.get("checked_at") or not self.path(symbol).is_file():
+            return False
+        now = now or datetime.now(JST)
+        if now - datetime.fromisoformat(m["checked_at"]) > self.max_age:
+            return False
+        if range_ is not None:
+            covered = m.get("covered_from")
+            if not covered or covered > range_start(range_, now.date()).isoformat():
+                return False
+        return True
+
+    # --- 書き ---
+
+    def write(self, symbol: str, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        """行を取り込み、実際に増えた／変わった行を返す。
+
+        最終保存日以降だけなら末尾を上書き＋追記。それより古い日が混ざるときは丸ごと書き直す。
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        incoming = {str(r["trade_date"])[:10]: r for r in rows if r.get("close") is not None}
+        if not incoming:
+            return []
+        p = self.path(symbol)
+        with open(self.root / f".{_safe_name(symbol)}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            last = self.last_date(symbol)
+            first_new = min(incoming)
+            if last is None or first_new >= last:
+                return self._append(p, symbol, incoming, last)
+            return self._rewrite(p, symbol, incoming)
+
+    def _pack(self, r: dict[str, Any]) -> bytes:
+        return RECORD.pack(
+            _ymd(str(r["trade_date"])),
+            _f(r.get("open")),
+            _f(r.get("high")),
+            _f(r.get("low")),
+            float(r["close"]),
+            int(r.get("volume") or 0),
+        )
+
+    def _append(
+        self, p: Path, symbol: str, incoming: dict[str, dict[str, Any]], last: str | None
+    ) -> list[dict[str, Any]]:
+        changed: list[dict[str, Any]] = []
+        with p.open("r+b" if p.exists() else "wb") as fh:
+            end = fh.seek(0, os.SEEK_END) // RECORD.size * RECORD.size
+            if last is not None and last in incoming:
+                rec = self._pack(incoming[last])
+                fh.seek(end - RECORD.size)
+                if fh.read(RECORD.size) != rec:
+                    fh.seek(end - RECORD.size)
+                    fh.write(rec)
+                    changed.append(incoming[last])
+            fh.seek(end)
+            fh.truncate()
+            for d in sorted(incoming):
+                if last is not None and d <= last:
+                    continue
+                fh.write(self._pack(incoming[d]))
+                changed.append(incoming[d])
+        return changed
+
+    def _rewrite(self, p: Path, symbol: str, incoming: dict[str, dict[str, Any]]) -> list[dict[str, Any]]:
+        old = {r["trade_date"]: r for r in self.rows(symbol)}
+        changed = [
+            r for d, r in sorted(incoming.items()) if d not in old or self._pack(old[d]) != self._pack(r)
+        ]
+        merged = {**old, **incoming}
+        tmp = p.with_suffix(".bars.tmp")
+        tmp.write_bytes(b"".join(self._pack(merged[d]) for d in sorted(merged)))
+        os.replace(tmp, p)
+        return changed
+
+    def update_meta(self, symbol: str, **kv: Any) -> None:
+        self.root.mkdir(parents=True, exist_ok=True)
+        m = self.meta(symbol)
+        m.update(kv)
+        tmp = self._meta_path(symbol).with_suffix(".tmp")
+        tmp.write_text(json.dumps(m, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self._meta_path(symbol))
+
+    def _mark_checked(self, symbol: str, covered_from: str | None) -> None:
+        kv: dict[str, Any] = {
+            "checked_at": datetime.now(JST).isoformat(timespec="seconds"),
+            "last": self.last_date(symbol),
+        }
+        prev = self.meta(symbol).get("covered_from")
+        if covered_from and (not prev or covered_from < prev):
+            kv["covered_from"] = covered_from
+        self.update_meta(symbol, **kv)
+
+    def refresh(self, symbol: str, range_: str = "1y", *, force: bool = False) -> tuple[list[dict[str, Any]], bool]:
+        """Yahoo から足りない分だけ取って保存。(増えた／変わった行, ネットに出たか)。
+
+        range_ の起点まで未取得なら range_ で丸ごと取り直し、取得済みなら最終保存日から先だけ取る。
+        取得が失敗・一部欠け・空なら例外（取れた分は保存するが、確認済みにも取得済み範囲にもしない）。
+        """
+        if not force and self.is_fresh(symbol, range_):
+            return [], False
+        want_from = range_start(range_).isoformat()
+        covered = self.meta(symbol).get("covered_from")
+        last = self.last_date(symbol)
+        try:
+            if last is None or not covered or covered > want_from:
+                rows = fetch_yahoo_daily(symbol, range_=range_, strict=True)
+                covered_from = want_from
+            else:
+                # since は最終保存日を含むので、空なら取れていない
+                rows = fetch_yahoo_since(symbol, date.fromisoformat(last))
+                covered_from = None
+        except YahooFetchError as e:
+            self.write(symbol, e.rows)
+            raise
+        if not rows:
+            raise RuntimeError(f"yahoo {symbol}: 日足が空")
+        changed = self.write(symbol, rows)
+        self._mark_checked(symbol, covered_from)
+        return changed, True
+
+    def refresh_many(
+        self, symbols: list[str], range_: str = "1y", *, force: bool = False, workers: int = YAHOO_WORKERS
+    ) -> Iterator[tuple[str, list[dict[str, Any]], bool, Exception | None]]:
+        """複数銘柄を並列に refresh。終わった順に (銘柄, 変わった行, ネットに出たか, 例外)。
+
+        書き込みは銘柄ごとのファイル＋ロックなので並列で安全。間隔は yahoo_client のレート枠任せ。
+        """
+        for sym, res, err in yahoo_client().map(
+            lambda s: self.refresh(s, range_, force=force), symbols, workers=workers
+        ):
+            changed, fetched = res if res is not None else ([], True)
+            yield sym, changed, fetched, err
+
+    def load(self, symbol: str, range_: str = "1y", *, refresh: bool = True) -> list[dict[str, Any]]:
+        """range_ 分の日足。refresh=False ならネットに出ない（保存分だけ）。"""
+        if refresh:
+            self.refresh(symbol, range_)
+        return self.rows(symbol, since=range_start(range_))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Trade Desk 日足ローカル保管庫")
+    ap.add_argument("--refresh", action="store_true", help="ウォッチリストを差分更新")
+    ap.add_argument("--force", action="store_true", help="max_age 内でも Yahoo に確認")
+    ap.add_argument("--range", default="max")
+    ap.add_argument("--status", action="store_true")
+    args = ap.parse_args()
+
+    store = BarStore()
+    symbols = [it["symbol"] for it in load_watchlist()]
+    if args.refresh:
+        for sym, changed, hit, err in store.refresh_many(symbols, args.range, force=args.force):
+            if err is not None:
+                print(f"# FAIL {sym}: {err}", file=sys.stderr)
+                continue
+            print(f"# {sym} +{len(changed)} {'fetched' if hit else 'fresh'}", flush=True)
+    if args.status or not args.refresh:
+        for sym in symbols:
+            m = store.meta(sym)
+            n = store.path(sym).stat().st_size // RECORD.size if store.path(sym).is_file() else 0
+            print(f"{sym}\tbars={n}\tfrom={m.get('covered_from')}\tlast={m.get('last')}\tchecked={m.get('checked_at')}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
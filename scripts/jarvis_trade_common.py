@@ -1,15 +1,20 @@
 """Trade Desk 共通: Supabase 接続・指標計算・Yahoo 日足取得。"""
 from __future__ import annotations
 
+import gzip
+import http.client
 import json
 import os
+import queue
+import random
 import ssl
+import threading
 import time
-import urllib.error
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Iterable, Iterator, TypeVar
+from urllib.parse import urlsplit
 from zoneinfo import ZoneInfo
 
 import yaml
@@ -19,6 +24,13 @@ REPO = Path(__file__).resolve().parents[1]
 WATCHLIST = REPO / "config" / "trade_watchlist.yaml"
 YAHOO_CHART = "https://query1.finance.yahoo.com/v8/finance/chart/{symbol}"
 UA = "Mozilla/5.0 (compatible; JarvisTradeDesk/0.1; +https://github.com/local)"
+# Yahoo への秒間リクエスト上限（全スレッド合計）。429 が出たら実行中は自動で半分に落とす。
+YAHOO_RPS = float(os.environ.get("JARVIS_YAHOO_RPS") or 2.0)
+YAHOO_WORKERS = int(os.environ.get("JARVIS_YAHOO_WORKERS") or 4)
+YAHOO_RETRIES = 4
+
+T = TypeVar("T")
+R = TypeVar("R")
 
 
 def today_jst() -> date:
@@ -81,44 +93,206 @@ def _parse_yahoo_chart(payload: dict[str, Any], symbol: str) -> list[dict[str, A
     return rows
 
 
-def _fetch_yahoo_url(url: str, symbol: str) -> list[dict[str, Any]]:
-    req = urllib.request.Request(url, headers={"User-Agent": UA})
-    ctx = ssl.create_default_context()
+class TokenBucket:
+    """全スレッド共通のレート制限。take() は枠が空くまで待つ。"""
+
+    def __init__(self, rate: float, burst: float | None = None) -> None:
+        self.rate = max(rate, 0.05)
+        self.min_rate = self.rate / 8
+        self.burst = burst if burst is not None else max(1.0, self.rate)
+        self._tokens = self.burst
+        self._t = time.monotonic()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def take(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._t) * self.rate)
+                self._t = now
+                wait = self._not_before - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                if wait <= 0:
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, sec: float) -> None:
+        """429: 全スレッドを sec 止め、以後のレートを半分に。"""
+        with self._lock:
+            self._not_before = max(self._not_before, time.monotonic() + sec)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self._tokens = 0.0
+
+
+class YahooClient:
+    """Yahoo chart API 用。keep-alive 接続をプールして使い回し、429/5xx はジッタ付きで再試行。"""
+
+    def __init__(self, rate: float = YAHOO_RPS, *, retries: int = YAHOO_RETRIES, timeout: float = 30) -> None:
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.timeout = timeout
+        self._ctx = ssl.create_default_context()
+        self._pool: queue.LifoQueue[http.client.HTTPSConnection] = queue.LifoQueue()
+
+    def _conn(self, host: str) -> http.client.HTTPSConnection:
+        try:
+            conn = self._pool.get_nowait()
+            if conn.host == host:
+                return conn
+            conn.close()
+        except queue.Empty:
+            pass
+        return http.client.HTTPSConnection(host, timeout=self.timeout, context=self._ctx)
+
+    def get_json(self, url: str, label: str = "") -> dict[str, Any]:
+        u = urlsplit(url)
+        path = u.path + (f"?{u.query}" if u.query else "")
+        label = label or path
+        for attempt in range(self.retries + 1):
+            self.bucket.take()
+            conn = self._conn(u.netloc)
+            try:
+                conn.request("GET", path, headers={"User-Agent": UA, "Accept-Encoding": "gzip"})
+                resp = conn.getresponse()
+                body = resp.read()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()  # 切れた keep-alive は捨てて張り直す
+                if attempt >= self.retries:
+                    raise RuntimeError(f"yahoo {type(e).__name__} {label}") from e
+                time.sleep(_jitter(attempt))
+                continue
+            if resp.getheader("Connection", "").lower() == "close":
+                conn.close()
+            else:
+                self._pool.put(conn)
+            if resp.status == 200:
+                if resp.getheader("Content-Encoding", "") == "gzip":
+                    body = gzip.decompress(body)
+                return json.loads(body.decode("utf-8"))
+            if (resp.status == 429 or resp.status >= 500) and attempt < self.retries:
+                wait = _retry_after(resp.getheader("Retry-After")) or _jitter(attempt)
+                if resp.status == 429:
+                    self.bucket.backoff(wait)
+                else:
+                    time.sleep(wait)
+                continue
+            raise RuntimeError(f"yahoo HTTP {resp.status} {label}")
+        raise RuntimeError(f"yahoo retries exhausted {label}")
+
+    def map(
+        self, fn: Callable[[T], R], items: Iterable[T], *, workers: int = YAHOO_WORKERS
+    ) -> Iterator[tuple[T, R | None, Exception | None]]:
+        """fn を並列に流し、終わった順に (item, 結果, 例外) を返す。レートは bucket が守る。"""
+        items = list(items)
+        if workers <= 1 or len(items) <= 1:
+            for it in items:
+                try:
+                    yield it, fn(it), None
+                except Exception as e:
+                    yield it, None, e
+            return
+        with ThreadPoolExecutor(max_workers=min(workers, len(items))) as ex:
+            futs = {ex.submit(fn, it): it for it in items}
+            for fut in as_completed(futs):
+                err = fut.exception()
+                yield futs[fut], (None if err else fut.result()), err
+
+
+def _jitter(attempt: int, base: float = 1.0, cap: float = 30.0) -> float:
+    return random.uniform(0.5, 1.0) * min(cap, base * 2**attempt)
+
+
+def _retry_after(v: str | None) -> float | None:
     try:
-        with urllib.request.urlopen(req, context=ctx, timeout=30) as resp:
-            payload = json.loads(resp.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        raise RuntimeError(f"yahoo HTTP {e.code} {symbol}") from e
-    return _parse_yahoo_chart(payload, symbol)
+        return min(120.0, float(v)) if v else None
+    except ValueError:
+        return None
+
+
+_CLIENT: YahooClient | None = None
+_CLIENT_LOCK = threading.Lock()
+
 
+def yahoo_client() -> YahooClient:
+    """プロセス共通のクライアント（レート枠と接続プールを全呼び出しで共有）。"""
+    global _CLIENT
+    with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = YahooClient()
+        return _CLIENT
 
-def fetch_yahoo_daily(symbol: str, range_: str = "1y") -> list[dict[str, Any]]:
-    """日足取得。range=max は Yahoo が月足に間引くため、期間指定で分割する。"""
+
+def _fetch_yahoo_url(url: str, symbol: str) -> list[dict[str, Any]]:
+    return _parse_yahoo_chart(yahoo_client().get_json(url, symbol), symbol)
+
+
+class YahooFetchError(RuntimeError):
+    """期間取得の一部が失敗した（取れた分は rows）。"""
+
+    def __init__(self, msg: str, rows: list[dict[str, Any]]):
+        super().__init__(msg)
+        self.rows = rows
+
+
+def _fetch_yahoo_period(symbol: str, start: int, end: int, *, strict: bool = False) -> list[dict[str, Any]]:
+    """period1/period2 を4年ずつに割って並列取得し、日付で重ねる。
+
+    失敗したチャンクは飛ばす。strict なら1つでも失敗すれば YahooFetchError（取れた分を添える）。
+    """
+    chunk = 4 * 365 * 24 * 3600  # 4年ずつなら interval=1d が保たれやすい
+    spans = [(t, min(t + chunk, end)) for t in range(start, end, chunk)]
+    merged: dict[str, dict[str, Any]] = {}
+    results = yahoo_client().map(
+        lambda sp: _fetch_yahoo_url(_yahoo_chart_url(symbol, period1=sp[0], period2=sp[1]), symbol),
+        spans,
+        workers=len(spans),
+    )
+    errors: list[Exception] = []
+    for _, chunk_rows, err in sorted(results, key=lambda x: x[0]):
+        if err is not None:
+            if not isinstance(err, RuntimeError):
+                raise err
+            errors.append(err)
+            continue
+        for row in chunk_rows or []:
+            merged[row["trade_date"]] = row
+    rows = [merged[k] for k in sorted(merged)]
+    if strict and errors:
+        raise YahooFetchError(f"yahoo {symbol}: {len(errors)}/{len(spans)} 区間が失敗: {errors[0]}", rows)
+    return rows
+
+
+def fetch_yahoo_daily(symbol: str, range_: str = "1y", *, strict: bool = False) -> list[dict[str, Any]]:
+    """日足取得。range=max は Yahoo が月足に間引くため、期間指定で分割する。
+
+    strict なら分割取得の一部失敗を YahooFetchError で返し、5y への切り替えもしない。
+    """
     long = range_ in {"max", "20y", "15y", "10y"}
     if long:
         years = {"10y": 10, "15y": 15, "20y": 20}.get(range_, 20)
         now = int(time.time())
         start = now - years * 365 * 24 * 3600
-        chunk = 4 * 365 * 24 * 3600  # 4年ずつなら interval=1d が保たれやすい
-        merged: dict[str, dict[str, Any]] = {}
-        t = start
-        while t < now:
-            t2 = min(t + chunk, now)
-            url = _yahoo_chart_url(symbol, period1=t, period2=t2)
-            try:
-                chunk_rows = _fetch_yahoo_url(url, symbol)
-            except RuntimeError:
-                chunk_rows = []
-            for row in chunk_rows:
-                merged[row["trade_date"]] = row
-            t = t2
-            time.sleep(0.2)
-        if merged:
-            return [merged[k] for k in sorted(merged)]
+        rows = _fetch_yahoo_period(symbol, start, now, strict=strict)
+        if rows or strict:
+            return rows
         return _fetch_yahoo_url(_yahoo_chart_url(symbol, range_="5y"), symbol)
     return _fetch_yahoo_url(_yahoo_chart_url(symbol, range_=range_), symbol)
 
 
+def fetch_yahoo_since(symbol: str, since: date) -> list[dict[str, Any]]:
+    """since（当日を含む）以降の日足。差分更新用なので一部でも失敗すれば YahooFetchError。"""
+    start = int(datetime.combine(since, datetime.min.time(), tzinfo=JST).timestamp())
+    try:
+        rows = _fetch_yahoo_period(symbol, start, int(time.time()), strict=True)
+    except YahooFetchError as e:
+        e.rows = [r for r in e.rows if r["trade_date"] >= since.isoformat()]
+        raise
+    return [r for r in rows if r["trade_date"] >= since.isoformat()]
+
+
 def _num(arr: list[Any], i: int) -> float | None:
     if i >= len(arr) or arr[i] is None:
         return None
@@ -128,7 +302,11 @@ def _num(arr: list[Any], i: int) -> float | None:
 def sma(values: list[float], n: int) -> float | None:
     if len(values) < n or n <= 0:
         return None
-    return sum(values[-n:]) / n
+    # 左から順に足す（3.12+ の sum は補正付きで丸めが変わる。配列エンジンの window_sum と揃える）
+    total = 0.0
+    for v in values[-n:]:
+        total += v
+    return total / n
 
 
 def rsi(values: list[float], n: int = 14) -> float | None:
@@ -149,10 +327,6 @@ def rsi(values: list[float], n: int = 14) -> float | None:
     return 100.0 - (100.0 / (1.0 + rs))
 
 
-def sleep_polite(sec: float = 0.35) -> None:
-    time.sleep(sec)
-
-
 def last_n_weekdays(end: date, n: int) -> list[date]:
     out: list[date] = []
     d = end
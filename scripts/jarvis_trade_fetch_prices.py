@@ -1,6 +1,9 @@
 #!/usr/bin/env python3
 """ウォッチリストの日足を Yahoo から取得して trade_prices に upsert。
 
+  取得はローカル保管庫（jarvis_trade_bar_store）経由の差分だけ。upsert も前回送った日以降だけ。
+  Supabase 側を作り直したときは --full-upsert で保管庫の range 分を丸ごと送る。
+
   cd ~/git-repos && set -a && source .env.jarvis_private && set +a
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_fetch_prices.py
   ~/selenium_env/venv/bin/python scripts/jarvis_trade_fetch_prices.py --range 6mo
@@ -9,8 +12,10 @@ from __future__ import annotations
 
 import argparse
 import sys
+from datetime import date
 
-from jarvis_trade_common import fetch_yahoo_daily, load_watchlist, sb_client, sleep_polite
+from jarvis_trade_bar_store import BarStore, range_start
+from jarvis_trade_common import load_watchlist, sb_client
 
 
 def upsert_instruments(sb, instruments: list[dict]) -> None:
@@ -34,6 +39,7 @@ def main() -> int:
     ap = argparse.ArgumentParser(description="Trade Desk 日足取得")
     ap.add_argument("--range", default="1y", help="Yahoo range (3mo/6mo/1y)")
     ap.add_argument("--symbol", default="", help="1銘柄だけ")
+    ap.add_argument("--full-upsert", action="store_true", help="保管庫の range 分を丸ごと upsert")
     args = ap.parse_args()
 
     instruments = load_watchlist()
@@ -46,13 +52,25 @@ def main() -> int:
     sb = sb_client()
     upsert_instruments(sb, load_watchlist())
 
+    store = BarStore()
     ok = 0
     fail = 0
     bars = 0
+    # Yahoo は並列（レート枠は yahoo_client 任せ）、Supabase への upsert は1本ずつ
+    failed: dict[str, Exception] = {}
+    for sym, _, _, err in store.refresh_many([it["symbol"] for it in instruments], args.range, force=True):
+        if err is not None:
+            failed[sym] = err
     for it in instruments:
         sym = it["symbol"]
         try:
-            rows = fetch_yahoo_daily(sym, range_=args.range)
+            if sym in failed:
+                raise failed[sym]
+            pushed = store.meta(sym).get("pushed_last")
+            if args.full_upsert or not pushed:
+                rows = store.rows(sym, since=range_start(args.range))
+            else:
+                rows = store.rows(sym, since=date.fromisoformat(pushed))
             if rows:
                 # upsert は unique (symbol, trade_date)。id は自動
                 chunk = 200
@@ -62,12 +80,12 @@ def main() -> int:
                         on_conflict="symbol,trade_date",
                     ).execute()
                 bars += len(rows)
+                store.update_meta(sym, pushed_last=rows[-1]["trade_date"])
             print(f"# {sym} {it['name']} bars={len(rows)}")
             ok += 1
         except Exception as e:
             print(f"# FAIL {sym}: {e}", file=sys.stderr)
             fail += 1
-        sleep_polite()
 
     print(f"📎 Trade Desk 日足: ok={ok} fail={fail} bars={bars}")
     return 0 if fail == 0 else 1
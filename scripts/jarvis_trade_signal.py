@@ -14,6 +14,7 @@ import json
 from datetime import date, datetime, timedelta
 from typing import Any
 
+from jarvis_trade_bar_store import BarStore
 from jarvis_trade_common import JST, sb_client, sma, today_jst
 from jarvis_trade_research_ingest import research_bonus_for_symbol
 from jarvis_trade_strategy import (
@@ -29,6 +30,8 @@ from jarvis_trade_strategy import (
 )
 
 MODE = "paper"
+PRICE_TAIL = 120
+BAR_STORE = BarStore()
 
 
 def load_params(sb) -> dict[str, Any]:
@@ -39,7 +42,7 @@ def load_params(sb) -> dict[str, Any]:
     return merge_params(dict(rows[0]["value"]))
 
 
-def load_closes(sb, symbol: str, limit: int = 120) -> list[dict[str, Any]]:
+def load_closes(sb, symbol: str, limit: int = PRICE_TAIL) -> list[dict[str, Any]]:
     res = (
         sb.table("trade_prices")
         .select("trade_date,open,high,low,close,volume")
@@ -51,8 +54,66 @@ def load_closes(sb, symbol: str, limit: int = 120) -> list[dict[str, Any]]:
     return list(reversed(res.data or []))
 
 
-def regime_of(sb, p: dict[str, Any]) -> tuple[str, str]:
-    rows = load_closes(sb, REGIME_SYMBOL)
+class RunSnapshot:
+    """1回の実行で共有する読み取りキャッシュ（日足・リスク状態）。
+
+    日足は prefetch で全銘柄まとめて取る: 同じ Mac で fetch_prices 済みならローカル保管庫、
+    残りは trade_prices_tail RPC 1往復。RPC 未適用の DB では銘柄ごとの select に落とす。
+    """
+
+    def __init__(self, sb, limit: int = PRICE_TAIL) -> None:
+        self.sb = sb
+        self.limit = limit
+        self._bars: dict[str, list[dict[str, Any]]] = {}
+        self._risk: dict[str, Any] | None = None
+        self.round_trips = 0
+
+    def prefetch(self, symbols: list[str] | set[str]) -> None:
+        remote: list[str] = []
+        for sym in dict.fromkeys(symbols):
+            if sym in self._bars:
+                continue
+            if BAR_STORE.is_fresh(sym):
+                rows = BAR_STORE.tail(sym, self.limit)
+                if rows:
+                    self._bars[sym] = rows
+                    continue
+            remote.append(sym)
+        if not remote:
+            return
+        try:
+            self.round_trips += 1
+            res = self.sb.rpc("trade_prices_tail", {"p_symbols": remote, "p_limit": self.limit}).execute()
+            got = res.data or {}
+            for sym in remote:
+                self._bars[sym] = list(got.get(sym) or [])
+        except Exception as e:
+            print(f"# trade_prices_tail 不可（{e}）→ 銘柄ごとに取得", flush=True)
+            for sym in remote:
+                self.round_trips += 1
+                self._bars[sym] = load_closes(self.sb, sym, self.limit)
+
+    def closes(self, symbol: str) -> list[dict[str, Any]]:
+        if symbol not in self._bars:
+            self.prefetch([symbol])
+        return self._bars[symbol]
+
+    def last_close(self, symbol: str) -> float | None:
+        rows = self.closes(symbol)
+        if not rows:
+            return None
+        return float(rows[-1]["close"])
+
+    def risk_state(self) -> dict[str, Any]:
+        if self._risk is None:
+            self.round_trips += 1
+            res = self.sb.table("trade_risk_state").select("*").eq("id", MODE).limit(1).execute()
+            self._risk = dict((res.data or [{}])[0])
+        return self._risk
+
+
+def regime_of(snap: RunSnapshot, p: dict[str, Any]) -> tuple[str, str]:
+    rows = snap.closes(REGIME_SYMBOL)
     c = closes_of(rows)
     fast = sma(c, int(p["sma_fast"]))
     slow = sma(c, int(p["sma_slow"]))
@@ -74,18 +135,21 @@ def open_positions(sb) -> list[dict[str, Any]]:
     return list(res.data or [])
 
 
-def last_close(sb, symbol: str) -> float | None:
-    rows = load_closes(sb, symbol, limit=2)
-    if not rows:
-        return None
-    return float(rows[-1]["close"])
+def enabled_instruments(sb) -> list[dict[str, Any]]:
+    res = (
+        sb.table("trade_instruments")
+        .select("symbol,name,theme,asset_class")
+        .eq("enabled", True)
+        .execute()
+    )
+    return list(res.data or [])
 
 
-def mark_to_market(sb, positions: list[dict[str, Any]], cash: float) -> tuple[float, float]:
+def mark_to_market(snap: RunSnapshot, positions: list[dict[str, Any]], cash: float) -> tuple[float, float]:
     unreal = 0.0
     mkt = 0.0
     for pos in positions:
-        px = last_close(sb, pos["symbol"]) or float(pos["avg_price"])
+        px = snap.last_close(pos["symbol"]) or float(pos["avg_price"])
         avg = float(pos["avg_price"])
         qty = int(pos["qty"])
         unreal += (px - avg) * qty
@@ -138,6 +202,7 @@ def insert_fill(
 
 def apply_rhythm(
     sb,
+    snap: RunSnapshot,
     p: dict[str, Any],
     positions: list[dict[str, Any]],
     as_of: date,
@@ -148,8 +213,8 @@ def apply_rhythm(
     notes: list[str] = []
 
     for pos in positions:
-        rows = load_closes(sb, pos["symbol"])
-        px = last_close(sb, pos["symbol"])
+        rows = snap.closes(pos["symbol"])
+        px = snap.last_close(pos["symbol"])
         if px is None:
             continue
         decided = decide_rhythm_exit(pos, px, rows, as_of, p)
@@ -200,6 +265,7 @@ def apply_rhythm(
 
 def maybe_scale_in(
     sb,
+    snap: RunSnapshot,
     p: dict[str, Any],
     positions: list[dict[str, Any]],
     cash: float,
@@ -216,8 +282,8 @@ def maybe_scale_in(
     name_cap = capital * per
 
     for pos in positions:
-        rows = load_closes(sb, pos["symbol"])
-        px = last_close(sb, pos["symbol"])
+        rows = snap.closes(pos["symbol"])
+        px = snap.last_close(pos["symbol"])
         if px is None:
             continue
         decided = decide_scale_in(pos, px, rows, as_of, p)
@@ -277,7 +343,9 @@ def maybe_scale_in(
 
 def maybe_entries(
     sb,
+    snap: RunSnapshot,
     p: dict[str, Any],
+    instruments: list[dict[str, Any]],
     regime: str,
     regime_note: str,
     cash: float,
@@ -293,21 +361,14 @@ def maybe_entries(
     max_pos = int(p["max_positions"])
     per = float(p["per_name_pct"])
     fracs = list(p.get("scale_fracs") or [0.25, 0.35, 0.40])
-    risk = sb.table("trade_risk_state").select("*").eq("id", MODE).limit(1).execute()
-    state = (risk.data or [{}])[0]
+    state = snap.risk_state()
     if state.get("kill_switch"):
         return spent, [f"kill switch: {state.get('kill_reason') or '停止中'}"]
     capital = float(state.get("capital_jpy") or 100000)
 
-    inst = (
-        sb.table("trade_instruments")
-        .select("symbol,name,theme,asset_class")
-        .eq("enabled", True)
-        .execute()
-    )
     candidates: list[tuple[float, dict, str, str]] = []
     if regime == "risk_on":
-        for it in inst.data or []:
+        for it in instruments:
             if it.get("asset_class") in ("inverse_etf", "index"):
                 continue
             if it.get("theme") == "index":
@@ -316,7 +377,7 @@ def maybe_entries(
                 continue
             if it["symbol"] in held_symbols:
                 continue
-            rows = load_closes(sb, it["symbol"])
+            rows = snap.closes(it["symbol"])
             scored = score_probe(rows, p)
             if not scored:
                 continue
@@ -328,7 +389,7 @@ def maybe_entries(
             candidates.append((score, it, "buy", reason))
     else:
         if p.get("hedge_inverse") and INVERSE_SYMBOL not in held_symbols:
-            rows = load_closes(sb, INVERSE_SYMBOL)
+            rows = snap.closes(INVERSE_SYMBOL)
             c = closes_of(rows)
             fast = sma(c, int(p["sma_fast"]))
             if fast and c and c[-1] >= fast * 0.99:
@@ -341,7 +402,7 @@ def maybe_entries(
     for score, it, side, reason in candidates[:slots]:
         if cash - spent < probe_budget * 0.5:
             break
-        px = last_close(sb, it["symbol"])
+        px = snap.last_close(it["symbol"])
         if not px or px <= 0:
             continue
         qty = int(probe_budget // px)
@@ -370,7 +431,7 @@ def maybe_entries(
         )
         if dry:
             continue
-        rows = load_closes(sb, it["symbol"])
+        rows = snap.closes(it["symbol"])
         opened = as_of
         sw = swing_low_since(rows, opened) or px
         sb.table("trade_positions").insert(
@@ -408,9 +469,10 @@ def week_realized(sb, as_of: date) -> float:
     return sum(float(r.get("realized_pnl") or 0) for r in (res.data or []))
 
 
-def update_risk(sb, p: dict[str, Any], equity: float, as_of: date, dry: bool) -> dict[str, Any]:
-    res = sb.table("trade_risk_state").select("*").eq("id", MODE).limit(1).execute()
-    state = dict((res.data or [{}])[0])
+def update_risk(
+    sb, snap: RunSnapshot, p: dict[str, Any], equity: float, as_of: date, dry: bool
+) -> dict[str, Any]:
+    state = dict(snap.risk_state())
     peak = float(state.get("peak_equity") or equity)
     if equity > peak:
         peak = equity
@@ -450,10 +512,14 @@ def main() -> int:
     sb = sb_client()
     p = load_params(sb)
     as_of = today_jst()
-    regime, regime_note = regime_of(sb, p)
     positions = open_positions(sb)
-    risk0 = sb.table("trade_risk_state").select("*").eq("id", MODE).limit(1).execute()
-    st0 = (risk0.data or [{}])[0]
+    instruments = enabled_instruments(sb)
+    snap = RunSnapshot(sb)
+    snap.prefetch(
+        [REGIME_SYMBOL, INVERSE_SYMBOL, *(x["symbol"] for x in positions), *(it["symbol"] for it in instruments)]
+    )
+    regime, regime_note = regime_of(snap, p)
+    st0 = snap.risk_state()
     capital = float(st0.get("capital_jpy") or 100000)
     invested = sum(float(x["avg_price"]) * int(x["qty"]) for x in positions)
     closed = (
@@ -466,14 +532,14 @@ def main() -> int:
     realized_all = sum(float(r.get("realized_pnl") or 0) for r in (closed.data or []))
     cash = capital + realized_all - invested
 
-    realized_today, exit_notes = apply_rhythm(sb, p, positions, as_of, args.dry_run)
+    realized_today, exit_notes = apply_rhythm(sb, snap, p, positions, as_of, args.dry_run)
     if not args.dry_run:
         positions = open_positions(sb)
         invested = sum(float(x["avg_price"]) * int(x["qty"]) for x in positions)
         cash = capital + realized_all + realized_today - invested
 
     add_spent, add_notes = maybe_scale_in(
-        sb, p, positions, cash, capital, as_of, regime, args.dry_run
+        sb, snap, p, positions, cash, capital, as_of, regime, args.dry_run
     )
     cash = cash - add_spent
     if not args.dry_run:
@@ -481,7 +547,9 @@ def main() -> int:
 
     spent, entry_notes = maybe_entries(
         sb,
+        snap,
         p,
+        instruments,
         regime,
         regime_note,
         cash,
@@ -493,8 +561,8 @@ def main() -> int:
     cash_after = cash - spent
     if not args.dry_run:
         positions = open_positions(sb)
-    equity, unreal = mark_to_market(sb, positions, cash_after)
-    state = update_risk(sb, p, equity, as_of, args.dry_run)
+    equity, unreal = mark_to_market(snap, positions, cash_after)
+    state = update_risk(sb, snap, p, equity, as_of, args.dry_run)
 
     if not args.dry_run:
         sb.table("trade_daily_pnl").upsert(
@@ -517,7 +585,7 @@ def main() -> int:
     print(f"- 原理: 平均回帰リズム（probe 25% → confirm 35% → convince 40%）")
     print(f"- 市況: {regime} / {regime_note}")
     print(f"- 資金: cash={cash_after:,.0f} equity={equity:,.0f} DD={float(state.get('drawdown_pct') or 0)*100:.1f}%")
-    print(f"- 建玉: {len(positions)}  kill={state.get('kill_switch')}")
+    print(f"- 建玉: {len(positions)}  kill={state.get('kill_switch')}  日足/リスク取得 {snap.round_trips}往復")
     if exit_notes:
         print("- 決済:")
         for n in exit_notes:
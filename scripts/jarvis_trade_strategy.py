@@ -10,6 +10,7 @@ from jarvis_trade_common import rsi, sma
 REGIME_SYMBOL = "1321.T"
 INVERSE_SYMBOL = "1357.T"
 MEAN_N = 60
+REBOUND_SIGNS = ("陽転", "陽線", "安値切り上げ", "RSI上向き")
 
 DEFAULT_PARAMS: dict[str, Any] = {
     "style": "mean_reversion_scale",
@@ -71,19 +72,19 @@ def rebound_signs(rows: list[dict[str, Any]], p: dict[str, Any]) -> tuple[int, l
     lc, lo = last.get("close"), last.get("open")
     pc = prev.get("close")
     if lc is not None and pc is not None and float(lc) > float(pc):
-        signs.append("陽転")
+        signs.append(REBOUND_SIGNS[0])
     if lc is not None and lo is not None and float(lc) > float(lo):
-        signs.append("陽線")
+        signs.append(REBOUND_SIGNS[1])
     last_low = last.get("low")
     recent = [float(r["low"]) for r in rows[-6:-1] if r.get("low") is not None]
     if last_low is not None and recent and float(last_low) > min(recent):
-        signs.append("安値切り上げ")
+        signs.append(REBOUND_SIGNS[2])
     c = closes_of(rows)
     n = int(p["rsi_period"])
     r_now = rsi(c, n)
     r_prev = rsi(c[:-1], n) if len(c) > n + 2 else None
     if r_now is not None and r_prev is not None and r_now > r_prev:
-        signs.append("RSI上向き")
+        signs.append(REBOUND_SIGNS[3])
     return len(signs), signs
 
 
@@ -136,12 +137,24 @@ def score_probe(rows: list[dict[str, Any]], p: dict[str, Any]) -> tuple[float, s
         return None
     if not mean_is_rising(rows, p):
         return None
+    if not in_probe_band(st, p):
+        return None
+    _, signs = rebound_signs(rows, p)
+    return probe_from_stats(st, signs, p)
+
+
+def in_probe_band(st: dict[str, float], p: dict[str, Any]) -> bool:
     lo, hi = float(p["drop_min_pct"]), float(p["drop_max_pct"])
     if not (lo <= st["stretch"] <= hi):
+        return False
+    return float(p["rsi_buy_low"]) <= st["rsi"] <= float(p["rsi_buy_high"])
+
+
+def probe_from_stats(st: dict[str, float], signs: list[str], p: dict[str, Any]) -> tuple[float, str] | None:
+    """沈み帯・RSI・反発サインの判定と採点。配列エンジンも同じ文言・閾値を使う。"""
+    if not in_probe_band(st, p):
         return None
-    if not (float(p["rsi_buy_low"]) <= st["rsi"] <= float(p["rsi_buy_high"])):
-        return None
-    n_signs, signs = rebound_signs(rows, p)
+    n_signs = len(signs)
     if n_signs < int(p["rebound_min_signs"]):
         return None
     score = st["stretch"] * 100 + n_signs * 5 + max(0.0, 40.0 - abs(st["rsi"] - 35.0))
@@ -196,6 +209,25 @@ def decide_rhythm_exit(
     p: dict[str, Any],
 ) -> tuple[str, int, str] | None:
     """reason, sell_qty, kind。何もしないなら None。"""
+    if pos.get("symbol") == INVERSE_SYMBOL:
+        return rhythm_exit_from_stats(pos, px, as_of, p, None, None, 0)
+    opened = date.fromisoformat(str(pos["opened_at"])[:10])
+    n_signs, _ = rebound_signs(rows, p)
+    return rhythm_exit_from_stats(
+        pos, px, as_of, p, stretch_stats(rows, p), swing_low_since(rows, opened), n_signs
+    )
+
+
+def rhythm_exit_from_stats(
+    pos: dict[str, Any],
+    px: float,
+    as_of: date,
+    p: dict[str, Any],
+    st: dict[str, float] | None,
+    swing_low: float | None,
+    n_signs: int,
+) -> tuple[str, int, str] | None:
+    """decide_rhythm_exit の判定本体。指標（沈み・建玉後安値・反発数）は呼び出し側で用意する。"""
     avg = float(pos["avg_price"])
     qty = int(pos["qty"])
     if qty <= 0:
@@ -221,9 +253,7 @@ def decide_rhythm_exit(
             return f"インバース保有{held}日で見直し", qty, "full"
         return None
 
-    st = stretch_stats(rows, p)
-    sw = swing_low_since(rows, opened) or float(pl.get("swing_low") or avg)
-    n_signs, _ = rebound_signs(rows, p)
+    sw = swing_low or float(pl.get("swing_low") or avg)
 
     if pnl_pct <= -sl or px < sw * (1 - fail):
         return f"硬損切/スイング割れ {pnl_pct*100:.1f}%（安値{sw:.1f}）", qty, "full"
@@ -252,6 +282,23 @@ def decide_scale_in(
     p: dict[str, Any],
 ) -> tuple[int, str, list[str]] | None:
     """next_level, tag, signs。追加しないなら None。下落中は必ず None。"""
+    if _open_scale_level(pos, px, p) is None:
+        return None
+    _, signs = rebound_signs(rows, p)
+    opened = date.fromisoformat(str(pos["opened_at"])[:10])
+    return scale_in_from_stats(
+        pos,
+        px,
+        p,
+        signs,
+        stretch_stats(rows, p),
+        sma(closes_of(rows), int(p["sma_fast"])),
+        up_days_since(rows, opened),
+    )
+
+
+def _open_scale_level(pos: dict[str, Any], px: float, p: dict[str, Any]) -> int | None:
+    """買い増し余地のある現段階。インバース・最終段・含み損なら None。"""
     if pos.get("symbol") == INVERSE_SYMBOL:
         return None
     pl = pos_payload(pos)
@@ -259,17 +306,28 @@ def decide_scale_in(
     level = int(pl.get("scale_level") or 1)
     if level >= len(fracs):
         return None
-    avg = float(pos["avg_price"])
-    if px <= avg:
+    if px <= float(pos["avg_price"]):
         return None
-    n_signs, signs = rebound_signs(rows, p)
+    return level
+
+
+def scale_in_from_stats(
+    pos: dict[str, Any],
+    px: float,
+    p: dict[str, Any],
+    signs: list[str],
+    st: dict[str, float] | None,
+    fast: float | None,
+    ups: int,
+) -> tuple[int, str, list[str]] | None:
+    """decide_scale_in の判定本体。反発サイン・沈み・短期平均・上昇日数は呼び出し側で用意する。"""
+    level = _open_scale_level(pos, px, p)
+    if level is None:
+        return None
+    avg = float(pos["avg_price"])
+    n_signs = len(signs)
     if n_signs < int(p["rebound_min_signs"]):
         return None
-    st = stretch_stats(rows, p)
-    c = closes_of(rows)
-    fast = sma(c, int(p["sma_fast"]))
-    opened = date.fromisoformat(str(pos["opened_at"])[:10])
-    ups = up_days_since(rows, opened)
     gain = (px - avg) / avg
     confirm_gain = float(p["confirm_gain_pct"])
     next_level = level + 1
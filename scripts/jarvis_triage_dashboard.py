@@ -9,11 +9,13 @@ Jarvis: 夜間トリアージ用ダッシュボード
 from __future__ import annotations
 
 import argparse
+import functools
 import html
 import json
 import shutil
 import subprocess
 import sys
+import threading
 from datetime import datetime
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from pathlib import Path
@@ -32,6 +34,7 @@ WATCH_POPUP_DISMISS = JARVIS_STATE / "situation_watch_popup_dismiss.json"
 WATCH_SCRIPT = REPO / "scripts" / "jarvis_situation_watch.py"
 PY = Path.home() / "selenium_env" / "venv" / "bin" / "python"
 TRIAGE = REPO / "scripts" / "jarvis_night_triage.py"
+PARTNER_BODY_CACHE = 32  # 本文引き当て用にパース済みで持っておく 5.やり取り.md の数
 
 # --serve で生成した HTML だけ操作リンクを有効にする
 _SERVE_MODE = False
@@ -287,15 +290,39 @@ def cursor_login_status() -> tuple[bool, str]:
         return False, f"Cursor Agent 確認失敗: {e}"
 
 
-def _load_night_triage():
-    import importlib.util
+_TRIAGE_MOD = None
+_TRIAGE_LOCK = threading.Lock()
 
-    spec = importlib.util.spec_from_file_location("jarvis_night_triage", TRIAGE)
-    if spec is None or spec.loader is None:
-        return None
-    mod = importlib.util.module_from_spec(spec)
-    spec.loader.exec_module(mod)
-    return mod
+
+def _load_night_triage():
+    """jarvis_night_triage を1回だけ読み込む（--serve 中は同じモジュールを使い回す）。"""
+    global _TRIAGE_MOD
+    with _TRIAGE_LOCK:
+        if _TRIAGE_MOD is None:
+            import importlib.util
+
+            spec = importlib.util.spec_from_file_location("jarvis_night_triage", TRIAGE)
+            if spec is None or spec.loader is None:
+                return None
+            mod = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+            _TRIAGE_MOD = mod
+    return _TRIAGE_MOD
+
+
+@functools.lru_cache(maxsize=PARTNER_BODY_CACHE)
+def _partner_body_index(md_path: str, mtime_ns: int, size: int) -> tuple[dict, dict]:
+    """5.やり取り.md → (received_at → 見出しのリスト, (received_at, subject_norm) → 最初の見出し)。
+
+    mtime / size をキーに含めるので、書き換わったファイルだけ読み直す。
+    """
+    mod = _load_night_triage()
+    by_received: dict[str, list[dict]] = {}
+    by_subject: dict[tuple[str, str], dict] = {}
+    for e in mod.parse_yoritoori(Path(md_path), "", ""):
+        by_received.setdefault(e["received_at"], []).append(e)
+        by_subject.setdefault((e["received_at"], e["subject_norm"]), e)
+    return by_received, by_subject
 
 
 def lookup_partner_original_body(it: dict) -> str:
@@ -309,24 +336,24 @@ def lookup_partner_original_body(it: dict) -> str:
         mod = _load_night_triage()
         if mod is None:
             return ""
-        base = mod.partner_base()
-        md = base / folder / "5.やり取り.md"
-        if not md.is_file():
+        md = mod.partner_base() / folder / "5.やり取り.md"
+        try:
+            st = md.stat()
+        except OSError:
             return ""
-        entries = mod.parse_yoritoori(md, folder, str(it.get("partner") or ""))
-        # 日時一致を優先、なければ件名一致
-        for e in entries:
-            if e.get("received_at") == received:
-                if not subject or e.get("subject") == subject:
-                    return str(e.get("body") or "")[:8000]
+        by_received, by_subject = _partner_body_index(str(md), st.st_mtime_ns, st.st_size)
+        same_time = by_received.get(received) or []
+        # 日時＋件名の完全一致を優先、次に正規化した件名、最後に日時だけ
+        for e in same_time:
+            if not subject or e.get("subject") == subject:
+                return str(e.get("body") or "")[:8000]
         subj_norm = mod.normalize_subject(subject) if subject else ""
-        for e in entries:
-            if subj_norm and e.get("subject_norm") == subj_norm:
-                if e.get("received_at") == received or not received:
-                    return str(e.get("body") or "")[:8000]
-        for e in entries:
-            if e.get("received_at") == received:
+        if subj_norm:
+            e = by_subject.get((received, subj_norm))
+            if e is not None:
                 return str(e.get("body") or "")[:8000]
+        if same_time:
+            return str(same_time[0].get("body") or "")[:8000]
     except Exception as e:
         print(f"# original_body lookup failed folder={folder}: {e}")
     return ""
@@ -14,7 +14,6 @@ CSV の支払元/入金先の最終日付と、CSV 全体の最新日の差で
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import os
 import sys
@@ -25,6 +24,9 @@ from zoneinfo import ZoneInfo
 
 import yaml
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 JST = ZoneInfo("Asia/Tokyo")
 REPO = Path(__file__).resolve().parents[1]
 CFG_PATH = REPO / "config" / "zaim_bank_sync_watch.yaml"
@@ -57,25 +59,26 @@ def parse_d(s: str) -> date | None:
 
 def scan_csv(path: Path) -> tuple[date | None, dict[str, dict[str, Any]]]:
     """source_name -> {last, count, as_pay, as_deposit}"""
+    ledger = open_ledger(path)
     sources: dict[str, dict[str, Any]] = {}
-    csv_max: date | None = None
-    with path.open(encoding="utf-8-sig", newline="") as f:
-        for row in csv.DictReader(f):
-            d = parse_d(row.get("日付") or "")
-            if d and (csv_max is None or d > csv_max):
-                csv_max = d
-            for col, flag in (("支払元", "as_pay"), ("入金先", "as_deposit")):
-                name = (row.get(col) or "").strip()
-                if not name or name == "-":
-                    continue
-                bucket = sources.setdefault(
-                    name,
-                    {"last": None, "count": 0, "as_pay": 0, "as_deposit": 0},
-                )
-                bucket["count"] += 1
-                bucket[flag] += 1
-                if d and (bucket["last"] is None or d > bucket["last"]):
-                    bucket["last"] = d
+    total = ledger.group(())
+    csv_max = parse_d(total[0]["last"] or "") if total else None
+    for col, flag in (("支払元", "as_pay"), ("入金先", "as_deposit")):
+        if col not in ledger.header:
+            continue
+        for g in ledger.group((col,)):
+            name = (g[col] or "").strip()
+            if not name or name == "-":
+                continue
+            bucket = sources.setdefault(
+                name,
+                {"last": None, "count": 0, "as_pay": 0, "as_deposit": 0},
+            )
+            bucket["count"] += g["count"]
+            bucket[flag] += g["count"]
+            d = parse_d(g["last"] or "")
+            if d and (bucket["last"] is None or d > bucket["last"]):
+                bucket["last"] = d
     return csv_max, sources
 
 
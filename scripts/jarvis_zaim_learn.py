@@ -12,7 +12,6 @@ Watch runner の先頭で呼ぶ。自動適用は count>=2 かつ conflict/suppr
 from __future__ import annotations
 
 import argparse
-import csv
 import json
 import re
 import sys
@@ -25,6 +24,9 @@ from zoneinfo import ZoneInfo
 
 import yaml
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
+
 JST = ZoneInfo("Asia/Tokyo")
 REPO = Path(__file__).resolve().parents[1]
 STATE = REPO / ".jarvis_state"
@@ -490,11 +492,7 @@ def run(*, dry_run: bool = False, year: int | None = None) -> dict[str, Any]:
     snapshot = load_snapshot()
     payments: list[dict[str, str]] = []
     if csv_path and csv_path.is_file():
-        payments = [
-            r
-            for r in csv.DictReader(csv_path.open(encoding="utf-8-sig"))
-            if r.get("方法") == "payment"
-        ]
+        payments = open_ledger(csv_path).rows(method="payment")
     csv_index = index_csv_rows(payments)
     diffs = learn_from_snapshot(snapshot, csv_index, rules, suspicious)
     boot_n = bootstrap_from_csv(payments, rules, suspicious)
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""Zaim 年度CSV（Zaim.<年>年度.csv）の共有キャッシュ（SQLite）。週次チェーンで同じCSVを十数回パースしない。
+
+  CSV の中身の sha1 をキーに1回だけ取り込み、日付・金額を型付きの列で持つ。
+  ファイルの (size, mtime) が前回と同じなら sha1 も計算し直さない。中身が変わったら別キーで取り込み、
+  同じパスの古い版は1つ前まで残してそれより前を消す（開いたままの Ledger が読み続けられるように）。
+  元の列は文字列のまま持つので、行は csv.DictReader と同じキー・値で返る。
+
+    led = open_ledger(csv_path)
+    for r in led.rows(method="payment", start="2026-01-01", end="2026-03-31"):
+        r["_date"], r["_expense"], r["支払元"] ...
+    led.group(("ym", "カテゴリ"), value="expense", method="payment")
+    led.rows(contains={"カテゴリの内訳": "ソニー"})
+
+  行 dict に足す列（_ 始まり）:
+    _row       CSV 上の行番号（1始まり、ヘッダ除く）
+    _date      日付 YYYY-MM-DD（読めなければ None）
+    _income / _expense / _transfer   収入・支出・振替（float。空・不正は 0.0）
+
+  絞り込み（rows / group 共通）: start / end（_date の両端含む）、year / month、
+  method（方法）/ payer（支払元）/ category（カテゴリ）/ shop（お店）は文字列なら一致・リストなら IN、
+  contains={列名: 部分文字列}。
+
+  cd ~/git-repos
+  python scripts/jarvis_zaim_ledger.py "…/2026年度/Zaim.2026年度.csv"
+  python scripts/jarvis_zaim_ledger.py --status
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import io
+import json
+import sqlite3
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterable
+from zoneinfo import ZoneInfo
+
+JST = ZoneInfo("Asia/Tokyo")
+REPO = Path(__file__).resolve().parents[1]
+LEDGER_PATH = REPO / ".jarvis_state" / "zaim_ledger.sqlite3"
+TAX_DIR = Path(
+    "~/Library/CloudStorage/OneDrive-個人用/215_神・大家さん倶楽部/50_税金,確定申告"
+).expanduser()
+ENCODINGS = ("utf-8-sig", "cp932")
+VALUE_COLS = {"income": "_income", "expense": "_expense", "transfer": "_transfer"}
+FILTER_COLS = {"method": "方法", "payer": "支払元", "category": "カテゴリ", "shop": "お店"}
+INDEX_COLS = ("方法", "支払元", "カテゴリ", "お店")
+
+SCHEMA = """
+create table if not exists ledger_files (
+  sha1 text primary key,
+  tbl text not null,
+  header text not null,
+  row_count integer not null,
+  encoding text,
+  loaded_at text
+);
+create table if not exists ledger_paths (
+  path text primary key,
+  size integer not null,
+  mtime_ns integer not null,
+  sha1 text not null,
+  prev_sha1 text
+);
+"""
+
+
+def now_iso() -> str:
+    return datetime.now(JST).isoformat(timespec="seconds")
+
+
+def file_sha1(path: Path) -> str:
+    h = hashlib.sha1()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_date(raw: str | None) -> str | None:
+    s = (raw or "").strip().replace("/", "-")[:10]
+    if not s:
+        return None
+    try:
+        return datetime.strptime(s, "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        return None
+
+
+def parse_amount(raw: str | None) -> float:
+    try:
+        return float(str(raw or "0").replace(",", "").replace("円", "") or 0)
+    except ValueError:
+        return 0.0
+
+
+def _q(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _decode(data: bytes) -> tuple[str, str]:
+    for enc in ENCODINGS:
+        try:
+            return data.decode(enc), enc
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace"), "utf-8"
+
+
+def _connect(db_path: Path) -> sqlite3.Connection:
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    con = sqlite3.connect(str(db_path), timeout=30)
+    con.execute("pragma journal_mode=wal")
+    con.execute("pragma synchronous=normal")
+    con.executescript(SCHEMA)
+    # 既存 DB: prev_sha1（1つ前の版。次に中身が変わるまで消さない）が無ければ足す
+    cols = {r[1] for r in con.execute("pragma table_info(ledger_paths)")}
+    if "prev_sha1" not in cols:
+        con.execute("alter table ledger_paths add column prev_sha1 text")
+    return con
+
+
+def _file_entry(con: sqlite3.Connection, sha1: str) -> tuple[str, list[str], int] | None:
+    rec = con.execute("select tbl, header, row_count from ledger_files where sha1 = ?", (sha1,)).fetchone()
+    if not rec:
+        return None
+    return rec[0], json.loads(rec[1]), int(rec[2])
+
+
+def _import(con: sqlite3.Connection, path: Path, sha1: str) -> tuple[str, list[str], int]:
+    """CSV を1回だけパースして zaim_<sha1> テーブルに入れる（呼び出し側が begin immediate 済み）。"""
+    text, enc = _decode(path.read_bytes())
+    reader = csv.DictReader(io.StringIO(text, newline=""))
+    header: list[str] = []
+    for name in reader.fieldnames or []:
+        if name not in header:
+            header.append(name)
+    tbl = f"zaim_{sha1[:16]}"
+    cols = ", ".join(f"{_q(c)} text" for c in header)
+    con.execute(f"drop table if exists {tbl}")
+    con.execute(
+        f"create table {tbl} (_row integer primary key, _date text, _income real not null,"
+        f" _expense real not null, _transfer real not null{', ' + cols if cols else ''})"
+    )
+    con.execute(f"create index {tbl}_date on {tbl} (_date)")
+    for c in INDEX_COLS:
+        if c in header:
+            con.execute(f"create index {tbl}_{INDEX_COLS.index(c)} on {tbl} ({_q(c)}, _date)")
+    marks = ", ".join("?" * (5 + len(header)))
+    n = 0
+
+    def records() -> Iterable[tuple[Any, ...]]:
+        nonlocal n
+        for idx, row in enumerate(reader, start=1):
+            n = idx
+            yield (
+                idx,
+                parse_date(row.get("日付")),
+                parse_amount(row.get("収入")),
+                parse_amount(row.get("支出")),
+                parse_amount(row.get("振替")),
+                *(row.get(c) for c in header),
+            )
+
+    con.executemany(f"insert into {tbl} values ({marks})", records())
+    con.execute(
+        "insert or replace into ledger_files (sha1, tbl, header, row_count, encoding, loaded_at)"
+        " values (?, ?, ?, ?, ?, ?)",
+        (sha1, tbl, json.dumps(header, ensure_ascii=False), n, enc, now_iso()),
+    )
+    return tbl, header, n
+
+
+def _drop_unreferenced(con: sqlite3.Connection) -> None:
+    """どのパスの現在の版でも1つ前の版でもないものを消す。"""
+    for sha1, tbl in con.execute(
+        "select sha1, tbl from ledger_files where sha1 not in (select sha1 from ledger_paths)"
+        " and sha1 not in (select prev_sha1 from ledger_paths where prev_sha1 is not null)"
+    ).fetchall():
+        con.execute(f"drop table if exists {tbl}")
+        con.execute("delete from ledger_files where sha1 = ?", (sha1,))
+
+
+class Ledger:
+    """1つの Zaim CSV 版（sha1）。クエリごとに接続を開くのでスレッド間で共有してよい。"""
+
+    def __init__(self, path: Path, sha1: str, tbl: str, header: list[str], row_count: int, db_path: Path):
+        self.path = path
+        self.sha1 = sha1
+        self.tbl = tbl
+        self.header = header
+        self.row_count = row_count
+        self.db_path = db_path
+
+    def __len__(self) -> int:
+        return self.row_count
+
+    def _where(
+        self,
+        *,
+        start: str | None = None,
+        end: str | None = None,
+        year: int | None = None,
+        month: int | None = None,
+        contains: dict[str, str] | None = None,
+        **eq: Any,
+    ) -> tuple[str, list[Any]] | None:
+        """None = 存在しない列で絞ったので0件。"""
+        conds: list[str] = []
+        params: list[Any] = []
+        if month is not None and year is None:
+            raise TypeError("month filter needs year")
+        if year is not None:
+            # ISO 文字列の範囲にして _date の索引を使う（"-31" は月末より大きければよい）
+            lo, hi = (f"{month:02d}-01", f"{month:02d}-31") if month is not None else ("01-01", "12-31")
+            conds.append("_date between ? and ?")
+            params += [f"{year:04d}-{lo}", f"{year:04d}-{hi}"]
+        if start:
+            conds.append("_date >= ?")
+            params.append(str(start)[:10])
+        if end:
+            conds.append("_date <= ?")
+            params.append(str(end)[:10])
+        for key, val in eq.items():
+            if val is None:
+                continue
+            col = FILTER_COLS.get(key)
+            if col is None:
+                raise TypeError(f"unknown filter: {key}")
+            if col not in self.header:
+                return None
+            if isinstance(val, str):
+                conds.append(f"{_q(col)} = ?")
+                params.append(val)
+            else:
+                vals = list(val)
+                if not vals:
+                    return None
+                conds.append(f"{_q(col)} in ({', '.join('?' * len(vals))})")
+                params += vals
+        for col, needle in (contains or {}).items():
+            if col not in self.header:
+                return None
+            conds.append(f"instr({_q(col)}, ?) > 0")
+            params.append(needle)
+        return (" where " + " and ".join(conds) if conds else ""), params
+
+    def rows(self, **filters: Any) -> list[dict[str, Any]]:
+        """CSV の行（元の列は文字列、_row/_date/_income/_expense/_transfer 付き）。CSV 順。"""
+        where = self._where(**filters)
+        if where is None:
+            return []
+        sql, params = where
+        names = ["_row", "_date", "_income", "_expense", "_transfer", *self.header]
+        con = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            cur = con.execute(f"select * from {self.tbl}{sql} order by _row", params)
+            return [dict(zip(names, rec)) for rec in cur]
+        finally:
+            con.close()
+
+    def group(
+        self, by: Iterable[str], *, value: str = "expense", **filters: Any
+    ) -> list[dict[str, Any]]:
+        """by ごとの {..by.., sum, count, first, last}。by は "ym" / "date" / "year" / CSV の列名。"""
+        exprs = []
+        keys = list(by)
+        for k in keys:
+            if k == "ym":
+                exprs.append("substr(_date, 1, 7)")
+            elif k == "year":
+                exprs.append("substr(_date, 1, 4)")
+            elif k == "date":
+                exprs.append("_date")
+            elif k in self.header:
+                exprs.append(_q(k))
+            else:
+                raise KeyError(f"{self.path.name}: 列がありません: {k}")
+        vcol = VALUE_COLS[value]
+        where = self._where(**filters)
+        if where is None:
+            return []
+        sql, params = where
+        sel = ", ".join(exprs + [f"sum({vcol})", "count(*)", "min(_date)", "max(_date)"])
+        group = f" group by {', '.join(exprs)} order by {', '.join(exprs)}" if exprs else ""
+        con = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            out = []
+            for rec in con.execute(f"select {sel} from {self.tbl}{sql}{group}", params):
+                d = dict(zip(keys, rec[: len(keys)]))
+                d.update(zip(("sum", "count", "first", "last"), rec[len(keys) :]))
+                d["sum"] = d["sum"] or 0.0
+                out.append(d)
+            return out
+        finally:
+            con.close()
+
+
+_OPEN: dict[tuple[str, str], Ledger] = {}
+
+
+def open_ledger(path: Path, *, db_path: Path = LEDGER_PATH) -> Ledger:
+    """CSV を開く（未取込・更新済みなら取り込む）。同じプロセス・同じ版なら使い回す。"""
+    path = Path(path).expanduser().resolve()
+    st = path.stat()
+    con = _connect(db_path)
+    try:
+        rec = con.execute(
+            "select sha1 from ledger_paths where path = ? and size = ? and mtime_ns = ?",
+            (str(path), st.st_size, st.st_mtime_ns),
+        ).fetchone()
+        sha1 = rec[0] if rec else file_sha1(path)
+        cached = _OPEN.get((str(db_path), sha1))
+        if rec and cached is not None:
+            return cached
+        entry = _file_entry(con, sha1)
+        if entry is None or not rec:
+            con.execute("begin immediate")
+            try:
+                entry = _file_entry(con, sha1) or _import(con, path, sha1)
+                old = con.execute(
+                    "select sha1, prev_sha1 from ledger_paths where path = ?", (str(path),)
+                ).fetchone()
+                prev = None if old is None else old[1] if old[0] == sha1 else old[0]
+                con.execute(
+                    "insert or replace into ledger_paths (path, size, mtime_ns, sha1, prev_sha1)"
+                    " values (?, ?, ?, ?, ?)",
+                    (str(path), st.st_size, st.st_mtime_ns, sha1, prev),
+                )
+                _drop_unreferenced(con)
+                con.execute("commit")
+            except BaseException:
+                con.execute("rollback")
+                raise
+    finally:
+        con.close()
+    led = Ledger(path, sha1, entry[0], entry[1], entry[2], db_path)
+    _OPEN[(str(db_path), sha1)] = led
+    return led
+
+
+def yearly_csvs(base: Path = TAX_DIR) -> list[Path]:
+    """<年>年度/Zaim.<年>年度.csv を年の昇順で。"""
+    out = []
+    for d in sorted(base.glob("*年度")):
+        y = d.name[: -len("年度")]
+        p = d / f"Zaim.{y}年度.csv"
+        if y.isdigit() and p.is_file():
+            out.append(p)
+    return out
+
+
+def status(db_path: Path = LEDGER_PATH) -> list[dict[str, Any]]:
+    con = _connect(db_path)
+    try:
+        return [
+            {"path": p, "sha1": s, "rows": n, "loaded_at": at}
+            for p, s, n, at in con.execute(
+                "select p.path, p.sha1, f.row_count, f.loaded_at from ledger_paths p"
+                " join ledger_files f using (sha1) order by p.path"
+            )
+        ]
+    finally:
+        con.close()
+
+
+def main(argv: list[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description="Zaim CSV 共有キャッシュ")
+    ap.add_argument("csv", nargs="*", help="取り込む Zaim CSV")
+    ap.add_argument("--status", action="store_true", help="取込済みの一覧")
+    args = ap.parse_args(argv)
+    for p in args.csv:
+        led = open_ledger(Path(p))
+        print(f"# {led.path.name}: rows={len(led)} sha1={led.sha1[:12]}", file=sys.stderr)
+    if args.status or not args.csv:
+        print(json.dumps(status(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -6,17 +6,21 @@ Zaim CSV: 日常買い物の二重取込＋集計設定の食い違いを検知
   python scripts/jarvis_zaim_quality_check.py
   python scripts/jarvis_zaim_quality_check.py --dry-run
   python scripts/jarvis_zaim_quality_check.py --year 2026
+  python scripts/jarvis_zaim_quality_check.py --bench   # find_pairs の所要時間（合成1年分＋実CSV）
 """
 from __future__ import annotations
 
 import argparse
-import csv
 import json
+import math
+import random
 import re
 import sys
+import time
 import unicodedata
 from collections import Counter, defaultdict
 from datetime import date, datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 from zoneinfo import ZoneInfo
@@ -30,6 +34,7 @@ OUT_PATH = REPO / ".jarvis_state" / "zaim_quality_watch.json"
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
 import jarvis_zaim_learn as zlearn  # noqa: E402
+from jarvis_zaim_ledger import open_ledger  # noqa: E402
 
 INCLUDE = "常に集計に含める"
 EXCLUDE = "集計に含めない"
@@ -60,6 +65,7 @@ def yen(r: dict[str, str]) -> float:
         return 0.0
 
 
+@lru_cache(maxsize=8192)
 def shop_key(s: str) -> str:
     s = nf(s)
     for x in ("株式会社", "有限会社", "店", "通信販売", "新経路", "（新経路）", "(新経路)", "豊明"):
@@ -94,6 +100,69 @@ def agg_label(r: dict[str, str], include: str, exclude: str) -> str:
     return "unknown"
 
 
+AMOUNT_TOL = 3  # スマート合計とクレカ額の許容差（円）
+AMOUNT_BAND = 10  # 金額バケット幅（円）。AMOUNT_TOL*2 以上なら隣接バンドだけ見れば足りる
+SHOP_GRAM = 4
+
+
+def shop_grams(sk: str) -> set[str]:
+    return {sk[i : i + SHOP_GRAM] for i in range(max(0, len(sk) - SHOP_GRAM + 1))}
+
+
+def shops_shared(sk: str, csk: str) -> bool:
+    if sk and csk and (sk[:6] in csk or csk[:6] in sk):
+        return True
+    return any(g in csk for g in shop_grams(sk))
+
+
+class CardIndex:
+    """クレカ行の索引。(日付の序数, 金額バンド) と (日付の序数, 店キー 4-gram) の転置索引。
+
+    candidates() は 日付±1・金額±AMOUNT_TOL・shops_shared を満たしうる行の上位集合を
+    card_rows の並び順で返す。最終判定は呼び出し側が元の条件で行う。
+    """
+
+    def __init__(self, card_rows: list[dict[str, str]]):
+        self.shop_keys = [shop_key(r.get("お店") or "") for r in card_rows]
+        self.amounts = [yen(r) for r in card_rows]
+        self.by_band: dict[tuple[int, int], list[int]] = defaultdict(list)
+        self.by_gram: dict[tuple[int, str], set[int]] = defaultdict(set)
+        self.short: dict[int, set[int]] = defaultdict(set)  # 4文字未満の店キーは先頭一致で拾われうる
+        self._ordinals: dict[str, int] = {}
+        for i, r in enumerate(card_rows):
+            day = self._ordinal(r["日付"])
+            self.by_band[(day, self._band(self.amounts[i]))].append(i)
+            csk = self.shop_keys[i]
+            if len(csk) < SHOP_GRAM:
+                self.short[day].add(i)
+            for g in shop_grams(csk):
+                self.by_gram[(day, g)].add(i)
+
+    def _ordinal(self, d: str) -> int:
+        if d not in self._ordinals:
+            self._ordinals[d] = datetime.strptime(d, "%Y-%m-%d").toordinal()
+        return self._ordinals[d]
+
+    @staticmethod
+    def _band(amount: float) -> int:
+        return math.floor(amount / AMOUNT_BAND)
+
+    def candidates(self, d: str, sk: str, amount: float) -> list[int]:
+        day = self._ordinal(d)
+        days = (day - 1, day, day + 1)
+        bands = range(self._band(amount - AMOUNT_TOL), self._band(amount + AMOUNT_TOL) + 1)
+        near = [i for o in days for b in bands for i in self.by_band.get((o, b), ())]
+        if near and len(sk) >= SHOP_GRAM:
+            grams = shop_grams(sk)
+            shop: set[int] = set()
+            for o in days:
+                shop.update(self.short.get(o, ()))
+                for g in grams:
+                    shop.update(self.by_gram.get((o, g), ()))
+            near = [i for i in near if i in shop]
+        return sorted(near)
+
+
 def find_pairs(
     payments: list[dict[str, str]],
     cfg: dict[str, Any],
@@ -103,6 +172,12 @@ def find_pairs(
     card_kw = cfg.get("card_pay_keywords") or []
     include = cfg.get("include_label") or INCLUDE
     exclude = cfg.get("exclude_label") or EXCLUDE
+    daily_memo: dict[str, bool] = {}
+
+    def daily(shop: str) -> bool:
+        if shop not in daily_memo:
+            daily_memo[shop] = is_daily_shop(shop, daily_kw)
+        return daily_memo[shop]
 
     smart_agg: dict[tuple[str, str], dict[str, Any]] = defaultdict(
         lambda: {"sum": 0.0, "n": 0, "shop": "", "include_n": 0, "exclude_n": 0}
@@ -111,7 +186,7 @@ def find_pairs(
         if not is_smart(r.get("支払元") or ""):
             continue
         shop = r.get("お店") or ""
-        if not is_daily_shop(shop, daily_kw):
+        if not daily(shop):
             continue
         if is_excluded_shop(shop, r.get("カテゴリ") or "", excl_kw):
             continue
@@ -134,31 +209,22 @@ def find_pairs(
         if is_card(r.get("支払元") or "", card_kw)
         and yen(r) > 0
         and not is_excluded_shop(r.get("お店") or "", r.get("カテゴリ") or "", excl_kw)
-        and is_daily_shop(r.get("お店") or "", daily_kw)
+        and daily(r.get("お店") or "")
     ]
 
+    index = CardIndex(card_rows)
     pairs: list[dict[str, Any]] = []
     seen: set[tuple] = set()
     for (d, sk), agg in smart_agg.items():
         if agg["sum"] < 100:
             continue
-        dt = datetime.strptime(d, "%Y-%m-%d")
-        for r in card_rows:
+        for ci in index.candidates(d, sk, agg["sum"]):
+            r = card_rows[ci]
             rd = r["日付"]
-            rdt = datetime.strptime(rd, "%Y-%m-%d")
-            if abs((rdt - dt).days) > 1:
-                continue
-            csk = shop_key(r.get("お店") or "")
-            shared = bool(sk and csk and (sk[:6] in csk or csk[:6] in sk))
-            if not shared:
-                for i in range(max(0, len(sk) - 3)):
-                    if sk[i : i + 4] in csk:
-                        shared = True
-                        break
-            if not shared:
+            if not shops_shared(sk, index.shop_keys[ci]):
                 continue
-            ce = yen(r)
-            if abs(ce - agg["sum"]) > 3:
+            ce = index.amounts[ci]
+            if abs(ce - agg["sum"]) > AMOUNT_TOL:
                 continue
             uniq = (d, round(agg["sum"], 0), round(ce, 0), sk[:12], rd)
             if uniq in seen:
@@ -634,8 +700,7 @@ def run(year: int | None = None) -> dict[str, Any]:
             "category_review_count": 0,
         }
 
-    rows = list(csv.DictReader(csv_path.open(encoding="utf-8-sig")))
-    payments = [r for r in rows if r.get("方法") == "payment"]
+    payments = open_ledger(csv_path).rows(method="payment")
     pairs = find_pairs(payments, cfg)
     amazon = check_amazon(payments, cfg)
     must = check_must_include(payments, cfg)
@@ -643,13 +708,65 @@ def run(year: int | None = None) -> dict[str, Any]:
     return build_result(pairs, amazon, must, cfg, csv_path, cats)
 
 
+def synthetic_year(cfg: dict[str, Any], year: int, *, visits_per_day: int = 15, seed: int = 0) -> list[dict[str, str]]:
+    """ベンチ用の1年分の payment 行（スマートレシート明細＋同額クレカ＋無関係なクレカ/その他）。"""
+    rnd = random.Random(seed)
+    include = cfg.get("include_label") or INCLUDE
+    exclude = cfg.get("exclude_label") or EXCLUDE
+    shops = [f"{k}{b}店" for k in (cfg.get("daily_shop_keywords") or ["イオン"]) for b in ("豊明", "駅前", "本町")]
+    cards = cfg.get("card_pay_keywords") or ["三井住友"]
+    labels = (include, exclude, "")
+    out: list[dict[str, str]] = []
+
+    def row(d: date, pay: str, shop: str, amount: int, cat: str = "食費") -> dict[str, str]:
+        return {
+            "日付": d.isoformat(), "方法": "payment", "カテゴリ": cat, "支払元": pay,
+            "お店": shop, "支出": str(amount), "集計の設定": rnd.choice(labels),
+        }
+
+    day = date(year, 1, 1)
+    while day.year == year:
+        for _ in range(visits_per_day):
+            shop = rnd.choice(shops)
+            items = [rnd.randint(80, 1200) for _ in range(rnd.randint(1, 6))]
+            out.extend(row(day, "スマートレシート", shop, x) for x in items)
+            if rnd.random() < 0.6:
+                d = day + timedelta(days=rnd.choice((-1, 0, 0, 1)))
+                out.append(row(d, f"{rnd.choice(cards)}カード", shop, sum(items) + rnd.randint(-3, 3)))
+        for _ in range(visits_per_day * 2):
+            out.append(row(day, f"{rnd.choice(cards)}カード", rnd.choice(shops), rnd.randint(100, 8000)))
+        for _ in range(visits_per_day):
+            out.append(row(day, "現金", rnd.choice(shops), rnd.randint(100, 3000), cat="日用雑貨"))
+        day += timedelta(days=1)
+    return out
+
+
+def bench(cfg: dict[str, Any], year: int, *, repeat: int = 3) -> None:
+    sets = [("synthetic", synthetic_year(cfg, year))]
+    csv_path = resolve_csv(cfg, year)
+    if csv_path.is_file():
+        sets.append((csv_path.name, open_ledger(csv_path).rows(method="payment")))
+    for label, payments in sets:
+        best = float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            pairs = find_pairs(payments, cfg)
+            best = min(best, time.perf_counter() - t0)
+        print(f"bench {label}: rows={len(payments)} pairs={len(pairs)} find_pairs={best * 1000:.1f}ms")
+
+
 def main(argv: list[str] | None = None) -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--year", type=int, default=None)
     ap.add_argument("--dry-run", action="store_true")
     ap.add_argument("--json", action="store_true")
+    ap.add_argument("--bench", action="store_true", help="find_pairs の所要時間だけ測る（書き込みなし）")
     args = ap.parse_args(argv)
 
+    if args.bench:
+        bench(load_cfg(), args.year or datetime.now(JST).year)
+        return 0
+
     result = run(args.year)
     if not args.dry_run:
         OUT_PATH.parent.mkdir(parents=True, exist_ok=True)